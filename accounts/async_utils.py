@@ -0,0 +1,171 @@
+"""
+Async building blocks for I/O-bound views served through ASGI.
+
+Outbound HTTP (M-Pesa, Resend, Cloudinary) goes through one shared
+httpx.AsyncClient per event loop, so a worker keeps its connections alive and
+can have many requests in flight without tying up a thread for each one.
+"""
+
+import asyncio
+import json
+import logging
+import weakref
+
+import cloudinary
+import cloudinary.exceptions
+import cloudinary.utils
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.authtoken.models import Token
+
+logger = logging.getLogger(__name__)
+
+RESEND_API_URL = "https://api.resend.com/emails"
+
+HTTP_TIMEOUT = httpx.Timeout(getattr(settings, "ASYNC_HTTP_TIMEOUT", 30), connect=10)
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+_clients = weakref.WeakKeyDictionary()
+
+
+# ---------------------------------------------------------
+# HTTP client
+# ---------------------------------------------------------
+
+
+def get_http_client():
+    """
+    Return the shared AsyncClient for the running event loop.
+
+    Clients are bound to the loop that created them, so each loop (one per
+    ASGI worker, or one per request when async views run under WSGI) gets its
+    own.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
+        _clients[loop] = client
+    return client
+
+
+# ---------------------------------------------------------
+# Resend
+# ---------------------------------------------------------
+
+
+async def asend_email(params):
+    """
+    Async counterpart of `resend.Emails.send(params)`.
+
+    Returns the Resend response, or None on failure, like the sync email
+    helpers in each app's utils.py.
+    """
+    to = ", ".join(params.get("to", []))
+    try:
+        response = await get_http_client().post(
+            RESEND_API_URL,
+            json=params,
+            headers={"Authorization": f"Bearer {settings.RESEND_API_KEY}"},
+        )
+        response.raise_for_status()
+        data = response.json()
+        logger.info(f"Email sent to {to} with response: {data}")
+        return data
+    except Exception as e:
+        logger.error(f"Error sending email to {to}: {str(e)}")
+        return None
+
+
+# ---------------------------------------------------------
+# Cloudinary
+# ---------------------------------------------------------
+
+
+async def aupload_to_cloudinary(content, **options):
+    """
+    Async counterpart of `cloudinary.uploader.upload(file, **options)`.
+
+    `content` is the file body (str or bytes). The request is signed with the
+    configured Cloudinary credentials exactly like the SDK does.
+    """
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+
+    params = cloudinary.utils.cleanup_params(
+        cloudinary.utils.build_upload_params(**options)
+    )
+    params = cloudinary.utils.sign_request(params, options)
+    api_url = cloudinary.utils.cloudinary_api_url("upload", **options)
+    filename = options.get("public_id", "file").rsplit("/", 1)[-1]
+
+    response = await get_http_client().post(
+        api_url,
+        data={k: v for k, v in params.items() if v},
+        files={"file": (filename, content)},
+        headers={"User-Agent": cloudinary.get_user_agent()},
+    )
+    result = response.json()
+    if "error" in result:
+        raise cloudinary.exceptions.Error(result["error"].get("message"))
+    return result
+
+
+# ---------------------------------------------------------
+# Views
+# ---------------------------------------------------------
+
+
+async def aauthenticate(request):
+    """
+    Resolve `Authorization: Token <key>` the way DRF's TokenAuthentication
+    does. Returns the active user or None.
+    """
+    auth = request.headers.get("Authorization", "").split()
+    if len(auth) != 2 or auth[0].lower() != "token":
+        return None
+    try:
+        token = await Token.objects.select_related("user").aget(key=auth[1])
+    except Token.DoesNotExist:
+        return None
+    return token.user if token.user.is_active else None
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncAPIView(View):
+    """
+    Minimal async JSON view.
+
+    DRF's APIView runs handlers synchronously, so async endpoints are plain
+    Django views: the JSON body is parsed into `request.data` and token
+    authentication is enforced when `authentication_required` is set.
+    """
+
+    authentication_required = False
+
+    async def dispatch(self, request, *args, **kwargs):
+        if self.authentication_required:
+            user = await aauthenticate(request)
+            if user is None:
+                return JsonResponse(
+                    {"detail": "Authentication credentials were not provided."},
+                    status=401,
+                )
+            request.user = user
+
+        try:
+            request.data = json.loads(request.body or b"{}")
+        except ValueError:
+            return JsonResponse({"error": "Invalid JSON body"}, status=400)
+
+        return await super().dispatch(request, *args, **kwargs)
+
+
+def run_sync(func, *args, **kwargs):
+    """Run blocking ORM / serializer work from an async view."""
+    return sync_to_async(func)(*args, **kwargs)
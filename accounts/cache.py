@@ -0,0 +1,188 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models.signals import post_save, post_delete
+
+LOOKUP_PREFIX = "lookup"
+LOOKUP_CACHE_TIMEOUT = getattr(settings, "LOOKUP_CACHE_TIMEOUT", 60 * 60)
+
+# A GL change invalidates every namespace (and the reference registry).
+NAMESPACES = (
+    "saving_type",
+    "fee_type",
+    "gl_account",
+)
+
+# GL balances move on every posting, so they are never cached: cached GL
+# accounts defer the column and load it fresh on first access.
+GL_BALANCE_FIELDS = {"balance"}
+
+_MISSING = object()
+
+_local = threading.local()
+
+
+# ---------------------------------------------------------
+# Core helpers
+# ---------------------------------------------------------
+
+
+def _version_key(namespace):
+    return f"{LOOKUP_PREFIX}:{namespace}:version"
+
+
+def get_namespace_version(namespace):
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        # Seeded from the clock so an evicted counter never reuses a version
+        cache.add(_version_key(namespace), time.time_ns(), timeout=None)
+        version = cache.get(_version_key(namespace))
+    return version
+
+
+def uncommitted_namespaces():
+    """
+    Namespaces this thread has changed in its still open transaction.
+    Cleared on commit, and after a rollback once the connection has left
+    its atomic block.
+    """
+    namespaces = getattr(_local, "namespaces", None)
+    if namespaces is None:
+        namespaces = _local.namespaces = set()
+    if namespaces and not connection.in_atomic_block:
+        namespaces.clear()
+    return namespaces
+
+
+def cached_lookup(namespace, key, loader, timeout=LOOKUP_CACHE_TIMEOUT):
+    """
+    Cache-aside lookup: return the cached value for (namespace, key) or call
+    `loader()`, cache its result (including None) and return it.
+
+    Inside a transaction that changed the namespace the cache is bypassed:
+    other workers must not see uncommitted rows, and the cached values are
+    stale for this one.
+    """
+    if namespace in uncommitted_namespaces():
+        return loader()
+
+    digest = hashlib.md5(str(key).encode()).hexdigest()
+    version = get_namespace_version(namespace)
+    cache_key = f"{LOOKUP_PREFIX}:{namespace}:{version}:{digest}"
+
+    value = cache.get(cache_key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    value = loader()
+    cache.set(cache_key, value, timeout=timeout)
+    return value
+
+
+def invalidate_lookups(*namespaces):
+    """
+    Drop every cached lookup in the given namespaces.
+
+    The version is only bumped on commit, so a rolled back change is never
+    cached under a new version. Until then this transaction reads past the
+    cache (see `uncommitted_namespaces`).
+    """
+
+    def _bump():
+        for namespace in namespaces:
+            try:
+                cache.incr(_version_key(namespace))
+            except ValueError:
+                cache.add(_version_key(namespace), time.time_ns(), timeout=None)
+
+    transaction.on_commit(_bump)
+    if connection.in_atomic_block:
+        uncommitted = uncommitted_namespaces()
+        uncommitted.update(namespaces)
+        transaction.on_commit(uncommitted.clear)
+
+
+# ---------------------------------------------------------
+# Reference data lookups
+# ---------------------------------------------------------
+
+
+def get_saving_type_names():
+    from savingtypes.models import SavingType
+
+    return cached_lookup(
+        "saving_type",
+        "__names__",
+        lambda: list(SavingType.objects.values_list("name", flat=True)),
+    )
+
+
+def get_fee_type_names():
+    from feetypes.models import FeeType
+
+    return cached_lookup(
+        "fee_type",
+        "__names__",
+        lambda: list(FeeType.objects.values_list("name", flat=True)),
+    )
+
+
+def get_gl_account_by_name(name):
+    from glaccounts.models import GLAccount
+
+    return cached_lookup(
+        "gl_account",
+        f"name:{name}",
+        lambda: GLAccount.objects.defer("balance").filter(name=name).first(),
+    )
+
+
+# ---------------------------------------------------------
+# Invalidation
+# ---------------------------------------------------------
+
+
+def _invalidate_namespaces(*namespaces):
+    def handler(sender, **kwargs):
+        from accounts.registry import reference_data
+
+        invalidate_lookups(*namespaces)
+        reference_data.invalidate()
+
+    return handler
+
+
+def _invalidate_gl_lookups(sender, update_fields=None, **kwargs):
+    from accounts.registry import reference_data
+
+    # Balance-only saves happen on every posting and must not flush the cache.
+    if update_fields and set(update_fields) <= GL_BALANCE_FIELDS:
+        return
+    invalidate_lookups(*NAMESPACES)
+    reference_data.invalidate()
+
+
+def connect_lookup_invalidation():
+    from savingtypes.models import SavingType
+    from feetypes.models import FeeType
+    from loanproducts.models import LoanProduct
+    from paymentaccounts.models import PaymentAccount
+    from glaccounts.models import GLAccount
+
+    # Loan products and payment accounts are only held by the registry
+    for model, namespaces in (
+        (SavingType, ("saving_type",)),
+        (FeeType, ("fee_type",)),
+        (LoanProduct, ()),
+        (PaymentAccount, ()),
+    ):
+        handler = _invalidate_namespaces(*namespaces)
+        post_save.connect(handler, sender=model, weak=False)
+        post_delete.connect(handler, sender=model, weak=False)
+
+    post_save.connect(_invalidate_gl_lookups, sender=GLAccount)
+    post_delete.connect(_invalidate_gl_lookups, sender=GLAccount)
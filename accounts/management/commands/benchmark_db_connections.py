@@ -0,0 +1,114 @@
+"""
+Management command: benchmark_db_connections
+
+Measures per-request database latency under the three connection strategies
+supported by settings:
+
+  fresh       a new connection per request (CONN_MAX_AGE = 0, no pool)
+  persistent  one connection reused across requests (DB_CONN_MAX_AGE)
+  pooled      connections borrowed from a psycopg pool (DB_POOL)
+
+Each simulated request runs the same connection lifecycle Django applies
+around a request (close_old_connections → a query → close_old_connections),
+from several threads at once to mimic gunicorn threads / audit log threads.
+
+Usage
+-----
+    python manage.py benchmark_db_connections
+    python manage.py benchmark_db_connections --requests 500 --threads 8
+    python manage.py benchmark_db_connections --query "SELECT count(*) FROM loanaccounts_loanaccount"
+"""
+
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.utils import ConnectionHandler
+
+MODES = ("fresh", "persistent", "pooled")
+ALIAS = "benchmark"
+
+
+class Command(BaseCommand):
+    help = "Compares request latency with fresh, persistent and pooled DB connections."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument("--query", default="SELECT 1")
+        parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+
+    def handle(self, *args, **options):
+        base = connections["default"].settings_dict
+        if base["ENGINE"] != "django.db.backends.postgresql":
+            raise CommandError("Connection benchmarks require PostgreSQL.")
+
+        self.stdout.write(
+            f"{options['requests']} requests, {options['threads']} threads, "
+            f"query: {options['query']}"
+        )
+        self.stdout.write(
+            f"{'mode':<12}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'req/s':>10}"
+        )
+
+        for mode in options["modes"]:
+            timings, elapsed = self._run(mode, base, options)
+            timings.sort()
+            p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+            self.stdout.write(
+                f"{mode:<12}"
+                f"{statistics.mean(timings) * 1000:>10.2f}"
+                f"{statistics.median(timings) * 1000:>10.2f}"
+                f"{p95 * 1000:>10.2f}"
+                f"{len(timings) / elapsed:>10.1f}"
+            )
+
+    def _settings_for(self, mode, base, threads):
+        db = {**base, "OPTIONS": {**base.get("OPTIONS", {})}}
+        db["OPTIONS"].pop("pool", None)
+        db["CONN_MAX_AGE"] = 0
+        if mode == "persistent":
+            db["CONN_MAX_AGE"] = None
+        elif mode == "pooled":
+            db["OPTIONS"]["pool"] = {"min_size": threads, "max_size": threads}
+        return db
+
+    def _run(self, mode, base, options):
+        # A private alias so the benchmark never touches "default" or its pool
+        handler = ConnectionHandler(
+            {ALIAS: self._settings_for(mode, base, options["threads"])}
+        )
+        query = options["query"]
+        threads = options["threads"]
+        per_thread = max(1, options["requests"] // threads)
+
+        def worker(_):
+            timings = []
+            conn = handler[ALIAS]
+            try:
+                for _ in range(per_thread):
+                    # Same steps as close_old_connections() on request start/finish
+                    start = time.perf_counter()
+                    conn.close_if_unusable_or_obsolete()
+                    with conn.cursor() as cursor:
+                        cursor.execute(query)
+                        cursor.fetchall()
+                    conn.close_if_unusable_or_obsolete()
+                    timings.append(time.perf_counter() - start)
+            finally:
+                conn.close()
+            return timings
+
+        start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                results = list(executor.map(worker, range(threads)))
+        finally:
+            conn = handler[ALIAS]
+            if mode == "pooled":
+                conn.close_pool()
+        elapsed = time.perf_counter() - start
+
+        return [t for timings in results for t in timings], elapsed
@@ -0,0 +1,172 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from accounts.cache import (
+    get_namespace_version,
+    invalidate_lookups,
+    uncommitted_namespaces,
+)
+
+REGISTRY_NAMESPACE = "reference_registry"
+
+# How often (seconds) a process checks the shared version for changes made by
+# other workers. Changes made in this process are picked up immediately.
+REGISTRY_CHECK_INTERVAL = getattr(settings, "REFERENCE_REGISTRY_CHECK_INTERVAL", 5)
+
+
+class ReferenceRegistry:
+    """
+    Per-process snapshot of reference data used by the posting services:
+    saving types, fee types, loan products, payment accounts and the GL
+    accounts they point to.
+
+    Everything is loaded in one pass and shared by all threads, keyed by
+    primary key, so resolving `deposit.payment_method.gl_account` and friends
+    costs no queries. The snapshot is versioned through the shared cache and
+    reloaded after any of the underlying rows is saved or deleted.
+
+    GL accounts are loaded with `balance` deferred: balances move on every
+    posting and must always be read from the database.
+
+    A transaction that changes reference data works on its own snapshot
+    until it commits; the shared one never holds uncommitted rows.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._snapshot = None
+        self._version = None
+        self._checked_at = 0.0
+
+    # ---------------------------------------------------------
+    # Loading
+    # ---------------------------------------------------------
+
+    def _load(self):
+        from glaccounts.models import GLAccount
+        from savingtypes.models import SavingType
+        from feetypes.models import FeeType
+        from loanproducts.models import LoanProduct
+        from paymentaccounts.models import PaymentAccount
+
+        gl_accounts = {acc.pk: acc for acc in GLAccount.objects.defer("balance")}
+
+        def link(obj, *fields):
+            for field in fields:
+                gl_id = getattr(obj, f"{field}_id")
+                if gl_id is not None:
+                    setattr(obj, field, gl_accounts[gl_id])
+            return obj
+
+        payment_accounts = {
+            acc.pk: link(acc, "gl_account") for acc in PaymentAccount.objects.all()
+        }
+        # Mirrors paymentaccounts.models.PaymentAccount ordering (-created_at)
+        ordered = sorted(
+            payment_accounts.values(), key=lambda acc: acc.created_at, reverse=True
+        )
+        default_payment_method = next(
+            (acc for acc in ordered if acc.is_active), ordered[0] if ordered else None
+        )
+
+        return {
+            "gl_accounts": gl_accounts,
+            "gl_accounts_by_code": {acc.code: acc for acc in gl_accounts.values()},
+            "saving_types": {
+                st.pk: link(st, "gl_account") for st in SavingType.objects.all()
+            },
+            "fee_types": {
+                ft.pk: link(ft, "gl_account") for ft in FeeType.objects.all()
+            },
+            "loan_products": {
+                lp.pk: link(
+                    lp,
+                    "gl_principal_asset",
+                    "gl_interest_revenue",
+                    "gl_penalty_revenue",
+                    "gl_processing_fee_revenue",
+                    "gl_interest_receivable",
+                )
+                for lp in LoanProduct.objects.all()
+            },
+            "payment_accounts": payment_accounts,
+            "default_payment_method": default_payment_method,
+        }
+
+    def _get(self):
+        if REGISTRY_NAMESPACE in uncommitted_namespaces():
+            # Kept while the savepoints it was loaded under are not rolled back
+            savepoints = tuple(connection.savepoint_ids)
+            local = getattr(self._local, "snapshot", None)
+            if local is None or savepoints[: len(local[0])] != local[0]:
+                local = self._local.snapshot = (savepoints, self._load())
+            return local[1]
+
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._checked_at < REGISTRY_CHECK_INTERVAL:
+            return snapshot
+
+        version = get_namespace_version(REGISTRY_NAMESPACE)
+        with self._lock:
+            if self._snapshot is None or self._version != version:
+                self._snapshot = self._load()
+                self._version = version
+            self._checked_at = now
+            return self._snapshot
+
+    def clear(self):
+        self._local.snapshot = None
+        with self._lock:
+            self._snapshot = None
+
+    def invalidate(self):
+        """
+        Reload this transaction's snapshot now, and once it commits this
+        process's and (through the shared version) the other workers'.
+        """
+        invalidate_lookups(REGISTRY_NAMESPACE)
+        self._local.snapshot = None
+        transaction.on_commit(self.clear)
+
+    # ---------------------------------------------------------
+    # Accessors
+    # ---------------------------------------------------------
+
+    def _lookup(self, table, key):
+        if key is None:
+            return None
+        obj = self._get()[table].get(key)
+        if obj is None:
+            # Possibly created by another worker since the last version check
+            self.clear()
+            obj = self._get()[table].get(key)
+        return obj
+
+    def gl_account(self, pk):
+        return self._lookup("gl_accounts", pk)
+
+    def gl_account_by_code(self, code):
+        return self._lookup("gl_accounts_by_code", code)
+
+    def saving_type(self, pk):
+        return self._lookup("saving_types", pk)
+
+    def fee_type(self, pk):
+        return self._lookup("fee_types", pk)
+
+    def loan_product(self, pk):
+        return self._lookup("loan_products", pk)
+
+    def payment_account(self, pk):
+        return self._lookup("payment_accounts", pk)
+
+    def default_payment_method(self):
+        return self._get()["default_payment_method"]
+
+
+reference_data = ReferenceRegistry()
@@ -229,7 +229,8 @@ class ForgotPasswordSerializer(serializers.Serializer):
             raise serializers.ValidationError("User with this email does not exist")
         return value
 
-    def save(self):
+    def create_reset_code(self):
+        """Store a new reset code on the user; returns (user, code)."""
         email = self.validated_data["email"]
         user = User.objects.get(email=email)
 
@@ -238,6 +239,10 @@ class ForgotPasswordSerializer(serializers.Serializer):
         user.password_reset_code = code
         user.password_reset_code_created_at = timezone.now()
         user.save()
+        return user, code
+
+    def save(self):
+        user, code = self.create_reset_code()
 
         # Send email
         send_forgot_password_email(user, code)
@@ -9,6 +9,7 @@ from accounts.views import (
     PasswordChangeView,
     MemberCreatedByAdminView,
     ForgotPasswordView,
+    AsyncForgotPasswordView,
     ResetPasswordView,
     AdminResetPasswordView,
     BulkMemberCreatedByAdminView,
@@ -56,6 +57,11 @@ urlpatterns = [
         ForgotPasswordView.as_view(),
         name="forgot-password",
     ),
+    path(
+        "password/forgot-password/async/",
+        AsyncForgotPasswordView.as_view(),
+        name="async-forgot-password",
+    ),
     path(
         "password/reset-password/", ResetPasswordView.as_view(), name="reset-password"
     ),
@@ -75,25 +75,29 @@ def send_account_activated_email(user):
         return None
 
 
+def forgot_password_email_params(user, code):
+    email_body = render_to_string(
+        "forgot_password.html",
+        {
+            "user": user,
+            "code": code,
+            "current_year": datetime.now().year,
+        },
+    )
+    return {
+        "from": "Mwanda Mzedu SACCO <security@mwandamzedusacco.com>",
+        "to": [user.email],
+        "subject": "Reset Your Mwanda Mzedu SACCO Password",
+        "html": email_body,
+    }
+
+
 def send_forgot_password_email(user, code):
     """
     A function to send a forgot password email
     """
     try:
-        email_body = render_to_string(
-            "forgot_password.html",
-            {
-                "user": user,
-                "code": code,
-                "current_year": datetime.now().year,
-            },
-        )
-        params = {
-            "from": "Mwanda Mzedu SACCO <security@mwandamzedusacco.com>",
-            "to": [user.email],
-            "subject": "Reset Your Mwanda Mzedu SACCO Password",
-            "html": email_body,
-        }
+        params = forgot_password_email_params(user, code)
         response = resend.Emails.send(params)
         logger.info(
             f"Forgot password email sent to {user.email} with response: {response}"
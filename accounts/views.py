@@ -6,7 +6,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model, authenticate
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 from rest_framework.authtoken.models import Token
 from django.utils.http import urlsafe_base64_decode
 from django.utils.encoding import force_str
@@ -23,7 +23,8 @@ from accounts.serializers import (
     BulkMemberCreatedByAdminSerializer,
     BulkMemberCreatedByAdminUploadCSVSerializer,
 )
-from accounts.utils import send_account_activated_email
+from accounts.utils import send_account_activated_email, forgot_password_email_params
+from accounts.async_utils import AsyncAPIView, asend_email, run_sync
 from accounts.tools import create_member_accounts
 from accounts.permissions import IsSystemAdminOrReadOnly
 from mwandamzedusaccoapi.settings import DOMAIN
@@ -138,6 +139,24 @@ class ForgotPasswordView(generics.GenericAPIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class AsyncForgotPasswordView(AsyncAPIView):
+    """
+    Async variant of ForgotPasswordView: the reset email goes out through
+    Resend without holding a worker thread.
+    """
+
+    async def post(self, request):
+        serializer = ForgotPasswordSerializer(data=request.data)
+        if not await run_sync(serializer.is_valid):
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        user, code = await run_sync(serializer.create_reset_code)
+        await asend_email(forgot_password_email_params(user, code))
+        return JsonResponse(
+            {"detail": "Reset code sent to your email"}, status=status.HTTP_200_OK
+        )
+
+
 class ResetPasswordView(generics.GenericAPIView):
     permission_classes = (AllowAny,)
     serializer_class = ResetPasswordSerializer
@@ -1,5 +1,6 @@
 import threading
 import json
+from django.db import connection
 from django.utils.deprecation import MiddlewareMixin
 from auditlogs.models import AuditLog
 
@@ -75,15 +76,20 @@ class AuditLogMiddleware(MiddlewareMixin):
                 description += f". Context Details: {details_str}"
                 
             def _create_log():
-                AuditLog.objects.create(
-                    user=user,
-                    action=action,
-                    module=module,
-                    description=description,
-                    ip_address=ip_address,
-                    request_payload=request_payload,
-                    response_payload=response_payload
-                )
+                try:
+                    AuditLog.objects.create(
+                        user=user,
+                        action=action,
+                        module=module,
+                        description=description,
+                        ip_address=ip_address,
+                        request_payload=request_payload,
+                        response_payload=response_payload
+                    )
+                finally:
+                    # Threads don't get request_finished: release the connection
+                    # (back to the pool, or closed) instead of leaking it
+                    connection.close()
                 
             thread = threading.Thread(target=_create_log)
             thread.start()
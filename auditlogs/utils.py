@@ -1,16 +1,21 @@
 import threading
+from django.db import connection
 
 def log_action(user, action, module, description, ip_address=None):
     from auditlogs.models import AuditLog
     
     def _create_log():
-        AuditLog.objects.create(
-            user=user,
-            action=action,
-            module=module,
-            description=description,
-            ip_address=ip_address
-        )
+        try:
+            AuditLog.objects.create(
+                user=user,
+                action=action,
+                module=module,
+                description=description,
+                ip_address=ip_address
+            )
+        finally:
+            # Threads don't get request_finished: release the connection
+            connection.close()
         
     thread = threading.Thread(target=_create_log)
     thread.start()
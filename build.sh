@@ -8,3 +8,4 @@ playwright install-deps
 
 python manage.py collectstatic --no-input
 python manage.py migrate
+python manage.py createcachetable
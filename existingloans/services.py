@@ -4,6 +4,7 @@ from decimal import Decimal
 from django.db import transaction
 from django.utils.timezone import now
 from financials.services import post_to_ledger
+from accounts.registry import reference_data
 
 logger = logging.getLogger(__name__)
 
@@ -17,13 +18,15 @@ def process_existing_loan_disbursement_accounting(existing_loan):
     if existing_loan.posted_to_gl:
         return True
 
-    if not existing_loan.payment_method or not existing_loan.gl_principal_asset:
+    if not existing_loan.payment_method_id or not existing_loan.gl_principal_asset_id:
         raise ValueError("Payment method and GL Principal Asset account must be set.")
 
     try:
         with transaction.atomic():
-            bank_gl = existing_loan.payment_method.gl_account
-            asset_gl = existing_loan.gl_principal_asset
+            bank_gl = reference_data.payment_account(
+                existing_loan.payment_method_id
+            ).gl_account
+            asset_gl = reference_data.gl_account(existing_loan.gl_principal_asset_id)
 
             entries = [
                 {"account": asset_gl, "debit": existing_loan.principal, "credit": 0},
@@ -9,6 +9,7 @@ from decimal import Decimal
 from django.db import transaction
 from django.utils.timezone import now
 from financials.services import post_to_ledger
+from accounts.registry import reference_data
 
 logger = logging.getLogger(__name__)
 
@@ -44,16 +45,18 @@ def process_existing_loan_payment_accounting(payment):
 
             # --- 2. GENERAL LEDGER POSTING ---
             if not payment.posted_to_gl:
-                bank_gl = payment.payment_method.gl_account
+                bank_gl = reference_data.payment_account(
+                    payment.payment_method_id
+                ).gl_account
 
                 # Route to GL based on admin label
                 if payment.repayment_type == "Interest Only":
-                    credit_acc = loan.gl_interest_revenue
+                    credit_acc = reference_data.gl_account(loan.gl_interest_revenue_id)
                 elif payment.repayment_type == "Penalty Payment":
-                    credit_acc = loan.gl_penalty_revenue
+                    credit_acc = reference_data.gl_account(loan.gl_penalty_revenue_id)
                 else:
                     # Regular/Partial/Clearance/Early Settlement goes to Principal Asset
-                    credit_acc = loan.gl_principal_asset
+                    credit_acc = reference_data.gl_account(loan.gl_principal_asset_id)
 
                 if not credit_acc:
                     raise ValueError(
@@ -2,6 +2,7 @@ import logging
 from django.db import transaction
 from django.utils.timezone import now
 from financials.services import post_to_ledger
+from accounts.registry import reference_data
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +21,8 @@ def process_fee_payment_accounting(payment):
         return True
 
     fee_acc = payment.fee_account
-    fee_type = fee_acc.fee_type
+    fee_type = reference_data.fee_type(fee_acc.fee_type_id)
+    payment_method = reference_data.payment_account(payment.payment_method_id)
 
     try:
         with transaction.atomic():
@@ -37,12 +39,12 @@ def process_fee_payment_accounting(payment):
 
             # 2. Post to General Ledger
             if not payment.posted_to_gl:
-                if not payment.payment_method or not payment.payment_method.gl_account:
+                if not payment_method or not payment_method.gl_account:
                     raise ValueError(
-                        f"No GL Account linked to Payment Method: {payment.payment_method}"
+                        f"No GL Account linked to Payment Method: {payment_method}"
                     )
 
-                bank_gl = payment.payment_method.gl_account
+                bank_gl = payment_method.gl_account
                 revenue_gl = (
                     fee_type.gl_account
                 )  # Fee types map directly to Revenue accounts
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class FinancialsConfig(AppConfig):
     name = "financials"
+
+    def ready(self):
+        import financials.signals
@@ -0,0 +1,159 @@
+# financials/cache.py
+import hashlib
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------
+# Constants
+# ---------------------------------------------------------
+LEDGER_VERSION_KEY = "financials:ledger_version"
+REPORT_KEY_PREFIX = "financials:report"
+REPORT_STATS_PREFIX = "financials:report_stats"
+
+# Upper bound on how long a report may be served from cache. The ledger
+# version already invalidates on every posting; the timeout only bounds
+# staleness when the cache backend is not shared between workers.
+REPORT_CACHE_TIMEOUT = getattr(settings, "REPORT_CACHE_TIMEOUT", 15 * 60)
+
+CACHED_REPORTS = (
+    "trial_balance",
+    "balance_sheet",
+    "pnl",
+    "cash_balance",
+    "debtors",
+    "summary_balance_sheet",
+    "summary_pnl",
+    "cash_book",
+)
+
+
+# ---------------------------------------------------------
+# Ledger version
+# ---------------------------------------------------------
+
+
+def get_ledger_version():
+    """
+    Returns the current ledger version.
+
+    The version is seeded from the clock the first time it is read (or after
+    the cache evicted it) so that a fresh counter can never collide with a
+    version used by reports that are still cached.
+    """
+    version = cache.get(LEDGER_VERSION_KEY)
+    if version is None:
+        cache.add(LEDGER_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(LEDGER_VERSION_KEY)
+    return version
+
+
+def _increment_ledger_version():
+    try:
+        cache.incr(LEDGER_VERSION_KEY)
+    except ValueError:
+        # Key missing (first run or evicted): seed a new, unused version
+        cache.add(LEDGER_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def bump_ledger_version():
+    """
+    Invalidate every cached report.
+
+    The bump is deferred until the surrounding transaction commits so that a
+    report computed in between can never be cached under the new version
+    while the posting is still invisible, and so rolled back postings do not
+    invalidate anything.
+    """
+    transaction.on_commit(_increment_ledger_version)
+
+
+# ---------------------------------------------------------
+# Report cache
+# ---------------------------------------------------------
+
+
+def _report_key(name, params, version):
+    # Reports resolve missing dates to "today", so the current date is part
+    # of the key: cached defaults roll over at midnight.
+    payload = {"params": params or {}, "today": timezone.localdate()}
+    digest = hashlib.md5(
+        json.dumps(payload, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return f"{REPORT_KEY_PREFIX}:{name}:{version}:{digest}"
+
+
+def _record(name, outcome):
+    key = f"{REPORT_STATS_PREFIX}:{name}:{outcome}"
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def cached_report(name, params, builder):
+    """
+    Return the report `name` for `params`, building it with `builder()` on a miss.
+
+    Entries are keyed by (report, params, ledger version) so any posting makes
+    every previously cached report unreachable.
+    """
+    key = _report_key(name, params, get_ledger_version())
+
+    data = cache.get(key)
+    if data is not None:
+        _record(name, "hits")
+        return data
+
+    _record(name, "misses")
+    start_time = time.perf_counter()
+    data = builder()
+    logger.info(
+        f"Report cache miss for {name}: built in {time.perf_counter() - start_time:.3f}s"
+    )
+    cache.set(key, data, timeout=REPORT_CACHE_TIMEOUT)
+    return data
+
+
+def get_report_cache_stats():
+    """Hit/miss counters for every cached report."""
+    reports = []
+    total_hits = 0
+    total_misses = 0
+
+    for name in CACHED_REPORTS:
+        hits = cache.get(f"{REPORT_STATS_PREFIX}:{name}:hits", 0)
+        misses = cache.get(f"{REPORT_STATS_PREFIX}:{name}:misses", 0)
+        lookups = hits + misses
+        reports.append(
+            {
+                "report": name,
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else None,
+            }
+        )
+        total_hits += hits
+        total_misses += misses
+
+    total_lookups = total_hits + total_misses
+    return {
+        "ledger_version": get_ledger_version(),
+        "reports": reports,
+        "totals": {
+            "hits": total_hits,
+            "misses": total_misses,
+            "hit_rate": (
+                round(total_hits / total_lookups, 4) if total_lookups else None
+            ),
+        },
+    }
+
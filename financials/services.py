@@ -6,6 +6,7 @@ from django.db import transaction
 from journalentries.models import JournalEntry
 from journalbatches.models import JournalBatch
 from financials.models import PostingLog
+from financials.cache import bump_ledger_version
 
 logger = logging.getLogger(__name__)
 
@@ -85,4 +86,7 @@ def post_to_ledger(description, reference, entries, posting_date=None):
             reference=reference,
         )
 
+        # 6. Invalidate cached financial reports once the posting commits
+        bump_ledger_version()
+
         return batch
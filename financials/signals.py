@@ -0,0 +1,34 @@
+from django.db.models.signals import post_save, post_delete
+
+from financials.cache import bump_ledger_version
+from journalentries.models import JournalEntry
+from journalbatches.models import JournalBatch
+from savingsdeposits.models import SavingsDeposit
+from venturedeposits.models import VentureDeposit
+from venturepayments.models import VenturePayment
+from loanaccounts.models import LoanAccount
+from loanpayments.models import LoanPayment
+from loandisbursements.models import LoanDisbursement
+
+# GL reports read journal entries and batches; the operational reports
+# (debtors, summary balance sheet, P&L and cash book) read these tables
+# directly, so changes to them invalidate cached reports as well.
+LEDGER_SOURCES = (
+    JournalEntry,
+    JournalBatch,
+    SavingsDeposit,
+    VentureDeposit,
+    VenturePayment,
+    LoanAccount,
+    LoanPayment,
+    LoanDisbursement,
+)
+
+
+def invalidate_cached_reports(sender, **kwargs):
+    bump_ledger_version()
+
+
+for model in LEDGER_SOURCES:
+    post_save.connect(invalidate_cached_reports, sender=model)
+    post_delete.connect(invalidate_cached_reports, sender=model)
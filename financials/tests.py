@@ -1,3 +1,54 @@
+from decimal import Decimal
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from financials.cache import cached_report, get_ledger_version, get_report_cache_stats
+from financials.services import post_to_ledger
+from glaccounts.models import GLAccount
+
+
+class ReportCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.bank = GLAccount.objects.create(
+            name="Cash at Bank", code="11000", category="ASSET"
+        )
+        self.savings = GLAccount.objects.create(
+            name="Member Savings", code="20000", category="LIABILITY"
+        )
+        # Reload so balances are Decimals, as they are for posting services
+        self.bank.refresh_from_db()
+        self.savings.refresh_from_db()
+        self.calls = 0
+
+    def build(self):
+        self.calls += 1
+        return {"calls": self.calls}
+
+    def test_repeated_reads_are_served_from_cache(self):
+        first = cached_report("trial_balance", {"as_of_date": None}, self.build)
+        second = cached_report("trial_balance", {"as_of_date": None}, self.build)
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.calls, 1)
+
+        stats = get_report_cache_stats()["reports"][0]
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_posting_invalidates_cached_reports(self):
+        cached_report("trial_balance", {}, self.build)
+        version = get_ledger_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post_to_ledger(
+                "Deposit",
+                "REF-001",
+                [
+                    {"account": self.bank, "debit": Decimal("100"), "credit": 0},
+                    {"account": self.savings, "debit": 0, "credit": Decimal("100")},
+                ],
+            )
+
+        self.assertGreater(get_ledger_version(), version)
+        cached_report("trial_balance", {}, self.build)
+        self.assertEqual(self.calls, 2)
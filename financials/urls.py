@@ -6,6 +6,8 @@ from financials.views import (
     PnLStatementView,
     CashBalanceView,
     DebtorsListView,
+    PortfolioAtRiskView,
+    ReportCacheStatsView,
 )
 
 urlpatterns = [
@@ -14,4 +16,12 @@ urlpatterns = [
     path("pnl/", PnLStatementView.as_view(), name="pnl-statement"),
     path("cash-balance/", CashBalanceView.as_view(), name="cash-balance"),
     path("debtors/", DebtorsListView.as_view(), name="debtors-list"),
+    path(
+        "portfolio-at-risk/",
+        PortfolioAtRiskView.as_view(),
+        name="portfolio-at-risk",
+    ),
+    path(
+        "report-cache/", ReportCacheStatsView.as_view(), name="report-cache-stats"
+    ),
 ]
@@ -1,5 +1,6 @@
 # financials/views.py
 from datetime import date
+from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -11,7 +12,13 @@ from financials.reports import (
     get_pnl_statement,
     get_cash_balances,
 )
+from financials.cache import cached_report, get_report_cache_stats
 from transactions.reports import get_debtors_report
+from loanaccounts.ageing import (
+    AGEING_BUCKETS,
+    get_portfolio_at_risk_report,
+)
+from loanaccounts.models import PortfolioAgeingSnapshot
 
 
 def _parse_date(date_str, param_name):
@@ -40,7 +47,11 @@ class TrialBalanceView(APIView):
             if err:
                 return Response({"error": err}, status=status.HTTP_400_BAD_REQUEST)
 
-        data = get_trial_balance(as_of_date=as_of_date)
+        data = cached_report(
+            "trial_balance",
+            {"as_of_date": as_of_date},
+            lambda: get_trial_balance(as_of_date=as_of_date),
+        )
         return Response(data)
 
 
@@ -62,7 +73,11 @@ class BalanceSheetView(APIView):
             if err:
                 return Response({"error": err}, status=status.HTTP_400_BAD_REQUEST)
 
-        data = get_balance_sheet(as_of_date=as_of_date)
+        data = cached_report(
+            "balance_sheet",
+            {"as_of_date": as_of_date},
+            lambda: get_balance_sheet(as_of_date=as_of_date),
+        )
         return Response(data)
 
 
@@ -100,7 +115,11 @@ class PnLStatementView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        data = get_pnl_statement(start_date=start_date, end_date=end_date)
+        data = cached_report(
+            "pnl",
+            {"start_date": start_date, "end_date": end_date},
+            lambda: get_pnl_statement(start_date=start_date, end_date=end_date),
+        )
         return Response(data)
 
 
@@ -122,7 +141,11 @@ class CashBalanceView(APIView):
             if err:
                 return Response({"error": err}, status=status.HTTP_400_BAD_REQUEST)
 
-        data = get_cash_balances(as_of_date=as_of_date)
+        data = cached_report(
+            "cash_balance",
+            {"as_of_date": as_of_date},
+            lambda: get_cash_balances(as_of_date=as_of_date),
+        )
         return Response(data)
 
 
@@ -134,5 +157,58 @@ class DebtorsListView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        data = get_debtors_report()
+        data = cached_report("debtors", {}, get_debtors_report)
         return Response(data)
+
+
+class PortfolioAtRiskView(APIView):
+    """
+    GET /api/v1/financials/portfolio-at-risk/
+
+    Query params:
+        as_of_date (optional): YYYY-MM-DD  — defaults to today
+        bucket (optional): list the loans in this ageing bucket (e.g. 31-60)
+
+    Served from the day's stored snapshot, built by the daily
+    compute_portfolio_ageing command; 404 until it has run.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        as_of_date = timezone.localdate()
+        raw = request.query_params.get("as_of_date")
+        if raw:
+            as_of_date, err = _parse_date(raw, "as_of_date")
+            if err:
+                return Response({"error": err}, status=status.HTTP_400_BAD_REQUEST)
+
+        bucket = request.query_params.get("bucket")
+        if bucket and bucket not in dict(AGEING_BUCKETS):
+            return Response(
+                {
+                    "error": f"'bucket' must be one of {', '.join(dict(AGEING_BUCKETS))}."
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        snapshot = PortfolioAgeingSnapshot.objects.filter(as_of_date=as_of_date).first()
+        if snapshot is None:
+            return Response(
+                {"error": f"No portfolio ageing snapshot for {as_of_date}."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response(get_portfolio_at_risk_report(snapshot, bucket))
+
+
+class ReportCacheStatsView(APIView):
+    """
+    GET /api/v1/financials/report-cache/
+
+    Hit/miss counters for the cached financial reports.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(get_report_cache_stats())
@@ -148,12 +148,13 @@ class GuaranteeRequestSerializer(serializers.ModelSerializer):
 
         # AUTO-ACCEPT SELF-GUARANTEE ONLY if amount is provided
         if instance.guarantor.member == instance.member and instance.guaranteed_amount:
-            instance.status = "Accepted"
-            instance.save(update_fields=["status"])
+            from guarantors.services import update_guarantee_status
+
+            # Also commits the amount on the profile and sets the
+            # application's self_guaranteed_amount
+            update_guarantee_status(instance, "Accepted")
 
             loan = instance.loan_application
-            loan.self_guaranteed_amount = instance.guaranteed_amount
-            loan.save(update_fields=["self_guaranteed_amount"])
 
             if compute_loan_coverage(loan)["is_fully_covered"]:
                 loan.status = "Ready for Submission"
@@ -87,13 +87,15 @@ class GuaranteeRequestUpdateStatusView(generics.UpdateAPIView):
             )
 
         with transaction.atomic():
-            from guarantors.services import (
-                update_guarantee_status,
-                sync_guarantor_profile,
-            )
+            from guarantors.models import GuarantorProfile
+            from guarantors.services import update_guarantee_status
 
             if new_status == "Accepted":
-                profile = instance.guarantor
+                # Capacity is kept current by delta; lock it while we commit
+                profile = GuarantorProfile.objects.select_for_update().get(
+                    pk=instance.guarantor_id
+                )
+                instance.guarantor = profile
 
                 # Check for amount adjustment (REQUIRED for acceptance now)
                 adjusted_amount = serializer.validated_data.get("guaranteed_amount")
@@ -118,8 +120,7 @@ class GuaranteeRequestUpdateStatusView(generics.UpdateAPIView):
                         }
                     )
 
-                # Validate capacity (ensure profile is synced first just in case)
-                sync_guarantor_profile(profile)
+                # Validate capacity
                 if profile.available_capacity() < amount_to_commit:
                     raise serializers.ValidationError(
                         {
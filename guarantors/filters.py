@@ -0,0 +1,18 @@
+import django_filters
+
+from guarantors.models import GuarantorProfile
+
+
+class GuarantorSearchFilter(django_filters.FilterSet):
+    """
+    Filters for the guarantor search API. min_amount is a range scan on the
+    guarantor_search_idx index (is_eligible, available_guarantee_amount).
+    """
+
+    min_amount = django_filters.NumberFilter(
+        field_name="available_guarantee_amount", lookup_expr="gte"
+    )
+
+    class Meta:
+        model = GuarantorProfile
+        fields = []
@@ -0,0 +1,57 @@
+"""
+Management command: verify_guarantor_capacity
+
+Guarantor profiles' committed_guarantee_amount and max_guarantee_amount are
+maintained by delta on every deposit, guarantee decision and repayment, and
+active_guarantees is recounted when guarantees go live or are released. This
+recomputes all three for every profile and reports the ones that have drifted
+(e.g. after a balance edited outside the services). Run it periodically;
+--fix rewrites the drifted profiles from the recomputation.
+
+Usage
+-----
+    python manage.py verify_guarantor_capacity
+    python manage.py verify_guarantor_capacity --fix
+    python manage.py verify_guarantor_capacity --chunk-size 500
+"""
+
+from django.core.management.base import BaseCommand
+
+from guarantors.services import find_capacity_drift, sync_guarantor_profiles
+
+
+class Command(BaseCommand):
+    help = "Reports (and with --fix repairs) drift in guarantor capacity figures."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix", action="store_true", help="Recompute the drifted profiles."
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Profiles compared per aggregate query.",
+        )
+
+    def handle(self, *args, **options):
+        drift = find_capacity_drift(chunk_size=options["chunk_size"])
+        for row in drift:
+            self.stdout.write(
+                f"{row['profile']}: committed {row['committed']} "
+                f"(expected {row['expected_committed']}), max {row['max']} "
+                f"(expected {row['expected_max']}), active {row['active']} "
+                f"(expected {row['expected_active']})"
+            )
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("No guarantor capacity drift."))
+        elif options["fix"]:
+            fixed = sync_guarantor_profiles(row["profile"] for row in drift)
+            self.stdout.write(self.style.SUCCESS(f"Fixed {fixed} profiles."))
+        else:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{len(drift)} profiles have drifted; rerun with --fix to repair."
+                )
+            )
@@ -0,0 +1,73 @@
+# Generated by Django 6.0.1 on 2026-10-19 01:13
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# Frozen copy of guarantors.models.ACTIVE_GUARANTEE_LOAN_STATUSES
+ACTIVE_GUARANTEE_LOAN_STATUSES = ["Submitted", "Approved", "Disbursed"]
+
+
+def backfill_active_guarantees(apps, schema_editor):
+    """Count every profile's accepted guarantees on live loans."""
+    GuarantorProfile = apps.get_model("guarantors", "GuarantorProfile")
+    GuaranteeRequest = apps.get_model("guaranteerequests", "GuaranteeRequest")
+    counts = (
+        GuaranteeRequest.objects.filter(
+            guarantor=OuterRef("pk"),
+            status="Accepted",
+            loan_application__status__in=ACTIVE_GUARANTEE_LOAN_STATUSES,
+        )
+        .order_by()
+        .values("guarantor")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    GuarantorProfile.objects.update(active_guarantees=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("guarantors", "0001_initial"),
+        ("guaranteerequests", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="guarantorprofile",
+            name="active_guarantees",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, help_text="Accepted guarantees on live loans"
+            ),
+        ),
+        migrations.AddField(
+            model_name="guarantorprofile",
+            name="available_guarantee_amount",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.db.models.functions.comparison.Greatest(
+                    django.db.models.expressions.CombinedExpression(
+                        models.F("max_guarantee_amount"),
+                        "-",
+                        models.F("committed_guarantee_amount"),
+                    ),
+                    models.Value(Decimal("0")),
+                ),
+                output_field=models.DecimalField(decimal_places=2, max_digits=15),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="guarantorprofile",
+            index=models.Index(
+                fields=["is_eligible", "-available_guarantee_amount"],
+                name="guarantor_search_idx",
+            ),
+        ),
+        migrations.RunPython(backfill_active_guarantees, migrations.RunPython.noop),
+    ]
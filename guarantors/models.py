@@ -1,5 +1,6 @@
 from decimal import Decimal
 from django.db import models
+from django.db.models.functions import Greatest
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
@@ -8,6 +9,22 @@ from savings.models import SavingsAccount
 
 User = get_user_model()
 
+# Loan application statuses whose accepted guarantees lock the guarantor's funds
+COMMITTING_LOAN_STATUSES = [
+    "Pending",
+    "Ready for Amendment",
+    "Amended",
+    "In Progress",
+    "Ready for Submission",
+    "Submitted",
+    "Approved",
+    "Disbursed",
+]
+
+# Loan application statuses whose accepted guarantees count towards a
+# guarantor's max_active_guarantees
+ACTIVE_GUARANTEE_LOAN_STATUSES = ["Submitted", "Approved", "Disbursed"]
+
 
 class GuarantorProfile(UniversalIdModel, TimeStampedModel, ReferenceModel):
     member = models.OneToOneField(
@@ -24,11 +41,29 @@ class GuarantorProfile(UniversalIdModel, TimeStampedModel, ReferenceModel):
     committed_guarantee_amount = models.DecimalField(
         max_digits=15, decimal_places=2, default=0
     )
+    # Guarantor search index: kept by the database / guarantors.services
+    available_guarantee_amount = models.GeneratedField(
+        expression=Greatest(
+            models.F("max_guarantee_amount") - models.F("committed_guarantee_amount"),
+            models.Value(Decimal("0")),
+        ),
+        output_field=models.DecimalField(max_digits=15, decimal_places=2),
+        db_persist=True,
+    )
+    active_guarantees = models.PositiveIntegerField(
+        default=0, editable=False, help_text="Accepted guarantees on live loans"
+    )
 
     class Meta:
         verbose_name = "Guarantor Profile"
         verbose_name_plural = "Guarantor Profiles"
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["is_eligible", "-available_guarantee_amount"],
+                name="guarantor_search_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.member.member_no} – Eligible: {self.is_eligible}"
@@ -44,34 +79,29 @@ class GuarantorProfile(UniversalIdModel, TimeStampedModel, ReferenceModel):
         from guaranteerequests.models import GuaranteeRequest
         from django.db.models import Sum
 
-        # Loans that should lock funds
-        active_statuses = [
-            "Pending",
-            "Ready for Amendment",
-            "Amended",
-            "In Progress",
-            "Ready for Submission",
-            "Submitted",
-            "Approved",
-            "Disbursed",
-        ]
-
         total = GuaranteeRequest.objects.filter(
             guarantor=self,
             status="Accepted",
-            loan_application__status__in=active_statuses,
+            loan_application__status__in=COMMITTING_LOAN_STATUSES,
         ).aggregate(total=Sum("guaranteed_amount"))["total"] or Decimal("0")
 
         self.committed_guarantee_amount = total
         return total
 
+    def recalculate_max_guarantee_amount(self):
+        """Recalculates max_guarantee_amount from the member's guarantee-eligible savings."""
+        total = SavingsAccount.objects.filter(
+            member=self.member, account_type__can_guarantee=True
+        ).aggregate(total=models.Sum("balance"))["total"] or Decimal("0")
+
+        self.max_guarantee_amount = total
+        return total
+
     def save(self, *args, **kwargs):
-        # Always sync max_guarantee_amount with current savings
-        if self.pk:  # Only for existing instances
-            total_savings = SavingsAccount.objects.filter(
-                member=self.member, account_type__can_guarantee=True
-            ).aggregate(total=models.Sum("balance"))["total"] or Decimal("0")
-            self.max_guarantee_amount = total_savings
+        # New profiles start from the member's current savings; after that
+        # deposits move max_guarantee_amount by delta (guarantors.services)
+        if self._state.adding:
+            self.recalculate_max_guarantee_amount()
 
         if self.is_eligible and not self.eligibility_checked_at:
             self.eligibility_checked_at = timezone.now()
@@ -89,5 +119,5 @@ class GuarantorProfile(UniversalIdModel, TimeStampedModel, ReferenceModel):
         return GuaranteeRequest.objects.filter(
             guarantor=self,
             status="Accepted",
-            loan_application__status__in=["Submitted", "Approved", "Disbursed"],
+            loan_application__status__in=ACTIVE_GUARANTEE_LOAN_STATUSES,
         ).count()
@@ -81,7 +81,7 @@ class GuarantorProfileSerializer(serializers.ModelSerializer):
         return data
 
     def get_active_guarantees_count(self, obj):
-        return obj.active_guarantees_count()
+        return obj.active_guarantees
 
     def get_committed_amount(self, obj):
         return float(obj.committed_guarantee_amount)
@@ -90,8 +90,7 @@ class GuarantorProfileSerializer(serializers.ModelSerializer):
         return float(obj.available_capacity())
 
     def get_has_reached_limit(self, obj):
-        count = obj.active_guarantees_count()
-        return count >= obj.max_active_guarantees
+        return obj.active_guarantees >= obj.max_active_guarantees
 
     def create(self, validated_data):
         member_no = validated_data.pop("member_no")
@@ -108,3 +107,25 @@ class GuarantorProfileSerializer(serializers.ModelSerializer):
             **validated_data,
         )
         return profile
+
+
+class GuarantorSearchSerializer(serializers.ModelSerializer):
+    member = serializers.CharField(source="member.member_no", read_only=True)
+    member_name = serializers.SerializerMethodField()
+    available_amount = serializers.FloatField(
+        source="available_guarantee_amount", read_only=True
+    )
+
+    class Meta:
+        model = GuarantorProfile
+        fields = (
+            "member",
+            "member_name",
+            "available_amount",
+            "active_guarantees",
+            "max_active_guarantees",
+            "reference",
+        )
+
+    def get_member_name(self, obj):
+        return obj.member.get_full_name()
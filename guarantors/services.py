@@ -1,20 +1,337 @@
-from decimal import Decimal
+"""
+Guarantor capacity.
+
+A profile's max_guarantee_amount (the member's guarantee-eligible savings)
+and committed_guarantee_amount (accepted guarantees on loans that lock
+funds) are maintained by delta: deposits, guarantee decisions, releases and
+repayments move them with atomic F() updates instead of re-aggregating.
+`sync_guarantor_profile(s)` recompute them from scratch, and
+`find_capacity_drift` (verify_guarantor_capacity command) checks the
+maintained figures against a full recomputation.
+
+The guarantor search index is the profile's available_guarantee_amount
+(generated by the database from the two amounts) and active_guarantees,
+recounted by `refresh_active_guarantees` for the profiles a guarantee
+decision, submission or release touches.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import ROUND_HALF_UP, Decimal
 from django.db import transaction
-from django.db.models import F
+from django.db.models import (
+    Case,
+    Count,
+    DecimalField,
+    F,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+CENT = Decimal("0.01")
+
+# Profiles whose committed amount changed inside `deferred_guarantor_syncs`,
+# None outside it
+_deferred_profiles = ContextVar("deferred_guarantor_profiles", default=None)
+
+
+def _money(amount):
+    return Decimal(amount).quantize(CENT, rounding=ROUND_HALF_UP)
 
 
 @transaction.atomic
 def sync_guarantor_profile(profile):
     """
-    Recalculates and saves the committed guarantee amount for a profile.
+    Recalculates and saves the committed and max guarantee amounts and the
+    active guarantee count for a profile.
     """
-    from guarantors.models import GuarantorProfile
-
     profile.recalculate_committed_amount()
-    profile.save(update_fields=["committed_guarantee_amount", "max_guarantee_amount"])
+    profile.recalculate_max_guarantee_amount()
+    profile.active_guarantees = profile.active_guarantees_count()
+    profile.save(
+        update_fields=[
+            "committed_guarantee_amount",
+            "max_guarantee_amount",
+            "active_guarantees",
+        ]
+    )
     return profile
 
 
+def _active_guarantees_subquery():
+    from guaranteerequests.models import GuaranteeRequest
+    from guarantors.models import ACTIVE_GUARANTEE_LOAN_STATUSES
+
+    counts = (
+        GuaranteeRequest.objects.filter(
+            guarantor=OuterRef("pk"),
+            status="Accepted",
+            loan_application__status__in=ACTIVE_GUARANTEE_LOAN_STATUSES,
+        )
+        .order_by()
+        .values("guarantor")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def refresh_active_guarantees(profile_ids):
+    """
+    Recount active_guarantees for `profile_ids` (ids or a values() queryset
+    of them) in one UPDATE.
+    """
+    from guarantors.models import GuarantorProfile
+
+    GuarantorProfile.objects.filter(pk__in=profile_ids).update(
+        active_guarantees=_active_guarantees_subquery(),
+        updated_at=timezone.now(),
+    )
+
+
+def refresh_application_guarantors(loan_app):
+    """Recount active_guarantees for every guarantor on `loan_app`."""
+    refresh_active_guarantees(loan_app.guarantors.values("guarantor_id"))
+
+
+def _expected_capacity(profiles):
+    """
+    Committed and max guarantee amounts and active guarantee counts
+    recomputed for `profiles`: one grouped aggregate over their guarantees
+    for each figure, one over their members' savings.
+    """
+    from guaranteerequests.models import GuaranteeRequest
+    from guarantors.models import (
+        ACTIVE_GUARANTEE_LOAN_STATUSES,
+        COMMITTING_LOAN_STATUSES,
+    )
+    from savings.models import SavingsAccount
+
+    committed = dict(
+        GuaranteeRequest.objects.filter(
+            guarantor__in=profiles,
+            status="Accepted",
+            loan_application__status__in=COMMITTING_LOAN_STATUSES,
+        )
+        .order_by()
+        .values("guarantor_id")
+        .annotate(total=Sum("guaranteed_amount"))
+        .values_list("guarantor_id", "total")
+    )
+    active = dict(
+        GuaranteeRequest.objects.filter(
+            guarantor__in=profiles,
+            status="Accepted",
+            loan_application__status__in=ACTIVE_GUARANTEE_LOAN_STATUSES,
+        )
+        .order_by()
+        .values("guarantor_id")
+        .annotate(count=Count("pk"))
+        .values_list("guarantor_id", "count")
+    )
+    savings = dict(
+        SavingsAccount.objects.filter(
+            member_id__in={profile.member_id for profile in profiles},
+            account_type__can_guarantee=True,
+        )
+        .order_by()
+        .values("member_id")
+        .annotate(total=Sum("balance"))
+        .values_list("member_id", "total")
+    )
+    return {
+        profile.pk: (
+            _money(committed.get(profile.pk) or 0),
+            _money(savings.get(profile.member_id) or 0),
+            active.get(profile.pk, 0),
+        )
+        for profile in profiles
+    }
+
+
+def sync_guarantor_profiles(profile_ids):
+    """
+    Recalculates committed_guarantee_amount, max_guarantee_amount and
+    active_guarantees for many profiles at once and writes them with one
+    bulk update.
+    Returns the number of profiles synced.
+    """
+    from guarantors.models import GuarantorProfile
+
+    profiles = list(
+        GuarantorProfile.objects.filter(pk__in=set(profile_ids))
+        .order_by()
+        .only(
+            "member_id",
+            "committed_guarantee_amount",
+            "max_guarantee_amount",
+            "active_guarantees",
+        )
+    )
+    if not profiles:
+        return 0
+
+    expected = _expected_capacity(profiles)
+    now = timezone.now()
+    for profile in profiles:
+        (
+            profile.committed_guarantee_amount,
+            profile.max_guarantee_amount,
+            profile.active_guarantees,
+        ) = expected[profile.pk]
+        profile.updated_at = now
+    GuarantorProfile.objects.bulk_update(
+        profiles,
+        [
+            "committed_guarantee_amount",
+            "max_guarantee_amount",
+            "active_guarantees",
+            "updated_at",
+        ],
+        batch_size=500,
+    )
+    return len(profiles)
+
+
+def find_capacity_drift(chunk_size=1000):
+    """
+    Compare every profile's maintained committed and max guarantee amounts
+    and active guarantee count with a full recomputation, `chunk_size` profiles at a time. Returns one
+    dict per profile that has drifted.
+    """
+    from guarantors.models import GuarantorProfile
+
+    profiles = GuarantorProfile.objects.order_by("pk").only(
+        "member_id",
+        "committed_guarantee_amount",
+        "max_guarantee_amount",
+        "active_guarantees",
+    )
+    drift = []
+    chunk = []
+
+    def check():
+        expected = _expected_capacity(chunk)
+        for profile in chunk:
+            committed, maximum, active = expected[profile.pk]
+            if (
+                profile.committed_guarantee_amount,
+                profile.max_guarantee_amount,
+                profile.active_guarantees,
+            ) != (committed, maximum, active):
+                drift.append(
+                    {
+                        "profile": profile.pk,
+                        "member": profile.member_id,
+                        "committed": profile.committed_guarantee_amount,
+                        "expected_committed": committed,
+                        "max": profile.max_guarantee_amount,
+                        "expected_max": maximum,
+                        "active": profile.active_guarantees,
+                        "expected_active": active,
+                    }
+                )
+        chunk.clear()
+
+    for profile in profiles.iterator(chunk_size=chunk_size):
+        chunk.append(profile)
+        if len(chunk) >= chunk_size:
+            check()
+    if chunk:
+        check()
+    return drift
+
+
+# ---------------------------------------------------------
+# Deltas
+# ---------------------------------------------------------
+
+
+def _apply_committed_deltas(deltas):
+    from guarantors.models import GuarantorProfile
+
+    GuarantorProfile.objects.filter(pk__in=deltas).update(
+        committed_guarantee_amount=F("committed_guarantee_amount")
+        + Case(
+            *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+            output_field=DecimalField(max_digits=15, decimal_places=2),
+        ),
+        updated_at=timezone.now(),
+    )
+
+
+def adjust_committed_amounts(deltas):
+    """
+    Move committed_guarantee_amount by {profile id: delta} in one UPDATE,
+    or, inside a `deferred_guarantor_syncs` block, by recomputing the
+    profiles when the block exits.
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    deferred = _deferred_profiles.get()
+    if deferred is not None:
+        deferred.update(deltas)
+    elif deltas:
+        _apply_committed_deltas(deltas)
+
+
+def adjust_max_guarantee_amount(member_id, delta):
+    """Move a member's max_guarantee_amount by `delta` (a savings balance change)."""
+    from guarantors.models import GuarantorProfile
+
+    if delta:
+        GuarantorProfile.objects.filter(member_id=member_id).update(
+            max_guarantee_amount=F("max_guarantee_amount") + delta,
+            updated_at=timezone.now(),
+        )
+
+
+@contextmanager
+def deferred_guarantor_syncs():
+    """
+    Collects the profiles whose committed amount changes inside the block and
+    recomputes them once, when it exits cleanly. Used by bulk repayment
+    uploads.
+
+    Only profile ids are collected, not deltas: a row whose savepoint rolls
+    back inside the block leaves nothing behind that the recomputation
+    would not see.
+    """
+    if _deferred_profiles.get() is not None:
+        # Nested: the outermost block recomputes them
+        yield
+        return
+
+    profile_ids = set()
+    token = _deferred_profiles.set(profile_ids)
+    try:
+        yield
+    finally:
+        _deferred_profiles.reset(token)
+    sync_guarantor_profiles(profile_ids)
+
+
+def _commits(loan_app):
+    from guarantors.models import COMMITTING_LOAN_STATUSES
+
+    return loan_app.status in COMMITTING_LOAN_STATUSES
+
+
+def _counts_active(loan_app):
+    from guarantors.models import ACTIVE_GUARANTEE_LOAN_STATUSES
+
+    return loan_app.status in ACTIVE_GUARANTEE_LOAN_STATUSES
+
+
+# ---------------------------------------------------------
+# Guarantee lifecycle
+# ---------------------------------------------------------
+
+
 @transaction.atomic
 def release_guarantees_for_application(loan_app):
     """
@@ -27,38 +344,58 @@ def release_guarantees_for_application(loan_app):
         loan_app.save(update_fields=["self_guaranteed_amount"])
 
     # 2. Update all accepted guarantee records to 'Cancelled'
-    # and collect the profiles to sync
-    guarantees = loan_app.guarantors.filter(status="Accepted")
-    profiles_to_sync = set()
+    # and release what they committed
+    guarantees = loan_app.guarantors.select_for_update().filter(status="Accepted")
+    released = {}
+    for guarantor_id, amount in guarantees.values_list(
+        "guarantor_id", "guaranteed_amount"
+    ):
+        released[guarantor_id] = released.get(guarantor_id, Decimal("0")) - amount
+    guarantees.update(status="Cancelled", updated_at=timezone.now())
 
-    for g in guarantees:
-        profiles_to_sync.add(g.guarantor)
-        g.status = "Cancelled"
-        g.save(update_fields=["status"])
-
-    # 3. Always include the application member's profile if it exists
-    try:
-        profiles_to_sync.add(loan_app.member.guarantor_profile)
-    except:
-        pass
-
-    # 4. Perform the sync for all affected profiles
-    for profile in profiles_to_sync:
-        sync_guarantor_profile(profile)
+    if _commits(loan_app):
+        adjust_committed_amounts(released)
+    if _counts_active(loan_app):
+        refresh_active_guarantees(list(released))
 
 
 def update_guarantee_status(guarantee_request, new_status, amount=None):
     """
-    Updates the status of a guarantee request and syncs the guarantor profile.
+    Updates the status of a guarantee request and moves the guarantor's
+    committed amount by what the change adds or releases.
     """
     with transaction.atomic():
+        # What the request committed before this change, read under lock
+        old_status, old_amount = (
+            type(guarantee_request)
+            .objects.select_for_update()
+            .values_list("status", "guaranteed_amount")
+            .get(pk=guarantee_request.pk)
+        )
+
         if amount is not None:
             guarantee_request.guaranteed_amount = amount
 
         guarantee_request.status = new_status
         guarantee_request.save(update_fields=["status", "guaranteed_amount"])
 
-        sync_guarantor_profile(guarantee_request.guarantor)
+        if _commits(guarantee_request.loan_application):
+            before = old_amount if old_status == "Accepted" else Decimal("0")
+            after = (
+                _money(guarantee_request.guaranteed_amount)
+                if new_status == "Accepted"
+                else Decimal("0")
+            )
+            adjust_committed_amounts({guarantee_request.guarantor_id: after - before})
+        if _counts_active(guarantee_request.loan_application):
+            refresh_active_guarantees([guarantee_request.guarantor_id])
+        guarantee_request.guarantor.refresh_from_db(
+            fields=[
+                "committed_guarantee_amount",
+                "max_guarantee_amount",
+                "active_guarantees",
+            ]
+        )
 
         # If it's a self-guarantee, update the loan application field too
         if guarantee_request.guarantor.member == guarantee_request.member:
@@ -77,7 +414,13 @@ def update_guarantees_on_repayment(loan_account, principal_reduction):
     Reduces the guaranteed_amount of all Accepted guarantees for a loan
     proportionally based on the principal reduction.
     Also updates the self_guaranteed_amount on the loan application.
+
+    All the reduced guarantees are written with one bulk update, and the
+    guarantors' committed amounts move by the reductions in one more (or
+    are recomputed at the end of a `deferred_guarantor_syncs` block).
     """
+    from guaranteerequests.models import GuaranteeRequest
+
     if principal_reduction <= 0:
         return
 
@@ -87,45 +430,61 @@ def update_guarantees_on_repayment(loan_account, principal_reduction):
 
     # 1. Get all active guarantees and separate owner from others
     # to avoid doubling (owner is in both the relation and self_guaranteed_amount)
-    all_accepted_guarantees = loan_app.guarantors.filter(status="Accepted")
-    external_guarantees = all_accepted_guarantees.exclude(
-        guarantor__member=loan_app.member
+    accepted = list(
+        loan_app.guarantors.filter(status="Accepted").values_list(
+            "pk", "guarantor_id", "guarantor__member_id", "guaranteed_amount"
+        )
     )
+    external = [row for row in accepted if row[2] != loan_app.member_id]
+    owner = [row for row in accepted if row[2] == loan_app.member_id]
     self_guarantee_amt = loan_app.self_guaranteed_amount
 
     # 2. Total currently guaranteed (sum of external + owner's committed amount)
-    total_guaranteed = (
-        sum(g.guaranteed_amount for g in external_guarantees) + self_guarantee_amt
-    )
+    total_guaranteed = sum(amount for *_, amount in external) + self_guarantee_amt
 
     if total_guaranteed <= 0:
         return
 
     # 3. Calculate reduction factor and apply proportionally
     with transaction.atomic():
-        # Update external guarantees
-        for g in external_guarantees:
-            reduction = (g.guaranteed_amount / total_guaranteed) * principal_reduction
-            g.guaranteed_amount = max(Decimal("0"), g.guaranteed_amount - reduction)
-            g.save(update_fields=["guaranteed_amount"])
-            sync_guarantor_profile(g.guarantor)
+        reduced = {
+            pk: (
+                guarantor_id,
+                amount,
+                _money(
+                    max(
+                        Decimal("0"),
+                        amount - (amount / total_guaranteed) * principal_reduction,
+                    )
+                ),
+            )
+            for pk, guarantor_id, _, amount in external
+        }
 
         # Update self guarantee and keep the owner's GuaranteeRequest in sync
         if self_guarantee_amt > 0:
             reduction = (self_guarantee_amt / total_guaranteed) * principal_reduction
-            new_self_amt = max(Decimal("0"), self_guarantee_amt - reduction)
+            new_self_amt = _money(max(Decimal("0"), self_guarantee_amt - reduction))
 
             # Update the summary field on the application
             loan_app.self_guaranteed_amount = new_self_amt
             loan_app.save(update_fields=["self_guaranteed_amount"])
 
-            # Update the owner's specific GuaranteeRequest record if it exists
-            all_accepted_guarantees.filter(guarantor__member=loan_app.member).update(
-                guaranteed_amount=new_self_amt
-            )
+            for pk, guarantor_id, _, amount in owner:
+                reduced[pk] = (guarantor_id, amount, new_self_amt)
+
+        GuaranteeRequest.objects.bulk_update(
+            [
+                GuaranteeRequest(pk=pk, guaranteed_amount=new)
+                for pk, (_, _, new) in reduced.items()
+            ],
+            ["guaranteed_amount"],
+        )
 
-            # Sync member's profile for self-guarantee
-            try:
-                sync_guarantor_profile(loan_app.member.guarantor_profile)
-            except:
-                pass
+        if _commits(loan_app):
+            deltas = {}
+            for guarantor_id, old, new in reduced.values():
+                deltas[guarantor_id] = deltas.get(guarantor_id, Decimal("0")) + (
+                    new - old
+                )
+            adjust_committed_amounts(deltas)
@@ -0,0 +1,311 @@
+import io
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from guaranteerequests.models import GuaranteeRequest
+from guarantors.models import GuarantorProfile
+from guarantors.services import (
+    deferred_guarantor_syncs,
+    find_capacity_drift,
+    refresh_application_guarantors,
+    release_guarantees_for_application,
+    sync_guarantor_profile,
+    update_guarantee_status,
+    update_guarantees_on_repayment,
+)
+from loanaccounts.models import LoanAccount
+from loanapplications.models import LoanApplication
+from loanproducts.models import LoanProduct
+from savings.models import SavingsAccount
+from savingtypes.models import SavingType
+
+User = get_user_model()
+
+
+class GuarantorTestCase(TestCase):
+    """A disbursed loan guaranteed by its borrower and two other members."""
+
+    def setUp(self):
+        self.saving_type = saving_type = SavingType.objects.create(
+            name="Member Savings"
+        )
+        product = LoanProduct.objects.create(
+            name="Development", interest_rate=Decimal("12")
+        )
+        self.borrower, *self.guarantors = [
+            User.objects.create_user(
+                email=f"member{n}@example.com", password="pass", member_no=f"MM00{n}"
+            )
+            for n in range(1, 4)
+        ]
+        self.profiles = {}
+        for member, savings in zip(
+            [self.borrower, *self.guarantors], ["4000", "9000", "6000"]
+        ):
+            SavingsAccount.objects.create(
+                member=member, account_type=saving_type, balance=Decimal(savings)
+            )
+            self.profiles[member], _ = GuarantorProfile.objects.get_or_create(
+                member=member, defaults={"is_eligible": True}
+            )
+
+        self.application = LoanApplication.objects.create(
+            member=self.borrower,
+            product=product,
+            requested_amount=Decimal("10000"),
+            calculation_mode="fixed_term",
+            term_months=12,
+            start_date=date(2026, 1, 15),
+            self_guaranteed_amount=Decimal("2000"),
+            status="Disbursed",
+        )
+        for member, amount in zip(
+            [self.borrower, *self.guarantors], ["2000", "5000", "3000"]
+        ):
+            GuaranteeRequest.objects.create(
+                member=self.borrower,
+                loan_application=self.application,
+                guarantor=self.profiles[member],
+                guaranteed_amount=Decimal(amount),
+                status="Accepted",
+            )
+        for profile in self.profiles.values():
+            sync_guarantor_profile(profile)
+
+        self.loan = LoanAccount.objects.create(
+            member=self.borrower,
+            product=product,
+            application=self.application,
+            principal=Decimal("10000"),
+            start_date=date(2026, 1, 15),
+        )
+
+    def committed(self):
+        return [
+            GuarantorProfile.objects.get(member=member).committed_guarantee_amount
+            for member in [self.borrower, *self.guarantors]
+        ]
+
+
+class GuaranteeReleaseTests(GuarantorTestCase):
+    def test_repayments_release_guarantees_proportionally(self):
+        # The same handful of queries however many guarantors there are
+        with self.assertNumQueries(6):
+            update_guarantees_on_repayment(self.loan, Decimal("1000"))
+
+        self.assertEqual(
+            self.committed(), [Decimal("1800"), Decimal("4500"), Decimal("2700")]
+        )
+        self.application.refresh_from_db()
+        self.assertEqual(self.application.self_guaranteed_amount, Decimal("1800"))
+
+        # Same figures as syncing each profile on its own
+        for member in [self.borrower, *self.guarantors]:
+            profile = GuarantorProfile.objects.get(member=member)
+            expected = sync_guarantor_profile(
+                GuarantorProfile.objects.get(member=member)
+            )
+            self.assertEqual(
+                (profile.committed_guarantee_amount, profile.max_guarantee_amount),
+                (expected.committed_guarantee_amount, expected.max_guarantee_amount),
+            )
+
+    def test_deferred_syncs_run_once_at_the_end_of_the_block(self):
+        with deferred_guarantor_syncs():
+            update_guarantees_on_repayment(self.loan, Decimal("1000"))
+            update_guarantees_on_repayment(self.loan, Decimal("1000"))
+            self.assertEqual(
+                self.committed(),
+                [Decimal("2000"), Decimal("5000"), Decimal("3000")],
+            )
+
+        self.assertEqual(
+            self.committed(), [Decimal("1600"), Decimal("4000"), Decimal("2400")]
+        )
+
+    def test_rolled_back_rows_leave_committed_amounts_alone(self):
+        # A bulk upload row that fails after releasing its guarantees,
+        # e.g. at GL posting, rolls back to its savepoint
+        with deferred_guarantor_syncs():
+            try:
+                with transaction.atomic():
+                    update_guarantees_on_repayment(self.loan, Decimal("1000"))
+                    raise RuntimeError("GL posting failed")
+            except RuntimeError:
+                pass
+
+        self.assertEqual(
+            self.committed(), [Decimal("2000"), Decimal("5000"), Decimal("3000")]
+        )
+        self.assertEqual(find_capacity_drift(), [])
+
+
+class GuarantorCapacityDeltaTests(GuarantorTestCase):
+    """Capacity moves by delta and stays equal to a full recomputation."""
+
+    def test_deposits_move_max_guarantee_amount_by_the_change(self):
+        account = SavingsAccount.objects.get(member=self.guarantors[0])
+        account.balance += Decimal("250")
+        with self.assertNumQueries(2):
+            account.save(update_fields=["balance"])
+        SavingsAccount.objects.create(
+            member=self.guarantors[0],
+            account_type=SavingType.objects.create(
+                name="Holiday Savings", can_guarantee=False
+            ),
+            balance=Decimal("500"),
+        )
+
+        profile = GuarantorProfile.objects.get(member=self.guarantors[0])
+        self.assertEqual(profile.max_guarantee_amount, Decimal("9250"))
+        self.assertEqual(find_capacity_drift(), [])
+
+    def test_guarantee_decisions_and_releases_move_committed_amounts(self):
+        other = User.objects.create_user(
+            email="member9@example.com", password="pass", member_no="MM009"
+        )
+        request = GuaranteeRequest.objects.create(
+            member=other,
+            loan_application=LoanApplication.objects.create(
+                member=other,
+                product=self.application.product,
+                requested_amount=Decimal("3000"),
+                calculation_mode="fixed_term",
+                term_months=12,
+                start_date=date(2026, 1, 15),
+                status="In Progress",
+            ),
+            guarantor=self.profiles[self.guarantors[0]],
+            guaranteed_amount=Decimal("1000"),
+        )
+
+        update_guarantee_status(request, "Accepted", amount=Decimal("1200"))
+        self.assertEqual(request.guarantor.committed_guarantee_amount, Decimal("6200"))
+        update_guarantee_status(request, "Declined")
+        self.assertEqual(request.guarantor.committed_guarantee_amount, Decimal("5000"))
+
+        update_guarantees_on_repayment(self.loan, Decimal("1000"))
+        release_guarantees_for_application(self.application)
+        self.assertEqual(self.committed(), [Decimal("0")] * 3)
+        self.assertEqual(find_capacity_drift(), [])
+
+    def test_the_verifier_reports_and_fixes_drift(self):
+        GuarantorProfile.objects.filter(member=self.guarantors[1]).update(
+            committed_guarantee_amount=Decimal("1")
+        )
+        drifted = self.profiles[self.guarantors[1]].pk
+
+        out = io.StringIO()
+        call_command("verify_guarantor_capacity", "--chunk-size", "2", stdout=out)
+        self.assertIn(f"{drifted}: committed 1.00 (expected 3000.00)", out.getvalue())
+        self.assertEqual([row["profile"] for row in find_capacity_drift()], [drifted])
+
+        call_command("verify_guarantor_capacity", "--fix", stdout=io.StringIO())
+        self.assertEqual(find_capacity_drift(), [])
+
+
+class GuarantorSearchTests(GuarantorTestCase):
+    """The search index answers "who can cover at least X" in one query."""
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.borrower)
+        self.url = reverse("guarantors:guarantor-search")
+
+    def members(self, response):
+        return [row["member"] for row in response.json()["results"]]
+
+    def test_search_lists_eligible_guarantors_by_available_capacity(self):
+        extra = [
+            User.objects.create_user(
+                email=f"member{n}@example.com", password="pass", member_no=f"MM00{n}"
+            )
+            for n in range(4, 7)
+        ]
+        for member, savings, eligible in zip(
+            extra, ["7000", "8000", "3500"], [True, False, True]
+        ):
+            SavingsAccount.objects.create(
+                member=member,
+                account_type=self.saving_type,
+                balance=Decimal(savings),
+            )
+            GuarantorProfile.objects.create(member=member, is_eligible=eligible)
+        # MM006 has reached its limit of active guarantees
+        GuarantorProfile.objects.filter(member=extra[2]).update(max_active_guarantees=0)
+
+        # The requester is left out, so are ineligible and fully used profiles
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {"min_amount": "3000"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 3)
+        self.assertEqual(self.members(response), ["MM004", "MM002", "MM003"])
+        self.assertEqual(
+            response.json()["results"][1],
+            {
+                "member": "MM002",
+                "member_name": self.guarantors[0].get_full_name(),
+                "available_amount": 4000.0,
+                "active_guarantees": 1,
+                "max_active_guarantees": 3,
+                "reference": self.profiles[self.guarantors[0]].reference,
+            },
+        )
+
+        page = self.client.get(self.url, {"page_size": 2, "page": 2})
+        self.assertEqual(self.members(page), ["MM003"])
+
+        # Capacity follows deposits through the generated column
+        account = SavingsAccount.objects.get(member=self.guarantors[1])
+        account.balance += Decimal("5000")
+        account.save(update_fields=["balance"])
+        response = self.client.get(self.url, {"min_amount": "7500"})
+        self.assertEqual(self.members(response), ["MM003"])
+
+    def test_active_guarantees_follow_submission_and_release(self):
+        application = LoanApplication.objects.create(
+            member=self.guarantors[1],
+            product=self.application.product,
+            requested_amount=Decimal("3000"),
+            calculation_mode="fixed_term",
+            term_months=12,
+            start_date=date(2026, 1, 15),
+            status="Ready for Submission",
+        )
+        request = GuaranteeRequest.objects.create(
+            member=self.guarantors[1],
+            loan_application=application,
+            guarantor=self.profiles[self.guarantors[0]],
+            guaranteed_amount=Decimal("1000"),
+        )
+        update_guarantee_status(request, "Accepted")
+        profile = self.profiles[self.guarantors[0]]
+        profile.refresh_from_db()
+        self.assertEqual(profile.active_guarantees, 1)
+
+        application.status = "Submitted"
+        application.save(update_fields=["status"])
+        refresh_application_guarantors(application)
+        profile.refresh_from_db()
+        self.assertEqual(profile.active_guarantees, 2)
+        self.assertEqual(find_capacity_drift(), [])
+
+        release_guarantees_for_application(application)
+        release_guarantees_for_application(self.application)
+        self.assertEqual(
+            list(
+                GuarantorProfile.objects.order_by("member__member_no").values_list(
+                    "active_guarantees", flat=True
+                )
+            ),
+            [0, 0, 0],
+        )
+        self.assertEqual(find_capacity_drift(), [])
@@ -1,11 +1,16 @@
 from django.urls import path
 
-from guarantors.views import GuarantorProfileDetailView, GuarantorProfileListCreateView
+from guarantors.views import (
+    GuarantorProfileDetailView,
+    GuarantorProfileListCreateView,
+    GuarantorSearchView,
+)
 
 app_name = "guarantors"
 
 urlpatterns = [
     path("", GuarantorProfileListCreateView.as_view(), name="guarantors"),
+    path("search/", GuarantorSearchView.as_view(), name="guarantor-search"),
     path(
         "<str:member>/",
         GuarantorProfileDetailView.as_view(),
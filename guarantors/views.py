@@ -1,7 +1,13 @@
+from django.db.models import F
 from rest_framework import generics
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 
-from guarantors.serializers import GuarantorProfileSerializer
+from guarantors.filters import GuarantorSearchFilter
+from guarantors.serializers import (
+    GuarantorProfileSerializer,
+    GuarantorSearchSerializer,
+)
 from guarantors.models import GuarantorProfile
 from accounts.permissions import IsSystemAdminOrReadOnly
 
@@ -18,3 +24,35 @@ class GuarantorProfileDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
     lookup_field = "member__member_no"
     lookup_url_kwarg = "member"
+
+
+class GuarantorSearchPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class GuarantorSearchView(generics.ListAPIView):
+    """
+    GET /api/v1/guarantors/search/?min_amount=<amount>
+
+    Eligible guarantors who can take another guarantee, most available
+    capacity first. Served from the guarantor search index, one query per
+    page plus the count.
+    """
+
+    serializer_class = GuarantorSearchSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = GuarantorSearchPagination
+    filterset_class = GuarantorSearchFilter
+
+    def get_queryset(self):
+        return (
+            GuarantorProfile.objects.filter(
+                is_eligible=True,
+                active_guarantees__lt=F("max_active_guarantees"),
+            )
+            .exclude(member=self.request.user)
+            .select_related("member")
+            .order_by("-available_guarantee_amount", "pk")
+        )
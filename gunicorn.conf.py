@@ -0,0 +1,15 @@
+# Gunicorn settings, picked up automatically from the working directory.
+# https://docs.gunicorn.org/en/stable/settings.html
+
+from decouple import config
+
+bind = f"0.0.0.0:{config('PORT', default='8000')}"
+
+# SERVER_MODE=asgi runs the app under uvicorn workers so the async views
+# (M-Pesa STK push, Cloudinary uploads, Resend emails) wait on outbound HTTP
+# without holding a worker. The default stays on the sync WSGI app.
+if config("SERVER_MODE", default="wsgi") == "asgi":
+    wsgi_app = "mwandamzedusaccoapi.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "mwandamzedusaccoapi.wsgi:application"
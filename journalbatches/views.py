@@ -20,6 +20,7 @@ from journalbatches.serializers import (
     BulkUploadFileSerializer,
 )
 from accounts.permissions import IsSystemAdminOrReadOnly
+from accounts.cache import get_gl_account_by_name
 from transactions.models import BulkTransactionLog
 
 logger = logging.getLogger(__name__)
@@ -198,7 +199,9 @@ class BulkJournalBatchUploadView(generics.CreateAPIView):
                     batch = JournalBatch.objects.create(**create_kwargs)
 
                     for e in bdata["entries"]:
-                        gl_acc = GLAccount.objects.get(name=e["account"])
+                        gl_acc = get_gl_account_by_name(e["account"])
+                        if gl_acc is None:
+                            raise GLAccount.DoesNotExist
                         JournalEntry.objects.create(
                             batch=batch,
                             account=gl_acc,
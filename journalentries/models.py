@@ -1,4 +1,7 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
 from accounts.abstracts import TimeStampedModel, UniversalIdModel, ReferenceModel
@@ -56,20 +59,24 @@ class JournalEntry(TimeStampedModel, UniversalIdModel, ReferenceModel):
         # Update the account balance based on category
         # Assets/Expenses: DR+, CR-
         # Liabilities/Equity/Revenues: CR+, DR-
-        if self.account.category in ["ASSET", "EXPENSE"]:
-            self.account.balance += self.debit - self.credit
-        else:
-            self.account.balance += self.credit - self.debit
-
-        self.account.save(update_fields=["balance"])
+        # Applied in SQL so concurrent postings cannot overwrite each other and
+        # shared (cached) GL account instances are never mutated.
+        self._apply_to_account_balance(self._balance_movement())
         super().save(*args, **kwargs)
 
     def delete(self, *args, **kwargs):
         # Revert the account balance on deletion
+        self._apply_to_account_balance(-self._balance_movement())
+        super().delete(*args, **kwargs)
+
+    def _balance_movement(self):
+        debit = Decimal(str(self.debit))
+        credit = Decimal(str(self.credit))
         if self.account.category in ["ASSET", "EXPENSE"]:
-            self.account.balance -= self.debit - self.credit
-        else:
-            self.account.balance -= self.credit - self.debit
+            return debit - credit
+        return credit - debit
 
-        self.account.save(update_fields=["balance"])
-        super().delete(*args, **kwargs)
+    def _apply_to_account_balance(self, movement):
+        GLAccount.objects.filter(pk=self.account_id).update(
+            balance=F("balance") + movement, updated_at=timezone.now()
+        )
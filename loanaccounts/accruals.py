@@ -0,0 +1,341 @@
+"""
+Interest accrual.
+
+`run_interest_accrual` recognises the interest reducing-balance loans earn
+between repayments. Each active loan accrues from its
+`last_interest_calulation`, or from its product's `accrual_start_date` when
+the receivable was enabled later (interest earned before that date is only
+recognised when it is repaid), to the latest accrual date its product's
+`interest_period` and `calculation_schedule` allow (every day for Daily,
+the 1st of each month for a Fixed Monthly product, each monthly
+anniversary of the start date for a Relative one, ...), at the product's
+annual rate on the loan's outstanding principal, actual/365.
+
+Loans are processed in chunks of consecutive ids, optionally on a thread
+pool, and each chunk writes its LoanInterestAccrual rows and advances its
+loans in one transaction. The unposted rows are then posted to the ledger
+in one batch per product (DR interest receivable, CR interest revenue).
+Re-running a date accrues and posts nothing new. When repayments bring the
+interest in, `interest_credit_entries` credits the accrued part to the
+receivable instead of revenue, and when a loan is settled early or cleared
+`accrual_reversal_entries` reverses whatever accrued interest was waived.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.utils import generate_reference
+from financials.services import post_to_ledger
+from loanaccounts.models import LoanAccount, LoanInterestAccrual
+from loanaccounts.utils import loan_id_ranges
+from loanproducts.models import LoanProduct
+
+logger = logging.getLogger(__name__)
+
+INTEREST_ACCRUAL_CHUNK_SIZE = getattr(settings, "INTEREST_ACCRUAL_CHUNK_SIZE", 500)
+INTEREST_ACCRUAL_WORKERS = getattr(settings, "INTEREST_ACCRUAL_WORKERS", 1)
+
+DAYS_IN_YEAR = Decimal("365")
+CENT = Decimal("0.01")
+PERIOD_STEPS = {
+    "Weekly": relativedelta(weeks=1),
+    "Monthly": relativedelta(months=1),
+    "Annually": relativedelta(years=1),
+}
+
+
+def accrual_date(interest_period, calculation_schedule, start_date, as_of):
+    """
+    The latest date on or before `as_of` up to which interest can be
+    accrued. Daily periods and Flexible schedules accrue every day.
+    """
+    if interest_period == "Daily" or calculation_schedule == "Flexible":
+        return as_of
+    if calculation_schedule == "Fixed":
+        if interest_period == "Weekly":
+            return as_of - timedelta(days=as_of.weekday())
+        if interest_period == "Annually":
+            return as_of.replace(month=1, day=1)
+        return as_of.replace(day=1)
+
+    # Relative: anniversaries of the start date
+    step = PERIOD_STEPS.get(interest_period, PERIOD_STEPS["Monthly"])
+    if as_of < start_date:
+        return start_date
+    periods = 0
+    if interest_period == "Monthly":
+        # Jump close to as_of instead of stepping month by month
+        periods = max(
+            0, (as_of.year - start_date.year) * 12 + as_of.month - start_date.month - 1
+        )
+    while start_date + step * (periods + 1) <= as_of:
+        periods += 1
+    return start_date + step * periods
+
+
+def accrued_interest(principal_balance, annual_rate, days):
+    return (principal_balance * annual_rate * days / (100 * DAYS_IN_YEAR)).quantize(
+        CENT, rounding=ROUND_HALF_UP
+    )
+
+
+def accruing_loans(as_of):
+    """Active reducing-balance loans whose product posts accruals."""
+    return LoanAccount.objects.filter(
+        status="Active",
+        product__interest_method="Reducing",
+        product__gl_interest_receivable__isnull=False,
+        product__gl_interest_revenue__isnull=False,
+        product__accrual_start_date__lt=as_of,
+        start_date__lt=as_of,
+    ).exclude(last_interest_calulation__gte=as_of)
+
+
+# ---------------------------------------------------------
+# Accrual
+# ---------------------------------------------------------
+
+
+def accrue_range(first_id, last_id, as_of):
+    """
+    Accrue the loans with ids in [first_id, last_id] up to `as_of`.
+    Returns the number of loans accrued and the interest accrued.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        loans = (
+            accruing_loans(as_of)
+            .filter(pk__gte=first_id, pk__lte=last_id)
+            .select_related("product")
+            .select_for_update(of=("self",))
+            .only(
+                "principal",
+                "total_principal_paid",
+                "start_date",
+                "last_interest_calulation",
+                "accrued_interest",
+                "product__interest_rate",
+                "product__interest_period",
+                "product__calculation_schedule",
+                "product__accrual_start_date",
+            )
+        )
+        accruals = []
+        changed = []
+        for loan in loans:
+            product = loan.product
+            period_start = max(
+                loan.last_interest_calulation or loan.start_date,
+                product.accrual_start_date,
+            )
+            period_end = accrual_date(
+                product.interest_period,
+                product.calculation_schedule,
+                loan.start_date,
+                as_of,
+            )
+            if period_end <= period_start:
+                continue
+
+            days = (period_end - period_start).days
+            balance = max(Decimal("0"), loan.principal - loan.total_principal_paid)
+            amount = accrued_interest(balance, product.interest_rate, days)
+            if amount > 0:
+                accruals.append(
+                    LoanInterestAccrual(
+                        loan_account=loan,
+                        period_start=period_start,
+                        period_end=period_end,
+                        days=days,
+                        principal_balance=balance,
+                        annual_rate=product.interest_rate,
+                        amount=amount,
+                    )
+                )
+            loan.accrued_interest += amount
+            loan.last_interest_calulation = period_end
+            loan.updated_at = now
+            changed.append(loan)
+
+        LoanInterestAccrual.objects.bulk_create(accruals, batch_size=1000)
+        LoanAccount.objects.bulk_update(
+            changed,
+            ["accrued_interest", "last_interest_calulation", "updated_at"],
+            batch_size=1000,
+        )
+    return len(accruals), sum((row.amount for row in accruals), Decimal("0"))
+
+
+def _accrue_range_on_thread(first_id, last_id, as_of):
+    try:
+        return accrue_range(first_id, last_id, as_of)
+    finally:
+        connection.close()
+
+
+def post_accruals(as_of):
+    """
+    Post every unposted accrual up to `as_of` to the ledger, one batch per
+    product. Returns {product name: (batch code, amount)}.
+    """
+    posted = {}
+    products = LoanProduct.objects.filter(
+        loans__interest_accruals__journal_batch__isnull=True,
+        loans__interest_accruals__period_end__lte=as_of,
+    ).distinct()
+    for product in products.select_related(
+        "gl_interest_receivable", "gl_interest_revenue"
+    ):
+        with transaction.atomic():
+            rows = list(
+                LoanInterestAccrual.objects.select_for_update()
+                .filter(
+                    loan_account__product=product,
+                    journal_batch__isnull=True,
+                    period_end__lte=as_of,
+                )
+                .values_list("pk", "amount")
+            )
+            if not rows:
+                continue
+            amount = sum((row_amount for _, row_amount in rows), Decimal("0"))
+            batch = post_to_ledger(
+                f"Interest accrual {as_of}: {product.name} ({len(rows)} loans)",
+                generate_reference(),
+                [
+                    {
+                        "account": product.gl_interest_receivable,
+                        "debit": amount,
+                        "credit": 0,
+                    },
+                    {
+                        "account": product.gl_interest_revenue,
+                        "debit": 0,
+                        "credit": amount,
+                    },
+                ],
+                posting_date=as_of,
+            )
+            LoanInterestAccrual.objects.filter(pk__in=[pk for pk, _ in rows]).update(
+                journal_batch=batch, updated_at=timezone.now()
+            )
+            posted[product.name] = (batch.code, amount)
+    return posted
+
+
+def run_interest_accrual(as_of=None, workers=None, chunk_size=None):
+    """
+    Accrue interest on every eligible loan up to `as_of` (default today)
+    and post it. Returns a report of the run.
+    """
+    as_of = as_of or timezone.localdate()
+    workers = workers or INTEREST_ACCRUAL_WORKERS
+    chunk_size = chunk_size or INTEREST_ACCRUAL_CHUNK_SIZE
+    start_time = time.perf_counter()
+
+    ranges = loan_id_ranges(accruing_loans(as_of), chunk_size)
+    if workers > 1 and len(ranges) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(
+                executor.map(
+                    lambda id_range: _accrue_range_on_thread(*id_range, as_of),
+                    ranges,
+                )
+            )
+    else:
+        results = [accrue_range(first, last, as_of) for first, last in ranges]
+
+    posted = post_accruals(as_of)
+    report = {
+        "as_of_date": as_of,
+        "chunks": len(ranges),
+        "loans_accrued": sum(count for count, _ in results),
+        "interest_accrued": sum((amount for _, amount in results), Decimal("0")),
+        "batches": [
+            {"product": name, "batch": code, "amount": amount}
+            for name, (code, amount) in posted.items()
+        ],
+        "duration": round(time.perf_counter() - start_time, 3),
+    }
+    logger.info(
+        f"Interest accrual for {as_of}: {report['loans_accrued']} loans, "
+        f"{report['interest_accrued']} in {len(posted)} batches, "
+        f"{report['duration']}s"
+    )
+    return report
+
+
+# ---------------------------------------------------------
+# Repayments
+# ---------------------------------------------------------
+
+
+def interest_credit_entries(loan_account, product, interest):
+    """
+    GL credit legs for `interest` received on a repayment. The part already
+    accrued settles the interest receivable (and is released from the
+    loan's `accrued_interest`); only the rest is new revenue.
+    """
+    settled = Decimal("0")
+    if product.gl_interest_receivable_id and interest > 0:
+        accrued = LoanAccount.objects.filter(pk=loan_account.pk).values_list(
+            "accrued_interest", flat=True
+        )[0]
+        settled = min(interest, max(Decimal("0"), accrued))
+        if settled:
+            LoanAccount.objects.filter(pk=loan_account.pk).update(
+                accrued_interest=F("accrued_interest") - settled
+            )
+            loan_account.accrued_interest = accrued - settled
+    return [
+        {
+            "account": product.gl_interest_receivable,
+            "debit": 0,
+            "credit": settled,
+        },
+        {
+            "account": product.gl_interest_revenue,
+            "debit": 0,
+            "credit": interest - settled,
+        },
+    ]
+
+
+def accrual_reversal_entries(loan_account, product):
+    """
+    GL legs reversing the interest still accrued on a loan that is closed
+    without paying it (early settlement, clearance): DR interest revenue,
+    CR interest receivable. Releases it from the loan's `accrued_interest`.
+    """
+    if not product.gl_interest_receivable_id:
+        return []
+    accrued = LoanAccount.objects.filter(pk=loan_account.pk).values_list(
+        "accrued_interest", flat=True
+    )[0]
+    if accrued <= 0:
+        return []
+    LoanAccount.objects.filter(pk=loan_account.pk).update(
+        accrued_interest=F("accrued_interest") - accrued
+    )
+    loan_account.accrued_interest = Decimal("0")
+    return [
+        {
+            "account": product.gl_interest_revenue,
+            "debit": accrued,
+            "credit": 0,
+        },
+        {
+            "account": product.gl_interest_receivable,
+            "debit": 0,
+            "credit": accrued,
+        },
+    ]
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from loanaccounts.models import LoanAccount
+from loanaccounts.models import LoanAccount, LoanInstallment, LoanInterestAccrual
 
 
 class LoanAccountAdmin(admin.ModelAdmin):
@@ -24,3 +24,37 @@ class LoanAccountAdmin(admin.ModelAdmin):
 
 
 admin.site.register(LoanAccount, LoanAccountAdmin)
+
+
+class LoanInstallmentAdmin(admin.ModelAdmin):
+    list_display = (
+        "loan_account",
+        "sequence",
+        "installment_code",
+        "due_date",
+        "total_due",
+        "amount_paid",
+        "is_paid",
+    )
+    search_fields = ("loan_account__account_number", "installment_code")
+    list_filter = ("is_paid", "due_date")
+
+
+admin.site.register(LoanInstallment, LoanInstallmentAdmin)
+
+
+class LoanInterestAccrualAdmin(admin.ModelAdmin):
+    list_display = (
+        "loan_account",
+        "period_start",
+        "period_end",
+        "days",
+        "principal_balance",
+        "amount",
+        "journal_batch",
+    )
+    search_fields = ("loan_account__account_number",)
+    list_filter = ("period_end",)
+
+
+admin.site.register(LoanInterestAccrual, LoanInterestAccrualAdmin)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LoanaccountsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "loanaccounts"
+
+    def ready(self):
+        import loanaccounts.signals
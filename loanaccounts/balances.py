@@ -0,0 +1,126 @@
+"""
+Loan balance refresh.
+
+`refresh_loan_balances` re-derives total_loan_amount, outstanding_balance
+and status for every loan with the rules of LoanAccount.compute_balances.
+On PostgreSQL it is one set-based UPDATE over the loans that are out of
+date; elsewhere (or when asked) the loans are streamed and bulk-updated in
+chunks, each in its own short transaction.
+"""
+
+import time
+
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.db.models.lookups import Exact, GreaterThan, LessThanOrEqual
+from django.utils import timezone
+
+from financials.cache import bump_ledger_version
+from loanaccounts.models import LoanAccount
+
+BALANCE_FIELDS = ["total_loan_amount", "outstanding_balance", "status"]
+
+TOTAL_LOAN_AMOUNT = F("principal") + F("total_interest_accrued") + F("processing_fee")
+OUTSTANDING_BALANCE = TOTAL_LOAN_AMOUNT - F("total_amount_paid")
+STATUS = Case(
+    When(LessThanOrEqual(OUTSTANDING_BALANCE, 0), then=Value("Closed")),
+    When(status="Funded", then=Value("Active")),
+    default=F("status"),
+)
+
+
+def _report(method, changed, closed, activated, start_time):
+    return {
+        "method": method,
+        "changed": changed,
+        "closed": closed,
+        "activated": activated,
+        "duration": round(time.perf_counter() - start_time, 3),
+    }
+
+
+def refresh_balances_in_sql():
+    """One UPDATE over the loans whose stored balances or status are stale."""
+    start_time = time.perf_counter()
+    stale = LoanAccount.objects.filter(
+        ~Q(Exact(F("total_loan_amount"), TOTAL_LOAN_AMOUNT))
+        | ~Q(Exact(F("outstanding_balance"), OUTSTANDING_BALANCE))
+        | ~Q(Exact(F("status"), STATUS))
+    ).order_by()
+
+    with transaction.atomic():
+        counts = stale.aggregate(
+            closed=Count(
+                "pk",
+                filter=Q(LessThanOrEqual(OUTSTANDING_BALANCE, 0)) & ~Q(status="Closed"),
+            ),
+            activated=Count(
+                "pk",
+                filter=Q(GreaterThan(OUTSTANDING_BALANCE, 0)) & Q(status="Funded"),
+            ),
+        )
+        changed = stale.update(
+            total_loan_amount=TOTAL_LOAN_AMOUNT,
+            outstanding_balance=OUTSTANDING_BALANCE,
+            status=STATUS,
+            updated_at=timezone.now(),
+        )
+        if changed:
+            # update() sends no post_save: invalidate cached reports here
+            bump_ledger_version()
+    return _report("sql", changed, counts["closed"], counts["activated"], start_time)
+
+
+def refresh_balances_in_chunks(chunk_size=1000):
+    """
+    Stream every loan, apply compute_balances and bulk-update the ones that
+    changed, one transaction per chunk.
+    """
+    start_time = time.perf_counter()
+    loans = LoanAccount.objects.order_by("pk").only(
+        "principal",
+        "total_interest_accrued",
+        "processing_fee",
+        "total_amount_paid",
+        *BALANCE_FIELDS,
+    )
+    changed = closed = activated = 0
+    chunk = []
+
+    def flush():
+        with transaction.atomic():
+            LoanAccount.objects.bulk_update(chunk, BALANCE_FIELDS + ["updated_at"])
+            # bulk_update sends no post_save: invalidate cached reports here
+            bump_ledger_version()
+        chunk.clear()
+
+    now = timezone.now()
+    for loan in loans.iterator(chunk_size=chunk_size):
+        before = [getattr(loan, field) for field in BALANCE_FIELDS]
+        loan.compute_balances()
+        if [getattr(loan, field) for field in BALANCE_FIELDS] == before:
+            continue
+
+        changed += 1
+        if loan.status != before[2]:
+            closed += loan.status == "Closed"
+            activated += loan.status == "Active"
+        loan.updated_at = now
+        chunk.append(loan)
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return _report("chunked", changed, closed, activated, start_time)
+
+
+def refresh_loan_balances(chunked=None, chunk_size=1000):
+    """
+    Refresh every loan's balances; set-based on PostgreSQL unless `chunked`.
+    Returns the number of loans changed, closed and activated.
+    """
+    if chunked is None:
+        chunked = connection.vendor != "postgresql"
+    if chunked:
+        return refresh_balances_in_chunks(chunk_size)
+    return refresh_balances_in_sql()
@@ -0,0 +1,173 @@
+"""
+Loan installments.
+
+LoanInstallment holds a loan's schedule as indexed rows so repayments can
+update only the installments they touch, and arrears and overdue questions
+can be answered in SQL. projection_snapshot["schedule"] is still written
+for the code that reads it; these helpers keep the two in step.
+"""
+
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import Count, F, Min, Sum
+from django.utils import timezone
+
+from loanaccounts.models import LoanInstallment
+
+AMOUNT_FIELDS = (
+    "principal_due",
+    "interest_due",
+    "fee_due",
+    "total_due",
+    "balance_after",
+)
+PAID_FIELDS = ("principal_paid", "interest_paid", "fee_paid", "amount_paid")
+
+
+def _amount(row, field):
+    return Decimal(str(row.get(field) or 0)).quantize(Decimal("0.01"))
+
+
+def _installment(loan_account, sequence, row):
+    return LoanInstallment(
+        loan_account=loan_account,
+        sequence=sequence,
+        installment_code=row.get("installment_code"),
+        due_date=date.fromisoformat(str(row["due_date"])[:10]),
+        is_paid=bool(row.get("is_paid")),
+        **{field: _amount(row, field) for field in AMOUNT_FIELDS + PAID_FIELDS},
+    )
+
+
+def _schedule(loan_account):
+    return (loan_account.projection_snapshot or {}).get("schedule", [])
+
+
+# ---------------------------------------------------------
+# Writing
+# ---------------------------------------------------------
+
+
+def sync_installments(loan_account, schedule=None):
+    """
+    Replace the loan's installments with `schedule` (by default its
+    projection_snapshot schedule). Returns the number of rows written.
+    """
+    schedule = _schedule(loan_account) if schedule is None else schedule
+    return replace_installments({loan_account: schedule})
+
+
+def replace_installments(schedules):
+    """
+    Replace the installments of several loans at once, from a
+    {loan_account: schedule} mapping: one delete and one bulk insert.
+    Returns the number of rows written.
+    """
+    LoanInstallment.objects.filter(
+        loan_account__in=[loan_account.pk for loan_account in schedules]
+    ).delete()
+    created = LoanInstallment.objects.bulk_create(
+        [
+            _installment(loan_account, sequence, row)
+            for loan_account, schedule in schedules.items()
+            for sequence, row in enumerate(schedule, start=1)
+        ],
+        batch_size=1000,
+    )
+    return len(created)
+
+
+def record_schedule_progress(loan_account, schedule):
+    """
+    Copy payment progress from the (already updated) `schedule` rows to the
+    installments. Only unpaid installments can change, so only they are
+    read, and only those whose amounts or status moved are written.
+    Returns the number of installments updated.
+    """
+    installments = list(
+        LoanInstallment.objects.filter(loan_account=loan_account, is_paid=False)
+    )
+    if not installments and not loan_account.installments.exists():
+        # Loans created before installments existed
+        sync_installments(loan_account, schedule)
+        return len(schedule)
+
+    now = timezone.now()
+    changed = []
+    for installment in installments:
+        if installment.sequence > len(schedule):
+            continue
+        row = schedule[installment.sequence - 1]
+        paid = {field: _amount(row, field) for field in PAID_FIELDS}
+        is_paid = bool(row.get("is_paid"))
+        if is_paid == installment.is_paid and all(
+            getattr(installment, field) == value for field, value in paid.items()
+        ):
+            continue
+        for field, value in paid.items():
+            setattr(installment, field, value)
+        installment.is_paid = is_paid
+        installment.updated_at = now
+        changed.append(installment)
+
+    LoanInstallment.objects.bulk_update(
+        changed, list(PAID_FIELDS) + ["is_paid", "updated_at"]
+    )
+    return len(changed)
+
+
+def installment_drift(loan_account):
+    """
+    Sequences whose installment differs from the projection_snapshot row
+    (including rows missing on either side).
+    """
+    fields = ("installment_code", "due_date", "is_paid") + AMOUNT_FIELDS + PAID_FIELDS
+    expected = {
+        sequence: _installment(loan_account, sequence, row)
+        for sequence, row in enumerate(_schedule(loan_account), start=1)
+    }
+    actual = {
+        installment.sequence: installment
+        for installment in loan_account.installments.all()
+    }
+    return sorted(
+        sequence
+        for sequence in expected.keys() | actual.keys()
+        if sequence not in expected
+        or sequence not in actual
+        or any(
+            getattr(expected[sequence], field) != getattr(actual[sequence], field)
+            for field in fields
+        )
+    )
+
+
+# ---------------------------------------------------------
+# Reading
+# ---------------------------------------------------------
+
+
+def overdue_installments(as_of=None):
+    """Unpaid installments of active loans that fell due before `as_of`."""
+    as_of = as_of or timezone.localdate()
+    return LoanInstallment.objects.filter(
+        is_paid=False, due_date__lt=as_of, loan_account__status="Active"
+    )
+
+
+def arrears_by_loan(as_of=None):
+    """
+    Per active loan with overdue installments: the amount in arrears, the
+    number of overdue installments and the oldest unpaid due date.
+    """
+    return (
+        overdue_installments(as_of)
+        .values("loan_account")
+        .annotate(
+            arrears=Sum(F("total_due") - F("amount_paid")),
+            overdue_installments=Count("id"),
+            oldest_due_date=Min("due_date"),
+        )
+        .order_by("loan_account")
+    )
@@ -0,0 +1,60 @@
+"""
+Management command: accrue_loan_interest
+
+Accrues interest on active reducing-balance loans up to today (or --date)
+and posts it to the ledger, one batch per product. Run it daily, after
+midnight; re-running a date accrues nothing new.
+
+Usage
+-----
+    python manage.py accrue_loan_interest
+    python manage.py accrue_loan_interest --date 2026-06-30
+    python manage.py accrue_loan_interest --workers 4 --chunk-size 1000
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from loanaccounts.accruals import (
+    INTEREST_ACCRUAL_CHUNK_SIZE,
+    INTEREST_ACCRUAL_WORKERS,
+    run_interest_accrual,
+)
+
+
+class Command(BaseCommand):
+    help = "Accrues interest on reducing-balance loans and posts it per product."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", type=date.fromisoformat, default=None)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=INTEREST_ACCRUAL_WORKERS,
+            help="Loan id ranges accrued concurrently.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=INTEREST_ACCRUAL_CHUNK_SIZE,
+            help="Loans per id range (and transaction).",
+        )
+
+    def handle(self, *args, **options):
+        report = run_interest_accrual(
+            options["date"],
+            workers=options["workers"],
+            chunk_size=options["chunk_size"],
+        )
+        for batch in report["batches"]:
+            self.stdout.write(
+                f"{batch['product']}: {batch['amount']} in batch {batch['batch']}"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{report['as_of_date']}: accrued {report['interest_accrued']} on "
+                f"{report['loans_accrued']} loans in {report['chunks']} chunks, "
+                f"{report['duration']}s"
+            )
+        )
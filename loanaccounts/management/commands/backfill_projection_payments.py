@@ -17,100 +17,46 @@ source of the early-settlement balance discrepancy bug).
 What it touches
 ---------------
 - loan_account.projection_snapshot  (updated)
+- loan_account.installments  (rebuilt from the updated schedule)
 - loan_application.projection_snapshot  (NEVER modified — left for member reference)
 
+How it runs
+-----------
+Loans are processed in chunks of consecutive ids (--chunk-size). Each chunk
+loads its loans and all their payments in two queries, replays them in
+memory and writes the schedules and installments in one transaction. With
+--workers N the chunks are spread over N processes. With --checkpoint FILE,
+chunks that finished without errors are recorded so an interrupted run
+picks up where it stopped, and chunks with failed loans are retried on
+resume; the file is removed once a run finishes without errors.
+
 Usage
 -----
     python manage.py backfill_projection_payments
     python manage.py backfill_projection_payments --account LN2620024528
     python manage.py backfill_projection_payments --dry-run
+    python manage.py backfill_projection_payments --workers 4 --checkpoint backfill.json
 """
 
 import copy
+import json
+import os
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from decimal import Decimal
 
+import django
 from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.db import connections, transaction
 
+from loanaccounts.installments import replace_installments
 from loanaccounts.models import LoanAccount
+from loanaccounts.utils import loan_id_ranges
 from loanapplications.utils import generate_installment_code
-
-# ---------------------------------------------------------------------------
-# Standalone waterfall engine
-# Mirrors calculate_waterfall_split() but operates on an explicit schedule +
-# running paid amount, so we can replay payments sequentially without a real
-# LoanAccount object being mutated mid-loop.
-# ---------------------------------------------------------------------------
-
-
-def _waterfall_engine(schedule, amount_paid, total_previously_paid):
-    """
-    Run one payment of `amount_paid` through the schedule.
-
-    Args:
-        schedule: list of row dicts (mutated in-place with tracking fields)
-        amount_paid: Decimal — amount being applied in this step
-        total_previously_paid: Decimal — sum of all prior payments (for overflow)
-
-    Returns:
-        (p_total, i_total, f_total) Decimal split for this payment
-    """
-    remaining = amount_paid
-    p_total, i_total, f_total = Decimal("0"), Decimal("0"), Decimal("0")
-
-    sum_closed = sum(Decimal(str(r["total_due"])) for r in schedule if r.get("is_paid"))
-    previous_overflow = total_previously_paid - sum_closed
-
-    for row in schedule:
-        if row.get("is_paid"):
-            continue
-
-        r_f = Decimal(str(row.get("fee_due", 0)))
-        r_i = Decimal(str(row.get("interest_due", 0)))
-        r_p = Decimal(str(row.get("principal_due", 0)))
-
-        row_fee_paid = Decimal(str(row.get("fee_paid", 0)))
-        row_interest_paid = Decimal(str(row.get("interest_paid", 0)))
-        row_principal_paid = Decimal(str(row.get("principal_paid", 0)))
-        row_amount_paid_so_far = Decimal(str(row.get("amount_paid", 0)))
-
-        # Fee bucket
-        f_gap = max(Decimal("0"), r_f - previous_overflow)
-        take_f = min(remaining, f_gap)
-        f_total += take_f
-        remaining -= take_f
-        previous_overflow = max(Decimal("0"), previous_overflow - r_f)
-
-        # Interest bucket
-        i_gap = max(Decimal("0"), r_i - previous_overflow)
-        take_i = min(remaining, i_gap)
-        i_total += take_i
-        remaining -= take_i
-        previous_overflow = max(Decimal("0"), previous_overflow - r_i)
-
-        # Principal bucket
-        p_gap = max(Decimal("0"), r_p - previous_overflow)
-        take_p = min(remaining, p_gap)
-        p_total += take_p
-        remaining -= take_p
-        previous_overflow = Decimal("0")
-
-        # Persist per-row tracking
-        row["fee_paid"] = float(row_fee_paid + take_f)
-        row["interest_paid"] = float(row_interest_paid + take_i)
-        row["principal_paid"] = float(row_principal_paid + take_p)
-        row["amount_paid"] = float(row_amount_paid_so_far + take_f + take_i + take_p)
-
-        if Decimal(str(row["amount_paid"])) >= Decimal(str(row.get("total_due", 0))):
-            row["is_paid"] = True
-
-        if remaining <= 0:
-            break
-
-    if remaining > 0:
-        p_total += remaining
-
-    return p_total, i_total, f_total
+from loanpayments.waterfall import Waterfall
+from loanpayments.models import LoanPayment
 
 
 def _get_pristine_schedule(loan_account):
@@ -141,46 +87,139 @@ def _get_pristine_schedule(loan_account):
     return pristine
 
 
-def _replay_payments(loan_account, schedule, stdout, dry_run):
+def _replay_payments(payments, schedule):
     """
-    Replay all completed, balance-updated payments through the waterfall.
-    Mutates `schedule` in-place.
-    Returns False if any payment could not be replayed cleanly.
+    Replay `payments` (completed, balance-updated, oldest first) through
+    the waterfall. Mutates `schedule` in-place.
     """
-    payments = loan_account.loan_payments.filter(
-        transaction_status="Completed", balance_updated=True
-    ).order_by("payment_date", "created_at")
-
-    running_total_paid = Decimal("0")
-
-    for payment in payments:
-        amount = Decimal(str(payment.amount))
-
-        if payment.repayment_type == "Early Settlement":
-            # Mark all remaining rows as paid; set tracking fields to their full values
-            for row in schedule:
-                if not row.get("is_paid"):
-                    row["is_paid"] = True
-                    # For settlement rows we don't backfill granular splits —
-                    # the balance fix works from total_interest_accrued recalc.
-                    # But we do set amount_paid so rows look consistent.
-                    total_due = Decimal(str(row.get("total_due", 0)))
-                    already_paid = Decimal(str(row.get("amount_paid", 0)))
-                    remainder = max(Decimal("0"), total_due - already_paid)
-                    row["amount_paid"] = float(already_paid + remainder)
-
-            running_total_paid += amount
-
-        elif payment.repayment_type == "Penalty Payment":
+    waterfall = Waterfall(schedule)
+
+    for repayment_type, amount in payments:
+        if repayment_type == "Early Settlement":
+            # Mark all remaining rows as paid with amount_paid = total_due.
+            # For settlement rows we don't backfill granular splits —
+            # the balance fix works from total_interest_accrued recalc.
+            waterfall.settle()
+
+        elif repayment_type == "Penalty Payment":
             # Penalties don't touch the installment schedule
             pass
 
         else:
             # Regular / Partial / Interest Only — run through waterfall
-            _waterfall_engine(schedule, amount, running_total_paid)
-            running_total_paid += amount
+            waterfall.apply(Decimal(str(amount)))
+
+
+# ---------------------------------------------------------------------------
+# Chunks
+# ---------------------------------------------------------------------------
+
+
+def _chunk_loans(first_id, last_id, account=None):
+    loans = LoanAccount.objects.select_related("application").filter(
+        pk__gte=first_id, pk__lte=last_id
+    )
+    if account:
+        loans = loans.filter(account_number=account)
+    return loans
+
+
+def backfill_chunk(first_id, last_id, dry_run=False, account=None):
+    """
+    Backfill the loans with ids in [first_id, last_id]. Returns a dict of
+    processed and skipped account numbers and (account number, error) pairs.
+    """
+    loans = list(
+        _chunk_loans(first_id, last_id, account).only(
+            "account_number",
+            "projection_snapshot",
+            "application__projection_snapshot",
+        )
+    )
+    payments = defaultdict(list)
+    rows = (
+        LoanPayment.objects.filter(
+            loan_account__in=[loan.pk for loan in loans],
+            transaction_status="Completed",
+            balance_updated=True,
+        )
+        .order_by("loan_account", "payment_date", "created_at")
+        .values_list("loan_account", "repayment_type", "amount")
+    )
+    for loan_id, repayment_type, amount in rows:
+        payments[loan_id].append((repayment_type, amount))
+
+    result = {"processed": [], "skipped": [], "errors": []}
+    schedules = {}
+    for loan_account in loans:
+        try:
+            if not loan_account.projection_snapshot:
+                result["skipped"].append(
+                    (loan_account.account_number, "no projection_snapshot")
+                )
+                continue
+
+            pristine = _get_pristine_schedule(loan_account)
+            if not pristine:
+                result["skipped"].append(
+                    (loan_account.account_number, "empty schedule")
+                )
+                continue
+
+            _replay_payments(payments[loan_account.pk], pristine)
+            loan_account.projection_snapshot["schedule"] = pristine
+            schedules[loan_account] = pristine
+        except Exception as e:
+            result["errors"].append((loan_account.account_number, str(e)))
+
+    if not dry_run and schedules:
+        with transaction.atomic():
+            # bulk_update, not save(), so balances are not recalculated
+            LoanAccount.objects.bulk_update(
+                list(schedules), ["projection_snapshot"], batch_size=500
+            )
+            replace_installments(schedules)
+
+    result["processed"] = [loan_account.account_number for loan_account in schedules]
+    return result
+
+
+def _init_worker():
+    # Spawned workers start without Django; forked ones already have it
+    django.setup()
+
+
+def _backfill_chunk_in_worker(first_id, last_id, dry_run, account):
+    try:
+        return backfill_chunk(
+            uuid.UUID(first_id), uuid.UUID(last_id), dry_run=dry_run, account=account
+        )
+    finally:
+        connections.close_all()
 
-    return True
+
+# ---------------------------------------------------------------------------
+# Checkpoints
+# ---------------------------------------------------------------------------
+
+
+def _load_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [
+            (uuid.UUID(first), uuid.UUID(last))
+            for first, last in json.load(f)["completed"]
+        ]
+
+
+def _save_checkpoint(path, completed):
+    # Written to a temporary file and renamed so a crash never truncates it
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(
+            {"completed": [[str(first), str(last)] for first, last in completed]}, f
+        )
+    os.replace(f"{path}.tmp", path)
 
 
 class Command(BaseCommand):
@@ -202,76 +241,118 @@ class Command(BaseCommand):
             default=False,
             help="Compute changes but do not write to the database.",
         )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=200,
+            help="Loans per chunk (and per transaction).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Processes backfilling chunks concurrently.",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            type=str,
+            default=None,
+            help="File recording chunks finished without errors; an existing one is resumed.",
+        )
 
     def handle(self, *args, **options):
         dry_run = options["dry_run"]
         account_filter = options.get("account")
+        checkpoint = None if dry_run else options["checkpoint"]
+        start_time = time.perf_counter()
 
-        qs = LoanAccount.objects.select_related(
-            "application", "product"
-        ).prefetch_related("loan_payments")
-
+        qs = LoanAccount.objects.all()
         if account_filter:
             qs = qs.filter(account_number=account_filter)
 
-        total = qs.count()
-        if total == 0:
+        completed = _load_checkpoint(checkpoint)
+        ranges = loan_id_ranges(qs, options["chunk_size"], exclude=completed)
+        if not ranges:
+            if completed:
+                os.remove(checkpoint)
             self.stdout.write(
-                self.style.WARNING("No loan accounts matched the filter.")
+                self.style.WARNING(
+                    "No loan accounts left to backfill."
+                    if completed
+                    else "No loan accounts matched the filter."
+                )
             )
             return
 
         mode = "[DRY RUN] " if dry_run else ""
-        self.stdout.write(f"{mode}Backfilling {total} loan account(s)...")
+        resumed = f", resuming after {len(completed)} chunk(s)" if completed else ""
+        self.stdout.write(
+            f"{mode}Backfilling {len(ranges)} chunk(s) of up to "
+            f"{options['chunk_size']} loan account(s){resumed}..."
+        )
 
-        success_count = 0
-        error_count = 0
+        totals = {"processed": 0, "skipped": 0, "errors": 0}
 
-        for loan_account in qs.iterator(chunk_size=100):
-            try:
-                if not loan_account.projection_snapshot:
-                    self.stdout.write(
-                        self.style.WARNING(
-                            f"  SKIP {loan_account.account_number}: no projection_snapshot."
-                        )
-                    )
-                    continue
-
-                pristine = _get_pristine_schedule(loan_account)
-                if not pristine:
+        def record(id_range, result):
+            for account_number, reason in result["skipped"]:
+                self.stdout.write(
+                    self.style.WARNING(f"  SKIP {account_number}: {reason}.")
+                )
+            for account_number, error in result["errors"]:
+                self.stderr.write(self.style.ERROR(f"  FAIL {account_number}: {error}"))
+            if options["verbosity"] > 1:
+                for account_number in result["processed"]:
                     self.stdout.write(
-                        self.style.WARNING(
-                            f"  SKIP {loan_account.account_number}: empty schedule."
-                        )
+                        f"  {'[DRY] ' if dry_run else ''}OK {account_number}"
                     )
-                    continue
-
-                _replay_payments(loan_account, pristine, self.stdout, dry_run)
-
-                if not dry_run:
-                    with transaction.atomic():
-                        loan_account.projection_snapshot["schedule"] = pristine
-                        # Use update() to avoid triggering balance recalc in save()
-                        LoanAccount.objects.filter(pk=loan_account.pk).update(
-                            projection_snapshot=loan_account.projection_snapshot
-                        )
-
-                success_count += 1
-                self.stdout.write(
-                    f"  {'[DRY] ' if dry_run else ''}OK {loan_account.account_number}"
+            for key in totals:
+                totals[key] += len(result[key])
+            if checkpoint and not result["errors"]:
+                # Chunks with failed loans are retried on resume
+                completed.append(id_range)
+                _save_checkpoint(checkpoint, completed)
+
+        if options["workers"] > 1:
+            # Children must open their own database connections
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=options["workers"], initializer=_init_worker
+            ) as executor:
+                futures = {
+                    executor.submit(
+                        _backfill_chunk_in_worker,
+                        str(first),
+                        str(last),
+                        dry_run,
+                        account_filter,
+                    ): (first, last)
+                    for first, last in ranges
+                }
+                try:
+                    for future in as_completed(futures):
+                        record(futures[future], future.result())
+                except BaseException:
+                    # Stop at the failed chunk; the checkpoint has the rest
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    raise
+        else:
+            for first, last in ranges:
+                record(
+                    (first, last),
+                    backfill_chunk(
+                        first, last, dry_run=dry_run, account=account_filter
+                    ),
                 )
 
-            except Exception as e:
-                error_count += 1
-                self.stderr.write(
-                    self.style.ERROR(f"  FAIL {loan_account.account_number}: {e}")
-                )
+        if checkpoint and not totals["errors"]:
+            os.remove(checkpoint)
 
         summary = (
             f"\n{mode}Done. "
-            f"Processed: {success_count}/{total}  |  Errors: {error_count}"
+            f"Processed: {totals['processed']}  |  Skipped: {totals['skipped']}  |  "
+            f"Errors: {totals['errors']}  |  {time.perf_counter() - start_time:.1f}s"
         )
-        if error_count:
+        if totals["errors"]:
             self.stdout.write(self.style.ERROR(summary))
         else:
             self.stdout.write(self.style.SUCCESS(summary))
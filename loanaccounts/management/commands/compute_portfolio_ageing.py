@@ -0,0 +1,35 @@
+"""
+Management command: compute_portfolio_ageing
+
+Ages the active loan book (days past due, arrears, PAR30/60/90) and stores
+it as the day's portfolio ageing snapshot. Run it daily, after midnight.
+
+Usage
+-----
+    python manage.py compute_portfolio_ageing
+    python manage.py compute_portfolio_ageing --date 2026-06-30
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from loanaccounts.ageing import compute_portfolio_ageing
+
+
+class Command(BaseCommand):
+    help = "Stores today's (or --date's) portfolio-at-risk snapshot."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", type=date.fromisoformat, default=None)
+
+    def handle(self, *args, **options):
+        snapshot = compute_portfolio_ageing(options["date"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{snapshot.as_of_date}: {snapshot.loans_in_arrears} of "
+                f"{snapshot.active_loans} active loans in arrears "
+                f"({snapshot.arrears_amount}); PAR30 {snapshot.par30}%, "
+                f"PAR60 {snapshot.par60}%, PAR90 {snapshot.par90}%"
+            )
+        )
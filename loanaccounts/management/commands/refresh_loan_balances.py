@@ -1,33 +1,42 @@
+"""
+Management command: refresh_loan_balances
+
+Recalculates total_loan_amount (principal + interest + processing fee),
+outstanding_balance and status for every loan account that is out of date.
+PostgreSQL runs it as one UPDATE; other databases (or --chunked) stream the
+loans and bulk-update them in chunks.
+
+Usage
+-----
+    python manage.py refresh_loan_balances
+    python manage.py refresh_loan_balances --chunked --chunk-size 500
+"""
+
 from django.core.management.base import BaseCommand
-from loanaccounts.models import LoanAccount
-from django.db import transaction
+
+from loanaccounts.balances import refresh_loan_balances
 
 
 class Command(BaseCommand):
     help = "Recalculates the total_loan_amount and outstanding_balance for all LoanAccounts to include processing fees."
 
-    def handle(self, *args, **options):
-        loans = LoanAccount.objects.all()
-        count = loans.count()
-        self.stdout.write(f"Refreshing balances for {count} loan accounts...")
-
-        updated_count = 0
-        with transaction.atomic():
-            for loan in loans:
-                try:
-                    # Calling save() triggers the updated model logic:
-                    # total_loan_amount = principal + interest + processing_fee
-                    loan.save()
-                    updated_count += 1
-                except Exception as e:
-                    self.stderr.write(
-                        self.style.ERROR(
-                            f"Failed to update loan {loan.account_number}: {str(e)}"
-                        )
-                    )
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunked",
+            action="store_true",
+            default=None,
+            help="Use the chunked ORM refresh even on PostgreSQL.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=1000)
 
+    def handle(self, *args, **options):
+        report = refresh_loan_balances(
+            chunked=options["chunked"], chunk_size=options["chunk_size"]
+        )
         self.stdout.write(
             self.style.SUCCESS(
-                f"Successfully refreshed {updated_count}/{count} loan accounts."
+                f"Refreshed {report['changed']} loan accounts "
+                f"({report['closed']} closed, {report['activated']} activated) "
+                f"[{report['method']}, {report['duration']}s]."
             )
         )
@@ -0,0 +1,56 @@
+"""
+Management command: sync_loan_installments
+
+Compares every loan's installments with its projection_snapshot schedule
+and rebuilds the ones that drifted (or never had installments).
+
+Usage
+-----
+    python manage.py sync_loan_installments
+    python manage.py sync_loan_installments --account LN2620024528
+    python manage.py sync_loan_installments --check
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from loanaccounts.installments import installment_drift, sync_installments
+from loanaccounts.models import LoanAccount
+
+
+class Command(BaseCommand):
+    help = "Rebuilds loan installments that differ from the projection snapshot."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--account", type=str, help="A single loan account number.")
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report loans whose installments drifted.",
+        )
+
+    def handle(self, *args, **options):
+        loans = LoanAccount.objects.exclude(projection_snapshot=None).prefetch_related(
+            "installments"
+        )
+        if options["account"]:
+            loans = loans.filter(account_number=options["account"])
+
+        checked = drifted = 0
+        for loan_account in loans.iterator(chunk_size=200):
+            checked += 1
+            sequences = installment_drift(loan_account)
+            if not sequences:
+                continue
+            drifted += 1
+            self.stdout.write(
+                f"  {loan_account.account_number}: installments {sequences} differ"
+            )
+            if not options["check"]:
+                with transaction.atomic():
+                    sync_installments(loan_account)
+
+        action = "found" if options["check"] else "rebuilt"
+        self.stdout.write(
+            self.style.SUCCESS(f"Checked {checked} loan(s); {action} {drifted}.")
+        )
@@ -0,0 +1,157 @@
+# Generated by Django 6.0.1 on 2026-10-19 00:42
+
+import django.db.models.deletion
+import uuid
+from datetime import date
+from decimal import Decimal
+
+from django.db import migrations, models
+
+AMOUNT_FIELDS = (
+    "principal_due",
+    "interest_due",
+    "fee_due",
+    "total_due",
+    "balance_after",
+    "principal_paid",
+    "interest_paid",
+    "fee_paid",
+    "amount_paid",
+)
+
+
+def backfill_installments(apps, schema_editor):
+    """Create installments from every loan's projection_snapshot schedule."""
+    LoanAccount = apps.get_model("loanaccounts", "LoanAccount")
+    LoanInstallment = apps.get_model("loanaccounts", "LoanInstallment")
+
+    batch = []
+    loans = LoanAccount.objects.exclude(projection_snapshot=None).only(
+        "id", "projection_snapshot"
+    )
+    for loan_account in loans.iterator(chunk_size=500):
+        schedule = (loan_account.projection_snapshot or {}).get("schedule") or []
+        for sequence, row in enumerate(schedule, start=1):
+            batch.append(
+                LoanInstallment(
+                    loan_account_id=loan_account.id,
+                    sequence=sequence,
+                    installment_code=row.get("installment_code"),
+                    due_date=date.fromisoformat(str(row["due_date"])[:10]),
+                    is_paid=bool(row.get("is_paid")),
+                    **{
+                        field: Decimal(str(row.get(field) or 0)).quantize(
+                            Decimal("0.01")
+                        )
+                        for field in AMOUNT_FIELDS
+                    },
+                )
+            )
+        if len(batch) >= 5000:
+            LoanInstallment.objects.bulk_create(batch)
+            batch = []
+    LoanInstallment.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("loanaccounts", "0003_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LoanInstallment",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                        unique=True,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("sequence", models.PositiveIntegerField()),
+                (
+                    "installment_code",
+                    models.CharField(blank=True, max_length=20, null=True),
+                ),
+                ("due_date", models.DateField()),
+                (
+                    "principal_due",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                (
+                    "interest_due",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                (
+                    "fee_due",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                (
+                    "total_due",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                (
+                    "balance_after",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                (
+                    "principal_paid",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                (
+                    "interest_paid",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                (
+                    "fee_paid",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                (
+                    "amount_paid",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                ("is_paid", models.BooleanField(default=False)),
+                (
+                    "loan_account",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="installments",
+                        to="loanaccounts.loanaccount",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Loan Installment",
+                "verbose_name_plural": "Loan Installments",
+                "ordering": ["loan_account", "sequence"],
+                "indexes": [
+                    models.Index(
+                        fields=["loan_account", "due_date", "is_paid"],
+                        name="loanaccount_loan_ac_7df425_idx",
+                    ),
+                    models.Index(
+                        fields=["is_paid", "due_date"],
+                        name="loanaccount_is_paid_767252_idx",
+                    ),
+                    models.Index(
+                        fields=["installment_code"],
+                        name="loanaccount_install_6824a0_idx",
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("loan_account", "sequence"),
+                        name="unique_loan_installment_sequence",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_installments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 6.0.1 on 2026-10-19 00:44
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("loanaccounts", "0004_loaninstallment"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PortfolioAgeingSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                        unique=True,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("as_of_date", models.DateField(unique=True)),
+                ("active_loans", models.PositiveIntegerField(default=0)),
+                ("loans_in_arrears", models.PositiveIntegerField(default=0)),
+                (
+                    "outstanding_principal",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                (
+                    "arrears_amount",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                (
+                    "par30",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=5),
+                ),
+                (
+                    "par60",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=5),
+                ),
+                (
+                    "par90",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=5),
+                ),
+                ("buckets", models.JSONField(default=dict)),
+            ],
+            options={
+                "verbose_name": "Portfolio Ageing Snapshot",
+                "verbose_name_plural": "Portfolio Ageing Snapshots",
+                "ordering": ["-as_of_date"],
+            },
+        ),
+        migrations.CreateModel(
+            name="LoanAgeing",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                        unique=True,
+                    ),
+                ),
+                ("bucket", models.CharField(max_length=10)),
+                ("days_past_due", models.PositiveIntegerField()),
+                ("overdue_installments", models.PositiveIntegerField()),
+                ("arrears", models.DecimalField(decimal_places=2, max_digits=15)),
+                (
+                    "outstanding_principal",
+                    models.DecimalField(decimal_places=2, max_digits=15),
+                ),
+                (
+                    "loan_account",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ageing",
+                        to="loanaccounts.loanaccount",
+                    ),
+                ),
+                (
+                    "snapshot",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="loans",
+                        to="loanaccounts.portfolioageingsnapshot",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Loan Ageing",
+                "verbose_name_plural": "Loan Ageing",
+                "ordering": ["-days_past_due"],
+                "indexes": [
+                    models.Index(
+                        fields=["snapshot", "bucket", "days_past_due"],
+                        name="loanaccount_snapsho_2bb766_idx",
+                    )
+                ],
+            },
+        ),
+    ]
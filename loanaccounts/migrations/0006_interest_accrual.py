@@ -0,0 +1,82 @@
+# Generated by Django 6.0.1 on 2026-10-19 00:50
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("journalbatches", "0001_initial"),
+        ("loanaccounts", "0005_portfolio_ageing"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="loanaccount",
+            name="accrued_interest",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=15),
+        ),
+        migrations.CreateModel(
+            name="LoanInterestAccrual",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                        unique=True,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("period_start", models.DateField()),
+                ("period_end", models.DateField()),
+                ("days", models.PositiveIntegerField()),
+                (
+                    "principal_balance",
+                    models.DecimalField(decimal_places=2, max_digits=15),
+                ),
+                ("annual_rate", models.DecimalField(decimal_places=2, max_digits=5)),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=15)),
+                (
+                    "journal_batch",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="interest_accruals",
+                        to="journalbatches.journalbatch",
+                    ),
+                ),
+                (
+                    "loan_account",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="interest_accruals",
+                        to="loanaccounts.loanaccount",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Loan Interest Accrual",
+                "verbose_name_plural": "Loan Interest Accruals",
+                "ordering": ["loan_account", "period_end"],
+                "indexes": [
+                    models.Index(
+                        fields=["journal_batch", "period_end"],
+                        name="loanaccount_journal_2ee69b_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("loan_account", "period_end"),
+                        name="unique_loan_interest_accrual_period",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -4,6 +4,7 @@ from django.contrib.auth import get_user_model
 from django.utils import timezone
 
 from accounts.abstracts import TimeStampedModel, UniversalIdModel, ReferenceModel
+from journalbatches.models import JournalBatch
 from loanproducts.models import LoanProduct
 from loanaccounts.utils import generate_loan_account_number
 from loanapplications.models import LoanApplication
@@ -50,6 +51,8 @@ class LoanAccount(UniversalIdModel, TimeStampedModel, ReferenceModel):
     total_interest_accrued = models.DecimalField(
         max_digits=15, decimal_places=2, default=0
     )
+    # Interest accrued to the GL (interest receivable) and not yet received
+    accrued_interest = models.DecimalField(max_digits=15, decimal_places=2, default=0)
     total_principal_paid = models.DecimalField(
         max_digits=15, decimal_places=2, default=0
     )
@@ -66,6 +69,14 @@ class LoanAccount(UniversalIdModel, TimeStampedModel, ReferenceModel):
         if not self.start_date:
             self.start_date = timezone.now().date()
 
+        self.compute_balances()
+        super().save(*args, **kwargs)
+
+    def compute_balances(self):
+        """
+        Derive total_loan_amount, outstanding_balance and status from the
+        amounts. loanaccounts.balances applies the same rules in bulk.
+        """
         self.total_loan_amount = (
             self.principal
             + Decimal(str(self.total_interest_accrued))
@@ -79,8 +90,6 @@ class LoanAccount(UniversalIdModel, TimeStampedModel, ReferenceModel):
         elif self.status == "Funded":
             self.status = "Active"
 
-        super().save(*args, **kwargs)
-
     def __str__(self):
         return (
             f"{self.member} - {self.product} - {self.account_number} - {self.reference}"
@@ -112,3 +121,140 @@ class LoanAccount(UniversalIdModel, TimeStampedModel, ReferenceModel):
         from decimal import Decimal
 
         return Decimal(str(self.outstanding_balance)) + self.total_penalties_owed
+
+
+class LoanInstallment(UniversalIdModel, TimeStampedModel):
+    """
+    One row of a loan's repayment schedule, with what has been paid into
+    each bucket. Mirrors projection_snapshot["schedule"], which is kept for
+    compatibility; repayments update only the rows they touch.
+    """
+
+    loan_account = models.ForeignKey(
+        LoanAccount, on_delete=models.CASCADE, related_name="installments"
+    )
+    sequence = models.PositiveIntegerField()
+    installment_code = models.CharField(max_length=20, blank=True, null=True)
+    due_date = models.DateField()
+    principal_due = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    interest_due = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    fee_due = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    total_due = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    balance_after = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    principal_paid = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    interest_paid = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    fee_paid = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    amount_paid = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    is_paid = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name = "Loan Installment"
+        verbose_name_plural = "Loan Installments"
+        ordering = ["loan_account", "sequence"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["loan_account", "sequence"],
+                name="unique_loan_installment_sequence",
+            )
+        ]
+        indexes = [
+            models.Index(fields=["loan_account", "due_date", "is_paid"]),
+            # Portfolio-wide overdue and arrears queries
+            models.Index(fields=["is_paid", "due_date"]),
+            models.Index(fields=["installment_code"]),
+        ]
+
+    def __str__(self):
+        return f"{self.loan_account.account_number} - {self.sequence} - {self.due_date}"
+
+
+class PortfolioAgeingSnapshot(UniversalIdModel, TimeStampedModel):
+    """
+    Portfolio at risk on one day: arrears ageing buckets and PAR30/60/90
+    across all active loans. Built by loanaccounts.ageing.
+    """
+
+    as_of_date = models.DateField(unique=True)
+    active_loans = models.PositiveIntegerField(default=0)
+    loans_in_arrears = models.PositiveIntegerField(default=0)
+    outstanding_principal = models.DecimalField(
+        max_digits=15, decimal_places=2, default=0
+    )
+    arrears_amount = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    # Percent of outstanding principal on loans more than 30/60/90 days past due
+    par30 = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    par60 = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    par90 = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    buckets = models.JSONField(default=dict)
+
+    class Meta:
+        verbose_name = "Portfolio Ageing Snapshot"
+        verbose_name_plural = "Portfolio Ageing Snapshots"
+        ordering = ["-as_of_date"]
+
+    def __str__(self):
+        return f"PAR {self.as_of_date}: {self.par30}% / {self.par60}% / {self.par90}%"
+
+
+class LoanAgeing(UniversalIdModel):
+    """A loan in arrears on the day of a PortfolioAgeingSnapshot."""
+
+    snapshot = models.ForeignKey(
+        PortfolioAgeingSnapshot, on_delete=models.CASCADE, related_name="loans"
+    )
+    loan_account = models.ForeignKey(
+        LoanAccount, on_delete=models.CASCADE, related_name="ageing"
+    )
+    bucket = models.CharField(max_length=10)
+    days_past_due = models.PositiveIntegerField()
+    overdue_installments = models.PositiveIntegerField()
+    arrears = models.DecimalField(max_digits=15, decimal_places=2)
+    outstanding_principal = models.DecimalField(max_digits=15, decimal_places=2)
+
+    class Meta:
+        verbose_name = "Loan Ageing"
+        verbose_name_plural = "Loan Ageing"
+        ordering = ["-days_past_due"]
+        indexes = [models.Index(fields=["snapshot", "bucket", "days_past_due"])]
+
+    def __str__(self):
+        return f"{self.loan_account.account_number}: {self.days_past_due} days"
+
+
+class LoanInterestAccrual(UniversalIdModel, TimeStampedModel):
+    """
+    Interest accrued on a loan for one period, by loanaccounts.accruals.
+    Rows are posted to the GL in one batch per product and date.
+    """
+
+    loan_account = models.ForeignKey(
+        LoanAccount, on_delete=models.CASCADE, related_name="interest_accruals"
+    )
+    period_start = models.DateField()
+    period_end = models.DateField()
+    days = models.PositiveIntegerField()
+    principal_balance = models.DecimalField(max_digits=15, decimal_places=2)
+    annual_rate = models.DecimalField(max_digits=5, decimal_places=2)
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    journal_batch = models.ForeignKey(
+        JournalBatch,
+        on_delete=models.PROTECT,
+        related_name="interest_accruals",
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        verbose_name = "Loan Interest Accrual"
+        verbose_name_plural = "Loan Interest Accruals"
+        ordering = ["loan_account", "period_end"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["loan_account", "period_end"],
+                name="unique_loan_interest_accrual_period",
+            )
+        ]
+        indexes = [models.Index(fields=["journal_batch", "period_end"])]
+
+    def __str__(self):
+        return f"{self.loan_account.account_number} - {self.period_end} - {self.amount}"
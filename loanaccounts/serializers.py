@@ -42,6 +42,7 @@ class LoanAccountSerializer(serializers.ModelSerializer):
             "start_date",
             "end_date",
             "last_interest_calulation",
+            "accrued_interest",
             "status",
             "created_at",
             "updated_at",
@@ -52,7 +53,11 @@ class LoanAccountSerializer(serializers.ModelSerializer):
             "projection_snapshot",
             "application_details",
         )
-        read_only_fields = ("total_penalties_owed", "total_clearance_amount")
+        read_only_fields = (
+            "total_penalties_owed",
+            "total_clearance_amount",
+            "accrued_interest",
+        )
 
     def get_application_details(self, obj):
         if obj.application:
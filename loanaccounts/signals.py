@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save
+
+from loanaccounts.installments import sync_installments
+from loanaccounts.models import LoanAccount
+
+
+def create_installments(sender, instance, created, raw=False, **kwargs):
+    # Installments are written once from the schedule the loan starts with;
+    # repayments keep them up to date from then on
+    if created and not raw:
+        sync_installments(instance)
+
+
+post_save.connect(create_installments, sender=LoanAccount)
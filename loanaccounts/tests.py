@@ -0,0 +1,450 @@
+import io
+import json
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import F
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from financials.cache import get_ledger_version
+from glaccounts.models import GLAccount
+from loanaccounts.accruals import (
+    accrual_date,
+    interest_credit_entries,
+    run_interest_accrual,
+)
+from loanaccounts.ageing import compute_portfolio_ageing
+from loanaccounts.balances import refresh_balances_in_chunks, refresh_balances_in_sql
+from loanaccounts.installments import (
+    arrears_by_loan,
+    installment_drift,
+    record_schedule_progress,
+)
+from loanaccounts.models import (
+    LoanAccount,
+    LoanAgeing,
+    LoanInstallment,
+    LoanInterestAccrual,
+    PortfolioAgeingSnapshot,
+)
+from loanapplications.calculators import reducing_fixed_term
+from loanpayments.models import LoanPayment
+from loanpayments.services import calculate_waterfall_split
+from loanpenalties.services import apply_auto_targeted_penalty
+from loanproducts.models import LoanProduct
+
+User = get_user_model()
+
+
+def create_loan(
+    member, product, principal=Decimal("12000"), term=6, start=date(2026, 1, 15)
+):
+    projection = reducing_fixed_term(principal, product.interest_rate, term, start)
+    return LoanAccount.objects.create(
+        member=member,
+        product=product,
+        principal=principal,
+        outstanding_balance=Decimal(str(projection["total_repayment"])),
+        total_interest_accrued=Decimal(str(projection["total_interest"])),
+        projection_snapshot=projection,
+        start_date=start,
+    )
+
+
+class LoanInstallmentTests(TestCase):
+    def setUp(self):
+        self.member = User.objects.create_user(
+            email="member@example.com", password="pass", member_no="MM001"
+        )
+        self.admin = User.objects.create_user(
+            email="admin@example.com",
+            password="pass",
+            member_no="MM002",
+            is_sacco_admin=True,
+        )
+        self.product = LoanProduct.objects.create(
+            name="Development", interest_rate=Decimal("12")
+        )
+        self.loan = create_loan(self.member, self.product)
+
+    def pay(self, amount):
+        principal, interest, fee, _, schedule = calculate_waterfall_split(
+            self.loan, Decimal(amount)
+        )
+        self.loan.total_principal_paid += principal
+        self.loan.total_amount_paid += principal + interest + fee
+        self.loan.projection_snapshot["schedule"] = schedule
+        self.loan.save()
+        return record_schedule_progress(self.loan, schedule)
+
+    def test_new_loans_get_their_schedule_as_installments(self):
+        installments = list(self.loan.installments.all())
+        schedule = self.loan.projection_snapshot["schedule"]
+        self.assertEqual(len(installments), 6)
+        self.assertEqual(
+            [i.installment_code for i in installments],
+            [row["installment_code"] for row in schedule],
+        )
+        self.assertEqual(installments[0].due_date, date(2026, 2, 15))
+        self.assertEqual(installment_drift(self.loan), [])
+
+    def test_repayments_update_only_touched_installments(self):
+        first_total = self.loan.installments.get(sequence=1).total_due
+
+        # Clears the first installment and part of the second
+        self.assertEqual(self.pay(first_total + 100), 2)
+        self.assertEqual(self.pay("50"), 1)
+
+        first, second = self.loan.installments.all()[:2]
+        self.assertTrue(first.is_paid)
+        self.assertFalse(second.is_paid)
+        self.assertEqual(second.amount_paid, Decimal("150.00"))
+        self.assertEqual(installment_drift(self.loan), [])
+
+    def test_arrears_are_computed_in_sql(self):
+        self.pay("500")
+        arrears = {
+            row["loan_account"]: row for row in arrears_by_loan(date(2026, 4, 1))
+        }[self.loan.pk]
+        due = sum(i.total_due for i in self.loan.installments.filter(sequence__lte=2))
+        self.assertEqual(arrears["overdue_installments"], 2)
+        self.assertEqual(arrears["arrears"], due - Decimal("500"))
+        self.assertEqual(arrears["oldest_due_date"], date(2026, 2, 15))
+
+    def test_penalties_target_the_first_unpaid_installment(self):
+        self.pay(self.loan.installments.get(sequence=1).total_due)
+        penalty = apply_auto_targeted_penalty(self.loan, self.admin)
+        self.assertEqual(
+            penalty.installment_code,
+            self.loan.installments.get(sequence=2).installment_code,
+        )
+        penalty = apply_auto_targeted_penalty(self.loan, self.admin)
+        self.assertEqual(
+            penalty.installment_code,
+            self.loan.installments.get(sequence=3).installment_code,
+        )
+
+    def test_backfill_replays_payments_in_resumable_chunks(self):
+        first_total = self.loan.installments.get(sequence=1).total_due
+        LoanPayment.objects.create(
+            loan_account=self.loan,
+            amount=first_total + 100,
+            transaction_status="Completed",
+            balance_updated=True,
+        )
+        other = create_loan(self.member, self.product)
+        checkpoint = os.path.join(tempfile.mkdtemp(), "backfill.json")
+
+        # A checkpoint covering every loan leaves nothing to do
+        first, last = sorted([self.loan.pk, other.pk])
+        with open(checkpoint, "w") as f:
+            json.dump({"completed": [[str(first), str(last)]]}, f)
+        out = io.StringIO()
+        call_command(
+            "backfill_projection_payments", "--checkpoint", checkpoint, stdout=out
+        )
+        self.assertIn("No loan accounts left", out.getvalue())
+        self.assertFalse(self.loan.installments.get(sequence=1).is_paid)
+
+        out = io.StringIO()
+        call_command(
+            "backfill_projection_payments",
+            "--chunk-size",
+            "1",
+            "--checkpoint",
+            checkpoint,
+            stdout=out,
+        )
+        self.assertIn("Processed: 2", out.getvalue())
+        self.assertFalse(os.path.exists(checkpoint))
+
+        first, second = self.loan.installments.all()[:2]
+        self.assertTrue(first.is_paid)
+        self.assertEqual(second.amount_paid, Decimal("100.00"))
+        self.loan.refresh_from_db()
+        self.assertEqual(installment_drift(self.loan), [])
+        self.assertFalse(other.installments.filter(is_paid=True).exists())
+
+    def test_backfill_checkpoint_keeps_failed_chunks_for_the_resume(self):
+        LoanPayment.objects.create(
+            loan_account=self.loan,
+            amount=Decimal("100"),
+            transaction_status="Completed",
+            balance_updated=True,
+        )
+        create_loan(self.member, self.product)
+        checkpoint = os.path.join(tempfile.mkdtemp(), "backfill.json")
+        options = ["--chunk-size", "1", "--checkpoint", checkpoint]
+
+        def replay(payments, schedule):
+            if payments:
+                raise ValueError("Corrupt schedule")
+
+        with mock.patch(
+            "loanaccounts.management.commands.backfill_projection_payments."
+            "_replay_payments",
+            side_effect=replay,
+        ):
+            out = io.StringIO()
+            call_command(
+                "backfill_projection_payments",
+                *options,
+                stdout=out,
+                stderr=io.StringIO(),
+            )
+        self.assertIn("Processed: 1  |  Skipped: 0  |  Errors: 1", out.getvalue())
+        with open(checkpoint) as f:
+            self.assertEqual(len(json.load(f)["completed"]), 1)
+
+        # The resumed run retries the failed loan only
+        out = io.StringIO()
+        call_command("backfill_projection_payments", *options, stdout=out)
+        self.assertIn("Processed: 1  |  Skipped: 0  |  Errors: 0", out.getvalue())
+        self.assertFalse(os.path.exists(checkpoint))
+        self.assertEqual(
+            self.loan.installments.get(sequence=1).amount_paid, Decimal("100.00")
+        )
+
+    def test_sync_command_rebuilds_drifted_installments(self):
+        LoanInstallment.objects.filter(loan_account=self.loan, sequence=3).delete()
+        self.assertEqual(installment_drift(self.loan), [3])
+        call_command("sync_loan_installments", stdout=io.StringIO())
+        self.assertEqual(installment_drift(self.loan), [])
+
+
+class PortfolioAgeingTests(TestCase):
+    def setUp(self):
+        member = User.objects.create_user(
+            email="member@example.com", password="pass", member_no="MM001"
+        )
+        product = LoanProduct.objects.create(
+            name="Development", interest_rate=Decimal("12")
+        )
+        # First installments due 2026-02-15, 2026-04-15 and 2026-06-15
+        self.late = create_loan(member, product, start=date(2026, 1, 15))
+        self.recent = create_loan(member, product, start=date(2026, 3, 15))
+        self.current = create_loan(member, product, start=date(2026, 5, 15))
+
+    def test_loans_are_aged_into_buckets_and_par(self):
+        snapshot = compute_portfolio_ageing(date(2026, 5, 1))
+        self.assertEqual(snapshot.active_loans, 3)
+        self.assertEqual(snapshot.loans_in_arrears, 2)
+
+        ageing = {a.loan_account_id: a for a in snapshot.loans.all()}
+        self.assertEqual(ageing[self.late.pk].days_past_due, 75)
+        self.assertEqual(ageing[self.late.pk].bucket, "61-90")
+        self.assertEqual(ageing[self.late.pk].overdue_installments, 3)
+        self.assertEqual(ageing[self.recent.pk].bucket, "1-30")
+        self.assertEqual(snapshot.buckets["current"]["loans"], 1)
+
+        # One of three equal loans is more than 30 and 60 days past due
+        self.assertEqual(snapshot.par30, Decimal("33.33"))
+        self.assertEqual(snapshot.par60, Decimal("33.33"))
+        self.assertEqual(snapshot.par90, Decimal("0"))
+
+        # Re-running the day replaces its snapshot
+        compute_portfolio_ageing(date(2026, 5, 1))
+        self.assertEqual(LoanAgeing.objects.count(), 2)
+
+    def test_report_endpoint_serves_the_days_snapshot(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(member_no="MM001"))
+        url = reverse("portfolio-at-risk")
+
+        response = client.get(url, {"as_of_date": "2026-05-01"})
+        self.assertEqual(response.status_code, 404)
+        # Requests never build a snapshot, not even today's
+        self.assertEqual(client.get(url).status_code, 404)
+        self.assertFalse(PortfolioAgeingSnapshot.objects.exists())
+
+        compute_portfolio_ageing(date(2026, 5, 1))
+        body = client.get(url, {"as_of_date": "2026-05-01", "bucket": "61-90"}).json()
+        self.assertEqual(body["loans_in_arrears"], 2)
+        self.assertEqual(
+            [loan["account_number"] for loan in body["loans"]],
+            [self.late.account_number],
+        )
+
+        compute_portfolio_ageing()
+        body = client.get(url).json()
+        self.assertEqual(body["as_of_date"], timezone.localdate().isoformat())
+
+
+class InterestAccrualTests(TestCase):
+    def setUp(self):
+        member = User.objects.create_user(
+            email="member@example.com", password="pass", member_no="MM001"
+        )
+        self.receivable = GLAccount.objects.create(
+            name="Interest Receivable", code="12000", category="ASSET"
+        )
+        self.revenue = GLAccount.objects.create(
+            name="Interest Income", code="40000", category="REVENUE"
+        )
+        gls = {
+            "gl_interest_receivable": self.receivable,
+            "gl_interest_revenue": self.revenue,
+            "accrual_start_date": date(2026, 1, 1),
+        }
+        self.daily = LoanProduct.objects.create(
+            name="Daily", interest_rate=Decimal("12"), interest_period="Daily", **gls
+        )
+        self.monthly = LoanProduct.objects.create(
+            name="Monthly", interest_rate=Decimal("12"), **gls
+        )
+        self.loans = [create_loan(member, self.daily) for _ in range(3)]
+        self.monthly_loan = create_loan(member, self.monthly)
+
+    def test_accrual_dates_follow_the_product_schedule(self):
+        start, as_of = date(2026, 1, 31), date(2026, 3, 20)
+        self.assertEqual(accrual_date("Daily", "Relative", start, as_of), as_of)
+        self.assertEqual(
+            accrual_date("Monthly", "Relative", start, as_of), date(2026, 2, 28)
+        )
+        self.assertEqual(
+            accrual_date("Monthly", "Fixed", start, as_of), date(2026, 3, 1)
+        )
+        # 2026-03-20 is a Friday
+        self.assertEqual(
+            accrual_date("Weekly", "Fixed", start, as_of), date(2026, 3, 16)
+        )
+        self.assertEqual(accrual_date("Annually", "Relative", start, as_of), start)
+
+    def test_loans_accrue_once_per_date_in_one_batch_per_product(self):
+        # Ten days at 12% on 12,000
+        report = run_interest_accrual(date(2026, 1, 25), chunk_size=2)
+        self.assertEqual(report["chunks"], 2)
+        self.assertEqual(report["loans_accrued"], 3)
+        self.assertEqual(report["interest_accrued"], Decimal("118.35"))
+        self.assertEqual(len(report["batches"]), 1)
+
+        self.receivable.refresh_from_db()
+        self.revenue.refresh_from_db()
+        self.assertEqual(self.receivable.balance, Decimal("118.35"))
+        self.assertEqual(self.revenue.balance, Decimal("118.35"))
+
+        loan = LoanAccount.objects.get(pk=self.loans[0].pk)
+        self.assertEqual(loan.accrued_interest, Decimal("39.45"))
+        self.assertEqual(loan.last_interest_calulation, date(2026, 1, 25))
+
+        report = run_interest_accrual(date(2026, 1, 25))
+        self.assertEqual(report["loans_accrued"], 0)
+        self.assertEqual(report["batches"], [])
+
+        # The monthly loan accrues its first full month on the anniversary
+        run_interest_accrual(date(2026, 2, 15))
+        accrual = LoanInterestAccrual.objects.get(loan_account=self.monthly_loan)
+        self.assertEqual((accrual.period_start, accrual.days), (date(2026, 1, 15), 31))
+        self.assertEqual(accrual.amount, Decimal("122.30"))
+        self.assertFalse(
+            LoanInterestAccrual.objects.filter(journal_batch__isnull=True).exists()
+        )
+
+    def test_loans_accrue_from_when_the_receivable_was_enabled(self):
+        LoanProduct.objects.filter(pk=self.daily.pk).update(
+            accrual_start_date=date(2026, 1, 20)
+        )
+        self.assertEqual(run_interest_accrual(date(2026, 1, 20))["loans_accrued"], 0)
+
+        # Five days, not the ten since the loans started
+        report = run_interest_accrual(date(2026, 1, 25))
+        self.assertEqual(report["interest_accrued"], Decimal("59.19"))
+        accrual = LoanInterestAccrual.objects.filter(loan_account=self.loans[0]).get()
+        self.assertEqual((accrual.period_start, accrual.days), (date(2026, 1, 20), 5))
+
+    def test_enabling_the_receivable_sets_the_accrual_start_date(self):
+        product = LoanProduct.objects.create(name="Later", interest_rate=Decimal("12"))
+        self.assertIsNone(product.accrual_start_date)
+        product.gl_interest_receivable = self.receivable
+        product.save()
+        self.assertEqual(product.accrual_start_date, timezone.localdate())
+
+    def test_repayments_settle_the_receivable_first(self):
+        run_interest_accrual(date(2026, 1, 25))
+        loan = self.loans[0]
+        receivable, revenue = interest_credit_entries(loan, self.daily, Decimal("50"))
+        self.assertEqual(receivable["credit"], Decimal("39.45"))
+        self.assertEqual(revenue["credit"], Decimal("10.55"))
+        loan.refresh_from_db()
+        self.assertEqual(loan.accrued_interest, Decimal("0"))
+
+
+class RefreshLoanBalancesTests(TestCase):
+    def setUp(self):
+        member = User.objects.create_user(
+            email="member@example.com", password="pass", member_no="MM001"
+        )
+        product = LoanProduct.objects.create(
+            name="Development", interest_rate=Decimal("12")
+        )
+        self.loans = [create_loan(member, product) for _ in range(4)]
+
+    def make_stale(self):
+        paid, funded, fee, current = self.loans
+        LoanAccount.objects.filter(pk=paid.pk).update(
+            total_amount_paid=F("total_loan_amount")
+        )
+        LoanAccount.objects.filter(pk=funded.pk).update(status="Funded")
+        LoanAccount.objects.filter(pk=fee.pk).update(processing_fee=Decimal("240"))
+
+    def balances(self):
+        return list(
+            LoanAccount.objects.order_by("pk").values_list(
+                "total_loan_amount", "outstanding_balance", "status"
+            )
+        )
+
+    def test_set_based_refresh_updates_only_stale_loans(self):
+        self.make_stale()
+        report = refresh_balances_in_sql()
+        self.assertEqual(
+            (report["changed"], report["closed"], report["activated"]), (3, 1, 1)
+        )
+        self.assertEqual(refresh_balances_in_sql()["changed"], 0)
+
+        paid, funded, fee, current = [
+            LoanAccount.objects.get(pk=loan.pk) for loan in self.loans
+        ]
+        self.assertEqual(paid.status, "Closed")
+        self.assertEqual(paid.outstanding_balance, Decimal("0"))
+        self.assertEqual(funded.status, "Active")
+        self.assertEqual(
+            fee.total_loan_amount, current.total_loan_amount + Decimal("240")
+        )
+
+    def test_chunked_refresh_matches_the_set_based_one(self):
+        self.make_stale()
+        with transaction.atomic():
+            refresh_balances_in_sql()
+            expected = self.balances()
+            transaction.set_rollback(True)
+
+        report = refresh_balances_in_chunks(chunk_size=2)
+        self.assertEqual(
+            (report["changed"], report["closed"], report["activated"]), (3, 1, 1)
+        )
+        self.assertEqual(self.balances(), expected)
+
+    def test_refreshes_invalidate_cached_reports(self):
+        for refresh in (refresh_balances_in_sql, refresh_balances_in_chunks):
+            with self.subTest(refresh=refresh.__name__):
+                self.make_stale()
+                version = get_ledger_version()
+                with self.captureOnCommitCallbacks(execute=True):
+                    refresh()
+                self.assertGreater(get_ledger_version(), version)
+
+                # Nothing changed, nothing to invalidate
+                version = get_ledger_version()
+                with self.captureOnCommitCallbacks(execute=True):
+                    refresh()
+                self.assertEqual(get_ledger_version(), version)
@@ -1,3 +1,4 @@
+import bisect
 import string
 import secrets
 from datetime import datetime
@@ -8,3 +9,30 @@ def generate_loan_account_number():
     year = datetime.now().year % 100
     random_number = "".join(secrets.choice(string.digits) for _ in range(8))
     return f"LN{year}{random_number}"
+
+
+def loan_id_ranges(queryset, chunk_size, exclude=()):
+    """
+    Split `queryset` into (first id, last id) ranges of `chunk_size` loans,
+    leaving out loans inside the `exclude` ranges (say, already processed).
+    """
+    exclude = sorted(exclude)
+    starts = [first for first, _ in exclude]
+    ranges = []
+    ids = queryset.order_by("pk").values_list("pk", flat=True)
+    first = last = None
+    count = 0
+    for pk in ids.iterator(chunk_size=5000):
+        index = bisect.bisect_right(starts, pk) - 1
+        if index >= 0 and pk <= exclude[index][1]:
+            continue
+        if first is None:
+            first = pk
+        last = pk
+        count += 1
+        if count == chunk_size:
+            ranges.append((first, last))
+            first, count = None, 0
+    if first is not None:
+        ranges.append((first, last))
+    return ranges
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LoanapplicationsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "loanapplications"
+
+    def ready(self):
+        import loanapplications.signals
@@ -1,9 +1,13 @@
-# loan_functions.py
-from decimal import Decimal, ROUND_HALF_UP
+# Loan calculators; schedules are built by loanapplications.schedule_engine
+from decimal import Decimal
 from datetime import date
 from dateutil.relativedelta import relativedelta
-from typing import Dict, List
-from loanapplications.utils import generate_installment_code
+from typing import Dict
+from loanapplications.schedule_engine import (
+    flat_rate_schedule,
+    reducing_payment_schedule,
+    reducing_term_schedule,
+)
 
 
 def advance_date(current_date: date, frequency: str) -> date:
@@ -29,6 +33,7 @@ def advance_date(current_date: date, frequency: str) -> date:
 # 1. FLAT-RATE (Interest on original principal)
 # ======================================================================
 
+
 def flat_rate_fixed_term(
     principal: Decimal,
     annual_rate: Decimal,
@@ -43,111 +48,14 @@ def flat_rate_fixed_term(
     `balance_after` reflects total remaining obligation (principal + interest + fee)
     so it is consistent with what the waterfall and clearance service read.
     """
-    MONTHS_IN_PERIOD = {
-        "daily": Decimal("1") / 30,
-        "weekly": Decimal("1") / 4,
-        "biweekly": Decimal("0.5"),
-        "monthly": Decimal("1"),
-        "quarterly": Decimal("3"),
-        "annually": Decimal("12"),
-    }
-
-    months_per_period = MONTHS_IN_PERIOD.get(repayment_frequency, Decimal("1"))
-
-    rate = annual_rate / Decimal("100")
-    # FLAT RATE (Total Period Fixed Charge): total interest = principal × rate
-    # The rate is treated as a one-time total charge for the loan, regardless of term length.
-    total_interest = (principal * rate).quantize(
-        Decimal("0.01"), ROUND_HALF_UP
+    return flat_rate_schedule(
+        principal,
+        annual_rate,
+        term_months,
+        start_date,
+        repayment_frequency,
+        processing_fee_total,
     )
-    # total_repayment excludes processing_fee here; fee is added separately per row and in output
-    total_repayment = principal + total_interest
-
-    total_periods = int(Decimal(term_months) / months_per_period)
-    if total_periods < 1:
-        total_periods = 1
-
-    # Each period: equal slice of principal + equal slice of interest
-    interest_per_period = (total_interest / Decimal(total_periods)).quantize(
-        Decimal("0.01"), ROUND_HALF_UP
-    )
-    principal_per_period = (principal / Decimal(total_periods)).quantize(
-        Decimal("0.01"), ROUND_HALF_UP
-    )
-    payment_per_period = principal_per_period + interest_per_period
-    fee_per_period = (processing_fee_total / Decimal(total_periods)).quantize(
-        Decimal("0.01"), ROUND_HALF_UP
-    )
-
-    # Track remaining principal and remaining interest separately for accurate balance_after
-    remaining_principal = principal
-    remaining_interest = total_interest
-    remaining_fee = processing_fee_total
-    schedule: List[dict] = []
-
-    # Start first payment 1 period after start_date
-    cur_date = advance_date(start_date, repayment_frequency)
-
-    for period_idx in range(total_periods):
-        due = cur_date
-        is_last = (period_idx == total_periods - 1)
-
-        # Last period absorbs any rounding residuals
-        if is_last:
-            principal_due = remaining_principal
-            interest_due = remaining_interest
-            fee_due = remaining_fee
-        else:
-            principal_due = min(principal_per_period, remaining_principal)
-            interest_due = interest_per_period
-            fee_due = fee_per_period
-
-        total_due = principal_due + interest_due  # before fee
-
-        remaining_principal = (remaining_principal - principal_due).quantize(
-            Decimal("0.01"), ROUND_HALF_UP
-        )
-        remaining_interest = (remaining_interest - interest_due).quantize(
-            Decimal("0.01"), ROUND_HALF_UP
-        )
-        remaining_fee = (remaining_fee - fee_due).quantize(
-            Decimal("0.01"), ROUND_HALF_UP
-        )
-
-        # balance_after = total still outstanding after this payment
-        # (remaining principal + remaining interest + remaining fee)
-        balance_after_total = remaining_principal + remaining_interest + remaining_fee
-
-        schedule.append(
-            {
-                "due_date": due.isoformat(),
-                "installment_code": generate_installment_code(),
-                "principal_due": float(principal_due),
-                "interest_due": float(interest_due),
-                "fee_due": float(fee_due),
-                "total_due": float(total_due + fee_due),
-                "balance_after": float(balance_after_total),
-                "is_paid": False,
-                "fee_paid": 0.0,
-                "interest_paid": 0.0,
-                "principal_paid": 0.0,
-                "amount_paid": 0.0,
-            }
-        )
-        cur_date = advance_date(cur_date, repayment_frequency)
-
-    output_monthly_payment = payment_per_period / months_per_period
-
-    return {
-        "term_months": term_months,
-        "monthly_payment": float(
-            output_monthly_payment + (fee_per_period / months_per_period)
-        ),
-        "total_interest": float(total_interest),
-        "total_processing_fee": float(processing_fee_total),
-        "total_repayment": float(total_repayment + processing_fee_total),
-        "schedule": schedule,
-    }
 
 
 # ======================================================================
@@ -165,105 +73,15 @@ def reducing_fixed_term(
     REDUCING BALANCE: Member selects TERM (months) → Calculate MONTHLY PAYMENT
     Uses PMT formula.
     """
-    if term_months <= 0:
-        raise ValueError("Term months must be > 0")
-
-    MONTHS_IN_PERIOD = {
-        "daily": Decimal("1") / 30,
-        "weekly": Decimal("1") / 4,
-        "biweekly": Decimal("0.5"),
-        "monthly": Decimal("1"),
-        "quarterly": Decimal("3"),
-        "annually": Decimal("12"),
-    }
-    months_per_period = MONTHS_IN_PERIOD.get(repayment_frequency, Decimal("1"))
-
-    # Total periods
-    n_periods = Decimal(term_months) / months_per_period
-
-    # Rate per period
-    monthly_rate = (annual_rate / Decimal("100")) / Decimal("12")
-    rate_per_period = monthly_rate * months_per_period
-
-    if rate_per_period == 0:
-        payment_per_period = principal / n_periods
-    else:
-        # PMT Formula
-        payment_per_period = (
-            principal
-            * (rate_per_period * (1 + rate_per_period) ** n_periods)
-            / ((1 + rate_per_period) ** n_periods - 1)
-        )
-
-    payment_per_period = payment_per_period.quantize(Decimal("0.01"), ROUND_HALF_UP)
-    fee_per_period = (processing_fee_total / n_periods).quantize(
-        Decimal("0.01"), ROUND_HALF_UP
+    return reducing_term_schedule(
+        principal,
+        annual_rate,
+        term_months,
+        start_date,
+        repayment_frequency,
+        processing_fee_total,
     )
 
-    balance = principal
-    total_interest = Decimal("0")
-    schedule: List[dict] = []
-
-    # Start first payment 1 period after start_date
-    cur_date = advance_date(start_date, repayment_frequency)
-
-    loops = int(n_periods)
-
-    for _ in range(loops):
-        interest_due = (balance * rate_per_period).quantize(
-            Decimal("0.01"), ROUND_HALF_UP
-        )
-        principal_due = (payment_per_period - interest_due).quantize(
-            Decimal("0.01"), ROUND_HALF_UP
-        )
-
-        # Handle last payment rounding or if balance < principal_due
-        if balance < principal_due:
-            principal_due = balance
-            total_due = principal_due + interest_due
-        else:
-            total_due = payment_per_period
-
-        balance = (balance - principal_due).quantize(Decimal("0.01"), ROUND_HALF_UP)
-        total_interest += interest_due
-
-        schedule.append(
-            {
-                "due_date": cur_date.isoformat(),
-                "installment_code": generate_installment_code(),
-                "principal_due": float(principal_due),
-                "interest_due": float(interest_due),
-                "fee_due": float(fee_per_period),
-                "total_due": float(total_due + fee_per_period),
-                "balance_after": float(balance),
-                "is_paid": False,
-                "fee_paid": 0.0,
-                "interest_paid": 0.0,
-                "principal_paid": 0.0,
-                "amount_paid": 0.0,
-            }
-        )
-
-        cur_date = advance_date(cur_date, repayment_frequency)
-
-    # Normalize "monthly_payment" for output
-    output_monthly_payment = payment_per_period / months_per_period
-
-    return {
-        "term_months": term_months,
-        "monthly_payment": float(
-            output_monthly_payment + (fee_per_period / months_per_period)
-        ),
-        "total_interest": float(total_interest.quantize(Decimal("0.01"))),
-        "total_processing_fee": float(processing_fee_total),
-        "total_repayment": float(
-            (principal + total_interest + processing_fee_total).quantize(
-                Decimal("0.01")
-            )
-        ),
-        "schedule": schedule,
-    }
-
 
 def reducing_fixed_payment(
     principal: Decimal,
@@ -277,103 +95,16 @@ def reducing_fixed_payment(
     """
     REDUCING BALANCE: Member selects PAYMENT → Calculate TERM
     """
-    if payment_per_month <= 0:
-        raise ValueError("Payment must be > 0")
-
-    MONTHS_IN_PERIOD = {
-        "daily": Decimal("1") / 30,
-        "weekly": Decimal("1") / 4,
-        "biweekly": Decimal("0.5"),
-        "monthly": Decimal("1"),
-        "quarterly": Decimal("3"),
-        "annually": Decimal("12"),
-    }
-    months_per_period = MONTHS_IN_PERIOD.get(repayment_frequency, Decimal("1"))
-
-    # Convert monthly payment input to per-period payment
-    payment_per_period = (payment_per_month * months_per_period).quantize(
-        Decimal("0.01"), ROUND_HALF_UP
+    return reducing_payment_schedule(
+        principal,
+        annual_rate,
+        payment_per_month,
+        start_date,
+        repayment_frequency,
+        max_months,
+        processing_fee_total,
     )
 
-    monthly_rate = (annual_rate / Decimal("100")) / Decimal("12")
-    rate_per_period = monthly_rate * months_per_period
-
-    balance = principal
-    total_interest = Decimal("0")
-    schedule: List[dict] = []
-
-    # Start first payment 1 period after start_date
-    cur_date = advance_date(start_date, repayment_frequency)
-
-    months_elapsed = Decimal("0")  # Count in months for safety check
-
-    # Safety max periods
-    max_periods = max_months / float(months_per_period)
-    periods_elapsed = 0
-
-    while balance > Decimal("0.01") and periods_elapsed < max_periods:
-        interest_due = (balance * rate_per_period).quantize(
-            Decimal("0.01"), ROUND_HALF_UP
-        )
-        principal_due = (payment_per_period - interest_due).quantize(
-            Decimal("0.01"), ROUND_HALF_UP
-        )
-
-        if principal_due > balance:
-            principal_due = balance
-            total_due = principal_due + interest_due
-        else:
-            total_due = payment_per_period
-
-        balance = (balance - principal_due).quantize(Decimal("0.01"), ROUND_HALF_UP)
-        total_interest += interest_due
-
-        schedule.append(
-            {
-                "due_date": cur_date.isoformat(),
-                "installment_code": generate_installment_code(),
-                "principal_due": float(principal_due),
-                "interest_due": float(interest_due),
-                "fee_paid": 0.0,
-                "interest_paid": 0.0,
-                "principal_paid": 0.0,
-                "amount_paid": 0.0,
-                "fee_due": 0.0,  # Placeholder
-                "total_due": float(total_due),
-                "balance_after": float(balance),
-                "is_paid": False,
-            }
-        )
-
-        cur_date = advance_date(cur_date, repayment_frequency)
-        months_elapsed += months_per_period
-        periods_elapsed += 1
-
-    term_months = int(months_elapsed.quantize(Decimal("1"), ROUND_HALF_UP))
-
-    num_payments = len(schedule)
-    if num_payments > 0:
-        fee_per_payment = (processing_fee_total / Decimal(num_payments)).quantize(
-            Decimal("0.01"), ROUND_HALF_UP
-        )
-        for entry in schedule:
-            entry["fee_due"] = float(fee_per_payment)
-            entry["total_due"] = float(
-                Decimal(str(entry["total_due"])) + fee_per_payment
-            )
-
-    return {
-        "term_months": term_months,
-        "total_interest": float(total_interest.quantize(Decimal("0.01"))),
-        "total_processing_fee": float(processing_fee_total),
-        "total_repayment": float(
-            (principal + total_interest + processing_fee_total).quantize(
-                Decimal("0.01")
-            )
-        ),
-        "schedule": schedule,
-    }
-
 
 # ======================================================================
 # 3. INTERACTIVE MENU
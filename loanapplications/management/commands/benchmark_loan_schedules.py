@@ -0,0 +1,140 @@
+"""
+Management command: benchmark_loan_schedules
+
+Measures schedule throughput (schedules per second) of the loan calculators
+for every calculation method and repayment frequency, comparing the schedule
+engine (loanapplications.schedule_engine) with the row-by-row Decimal
+reference (loanapplications.reference_calculators). Every engine schedule is
+also checked against the reference output.
+
+Usage
+-----
+    python manage.py benchmark_loan_schedules
+    python manage.py benchmark_loan_schedules --count 10000 --term 24
+    python manage.py benchmark_loan_schedules --frequencies monthly weekly --skip-reference
+"""
+
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from loanapplications import calculators, reference_calculators
+from loanapplications.schedule_engine import MONTHS_IN_PERIOD
+
+METHODS = ("flat_rate_fixed_term", "reducing_fixed_term", "reducing_fixed_payment")
+
+
+class Command(BaseCommand):
+    help = "Compares loan schedule throughput of the schedule engine and the reference calculators."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--count", type=int, default=10000, help="Engine schedules per case."
+        )
+        parser.add_argument(
+            "--reference-count",
+            type=int,
+            default=1000,
+            help="Reference schedules per case (the reference is much slower).",
+        )
+        parser.add_argument("--term", type=int, default=12, help="Term in months.")
+        parser.add_argument(
+            "--methods", nargs="+", choices=METHODS, default=list(METHODS)
+        )
+        parser.add_argument(
+            "--frequencies",
+            nargs="+",
+            choices=list(MONTHS_IN_PERIOD),
+            default=list(MONTHS_IN_PERIOD),
+        )
+        parser.add_argument("--skip-reference", action="store_true")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{options['count']} engine / {options['reference_count']} reference "
+            f"schedules per case, {options['term']}-month terms"
+        )
+        self.stdout.write(
+            f"{'method':<24}{'frequency':<11}{'rows':>6}"
+            f"{'engine/s':>12}{'reference/s':>14}{'speedup':>9}"
+        )
+
+        for method in options["methods"]:
+            for frequency in options["frequencies"]:
+                self._run_case(method, frequency, options)
+
+    def _inputs(self, method, frequency, count, options):
+        rnd = random.Random(options["seed"])
+        inputs = []
+        for _ in range(count):
+            principal = Decimal(rnd.randrange(10_000, 2_000_000, 50))
+            rate = Decimal(rnd.choice(["10", "12", "12.5", "13.5", "18", "24"]))
+            fee = principal * Decimal(rnd.choice(["0", "1.5", "2", "3"])) / 100
+            start = date(2026, 1, 1) + timedelta(days=rnd.randrange(365))
+            if method == "reducing_fixed_payment":
+                # roughly the payment that clears the loan within the term
+                term_or_payment = (
+                    principal * (1 + rate / 100) / options["term"]
+                ).quantize(Decimal("0.01"))
+            else:
+                term_or_payment = options["term"]
+            inputs.append(
+                {
+                    "principal": principal,
+                    "annual_rate": rate,
+                    (
+                        "payment_per_month"
+                        if method == "reducing_fixed_payment"
+                        else "term_months"
+                    ): term_or_payment,
+                    "start_date": start,
+                    "repayment_frequency": frequency,
+                    "processing_fee_total": fee,
+                }
+            )
+        return inputs
+
+    def _time(self, function, inputs):
+        start_time = time.perf_counter()
+        results = [function(**kwargs) for kwargs in inputs]
+        return len(inputs) / (time.perf_counter() - start_time), results
+
+    def _run_case(self, method, frequency, options):
+        inputs = self._inputs(method, frequency, options["count"], options)
+        engine_rate, results = self._time(getattr(calculators, method), inputs)
+        rows = len(results[0]["schedule"]) if results else 0
+
+        reference_rate = None
+        if not options["skip_reference"]:
+            sample = inputs[: options["reference_count"]]
+            reference_rate, expected = self._time(
+                getattr(reference_calculators, method), sample
+            )
+            for got, want in zip(results, expected):
+                if _without_codes(got) != _without_codes(want):
+                    raise CommandError(
+                        f"{method} ({frequency}) differs from the reference"
+                    )
+
+        self.stdout.write(
+            f"{method:<24}{frequency:<11}{rows:>6}{engine_rate:>12,.0f}"
+            + (
+                f"{reference_rate:>14,.0f}{engine_rate / reference_rate:>8.1f}x"
+                if reference_rate
+                else f"{'-':>14}{'-':>9}"
+            )
+        )
+
+
+def _without_codes(result):
+    return {
+        **result,
+        "schedule": [
+            {k: v for k, v in row.items() if k != "installment_code"}
+            for row in result["schedule"]
+        ],
+    }
@@ -0,0 +1,272 @@
+"""
+Loan quotes.
+
+`quote_grid` prices every combination of amount, term (or payment),
+repayment frequency, product and interest rate shock with the loan
+calculators (through the schedule cache) and returns summaries only:
+nothing is validated against the member or saved. Product parameters are
+memoised in the shared cache and invalidated when a product changes (see
+loanapplications.signals).
+"""
+
+import itertools
+import time
+from collections import namedtuple
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+
+from loanapplications.calculators import (
+    flat_rate_fixed_term,
+    reducing_fixed_payment,
+    reducing_fixed_term,
+)
+from loanapplications.schedule_cache import cached_projection
+from loanproducts.models import LoanProduct
+
+PRODUCT_VERSION_KEY = "loanapplications:product_version"
+PRODUCT_PARAMS_PREFIX = "loanapplications:product_params"
+
+QUOTE_PRODUCT_CACHE_TIMEOUT = getattr(settings, "QUOTE_PRODUCT_CACHE_TIMEOUT", 60 * 60)
+# Largest grid (number of combinations) priced in one request
+MAX_QUOTE_GRID_SIZE = getattr(settings, "MAX_QUOTE_GRID_SIZE", 500)
+
+ProductParameters = namedtuple(
+    "ProductParameters", ["name", "interest_method", "interest_rate", "processing_fee"]
+)
+
+
+class QuoteError(Exception):
+    pass
+
+
+# ---------------------------------------------------------
+# Product parameters
+# ---------------------------------------------------------
+
+
+def _product_version():
+    version = cache.get(PRODUCT_VERSION_KEY)
+    if version is None:
+        cache.add(PRODUCT_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(PRODUCT_VERSION_KEY)
+    return version
+
+
+def bump_product_version():
+    """Invalidate every memoised product."""
+    try:
+        cache.incr(PRODUCT_VERSION_KEY)
+    except ValueError:
+        cache.add(PRODUCT_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def get_product_parameters(names):
+    """
+    Pricing parameters of the active products called `names`, keyed by
+    name. Misses are loaded with one query and memoised.
+    """
+    version = _product_version()
+    keys = {name: f"{PRODUCT_PARAMS_PREFIX}:{version}:{name}" for name in names}
+    cached = cache.get_many(keys.values())
+    parameters = {
+        name: ProductParameters(*cached[key])
+        for name, key in keys.items()
+        if key in cached
+    }
+
+    missing = [name for name in names if name not in parameters]
+    if missing:
+        loaded = {}
+        for product in LoanProduct.objects.filter(name__in=missing, is_active=True):
+            parameters[product.name] = ProductParameters(
+                product.name,
+                product.interest_method,
+                product.interest_rate,
+                product.processing_fee,
+            )
+            loaded[keys[product.name]] = tuple(parameters[product.name])
+        cache.set_many(loaded, timeout=QUOTE_PRODUCT_CACHE_TIMEOUT)
+
+    unknown = [name for name in names if name not in parameters]
+    if unknown:
+        raise QuoteError(f"Unknown or inactive loan products: {', '.join(unknown)}")
+    return parameters
+
+
+# ---------------------------------------------------------
+# Quotes
+# ---------------------------------------------------------
+
+
+def _calculate(product, mode, principal, annual_rate, value, start_date, frequency):
+    processing_fee = principal * (product.processing_fee / Decimal("100"))
+    if product.interest_method == "Flat":
+        if mode != "fixed_term":
+            raise ValueError(
+                "Flat-rate loans require a fixed term strategy. You cannot use fixed payment."
+            )
+        calculator = flat_rate_fixed_term
+    elif mode == "fixed_term":
+        calculator = reducing_fixed_term
+    else:
+        calculator = reducing_fixed_payment
+    value_argument = "term_months" if mode == "fixed_term" else "payment_per_month"
+    projection = cached_projection(
+        calculator,
+        principal=principal,
+        annual_rate=annual_rate,
+        start_date=start_date,
+        repayment_frequency=frequency,
+        processing_fee_total=processing_fee,
+        **{value_argument: value},
+    )
+    return projection, processing_fee
+
+
+def quote_grid(
+    products,
+    amounts,
+    frequencies,
+    start_date,
+    calculation_mode="fixed_term",
+    terms=(),
+    payments=(),
+    rate_shocks=(Decimal("0"),),
+):
+    """
+    Price every combination of the grid. `rate_shocks` are percentage
+    points added to each product's rate (stress scenarios). Returns the
+    quotes, in grid order, and a comparison of the products per scenario.
+    """
+    values = terms if calculation_mode == "fixed_term" else payments
+    size = (
+        len(products) * len(amounts) * len(values) * len(frequencies) * len(rate_shocks)
+    )
+    if size > MAX_QUOTE_GRID_SIZE:
+        raise QuoteError(
+            f"The grid has {size} combinations; the limit is {MAX_QUOTE_GRID_SIZE}."
+        )
+    parameters = get_product_parameters(list(dict.fromkeys(products)))
+
+    quotes = []
+    calculated = {}
+    for name, amount, value, frequency, shock in itertools.product(
+        products, amounts, values, frequencies, rate_shocks
+    ):
+        product = parameters[name]
+        annual_rate = max(product.interest_rate + shock, Decimal("0"))
+        quote = {
+            "product": name,
+            "interest_method": product.interest_method,
+            "requested_amount": amount,
+            "repayment_frequency": frequency,
+            "rate_shock": shock,
+            "annual_rate": annual_rate,
+            "term_months": value if calculation_mode == "fixed_term" else None,
+            "monthly_payment": value if calculation_mode == "fixed_payment" else None,
+        }
+
+        key = (
+            product.interest_method,
+            product.processing_fee,
+            amount,
+            annual_rate,
+            value,
+            frequency,
+        )
+        if key not in calculated:
+            try:
+                calculated[key] = _calculate(
+                    product,
+                    calculation_mode,
+                    amount,
+                    annual_rate,
+                    value,
+                    start_date,
+                    frequency,
+                )
+            except (ValueError, ArithmeticError) as e:
+                calculated[key] = str(e)
+
+        result = calculated[key]
+        if isinstance(result, str):
+            quote["error"] = result
+        else:
+            projection, processing_fee = result
+            quote.update(
+                {
+                    "term_months": projection["term_months"],
+                    "monthly_payment": projection.get(
+                        "monthly_payment", quote["monthly_payment"]
+                    ),
+                    "processing_fee": processing_fee.quantize(Decimal("0.01")),
+                    "total_interest": projection["total_interest"],
+                    "total_repayment": projection["total_repayment"],
+                    "installments": len(projection["schedule"]),
+                    "first_due_date": (
+                        projection["schedule"][0]["due_date"]
+                        if projection["schedule"]
+                        else None
+                    ),
+                    "error": None,
+                }
+            )
+        quotes.append(quote)
+
+    return {
+        "calculation_mode": calculation_mode,
+        "start_date": start_date,
+        "count": len(quotes),
+        "quotes": quotes,
+        "comparison": _compare(quotes, calculation_mode),
+    }
+
+
+def _compare(quotes, calculation_mode):
+    """
+    Per scenario (amount, term or payment, frequency, shock), the products
+    that could price it, cheapest total repayment first.
+    """
+    value_field = "term_months" if calculation_mode == "fixed_term" else "payment"
+    scenarios = {}
+    for quote in quotes:
+        value = (
+            quote["term_months"]
+            if calculation_mode == "fixed_term"
+            else quote["monthly_payment"]
+        )
+        key = (
+            quote["requested_amount"],
+            value,
+            quote["repayment_frequency"],
+            quote["rate_shock"],
+        )
+        scenarios.setdefault(key, [])
+        if not quote["error"]:
+            scenarios[key].append(quote)
+
+    comparison = []
+    for (amount, value, frequency, shock), priced in scenarios.items():
+        ranked = sorted(priced, key=lambda quote: quote["total_repayment"])
+        comparison.append(
+            {
+                "requested_amount": amount,
+                value_field: value,
+                "repayment_frequency": frequency,
+                "rate_shock": shock,
+                "cheapest_product": ranked[0]["product"] if ranked else None,
+                "products": [
+                    {
+                        "product": quote["product"],
+                        "total_repayment": quote["total_repayment"],
+                        "difference": round(
+                            quote["total_repayment"] - ranked[0]["total_repayment"], 2
+                        ),
+                    }
+                    for quote in ranked
+                ],
+            }
+        )
+    return comparison
@@ -0,0 +1,183 @@
+"""
+Memoised loan schedules.
+
+A projection depends only on its calculator and inputs, so
+`cached_projection` keeps the calculator's output, less the installment
+codes, in a per-process LRU backed by the shared cache. Every call gets its
+own copy of the rows with freshly generated installment codes.
+
+Hit and miss counters, and the time spent on each, are kept per process and
+flushed to the shared cache every SCHEDULE_STATS_FLUSH_EVERY lookups; see
+`get_schedule_cache_stats`.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+
+from loanapplications.utils import generate_installment_code
+
+SCHEDULE_KEY_PREFIX = "loanapplications:schedule"
+SCHEDULE_STATS_PREFIX = "loanapplications:schedule_stats"
+# Bump when calculator output changes so stale templates are never served
+SCHEDULE_CACHE_VERSION = 1
+
+SCHEDULE_CACHE_LRU_SIZE = getattr(settings, "SCHEDULE_CACHE_LRU_SIZE", 1024)
+SCHEDULE_CACHE_TIMEOUT = getattr(settings, "SCHEDULE_CACHE_TIMEOUT", 24 * 60 * 60)
+SCHEDULE_STATS_FLUSH_EVERY = getattr(settings, "SCHEDULE_STATS_FLUSH_EVERY", 20)
+
+OUTCOMES = ("local_hits", "shared_hits", "misses")
+
+_templates = OrderedDict()
+_lock = threading.Lock()
+_pending = {}
+
+
+# ---------------------------------------------------------
+# Templates
+# ---------------------------------------------------------
+
+
+def _schedule_key(calculator, kwargs):
+    # Equal amounts hash alike whatever their exponent (1000 vs 1000.00)
+    parts = [calculator.__name__, str(SCHEDULE_CACHE_VERSION)] + [
+        f"{name}={value.normalize() if isinstance(value, Decimal) else value}"
+        for name, value in sorted(kwargs.items())
+    ]
+    digest = hashlib.md5("|".join(parts).encode()).hexdigest()
+    return f"{SCHEDULE_KEY_PREFIX}:{digest}"
+
+
+def _template(projection):
+    """The projection with its installment codes blanked (row order kept)."""
+    return {
+        **projection,
+        "schedule": [
+            {**row, "installment_code": None} for row in projection["schedule"]
+        ],
+    }
+
+
+def _with_codes(template):
+    schedule = []
+    for row in template["schedule"]:
+        row = dict(row)
+        row["installment_code"] = generate_installment_code()
+        schedule.append(row)
+    return {**template, "schedule": schedule}
+
+
+def _remember(key, template):
+    with _lock:
+        _templates[key] = template
+        _templates.move_to_end(key)
+        while len(_templates) > SCHEDULE_CACHE_LRU_SIZE:
+            _templates.popitem(last=False)
+
+
+def cached_projection(calculator, **kwargs):
+    """
+    `calculator(**kwargs)`, served from the LRU or the shared cache when the
+    same calculator already ran with the same inputs.
+    """
+    start_time = time.perf_counter()
+    key = _schedule_key(calculator, kwargs)
+
+    with _lock:
+        template = _templates.get(key)
+        if template is not None:
+            _templates.move_to_end(key)
+    outcome = "local_hits"
+
+    if template is None:
+        template = cache.get(key)
+        outcome = "shared_hits"
+        if template is None:
+            template = _template(calculator(**kwargs))
+            cache.set(key, template, timeout=SCHEDULE_CACHE_TIMEOUT)
+            outcome = "misses"
+        _remember(key, template)
+
+    projection = _with_codes(template)
+    _record(outcome, time.perf_counter() - start_time)
+    return projection
+
+
+def clear_local_schedules():
+    with _lock:
+        _templates.clear()
+
+
+# ---------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------
+
+
+def _record(outcome, duration):
+    with _lock:
+        count, micros = _pending.get(outcome, (0, 0))
+        _pending[outcome] = (count + 1, micros + int(duration * 1_000_000))
+        flush = sum(count for count, _ in _pending.values())
+        flush = flush >= SCHEDULE_STATS_FLUSH_EVERY
+    if flush:
+        flush_schedule_stats()
+
+
+def _incr(name, amount):
+    key = f"{SCHEDULE_STATS_PREFIX}:{name}"
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        pass
+
+
+def flush_schedule_stats():
+    """Push this process's pending counters to the shared cache."""
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+    for outcome, (count, micros) in pending.items():
+        _incr(outcome, count)
+        _incr(f"{outcome}_us", micros)
+
+
+def get_schedule_cache_stats():
+    """
+    Hit rate across processes, the average latency of hits and misses, and
+    the time hits saved compared with computing every schedule.
+    """
+    flush_schedule_stats()
+    counts = {}
+    averages = {}
+    for outcome in OUTCOMES:
+        count = cache.get(f"{SCHEDULE_STATS_PREFIX}:{outcome}", 0)
+        micros = cache.get(f"{SCHEDULE_STATS_PREFIX}:{outcome}_us", 0)
+        counts[outcome] = count
+        averages[outcome] = micros / count / 1000 if count else None
+
+    hits = counts["local_hits"] + counts["shared_hits"]
+    lookups = hits + counts["misses"]
+    saved_ms = None
+    if averages["misses"] is not None:
+        saved_ms = sum(
+            counts[outcome] * (averages["misses"] - averages[outcome])
+            for outcome in ("local_hits", "shared_hits")
+            if counts[outcome]
+        )
+    return {
+        **counts,
+        "lookups": lookups,
+        "hit_rate": round(hits / lookups, 4) if lookups else None,
+        "average_ms": {
+            outcome: round(average, 3) if average is not None else None
+            for outcome, average in averages.items()
+        },
+        "saved_ms": round(saved_ms, 1) if saved_ms is not None else None,
+        "local_entries": len(_templates),
+    }
@@ -0,0 +1,464 @@
+"""
+Amortisation schedule engine.
+
+Builds a whole repayment schedule in one pass for the loan calculators
+(loanapplications.calculators):
+
+- amounts are integers in units of 10^-scale (cents, unless the principal or
+  fee carry more decimals), so the per-row arithmetic is exact integer
+  arithmetic instead of Decimal objects
+- Decimal rounding is reproduced exactly: ROUND_HALF_UP to the cent, and the
+  context precision applied to `balance * rate` products
+- due dates come from a cached date array per (start date, frequency, count)
+  instead of one relativedelta addition per row
+
+The output is identical to the row-by-row Decimal implementations kept in
+loanapplications.reference_calculators.
+"""
+
+import calendar
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal, getcontext
+from functools import lru_cache
+from typing import Dict, List
+
+from loanapplications.utils import generate_installment_code
+
+CENT = Decimal("0.01")
+
+MONTHS_IN_PERIOD = {
+    "daily": Decimal("1") / 30,
+    "weekly": Decimal("1") / 4,
+    "biweekly": Decimal("0.5"),
+    "monthly": Decimal("1"),
+    "quarterly": Decimal("3"),
+    "annually": Decimal("12"),
+}
+
+# (unit, step) of one period per repayment frequency; unknown is monthly
+PERIOD_STEPS = {
+    "daily": ("days", 1),
+    "weekly": ("days", 7),
+    "biweekly": ("days", 14),
+    "monthly": ("months", 1),
+    "quarterly": ("months", 3),
+    "annually": ("months", 12),
+}
+
+
+# ---------------------------------------------------------
+# Dates
+# ---------------------------------------------------------
+
+
+@lru_cache(maxsize=4096)
+def due_dates(start_date: date, frequency: str, count: int) -> tuple:
+    """
+    ISO due dates of `count` periods, the first one period after
+    `start_date`. Month steps clamp the day like successive relativedelta
+    additions do (Jan 31 -> Feb 28 -> Mar 28).
+    """
+    unit, step = PERIOD_STEPS.get(frequency, ("months", 1))
+    if unit == "days":
+        return tuple(
+            (start_date + timedelta(days=step * i)).isoformat()
+            for i in range(1, count + 1)
+        )
+
+    dates = []
+    year, month, day = start_date.year, start_date.month, start_date.day
+    for _ in range(count):
+        month += step
+        year += (month - 1) // 12
+        month = (month - 1) % 12 + 1
+        day = min(day, calendar.monthrange(year, month)[1])
+        dates.append(date(year, month, day).isoformat())
+    return tuple(dates)
+
+
+# ---------------------------------------------------------
+# Integer amounts
+# ---------------------------------------------------------
+
+
+def _scale(*amounts: Decimal) -> int:
+    """Decimal places needed to hold every amount exactly (at least 2)."""
+    return max([2] + [-amount.as_tuple().exponent for amount in amounts])
+
+
+def _units(amount: Decimal, scale: int) -> int:
+    return int(amount.scaleb(scale))
+
+
+def _half_up(value: int, divisor: int) -> int:
+    """value / divisor rounded half away from zero (Decimal ROUND_HALF_UP)."""
+    quotient, remainder = divmod(abs(value), divisor)
+    if 2 * remainder >= divisor:
+        quotient += 1
+    return quotient if value >= 0 else -quotient
+
+
+def _half_even(value: int, divisor: int) -> int:
+    """value / divisor rounded half to even (the default Decimal context)."""
+    quotient, remainder = divmod(abs(value), divisor)
+    if 2 * remainder > divisor or (2 * remainder == divisor and quotient % 2):
+        quotient += 1
+    return quotient if value >= 0 else -quotient
+
+
+class _Amounts:
+    """Conversions between Decimal and integer units at one scale."""
+
+    def __init__(self, scale: int):
+        self.scale = scale
+        self.one = 10**scale
+        self.cent = 10 ** (scale - 2)
+
+    def units(self, amount: Decimal) -> int:
+        return _units(amount, self.scale)
+
+    def to_float(self, units: int) -> float:
+        # int / int is correctly rounded, exactly like float(Decimal)
+        return units / self.one
+
+    def quantize(self, units: int) -> int:
+        """`.quantize(Decimal("0.01"), ROUND_HALF_UP)`"""
+        if self.cent == 1:
+            return units
+        return _half_up(units, self.cent) * self.cent
+
+    def quantize_even(self, units: int) -> int:
+        """`.quantize(Decimal("0.01"))` under the default context"""
+        if self.cent == 1:
+            return units
+        return _half_even(units, self.cent) * self.cent
+
+    def multiplier(self, rate: Decimal):
+        """Return f(units) = `(units * rate).quantize(CENT, ROUND_HALF_UP)`."""
+        _, digits, exponent = rate.as_tuple()
+        coefficient = int("".join(map(str, digits))) * (-1 if rate < 0 else 1)
+        precision = getcontext().prec
+        limit = 10**precision
+        exponent -= self.scale
+        cent = self.cent
+
+        def multiply(units: int) -> int:
+            product = units * coefficient
+            product_exponent = exponent
+            # Decimal rounds the product to the context precision first
+            if abs(product) >= limit:
+                drop = len(str(abs(product))) - precision
+                product = _half_even(product, 10**drop)
+                product_exponent += drop
+            shift = -2 - product_exponent
+            if shift > 0:
+                cents = _half_up(product, 10**shift)
+            else:
+                cents = product * 10**-shift
+            return cents * cent
+
+        return multiply
+
+
+def _row_codes(count: int) -> List[str]:
+    return [generate_installment_code() for _ in range(count)]
+
+
+# ---------------------------------------------------------
+# Flat rate
+# ---------------------------------------------------------
+
+
+def flat_rate_schedule(
+    principal: Decimal,
+    annual_rate: Decimal,
+    term_months: int,
+    start_date: date,
+    repayment_frequency: str = "monthly",
+    processing_fee_total: Decimal = Decimal("0"),
+) -> Dict:
+    months_per_period = MONTHS_IN_PERIOD.get(repayment_frequency, Decimal("1"))
+
+    rate = annual_rate / Decimal("100")
+    total_interest = (principal * rate).quantize(CENT, ROUND_HALF_UP)
+    total_repayment = principal + total_interest
+
+    total_periods = int(Decimal(term_months) / months_per_period)
+    if total_periods < 1:
+        total_periods = 1
+
+    interest_per_period = (total_interest / Decimal(total_periods)).quantize(
+        CENT, ROUND_HALF_UP
+    )
+    principal_per_period = (principal / Decimal(total_periods)).quantize(
+        CENT, ROUND_HALF_UP
+    )
+    payment_per_period = principal_per_period + interest_per_period
+    fee_per_period = (processing_fee_total / Decimal(total_periods)).quantize(
+        CENT, ROUND_HALF_UP
+    )
+
+    amounts = _Amounts(_scale(principal, processing_fee_total))
+    quantize = amounts.quantize
+    to_float = amounts.to_float
+    per_principal = amounts.units(principal_per_period)
+    per_interest = amounts.units(interest_per_period)
+    per_fee = amounts.units(fee_per_period)
+    remaining_principal = amounts.units(principal)
+    remaining_interest = amounts.units(total_interest)
+    remaining_fee = amounts.units(processing_fee_total)
+
+    dates = due_dates(start_date, repayment_frequency, total_periods)
+    codes = _row_codes(total_periods)
+    last = total_periods - 1
+    schedule = []
+    for i in range(total_periods):
+        # Last period absorbs any rounding residuals
+        if i == last:
+            principal_due = remaining_principal
+            interest_due = remaining_interest
+            fee_due = remaining_fee
+        else:
+            principal_due = min(per_principal, remaining_principal)
+            interest_due = per_interest
+            fee_due = per_fee
+
+        remaining_principal = quantize(remaining_principal - principal_due)
+        remaining_interest = quantize(remaining_interest - interest_due)
+        remaining_fee = quantize(remaining_fee - fee_due)
+
+        schedule.append(
+            {
+                "due_date": dates[i],
+                "installment_code": codes[i],
+                "principal_due": to_float(principal_due),
+                "interest_due": to_float(interest_due),
+                "fee_due": to_float(fee_due),
+                "total_due": to_float(principal_due + interest_due + fee_due),
+                "balance_after": to_float(
+                    remaining_principal + remaining_interest + remaining_fee
+                ),
+                "is_paid": False,
+                "fee_paid": 0.0,
+                "interest_paid": 0.0,
+                "principal_paid": 0.0,
+                "amount_paid": 0.0,
+            }
+        )
+
+    output_monthly_payment = payment_per_period / months_per_period
+
+    return {
+        "term_months": term_months,
+        "monthly_payment": float(
+            output_monthly_payment + (fee_per_period / months_per_period)
+        ),
+        "total_interest": float(total_interest),
+        "total_processing_fee": float(processing_fee_total),
+        "total_repayment": float(total_repayment + processing_fee_total),
+        "schedule": schedule,
+    }
+
+
+# ---------------------------------------------------------
+# Reducing balance
+# ---------------------------------------------------------
+
+
+def _rate_per_period(annual_rate: Decimal, months_per_period: Decimal) -> Decimal:
+    monthly_rate = (annual_rate / Decimal("100")) / Decimal("12")
+    return monthly_rate * months_per_period
+
+
+def _totals(amounts, principal, total_interest, processing_fee_total):
+    principal_units = amounts.units(principal)
+    fee_units = amounts.units(processing_fee_total)
+    return (
+        amounts.to_float(amounts.quantize_even(total_interest)),
+        amounts.to_float(
+            amounts.quantize_even(principal_units + total_interest + fee_units)
+        ),
+    )
+
+
+def reducing_term_schedule(
+    principal: Decimal,
+    annual_rate: Decimal,
+    term_months: int,
+    start_date: date,
+    repayment_frequency: str = "monthly",
+    processing_fee_total: Decimal = Decimal("0"),
+) -> Dict:
+    if term_months <= 0:
+        raise ValueError("Term months must be > 0")
+
+    months_per_period = MONTHS_IN_PERIOD.get(repayment_frequency, Decimal("1"))
+    n_periods = Decimal(term_months) / months_per_period
+    rate_per_period = _rate_per_period(annual_rate, months_per_period)
+
+    if rate_per_period == 0:
+        payment_per_period = principal / n_periods
+    else:
+        # PMT Formula
+        payment_per_period = (
+            principal
+            * (rate_per_period * (1 + rate_per_period) ** n_periods)
+            / ((1 + rate_per_period) ** n_periods - 1)
+        )
+    payment_per_period = payment_per_period.quantize(CENT, ROUND_HALF_UP)
+    fee_per_period = (processing_fee_total / n_periods).quantize(CENT, ROUND_HALF_UP)
+
+    amounts = _Amounts(_scale(principal, processing_fee_total))
+    quantize = amounts.quantize
+    to_float = amounts.to_float
+    interest_on = amounts.multiplier(rate_per_period)
+    payment = amounts.units(payment_per_period)
+    fee = amounts.units(fee_per_period)
+    fee_float = to_float(fee)
+    balance = amounts.units(principal)
+    total_interest = 0
+
+    loops = int(n_periods)
+    dates = due_dates(start_date, repayment_frequency, loops)
+    codes = _row_codes(loops)
+    schedule = []
+    for i in range(loops):
+        interest_due = interest_on(balance)
+        principal_due = quantize(payment - interest_due)
+
+        # Handle last payment rounding or if balance < principal_due
+        if balance < principal_due:
+            principal_due = balance
+            total_due = principal_due + interest_due
+        else:
+            total_due = payment
+
+        balance = quantize(balance - principal_due)
+        total_interest += interest_due
+
+        schedule.append(
+            {
+                "due_date": dates[i],
+                "installment_code": codes[i],
+                "principal_due": to_float(principal_due),
+                "interest_due": to_float(interest_due),
+                "fee_due": fee_float,
+                "total_due": to_float(total_due + fee),
+                "balance_after": to_float(balance),
+                "is_paid": False,
+                "fee_paid": 0.0,
+                "interest_paid": 0.0,
+                "principal_paid": 0.0,
+                "amount_paid": 0.0,
+            }
+        )
+
+    total_interest, total_repayment = _totals(
+        amounts, principal, total_interest, processing_fee_total
+    )
+    output_monthly_payment = payment_per_period / months_per_period
+
+    return {
+        "term_months": term_months,
+        "monthly_payment": float(
+            output_monthly_payment + (fee_per_period / months_per_period)
+        ),
+        "total_interest": total_interest,
+        "total_processing_fee": float(processing_fee_total),
+        "total_repayment": total_repayment,
+        "schedule": schedule,
+    }
+
+
+def reducing_payment_schedule(
+    principal: Decimal,
+    annual_rate: Decimal,
+    payment_per_month: Decimal,
+    start_date: date,
+    repayment_frequency: str = "monthly",
+    max_months: int = 360,
+    processing_fee_total: Decimal = Decimal("0"),
+) -> Dict:
+    if payment_per_month <= 0:
+        raise ValueError("Payment must be > 0")
+
+    months_per_period = MONTHS_IN_PERIOD.get(repayment_frequency, Decimal("1"))
+    payment_per_period = (payment_per_month * months_per_period).quantize(
+        CENT, ROUND_HALF_UP
+    )
+    rate_per_period = _rate_per_period(annual_rate, months_per_period)
+
+    amounts = _Amounts(_scale(principal, processing_fee_total))
+    quantize = amounts.quantize
+    interest_on = amounts.multiplier(rate_per_period)
+    payment = amounts.units(payment_per_period)
+    balance = amounts.units(principal)
+    min_balance = amounts.cent
+    total_interest = 0
+
+    # Safety max periods
+    max_periods = max_months / float(months_per_period)
+    rows = []
+    while balance > min_balance and len(rows) < max_periods:
+        interest_due = interest_on(balance)
+        principal_due = quantize(payment - interest_due)
+
+        if principal_due > balance:
+            principal_due = balance
+            total_due = principal_due + interest_due
+        else:
+            total_due = payment
+
+        balance = quantize(balance - principal_due)
+        total_interest += interest_due
+        rows.append((principal_due, interest_due, total_due, balance))
+
+    num_payments = len(rows)
+    # Summed once per row rather than multiplied: for daily loans the
+    # repeated additions round differently from one product
+    months_elapsed = Decimal("0")
+    for _ in range(num_payments):
+        months_elapsed += months_per_period
+    term_months = int(months_elapsed.quantize(Decimal("1"), ROUND_HALF_UP))
+
+    fee = 0
+    if num_payments > 0:
+        fee = amounts.units(
+            (processing_fee_total / Decimal(num_payments)).quantize(CENT, ROUND_HALF_UP)
+        )
+    fee_float = amounts.to_float(fee)
+
+    to_float = amounts.to_float
+    dates = due_dates(start_date, repayment_frequency, num_payments)
+    codes = _row_codes(num_payments)
+    schedule = [
+        {
+            "due_date": dates[i],
+            "installment_code": codes[i],
+            "principal_due": to_float(principal_due),
+            "interest_due": to_float(interest_due),
+            "fee_paid": 0.0,
+            "interest_paid": 0.0,
+            "principal_paid": 0.0,
+            "amount_paid": 0.0,
+            "fee_due": fee_float,
+            "total_due": to_float(total_due + fee),
+            "balance_after": to_float(balance_after),
+            "is_paid": False,
+        }
+        for i, (principal_due, interest_due, total_due, balance_after) in enumerate(
+            rows
+        )
+    ]
+
+    total_interest, total_repayment = _totals(
+        amounts, principal, total_interest, processing_fee_total
+    )
+
+    return {
+        "term_months": term_months,
+        "total_interest": total_interest,
+        "total_processing_fee": float(processing_fee_total),
+        "total_repayment": total_repayment,
+        "schedule": schedule,
+    }
@@ -18,6 +18,7 @@ from loanapplications.calculators import (
 )
 from guaranteerequests.models import GuaranteeRequest
 from guarantors.models import GuarantorProfile
+from loanapplications.schedule_cache import cached_projection
 from loanapplications.utils import compute_loan_coverage
 from guaranteerequests.serializers import GuaranteeRequestSerializer
 from mwandamzedusaccoapi.settings import (
@@ -249,7 +250,8 @@ class LoanApplicationSerializer(serializers.ModelSerializer):
         try:
             if product.interest_method == "Flat":
                 if mode == "fixed_term":
-                    proj = flat_rate_fixed_term(
+                    proj = cached_projection(
+                        flat_rate_fixed_term,
                         principal=principal,
                         annual_rate=product.interest_rate,
                         term_months=term,
@@ -264,7 +266,8 @@ class LoanApplicationSerializer(serializers.ModelSerializer):
                     )
             else:
                 if mode == "fixed_term":
-                    proj = reducing_fixed_term(
+                    proj = cached_projection(
+                        reducing_fixed_term,
                         principal=principal,
                         annual_rate=product.interest_rate,
                         term_months=term,
@@ -274,7 +277,8 @@ class LoanApplicationSerializer(serializers.ModelSerializer):
                     )
                     data["monthly_payment"] = Decimal(str(proj["monthly_payment"]))
                 else:
-                    proj = reducing_fixed_payment(
+                    proj = cached_projection(
+                        reducing_fixed_payment,
                         principal=principal,
                         annual_rate=product.interest_rate,
                         payment_per_month=payment,
@@ -495,3 +499,53 @@ class BulkAdminLoanApplicationSerializer(serializers.Serializer):
 
 class BulkUploadFileSerializer(serializers.Serializer):
     file = serializers.FileField()
+
+
+class LoanQuoteGridSerializer(serializers.Serializer):
+    products = serializers.ListField(
+        child=serializers.CharField(), min_length=1, max_length=10
+    )
+    calculation_mode = serializers.ChoiceField(
+        choices=LoanApplication.CALCULATION_MODE_CHOICES, default="fixed_term"
+    )
+    amounts = serializers.ListField(
+        child=serializers.DecimalField(max_digits=15, decimal_places=2, min_value=1),
+        min_length=1,
+    )
+    terms = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False, default=list
+    )
+    payments = serializers.ListField(
+        child=serializers.DecimalField(
+            max_digits=15, decimal_places=2, min_value=Decimal("0.01")
+        ),
+        required=False,
+        default=list,
+    )
+    frequencies = serializers.ListField(
+        child=serializers.ChoiceField(
+            choices=LoanApplication.REPAYMENT_FREQUENCY_CHOICES
+        ),
+        min_length=1,
+        default=lambda: ["monthly"],
+    )
+    # Stress scenarios: percentage points added to each product's rate
+    rate_shocks = serializers.ListField(
+        child=serializers.DecimalField(
+            max_digits=5, decimal_places=2, min_value=-100, max_value=100
+        ),
+        min_length=1,
+        default=lambda: [Decimal("0")],
+    )
+    start_date = serializers.DateField(default=date.today)
+
+    def validate(self, data):
+        if data["calculation_mode"] == "fixed_term" and not data["terms"]:
+            raise serializers.ValidationError(
+                {"terms": "Required in 'fixed_term' mode."}
+            )
+        if data["calculation_mode"] == "fixed_payment" and not data["payments"]:
+            raise serializers.ValidationError(
+                {"payments": "Required in 'fixed_payment' mode."}
+            )
+        return data
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save, post_delete
+
+from loanapplications.quotes import bump_product_version
+from loanproducts.models import LoanProduct
+
+
+def invalidate_product_parameters(sender, **kwargs):
+    bump_product_version()
+
+
+post_save.connect(invalidate_product_parameters, sender=LoanProduct)
+post_delete.connect(invalidate_product_parameters, sender=LoanProduct)
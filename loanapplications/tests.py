@@ -0,0 +1,244 @@
+import io
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from loanapplications import calculators, reference_calculators
+from loanapplications.models import LoanApplication
+from loanapplications.schedule_cache import (
+    cached_projection,
+    clear_local_schedules,
+    flush_schedule_stats,
+    get_schedule_cache_stats,
+)
+from loanapplications.schedule_engine import MONTHS_IN_PERIOD, due_dates
+from loanproducts.models import LoanProduct
+
+User = get_user_model()
+
+
+def _without_codes(result):
+    for row in result["schedule"]:
+        assert row.pop("installment_code").startswith("IC")
+    return result
+
+
+class ScheduleEngineTests(SimpleTestCase):
+    CASES = [
+        (Decimal("100000"), Decimal("12"), Decimal("1500")),
+        (Decimal("73333.33"), Decimal("13.5"), Decimal("0")),
+        (Decimal("250000.55"), Decimal("18.25"), Decimal("3333.33")),
+    ]
+
+    def assertMatchesReference(self, method, **kwargs):
+        self.assertEqual(
+            _without_codes(getattr(calculators, method)(**kwargs)),
+            _without_codes(getattr(reference_calculators, method)(**kwargs)),
+            f"{method} {kwargs}",
+        )
+
+    def test_fixed_term_schedules_match_reference(self):
+        for principal, rate, fee in self.CASES:
+            for frequency in MONTHS_IN_PERIOD:
+                for method in ("flat_rate_fixed_term", "reducing_fixed_term"):
+                    self.assertMatchesReference(
+                        method,
+                        principal=principal,
+                        annual_rate=rate,
+                        term_months=7,
+                        start_date=date(2026, 1, 31),
+                        repayment_frequency=frequency,
+                        processing_fee_total=fee,
+                    )
+
+    def test_fixed_payment_schedules_match_reference(self):
+        for principal, rate, fee in self.CASES:
+            for frequency in MONTHS_IN_PERIOD:
+                self.assertMatchesReference(
+                    "reducing_fixed_payment",
+                    principal=principal,
+                    annual_rate=rate,
+                    payment_per_month=(principal / 9).quantize(Decimal("0.01")),
+                    start_date=date(2026, 1, 31),
+                    repayment_frequency=frequency,
+                    processing_fee_total=fee,
+                )
+
+    def test_non_positive_inputs_are_rejected(self):
+        with self.assertRaises(ValueError):
+            calculators.reducing_fixed_payment(
+                Decimal("100000"), Decimal("24"), Decimal("0")
+            )
+        with self.assertRaises(ValueError):
+            calculators.reducing_fixed_term(Decimal("100000"), Decimal("24"), 0)
+
+    def test_month_steps_clamp_the_day(self):
+        self.assertEqual(
+            due_dates(date(2026, 1, 31), "monthly", 3),
+            ("2026-02-28", "2026-03-28", "2026-04-28"),
+        )
+
+    def test_benchmark_command_checks_reference(self):
+        call_command(
+            "benchmark_loan_schedules",
+            count=5,
+            reference_count=5,
+            frequencies=["monthly"],
+            stdout=io.StringIO(),
+        )
+
+
+class LoanQuoteTests(TestCase):
+    def setUp(self):
+        self.member = User.objects.create_user(
+            email="member@example.com", password="pass", member_no="MM001"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.member)
+        self.reducing = LoanProduct.objects.create(
+            name="Development", interest_rate=Decimal("12"), processing_fee=2
+        )
+        self.flat = LoanProduct.objects.create(
+            name="Emergency",
+            interest_method="Flat",
+            interest_rate=Decimal("10"),
+            processing_fee=0,
+        )
+
+    def quote(self, **grid):
+        return self.client.post(
+            reverse("loanapplications:loan-quote"), grid, format="json"
+        )
+
+    def test_grid_prices_every_combination_without_saving(self):
+        response = self.quote(
+            products=["Development", "Emergency"],
+            amounts=["100000", "50000"],
+            terms=[6, 12],
+            frequencies=["monthly", "weekly"],
+            rate_shocks=["0", "3"],
+            start_date="2026-01-31",
+        )
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["count"], 32)
+        self.assertFalse(LoanApplication.objects.exists())
+
+        expected = calculators.reducing_fixed_term(
+            Decimal("100000"),
+            Decimal("15"),
+            12,
+            date(2026, 1, 31),
+            "monthly",
+            Decimal("2000"),
+        )
+        quote = next(
+            q
+            for q in body["quotes"]
+            if q["product"] == "Development"
+            and q["requested_amount"] == 100000
+            and q["term_months"] == 12
+            and q["repayment_frequency"] == "monthly"
+            and q["rate_shock"] == 3
+        )
+        self.assertEqual(quote["total_repayment"], expected["total_repayment"])
+        self.assertEqual(quote["monthly_payment"], expected["monthly_payment"])
+        self.assertEqual(len(body["comparison"]), 16)
+
+    def test_flat_products_cannot_be_quoted_by_payment(self):
+        body = self.quote(
+            products=["Development", "Emergency"],
+            calculation_mode="fixed_payment",
+            amounts=["100000"],
+            payments=["10000"],
+        ).json()
+        errors = {q["product"]: q["error"] for q in body["quotes"]}
+        self.assertIsNone(errors["Development"])
+        self.assertIn("fixed term", errors["Emergency"])
+        self.assertEqual(body["comparison"][0]["cheapest_product"], "Development")
+
+    def test_product_changes_invalidate_memoised_parameters(self):
+        self.quote(products=["Development"], amounts=["1000"], terms=[12])
+        self.reducing.interest_rate = Decimal("24")
+        self.reducing.save()
+        quote = self.quote(products=["Development"], amounts=["1000"], terms=[12])
+        self.assertEqual(quote.json()["quotes"][0]["annual_rate"], 24)
+
+    def test_unknown_products_and_oversized_grids_are_rejected(self):
+        response = self.quote(products=["Missing"], amounts=["1000"], terms=[12])
+        self.assertEqual(response.status_code, 400)
+        response = self.quote(
+            products=["Development"],
+            amounts=[str(1000 + i) for i in range(100)],
+            terms=list(range(1, 7)),
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("limit", response.json()["detail"])
+
+
+class ScheduleCacheTests(TestCase):
+    KWARGS = {
+        "principal": Decimal("120000"),
+        "annual_rate": Decimal("12"),
+        "term_months": 12,
+        "start_date": date(2026, 3, 1),
+        "repayment_frequency": "monthly",
+        "processing_fee_total": Decimal("2400"),
+    }
+
+    def setUp(self):
+        flush_schedule_stats()
+        cache.clear()
+        clear_local_schedules()
+
+    def test_cached_schedules_match_calculator_with_fresh_codes(self):
+        first = cached_projection(calculators.reducing_fixed_term, **self.KWARGS)
+        first["schedule"][0]["amount_paid"] = 999
+        second = cached_projection(
+            calculators.reducing_fixed_term,
+            **{**self.KWARGS, "principal": Decimal("120000.00")},
+        )
+        clear_local_schedules()
+        third = cached_projection(calculators.reducing_fixed_term, **self.KWARGS)
+
+        codes = [row["installment_code"] for row in second["schedule"]]
+        self.assertEqual(len(set(codes)), 12)
+        self.assertNotEqual(codes, [r["installment_code"] for r in third["schedule"]])
+        self.assertEqual(
+            _without_codes(second),
+            _without_codes(calculators.reducing_fixed_term(**self.KWARGS)),
+        )
+
+        stats = get_schedule_cache_stats()
+        self.assertEqual(
+            (stats["misses"], stats["local_hits"], stats["shared_hits"]), (1, 1, 1)
+        )
+        self.assertAlmostEqual(stats["hit_rate"], 2 / 3, places=3)
+
+    def test_application_endpoints_reuse_schedules(self):
+        admin = User.objects.create_user(
+            email="admin@example.com",
+            password="pass",
+            member_no="MM003",
+            is_sacco_admin=True,
+        )
+        LoanProduct.objects.create(name="Development", interest_rate=Decimal("12"))
+        client = APIClient()
+        client.force_authenticate(admin)
+        payload = {
+            "product": "Development",
+            "requested_amount": "50000",
+            "calculation_mode": "fixed_term",
+            "term_months": 6,
+            "start_date": "2026-03-01",
+        }
+        url = reverse("loanapplications:loanapplications")
+        for _ in range(2):
+            self.assertEqual(client.post(url, payload, format="json").status_code, 201)
+        self.assertEqual(get_schedule_cache_stats()["local_hits"], 1)
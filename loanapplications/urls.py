@@ -14,6 +14,8 @@ from loanapplications.views import (
     AdminLoanApplicationTemplateDownloadView,
     BulkAdminLoanApplicationUploadView,
     BulkAdminLoanApplicationCreateView,
+    LoanQuoteView,
+    ScheduleCacheStatsView,
 )
 
 app_name = "loanapplications"
@@ -40,6 +42,12 @@ urlpatterns = [
         BulkAdminLoanApplicationCreateView.as_view(),
         name="admin-bulk-create",
     ),
+    path("quote/", LoanQuoteView.as_view(), name="loan-quote"),
+    path(
+        "schedule-cache/stats/",
+        ScheduleCacheStatsView.as_view(),
+        name="schedule-cache-stats",
+    ),
     path(
         "<str:reference>/",
         LoanApplicationDetailView.as_view(),
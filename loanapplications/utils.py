@@ -1,5 +1,4 @@
 import resend
-import string
 import secrets
 from decimal import Decimal
 from django.db import models
@@ -16,8 +15,8 @@ current_year = datetime.now().year
 def generate_installment_code():
     """Generate a random 10-digit installment code."""
     year = datetime.now().year % 100
-    random_number = "".join(secrets.choice(string.digits) for _ in range(8))
-    return f"IC{year}{random_number}"
+    # One draw of 8 uniform digits (instead of 8 separate draws)
+    return f"IC{year}{secrets.randbelow(10**8):08d}"
 
 
 def compute_loan_coverage(application):
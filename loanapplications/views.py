@@ -21,6 +21,7 @@ from loanapplications.serializers import (
     AdminLoanApplicationSerializer,
     BulkAdminLoanApplicationSerializer,
     BulkUploadFileSerializer,
+    LoanQuoteGridSerializer,
 )
 from loanaccounts.models import LoanAccount
 from accounts.permissions import IsSystemAdminOrReadOnly
@@ -33,6 +34,8 @@ from loanapplications.utils import (
     send_loan_application_approved_email,
 )
 from guarantors.models import GuarantorProfile
+from loanapplications.quotes import QuoteError, quote_grid
+from loanapplications.schedule_cache import get_schedule_cache_stats
 
 
 class LoanApplicationListCreateView(generics.ListCreateAPIView):
@@ -299,8 +302,11 @@ class SubmitLoanApplicationView(generics.GenericAPIView):
             )
 
         with transaction.atomic():
+            from guarantors.services import refresh_application_guarantors
+
             application.status = "Submitted"
             application.save(update_fields=["status"])
+            refresh_application_guarantors(application)
 
         serializer = self.get_serializer(application)
 
@@ -667,3 +673,33 @@ class AdminCreateLoanApplicationView(generics.CreateAPIView):
     queryset = LoanApplication.objects.all()
     serializer_class = AdminLoanApplicationSerializer
     permission_classes = [IsSystemAdminOrReadOnly]
+
+
+class LoanQuoteView(generics.GenericAPIView):
+    """
+    Price a grid of amounts, terms (or payments), frequencies, products and
+    rate shocks in one call. Nothing is saved.
+    """
+
+    serializer_class = LoanQuoteGridSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            return Response(quote_grid(**serializer.validated_data))
+        except QuoteError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ScheduleCacheStatsView(generics.GenericAPIView):
+    """
+    Hit rate of the memoised loan schedules used by the application and
+    quote endpoints, with the latency they saved.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(get_schedule_cache_stats())
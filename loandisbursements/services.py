@@ -2,6 +2,7 @@ import logging
 from django.db import transaction
 from django.utils.timezone import now
 from financials.services import post_to_ledger
+from accounts.registry import reference_data
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +28,8 @@ def process_loan_disbursement_accounting(disbursement):
         return True
 
     loan_acc = disbursement.loan_account
-    product = loan_acc.product
+    product = reference_data.loan_product(loan_acc.product_id)
+    payment_method = reference_data.payment_account(disbursement.payment_method_id)
 
     try:
         with transaction.atomic():
@@ -40,15 +42,12 @@ def process_loan_disbursement_accounting(disbursement):
 
             # 2. Post to General Ledger
             if not disbursement.posted_to_gl:
-                if (
-                    not disbursement.payment_method
-                    or not disbursement.payment_method.gl_account
-                ):
+                if not payment_method or not payment_method.gl_account:
                     raise ValueError(
-                        f"No GL Account linked to Payment Method: {disbursement.payment_method}"
+                        f"No GL Account linked to Payment Method: {payment_method}"
                     )
 
-                bank_gl = disbursement.payment_method.gl_account
+                bank_gl = payment_method.gl_account
                 principal_asset_gl = product.gl_principal_asset
 
                 description = f"Loan Disbursement: {loan_acc.account_number} | Member: {loan_acc.member.member_no}"
@@ -0,0 +1,136 @@
+"""
+Management command: benchmark_waterfall
+
+Measures repayment waterfall throughput (payments per second) over random
+loans and payment histories for three paths:
+
+  * reference  — the Decimal waterfall (loanpayments.reference_waterfall),
+                 re-reading the schedule for every payment
+  * per-payment — loanpayments.waterfall parsing the schedule afresh for
+                 every payment, as the repayment services do
+  * replay     — one Waterfall per loan replaying its whole history, as the
+                 projection backfill does
+
+Every split and final schedule is checked against the reference.
+
+Usage
+-----
+    python manage.py benchmark_waterfall
+    python manage.py benchmark_waterfall --loans 2000 --term 36 --payments 24
+    python manage.py benchmark_waterfall --skip-reference
+"""
+
+import copy
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from loanapplications.calculators import flat_rate_fixed_term, reducing_fixed_term
+from loanpayments.reference_waterfall import reference_waterfall_split
+from loanpayments.waterfall import Waterfall
+
+TRACKING_FIELDS = ("fee_paid", "interest_paid", "principal_paid", "amount_paid")
+
+
+class Command(BaseCommand):
+    help = "Compares repayment waterfall throughput of the integer-cents engine and the reference."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loans", type=int, default=500)
+        parser.add_argument("--term", type=int, default=24, help="Term in months.")
+        parser.add_argument(
+            "--payments", type=int, default=18, help="Payments per loan."
+        )
+        parser.add_argument("--skip-reference", action="store_true")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        cases = self._cases(options)
+        payments = sum(len(amounts) for _, amounts in cases)
+        self.stdout.write(
+            f"{len(cases)} loans, {payments} payments, "
+            f"{options['term']}-month terms"
+        )
+        self.stdout.write(f"{'path':<14}{'payments/s':>14}{'speedup':>9}")
+
+        baseline = None
+        expected = None
+        if not options["skip_reference"]:
+            baseline, expected = self._time(self._reference, cases)
+            self._report("reference", baseline, baseline)
+
+        for name, path in (
+            ("per-payment", self._per_payment),
+            ("replay", self._replay),
+        ):
+            rate, results = self._time(path, cases)
+            if expected is not None and results != expected:
+                raise CommandError(f"{name} differs from the reference")
+            self._report(name, rate, baseline)
+
+    def _cases(self, options):
+        rnd = random.Random(options["seed"])
+        cases = []
+        for _ in range(options["loans"]):
+            principal = Decimal(rnd.randrange(10_000, 2_000_000, 50))
+            calculator = rnd.choice([flat_rate_fixed_term, reducing_fixed_term])
+            projection = calculator(
+                principal=principal,
+                annual_rate=Decimal(rnd.choice(["10", "12", "13.5", "18"])),
+                term_months=options["term"],
+                start_date=date(2026, 1, 1) + timedelta(days=rnd.randrange(365)),
+                repayment_frequency="monthly",
+                processing_fee_total=principal
+                * Decimal(rnd.choice(["0", "2", "3"]))
+                / 100,
+            )
+            schedule = projection["schedule"]
+            for row in schedule:
+                row["is_paid"] = False
+                for field in TRACKING_FIELDS:
+                    row[field] = 0.0
+
+            # Roughly one installment per payment, give or take
+            installment = Decimal(str(schedule[0]["total_due"]))
+            amounts = [
+                (installment * Decimal(rnd.uniform(0.5, 1.5))).quantize(Decimal("0.01"))
+                for _ in range(options["payments"])
+            ]
+            cases.append((schedule, amounts))
+        return cases
+
+    def _time(self, path, cases):
+        cases = copy.deepcopy(cases)
+        payments = sum(len(amounts) for _, amounts in cases)
+        start_time = time.perf_counter()
+        results = [path(schedule, amounts) for schedule, amounts in cases]
+        return payments / (time.perf_counter() - start_time), results
+
+    def _reference(self, schedule, amounts):
+        total_paid = Decimal("0")
+        splits = []
+        for amount in amounts:
+            splits.append(reference_waterfall_split(schedule, amount, total_paid))
+            total_paid += amount
+        return splits, schedule
+
+    def _per_payment(self, schedule, amounts):
+        total_paid = Decimal("0")
+        splits = []
+        for amount in amounts:
+            splits.append(Waterfall(schedule, total_paid).apply(amount))
+            total_paid += amount
+        return splits, schedule
+
+    def _replay(self, schedule, amounts):
+        waterfall = Waterfall(schedule)
+        return [waterfall.apply(amount) for amount in amounts], schedule
+
+    def _report(self, name, rate, baseline):
+        self.stdout.write(
+            f"{name:<14}{rate:>14,.0f}"
+            + (f"{rate / baseline:>8.1f}x" if baseline else f"{'-':>9}")
+        )
@@ -0,0 +1,55 @@
+"""
+Management command: process_loan_repayments
+
+Applies the accounting for completed loan payments that have not been
+applied yet (e.g. M-Pesa payments completed by their callback, or payments
+whose processing failed). Each loan's payments are applied one at a time in
+transaction-date order; different loans are processed in parallel. A failed
+payment holds back the later payments of its loan until the next run.
+
+Usage
+-----
+    python manage.py process_loan_repayments
+    python manage.py process_loan_repayments --workers 8
+    python manage.py process_loan_repayments --loan LN0001234
+"""
+
+from django.core.management.base import BaseCommand
+
+from loanpayments.services import (
+    LOAN_REPAYMENT_WORKERS,
+    pending_repayments,
+    process_loan_repayments,
+)
+
+
+class Command(BaseCommand):
+    help = "Applies the accounting for completed loan payments, one queue per loan."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=LOAN_REPAYMENT_WORKERS,
+            help="Loans processed concurrently.",
+        )
+        parser.add_argument(
+            "--loan", help="Only process this loan account number's payments."
+        )
+
+    def handle(self, *args, **options):
+        payments = pending_repayments().order_by(
+            "transaction_date", "payment_date", "pk"
+        )
+        if options["loan"]:
+            payments = payments.filter(loan_account__account_number=options["loan"])
+
+        report = process_loan_repayments(payments, workers=options["workers"])
+        for error in report["errors"]:
+            self.stderr.write(f"{error['payment']}: {error['error']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Processed {report['processed']} payments on {report['loans']} "
+                f"loans ({report['failed']} failed, {report['held']} held back)."
+            )
+        )
@@ -32,212 +32,19 @@ from django.db import transaction
 from django.utils.timezone import now
 
 from financials.services import post_to_ledger
+from accounts.registry import reference_data
 from guarantors.services import update_guarantees_on_repayment
+from loanaccounts.accruals import accrual_reversal_entries, interest_credit_entries
+from loanaccounts.installments import record_schedule_progress
+from loanpayments.services import lock_loan_for_repayment
+from loanpayments.waterfall import (
+    calculate_early_payoff_amounts,
+    calculate_waterfall_split,
+)
 
 logger = logging.getLogger(__name__)
 
 
-# ============================================================================
-# INTERNAL HELPERS
-# ============================================================================
-
-
-def _row_remaining(row, bucket):
-    """Return the remaining unpaid amount for a given bucket in a schedule row."""
-    due_key = f"{bucket}_due"
-    paid_key = f"{bucket}_paid"
-    due = Decimal(str(row.get(due_key, 0)))
-    paid = Decimal(str(row.get(paid_key, 0)))
-    return max(Decimal("0"), due - paid)
-
-
-def _apply_to_row(row, remaining):
-    """
-    Apply `remaining` payment amount to a single schedule row using the waterfall order:
-      fee → interest → principal
-
-    Mutates the row's tracking fields in-place.
-
-    Returns:
-        (take_f, take_i, take_p, leftover)  — all Decimal
-    """
-    take_f = min(remaining, _row_remaining(row, "fee"))
-    remaining -= take_f
-
-    take_i = min(remaining, _row_remaining(row, "interest"))
-    remaining -= take_i
-
-    take_p = min(remaining, _row_remaining(row, "principal"))
-    remaining -= take_p
-
-    row["fee_paid"] = float(Decimal(str(row.get("fee_paid", 0))) + take_f)
-    row["interest_paid"] = float(Decimal(str(row.get("interest_paid", 0))) + take_i)
-    row["principal_paid"] = float(Decimal(str(row.get("principal_paid", 0))) + take_p)
-    row["amount_paid"] = float(
-        Decimal(str(row.get("amount_paid", 0))) + take_f + take_i + take_p
-    )
-
-    if Decimal(str(row["amount_paid"])) >= Decimal(str(row.get("total_due", 0))):
-        row["is_paid"] = True
-
-    return take_f, take_i, take_p, remaining
-
-
-def _find_start_index(schedule, target_code):
-    """
-    Return the schedule index to start the waterfall from.
-
-    - If target_code is given and found (and unpaid) → that row's index.
-    - If target_code given but not found → log a warning, fall back to first unpaid.
-    - If no target_code → first unpaid row.
-    """
-    if target_code:
-        for idx, row in enumerate(schedule):
-            if row.get("installment_code") == target_code:
-                if row.get("is_paid"):
-                    raise ValueError(
-                        f"Installment {target_code} is already fully paid. "
-                        "Choose a different installment or make a regular payment."
-                    )
-                return idx
-        # Code not found — warn and fall back
-        logger.warning(
-            f"target_installment_code '{target_code}' not found in schedule. "
-            "Falling back to first unpaid row."
-        )
-
-    # First unpaid row
-    for idx, row in enumerate(schedule):
-        if not row.get("is_paid"):
-            return idx
-
-    return len(schedule)  # All rows are paid (edge case)
-
-
-# ============================================================================
-# CORE WATERFALL
-# ============================================================================
-
-
-def calculate_waterfall_split(loan_acc, amount_paid, target_installment_code=None):
-    """
-    Targeted Installment Waterfall.
-
-    Applies `amount_paid` starting at the row identified by `target_installment_code`
-    (or the first unpaid row when no target is given).  Overflow from a filled row
-    cascades naturally into subsequent rows in schedule order.
-
-    Per-row tracking fields (fee_paid, interest_paid, principal_paid, amount_paid,
-    is_paid) are updated in-place.
-
-    Returns:
-        (p_total, i_total, f_total, Decimal("0"), schedule)
-    """
-    schedule = loan_acc.projection_snapshot.get("schedule", [])
-    remaining = amount_paid
-    p_total, i_total, f_total = Decimal("0"), Decimal("0"), Decimal("0")
-
-    start_idx = _find_start_index(schedule, target_installment_code)
-
-    for row in schedule[start_idx:]:
-        if row.get("is_paid"):
-            # Skip already-closed rows (e.g. out-of-order targeted payment that skipped a row)
-            continue
-
-        take_f, take_i, take_p, remaining = _apply_to_row(row, remaining)
-        f_total += take_f
-        i_total += take_i
-        p_total += take_p
-
-        if remaining <= 0:
-            break
-
-    # Any unallocated surplus → principal (overpayment edge case)
-    if remaining > 0:
-        p_total += remaining
-
-    return p_total, i_total, f_total, Decimal("0"), schedule
-
-
-# ============================================================================
-# EARLY PAYOFF CALCULATOR  (unchanged logic, cleaner implementation)
-# ============================================================================
-
-
-def calculate_early_payoff_amounts(loan_acc):
-    """
-    Calculates the exact (principal, interest, fee) to fully close the loan today.
-
-    Flat Rate:
-        All interest and all fees must be paid — no waiver.
-        Uses the waterfall on outstanding_balance.
-
-    Reducing Balance:
-        - Principal: full remaining principal.
-        - Interest: only the remaining interest on the current (first unpaid) installment.
-        - Fees: ALL unpaid fees across all remaining rows (non-negotiable).
-
-    Uses per-row tracking fields for precision. Returns exact Decimal values.
-    """
-    product = loan_acc.product
-
-    if product.interest_method == "Flat":
-        p, i, f, _, _ = calculate_waterfall_split(
-            loan_acc, loan_acc.outstanding_balance
-        )
-        return p, i, f
-
-    # --- Reducing Balance ---
-    remaining_principal = loan_acc.principal - loan_acc.total_principal_paid
-    schedule = loan_acc.projection_snapshot.get("schedule", [])
-
-    current_interest = Decimal("0")
-    unpaid_fees = Decimal("0")
-    is_first_unpaid = True
-
-    rows_have_tracking = any("interest_paid" in row for row in schedule)
-
-    if rows_have_tracking:
-        for row in schedule:
-            if row.get("is_paid"):
-                continue
-
-            if is_first_unpaid:
-                # Charge only the remaining interest in the current row
-                current_interest = _row_remaining(row, "interest")
-                # Charge remaining fee in current row
-                unpaid_fees += _row_remaining(row, "fee")
-                is_first_unpaid = False
-            else:
-                # Future rows: interest waived, fees are NON-NEGOTIABLE
-                unpaid_fees += Decimal(str(row.get("fee_due", 0)))
-
-    else:
-        # Legacy path (no tracking fields) — overflow arithmetic
-        sum_closed = sum(
-            Decimal(str(r["total_due"])) for r in schedule if r.get("is_paid")
-        )
-        overflow = loan_acc.total_amount_paid - sum_closed
-
-        for row in schedule:
-            if row.get("is_paid"):
-                continue
-
-            r_f = Decimal(str(row.get("fee_due", 0)))
-            r_i = Decimal(str(row.get("interest_due", 0)))
-
-            if is_first_unpaid:
-                fee_consumed = min(overflow, r_f)
-                overflow_after_fee = max(Decimal("0"), overflow - r_f)
-                current_interest = max(Decimal("0"), r_i - min(overflow_after_fee, r_i))
-                unpaid_fees += max(Decimal("0"), r_f - fee_consumed)
-                is_first_unpaid = False
-            else:
-                unpaid_fees += r_f
-
-    return remaining_principal, current_interest, unpaid_fees
-
-
 # ============================================================================
 # MAIN ENTRY POINT
 # ============================================================================
@@ -263,14 +70,16 @@ def process_loan_repayment_accounting(payment):
     if payment.posted_to_gl and payment.balance_updated:
         return True
 
-    loan_acc = payment.loan_account
-    product = loan_acc.product
+    product = reference_data.loan_product(payment.loan_account.product_id)
 
     # Read optional targeting field (graceful degradation if field doesn't exist yet)
     target_code = getattr(payment, "target_installment_code", None)
 
     try:
         with transaction.atomic():
+            loan_acc = lock_loan_for_repayment(payment)
+            if payment.posted_to_gl and payment.balance_updated:
+                return True
 
             # ----------------------------------------------------------------
             # 1. DETERMINE DISTRIBUTION
@@ -346,6 +155,7 @@ def process_loan_repayment_accounting(payment):
 
                 loan_acc.projection_snapshot["schedule"] = updated_schedule
                 loan_acc.save()
+                record_schedule_progress(loan_acc, updated_schedule)
 
                 if principal > 0:
                     update_guarantees_on_repayment(loan_acc, principal)
@@ -356,7 +166,9 @@ def process_loan_repayment_accounting(payment):
             # 3. GENERAL LEDGER POSTING
             # ----------------------------------------------------------------
             if not payment.posted_to_gl:
-                bank_gl = payment.payment_method.gl_account
+                bank_gl = reference_data.payment_account(
+                    payment.payment_method_id
+                ).gl_account
 
                 entries = [
                     {"account": bank_gl, "debit": payment.amount, "credit": 0},
@@ -365,11 +177,7 @@ def process_loan_repayment_accounting(payment):
                         "debit": 0,
                         "credit": principal,
                     },
-                    {
-                        "account": product.gl_interest_revenue,
-                        "debit": 0,
-                        "credit": interest,
-                    },
+                    *interest_credit_entries(loan_acc, product, interest),
                     {
                         "account": product.gl_processing_fee_revenue,
                         "debit": 0,
@@ -381,6 +189,9 @@ def process_loan_repayment_accounting(payment):
                         "credit": penalty,
                     },
                 ]
+                if payment.repayment_type == "Early Settlement":
+                    # Accrued interest the closing payment does not cover
+                    entries += accrual_reversal_entries(loan_acc, product)
 
                 description = payment.repayment_type
                 if target_code:
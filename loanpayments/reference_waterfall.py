@@ -0,0 +1,116 @@
+"""
+Reference waterfall.
+
+The original Decimal implementation of the sequential repayment waterfall
+(overflow arithmetic over the whole schedule on every call), kept as the
+oracle for loanpayments.waterfall in the tests and the
+benchmark_waterfall command. Not used by the services.
+"""
+
+from decimal import Decimal
+
+
+def reference_waterfall_split(schedule, amount_paid, total_previously_paid):
+    """
+    Run one payment of `amount_paid` through the schedule, mutating its rows.
+    Returns the (principal, interest, fee) split.
+    """
+    remaining = amount_paid
+    p_total, i_total, f_total = Decimal("0"), Decimal("0"), Decimal("0")
+
+    sum_closed = sum(Decimal(str(r["total_due"])) for r in schedule if r.get("is_paid"))
+    previous_overflow = total_previously_paid - sum_closed
+
+    for row in schedule:
+        if row.get("is_paid"):
+            continue
+
+        r_f = Decimal(str(row.get("fee_due", 0)))
+        r_i = Decimal(str(row.get("interest_due", 0)))
+        r_p = Decimal(str(row.get("principal_due", 0)))
+
+        row_fee_paid = Decimal(str(row.get("fee_paid", 0)))
+        row_interest_paid = Decimal(str(row.get("interest_paid", 0)))
+        row_principal_paid = Decimal(str(row.get("principal_paid", 0)))
+        row_amount_paid_so_far = Decimal(str(row.get("amount_paid", 0)))
+
+        # Fee bucket
+        f_gap = max(Decimal("0"), r_f - previous_overflow)
+        take_f = min(remaining, f_gap)
+        f_total += take_f
+        remaining -= take_f
+        previous_overflow = max(Decimal("0"), previous_overflow - r_f)
+
+        # Interest bucket
+        i_gap = max(Decimal("0"), r_i - previous_overflow)
+        take_i = min(remaining, i_gap)
+        i_total += take_i
+        remaining -= take_i
+        previous_overflow = max(Decimal("0"), previous_overflow - r_i)
+
+        # Principal bucket
+        p_gap = max(Decimal("0"), r_p - previous_overflow)
+        take_p = min(remaining, p_gap)
+        p_total += take_p
+        remaining -= take_p
+        previous_overflow = Decimal("0")
+
+        row["fee_paid"] = float(row_fee_paid + take_f)
+        row["interest_paid"] = float(row_interest_paid + take_i)
+        row["principal_paid"] = float(row_principal_paid + take_p)
+        row["amount_paid"] = float(row_amount_paid_so_far + take_f + take_i + take_p)
+
+        if Decimal(str(row["amount_paid"])) >= Decimal(str(row.get("total_due", 0))):
+            row["is_paid"] = True
+
+        if remaining <= 0:
+            break
+
+    if remaining > 0:
+        p_total += remaining
+
+    return p_total, i_total, f_total
+
+
+def reference_payoff_interest_and_fees(schedule, total_amount_paid):
+    """Reducing-balance early payoff: (current interest, unpaid fees)."""
+    current_interest = Decimal("0")
+    unpaid_fees = Decimal("0")
+    is_first_unpaid = True
+
+    if any("interest_paid" in row for row in schedule):
+        for row in schedule:
+            if row.get("is_paid"):
+                continue
+            if is_first_unpaid:
+                current_interest = max(
+                    Decimal("0"),
+                    Decimal(str(row.get("interest_due", 0)))
+                    - Decimal(str(row.get("interest_paid", 0))),
+                )
+                unpaid_fees += max(
+                    Decimal("0"),
+                    Decimal(str(row.get("fee_due", 0)))
+                    - Decimal(str(row.get("fee_paid", 0))),
+                )
+                is_first_unpaid = False
+            else:
+                unpaid_fees += Decimal(str(row.get("fee_due", 0)))
+        return current_interest, unpaid_fees
+
+    sum_closed = sum(Decimal(str(r["total_due"])) for r in schedule if r.get("is_paid"))
+    overflow = total_amount_paid - sum_closed
+    for row in schedule:
+        if row.get("is_paid"):
+            continue
+        r_f = Decimal(str(row.get("fee_due", 0)))
+        r_i = Decimal(str(row.get("interest_due", 0)))
+        if is_first_unpaid:
+            fee_consumed = min(overflow, r_f)
+            overflow_after_fee = max(Decimal("0"), overflow - r_f)
+            current_interest = max(Decimal("0"), r_i - min(overflow_after_fee, r_i))
+            unpaid_fees += max(Decimal("0"), r_f - fee_consumed)
+            is_first_unpaid = False
+        else:
+            unpaid_fees += r_f
+    return current_interest, unpaid_fees
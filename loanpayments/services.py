@@ -1,13 +1,41 @@
 import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
-from django.db import transaction
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
 from django.utils.timezone import now
 from financials.services import post_to_ledger
+from accounts.registry import reference_data
 from guarantors.services import update_guarantees_on_repayment
+from loanaccounts.accruals import accrual_reversal_entries, interest_credit_entries
+from loanaccounts.installments import record_schedule_progress
+from loanaccounts.models import LoanAccount
+from loanpayments.models import LoanPayment
+from loanpayments.waterfall import (
+    calculate_early_payoff_amounts,
+    calculate_waterfall_split,
+)
 from loanpenalties.models import LoanPenalty
 
 logger = logging.getLogger(__name__)
 
+LOAN_REPAYMENT_WORKERS = getattr(settings, "LOAN_REPAYMENT_WORKERS", 4)
+
+
+def lock_loan_for_repayment(payment):
+    """
+    Lock the payment's loan row and re-read it (and the payment's
+    processing flags), so repayments on the same loan apply one after the
+    other against the latest schedule instead of overwriting each other.
+    Must run inside a transaction; returns the locked LoanAccount.
+    """
+    loan_acc = LoanAccount.objects.select_for_update().get(pk=payment.loan_account_id)
+    payment.loan_account = loan_acc
+    payment.refresh_from_db(fields=["posted_to_gl", "balance_updated"])
+    return loan_acc
+
 
 def process_loan_repayment_accounting(payment):
     """
@@ -21,11 +49,15 @@ def process_loan_repayment_accounting(payment):
     if payment.posted_to_gl and payment.balance_updated:
         return True
 
-    loan_acc = payment.loan_account
-    product = loan_acc.product
+    product = reference_data.loan_product(payment.loan_account.product_id)
 
     try:
         with transaction.atomic():
+            loan_acc = lock_loan_for_repayment(payment)
+            if payment.posted_to_gl and payment.balance_updated:
+                # Applied by a concurrent caller while we waited for the lock
+                return True
+
             # --- 1. DETERMINE DISTRIBUTION ---
             principal, interest, fee, penalty = (
                 Decimal("0"),
@@ -257,6 +289,7 @@ def process_loan_repayment_accounting(payment):
 
                     # save() triggers: total_loan_amount recalc + outstanding_balance recalc
                     loan_acc.save()
+                    record_schedule_progress(loan_acc, updated_schedule)
 
                     # Proportionally release guarantor liability based on principal reduction
                     if principal > 0:
@@ -266,7 +299,9 @@ def process_loan_repayment_accounting(payment):
 
             # --- 3. GENERAL LEDGER POSTING ---
             if not payment.posted_to_gl:
-                bank_gl = payment.payment_method.gl_account
+                bank_gl = reference_data.payment_account(
+                    payment.payment_method_id
+                ).gl_account
 
                 entries = [
                     {"account": bank_gl, "debit": payment.amount, "credit": 0},
@@ -275,11 +310,7 @@ def process_loan_repayment_accounting(payment):
                         "debit": 0,
                         "credit": principal,
                     },
-                    {
-                        "account": product.gl_interest_revenue,
-                        "debit": 0,
-                        "credit": interest,
-                    },
+                    *interest_credit_entries(loan_acc, product, interest),
                     {
                         "account": product.gl_processing_fee_revenue,
                         "debit": 0,
@@ -291,6 +322,9 @@ def process_loan_repayment_accounting(payment):
                         "credit": penalty,
                     },
                 ]
+                if payment.repayment_type in ("Early Settlement", "Loan Clearance"):
+                    # Accrued interest the closing payment does not cover
+                    entries += accrual_reversal_entries(loan_acc, product)
 
                 # Centralized service handles filtering zero-legs and batch creation
                 post_to_ledger(
@@ -316,178 +350,65 @@ def process_loan_repayment_accounting(payment):
         raise e
 
 
-def calculate_early_payoff_amounts(loan_acc):
-    """
-    Calculates the exact (principal, interest, fee) required to fully close the loan today.
-
-    Flat Rate:
-      All interest and all fees must be paid — no waiver. Uses the waterfall on
-      outstanding_balance (same as a regular full payment).
-
-    Reducing Balance:
-      - Principal: full remaining principal balance.
-      - Interest: only the current period's remaining interest (future interest is waived).
-      - Fees: ALL unpaid processing fees are mandatory regardless of interest waiver.
+# ---------------------------------------------------------
+# Repayment queue
+# ---------------------------------------------------------
 
-    Uses per-row payment tracking fields (fee_paid, interest_paid) when available.
-    Falls back to overflow arithmetic for legacy rows without those fields.
-    """
-    product = loan_acc.product
-
-    if product.interest_method == "Flat":
-        # Flat Rate: Run waterfall on outstanding_balance — all buckets must be settled.
-        p, i, f, _, _ = calculate_waterfall_split(
-            loan_acc, loan_acc.outstanding_balance
-        )
-        return p, i, f
-
-    else:
-        # Reducing Balance: waive future interest, but ALL fees are mandatory.
-        remaining_principal = loan_acc.principal - loan_acc.total_principal_paid
-        schedule = loan_acc.projection_snapshot.get("schedule", [])
-
-        rows_have_tracking = any("interest_paid" in row for row in schedule)
 
-        if rows_have_tracking:
-            # --- New path: read directly from per-row tracking fields ---
-            current_interest = Decimal("0")
-            unpaid_fees = Decimal("0")
-            is_first_unpaid = True
-
-            for row in schedule:
-                if row.get("is_paid"):
-                    continue
-
-                fee_paid_in_row = Decimal(str(row.get("fee_paid", 0)))
-
-                if is_first_unpaid:
-                    # Current active row: charge remaining interest + remaining fee
-                    interest_paid_in_row = Decimal(str(row.get("interest_paid", 0)))
-                    current_interest = max(
-                        Decimal("0"),
-                        Decimal(str(row.get("interest_due", 0))) - interest_paid_in_row,
-                    )
-                    unpaid_fees += max(
-                        Decimal("0"),
-                        Decimal(str(row.get("fee_due", 0))) - fee_paid_in_row,
-                    )
-                    is_first_unpaid = False
-                else:
-                    # Future rows: interest waived, but fees are NON-NEGOTIABLE.
-                    unpaid_fees += Decimal(str(row.get("fee_due", 0)))
-
-        else:
-            # --- Legacy path: recompute overflow from running totals ---
-            sum_closed_rows = sum(
-                Decimal(str(r["total_due"])) for r in schedule if r.get("is_paid")
-            )
-            overflow = loan_acc.total_amount_paid - sum_closed_rows
-
-            current_interest = Decimal("0")
-            unpaid_fees = Decimal("0")
-            is_first_unpaid = True
-
-            for row in schedule:
-                if row.get("is_paid"):
-                    continue
-
-                r_f = Decimal(str(row.get("fee_due", 0)))
-                r_i = Decimal(str(row.get("interest_due", 0)))
+def pending_repayments():
+    """Completed loan payments whose accounting has not been applied yet."""
+    return LoanPayment.objects.filter(transaction_status="Completed").filter(
+        Q(posted_to_gl=False) | Q(balance_updated=False)
+    )
 
-                if is_first_unpaid:
-                    # Waterfall order: fee first, then interest
-                    fee_overflow_consumed = min(overflow, r_f)
-                    overflow_after_fee = max(Decimal("0"), overflow - r_f)
 
-                    current_fee_remaining = max(
-                        Decimal("0"), r_f - fee_overflow_consumed
-                    )
-                    interest_overflow_consumed = min(overflow_after_fee, r_i)
-                    current_interest = max(
-                        Decimal("0"), r_i - interest_overflow_consumed
-                    )
+def _drain_loan_queue(payments):
+    """
+    Apply one loan's payments in order. A failure holds back the rest of
+    the loan's queue, so its later payments never overtake it.
+    """
+    processed, held = 0, 0
+    errors = []
+    for index, payment in enumerate(payments):
+        try:
+            process_loan_repayment_accounting(payment)
+            processed += 1
+        except Exception as e:
+            errors.append({"payment": payment.reference, "error": str(e)})
+            held = len(payments) - index - 1
+            break
+    return processed, held, errors
 
-                    unpaid_fees += current_fee_remaining
-                    is_first_unpaid = False
-                else:
-                    # Future rows: full fee is due
-                    unpaid_fees += r_f
 
-        return remaining_principal, current_interest, unpaid_fees
+def _drain_loan_queue_on_thread(payments):
+    try:
+        return _drain_loan_queue(payments)
+    finally:
+        connection.close()
 
 
-def calculate_waterfall_split(loan_acc, amount_paid):
+def process_loan_repayments(payments, workers=None):
     """
-    Core Greedy Waterfall algorithm.
-
-    Processes installments in order (fee → interest → principal per row),
-    respecting any overflow from amounts already paid toward the current row.
-
-    Per-row tracking fields are updated in-place on the schedule rows:
-      - fee_paid, interest_paid, principal_paid: cumulative contributions per bucket
-      - amount_paid: total cumulative amount applied to this row
-      - is_paid: True once amount_paid >= total_due for the row
+    Apply the accounting for `payments` through one ordered queue per loan:
+    a loan's payments run one at a time in the order given, while different
+    loans proceed in parallel on `workers` threads. Returns a report.
     """
-    schedule = loan_acc.projection_snapshot.get("schedule", [])
-    remaining = amount_paid
-    p_total, i_total, f_total = Decimal("0"), Decimal("0"), Decimal("0")
-
-    # Overflow = amount already paid that has not yet closed a row (sitting mid-row)
-    sum_closed_rows = sum(
-        Decimal(str(r["total_due"])) for r in schedule if r.get("is_paid")
-    )
-    previous_overflow = loan_acc.total_amount_paid - sum_closed_rows
-
-    for row in schedule:
-        if row.get("is_paid"):
-            continue
-
-        r_f = Decimal(str(row.get("fee_due", 0)))
-        r_i = Decimal(str(row.get("interest_due", 0)))
-        r_p = Decimal(str(row.get("principal_due", 0)))
-
-        # Existing per-row tracked amounts (cumulative from prior payments)
-        row_fee_paid = Decimal(str(row.get("fee_paid", 0)))
-        row_interest_paid = Decimal(str(row.get("interest_paid", 0)))
-        row_principal_paid = Decimal(str(row.get("principal_paid", 0)))
-        row_amount_paid_so_far = Decimal(str(row.get("amount_paid", 0)))
-
-        # --- Fee bucket ---
-        f_gap = max(Decimal("0"), r_f - previous_overflow)
-        take_f = min(remaining, f_gap)
-        f_total += take_f
-        remaining -= take_f
-        previous_overflow = max(Decimal("0"), previous_overflow - r_f)
-
-        # --- Interest bucket ---
-        i_gap = max(Decimal("0"), r_i - previous_overflow)
-        take_i = min(remaining, i_gap)
-        i_total += take_i
-        remaining -= take_i
-        previous_overflow = max(Decimal("0"), previous_overflow - r_i)
-
-        # --- Principal bucket ---
-        p_gap = max(Decimal("0"), r_p - previous_overflow)
-        take_p = min(remaining, p_gap)
-        p_total += take_p
-        remaining -= take_p
-        previous_overflow = Decimal("0")
-
-        # Update per-row tracking (additive — only adds what THIS payment contributed)
-        row["fee_paid"] = float(row_fee_paid + take_f)
-        row["interest_paid"] = float(row_interest_paid + take_i)
-        row["principal_paid"] = float(row_principal_paid + take_p)
-        row["amount_paid"] = float(row_amount_paid_so_far + take_f + take_i + take_p)
-
-        # Mark row as paid when the cumulative amount_paid covers total_due
-        if Decimal(str(row["amount_paid"])) >= Decimal(str(row.get("total_due", 0))):
-            row["is_paid"] = True
-
-        if remaining <= 0:
-            break
-
-    # Any unallocated remainder goes to principal (e.g., overpayment edge cases)
-    if remaining > 0:
-        p_total += remaining
-
-    return p_total, i_total, f_total, Decimal("0"), schedule
+    workers = workers or LOAN_REPAYMENT_WORKERS
+    queues = defaultdict(list)
+    for payment in payments:
+        queues[payment.loan_account_id].append(payment)
+
+    queues = list(queues.values())
+    if workers > 1 and len(queues) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_drain_loan_queue_on_thread, queues))
+    else:
+        results = [_drain_loan_queue(queue) for queue in queues]
+
+    return {
+        "loans": len(queues),
+        "processed": sum(processed for processed, _, _ in results),
+        "failed": sum(len(errors) for _, _, errors in results),
+        "held": sum(held for _, held, _ in results),
+        "errors": [error for _, _, errors in results for error in errors],
+    }
@@ -0,0 +1,362 @@
+import copy
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    skipUnlessDBFeature,
+)
+
+from accounts.registry import reference_data
+from glaccounts.models import GLAccount
+from journalbatches.models import JournalBatch
+from loanaccounts.accruals import run_interest_accrual
+from loanaccounts.models import LoanAccount
+from loanapplications.calculators import flat_rate_fixed_term, reducing_fixed_term
+from loanpayments.models import LoanPayment
+from loanpayments.reference_waterfall import (
+    reference_payoff_interest_and_fees,
+    reference_waterfall_split,
+)
+from loanpayments.services import (
+    process_loan_repayment_accounting,
+    process_loan_repayments,
+)
+from loanpayments.waterfall import Waterfall, calculate_early_payoff_amounts
+from loanproducts.models import LoanProduct
+from paymentaccounts.models import PaymentAccount
+
+User = get_user_model()
+
+TRACKING_FIELDS = ("fee_paid", "interest_paid", "principal_paid", "amount_paid")
+
+
+def random_case(rnd):
+    """A fresh (tracked) schedule and a random sequence of payments."""
+    calculator = rnd.choice([flat_rate_fixed_term, reducing_fixed_term])
+    principal = Decimal(rnd.randrange(5_000, 500_000, 50))
+    projection = calculator(
+        principal=principal,
+        annual_rate=Decimal(rnd.choice(["0", "10", "12", "18.5"])),
+        term_months=rnd.randint(1, 24),
+        start_date=date(2026, 1, 1),
+        repayment_frequency=rnd.choice(["monthly", "weekly", "quarterly"]),
+        processing_fee_total=principal * Decimal(rnd.choice(["0", "2", "3"])) / 100,
+    )
+    schedule = projection["schedule"]
+    for row in schedule:
+        row["is_paid"] = False
+        for field in TRACKING_FIELDS:
+            row[field] = 0.0
+
+    total = int(Decimal(str(projection["total_repayment"])) * 100)
+    payments = [
+        Decimal(rnd.randint(1, max(1, total // rnd.choice([2, 5, 20])))) / 100
+        for _ in range(rnd.randint(1, 12))
+    ]
+    return schedule, payments
+
+
+class WaterfallPropertyTests(SimpleTestCase):
+    """
+    Properties of loanpayments.waterfall over seeded random schedules and
+    payment sequences, checked against the reference implementation.
+    """
+
+    CASES = 300
+
+    def cases(self):
+        rnd = random.Random(20261019)
+        for _ in range(self.CASES):
+            yield random_case(rnd)
+
+    def test_matches_the_reference_payment_by_payment(self):
+        for schedule, payments in self.cases():
+            expected = copy.deepcopy(schedule)
+            replayed = copy.deepcopy(schedule)
+            replay = Waterfall(replayed)
+            total_paid = Decimal("0")
+            for amount in payments:
+                want = reference_waterfall_split(expected, amount, total_paid)
+                # Services parse the stored schedule afresh for every payment
+                got = Waterfall(schedule, total_paid).apply(amount)
+                self.assertEqual(got, want)
+                # The backfill replays every payment on one Waterfall
+                self.assertEqual(replay.apply(amount), want)
+                total_paid += amount
+            self.assertEqual(schedule, expected)
+            self.assertEqual(replayed, expected)
+
+    def test_payments_are_conserved_and_paid_rows_are_a_prefix(self):
+        for schedule, payments in self.cases():
+            waterfall = Waterfall(schedule)
+            for amount in payments:
+                self.assertEqual(sum(waterfall.apply(amount)), amount)
+                paid = [bool(row.get("is_paid")) for row in schedule]
+                self.assertEqual(paid, sorted(paid, reverse=True))
+                self.assertEqual(waterfall.first_unpaid, paid.count(True))
+
+    def test_a_payment_splits_like_its_parts(self):
+        for schedule, payments in self.cases():
+            whole = copy.deepcopy(schedule)
+            amount = sum(payments)
+            expected = Waterfall(whole).apply(amount)
+            waterfall = Waterfall(schedule)
+            parts = [waterfall.apply(part) for part in payments]
+            self.assertEqual(tuple(sum(values) for values in zip(*parts)), expected)
+            self.assertEqual(schedule, whole)
+
+    def test_legacy_schedules_place_the_overflow_on_the_first_unpaid_row(self):
+        for schedule, payments in self.cases():
+            total_paid = sum(payments[:-1], Decimal("0"))
+            Waterfall(schedule).apply(total_paid)
+            legacy = [
+                {k: v for k, v in row.items() if k not in TRACKING_FIELDS}
+                for row in schedule
+            ]
+            self.assertEqual(
+                Waterfall(copy.deepcopy(legacy), total_paid).payoff_interest_and_fees(),
+                reference_payoff_interest_and_fees(legacy, total_paid),
+            )
+            self.assertEqual(
+                Waterfall(copy.deepcopy(legacy), total_paid).apply(payments[-1]),
+                reference_waterfall_split(
+                    copy.deepcopy(legacy), payments[-1], total_paid
+                ),
+            )
+
+    def test_early_payoff_matches_the_reference(self):
+        for schedule, payments in self.cases():
+            Waterfall(schedule).apply(payments[0])
+            self.assertEqual(
+                Waterfall(schedule).payoff_interest_and_fees(),
+                reference_payoff_interest_and_fees(schedule, payments[0]),
+            )
+
+    def test_targeted_payments_start_at_their_installment(self):
+        schedule = next(schedule for schedule, _ in self.cases() if len(schedule) >= 3)
+        target = schedule[2]
+        waterfall = Waterfall(schedule)
+        waterfall.apply(Decimal(str(target["total_due"])), target["installment_code"])
+
+        self.assertTrue(schedule[2]["is_paid"])
+        self.assertFalse(schedule[0].get("is_paid"))
+        self.assertEqual(waterfall.first_unpaid, 0)
+        with self.assertRaises(ValueError):
+            waterfall.apply(Decimal("1"), target["installment_code"])
+
+
+class RepaymentFixtures:
+    def create_fixtures(self):
+        cache.clear()
+        reference_data.clear()
+        self.member = User.objects.create_user(
+            email="member@example.com", password="pass", member_no="MM001"
+        )
+        gl = {
+            code: GLAccount.objects.create(name=name, code=code, category=category)
+            for code, name, category in [
+                ("11000", "Cash at Bank", "ASSET"),
+                ("12000", "Loans", "ASSET"),
+                ("40000", "Interest Income", "REVENUE"),
+                ("41000", "Penalty Income", "REVENUE"),
+            ]
+        }
+        self.product = LoanProduct.objects.create(
+            name="Development",
+            interest_rate=Decimal("12"),
+            gl_principal_asset=gl["12000"],
+            gl_interest_revenue=gl["40000"],
+            gl_penalty_revenue=gl["41000"],
+        )
+        self.method = PaymentAccount.objects.create(name="Bank", gl_account=gl["11000"])
+
+    def create_loan(self):
+        start = date(2026, 1, 15)
+        projection = reducing_fixed_term(Decimal("12000"), Decimal("12"), 6, start)
+        return LoanAccount.objects.create(
+            member=self.member,
+            product=self.product,
+            principal=Decimal("12000"),
+            outstanding_balance=Decimal(str(projection["total_repayment"])),
+            total_interest_accrued=Decimal(str(projection["total_interest"])),
+            projection_snapshot=projection,
+            start_date=start,
+            status="Active",
+        )
+
+    def create_payments(self, loan, amounts, repayment_type="Regular Repayment"):
+        return [
+            LoanPayment.objects.create(
+                loan_account=loan,
+                paid_by=self.member,
+                payment_method=self.method,
+                repayment_type=repayment_type,
+                amount=Decimal(amount),
+                transaction_status="Completed",
+            )
+            for amount in amounts
+        ]
+
+    def assertAppliedOnce(self, loan, total):
+        loan = LoanAccount.objects.get(pk=loan.pk)
+        schedule = loan.projection_snapshot["schedule"]
+        self.assertEqual(loan.total_amount_paid, total)
+        self.assertEqual(
+            sum(Decimal(str(row.get("amount_paid", 0))) for row in schedule), total
+        )
+        # One ledger batch per applied payment
+        references = LoanPayment.objects.filter(
+            loan_account=loan, posted_to_gl=True
+        ).values_list("reference", flat=True)
+        self.assertEqual(
+            sorted(
+                JournalBatch.objects.filter(
+                    description__endswith=loan.account_number
+                ).values_list("reference", flat=True)
+            ),
+            sorted(references),
+        )
+
+
+class RepaymentLockingTests(RepaymentFixtures, TestCase):
+    def setUp(self):
+        self.create_fixtures()
+        self.loan = self.create_loan()
+
+    def stale(self, payments):
+        """Each payment with its own copy of the loan, loaded up front."""
+        return [
+            LoanPayment.objects.select_related("loan_account").get(pk=payment.pk)
+            for payment in payments
+        ]
+
+    def test_stale_loan_copies_do_not_overwrite_each_other(self):
+        for payment in self.stale(self.create_payments(self.loan, ["1500", "700"])):
+            process_loan_repayment_accounting(payment)
+
+        self.assertAppliedOnce(self.loan, Decimal("2200"))
+
+    def test_a_payment_applied_meanwhile_is_not_applied_again(self):
+        (payment,) = self.create_payments(self.loan, ["1500"])
+        first, second = self.stale([payment, payment])
+        process_loan_repayment_accounting(first)
+        self.assertTrue(process_loan_repayment_accounting(second))
+
+        self.assertAppliedOnce(self.loan, Decimal("1500"))
+
+    def test_queues_run_per_loan_in_order_and_hold_back_after_a_failure(self):
+        other = self.create_loan()
+        payments = [
+            *self.create_payments(self.loan, ["1000"]),
+            # Wrong payoff amount: rejected
+            *self.create_payments(self.loan, ["5"], "Early Settlement"),
+            *self.create_payments(self.loan, ["1000"]),
+            *self.create_payments(other, ["1000", "2000"]),
+        ]
+
+        report = process_loan_repayments(payments, workers=1)
+
+        self.assertEqual(
+            {k: report[k] for k in ("loans", "processed", "failed", "held")},
+            {"loans": 2, "processed": 3, "failed": 1, "held": 1},
+        )
+        self.assertEqual(report["errors"][0]["payment"], payments[1].reference)
+        self.assertAppliedOnce(other, Decimal("3000"))
+        self.assertEqual(
+            LoanAccount.objects.get(pk=self.loan.pk).total_amount_paid,
+            Decimal("1000"),
+        )
+
+
+class AccrualReversalTests(RepaymentFixtures, TestCase):
+    def setUp(self):
+        self.create_fixtures()
+        self.receivable = GLAccount.objects.create(
+            name="Interest Receivable", code="12100", category="ASSET"
+        )
+        self.product.gl_interest_receivable = self.receivable
+        self.product.accrual_start_date = date(2026, 1, 1)
+        self.product.save()
+        self.loan = self.create_loan()
+        # 54 days of interest, more than the current period's
+        run_interest_accrual(date(2026, 3, 10))
+
+    def test_early_settlement_reverses_the_waived_accrued_interest(self):
+        loan = LoanAccount.objects.get(pk=self.loan.pk)
+        accrued = loan.accrued_interest
+        principal, interest, fee = calculate_early_payoff_amounts(loan)
+        self.assertLess(interest, accrued)
+        (payment,) = self.create_payments(
+            loan, [str(principal + interest + fee)], "Early Settlement"
+        )
+
+        self.assertTrue(process_loan_repayment_accounting(payment))
+
+        loan.refresh_from_db()
+        self.assertEqual(loan.status, "Closed")
+        self.assertEqual(loan.accrued_interest, Decimal("0"))
+        self.receivable.refresh_from_db()
+        self.assertEqual(self.receivable.balance, Decimal("0"))
+        # Only the interest actually paid stays recognised
+        self.assertEqual(GLAccount.objects.get(code="40000").balance, interest)
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class RepaymentStressTests(RepaymentFixtures, TransactionTestCase):
+    """
+    Many threads applying repayments to the same few loans at once. Needs a
+    database with row locks (PostgreSQL); SQLite serialises writers anyway.
+    """
+
+    THREADS = 8
+    PAYMENTS_PER_LOAN = 25
+
+    def setUp(self):
+        self.create_fixtures()
+        self.loans = [self.create_loan() for _ in range(3)]
+
+    def run_on_threads(self, function, items):
+        def call(item):
+            try:
+                return function(item)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.THREADS) as executor:
+            return list(executor.map(call, items))
+
+    def test_concurrent_repayments_on_the_same_loans(self):
+        payments = []
+        for loan in self.loans:
+            payments += self.create_payments(loan, ["100"] * self.PAYMENTS_PER_LOAN)
+        # Every payment twice, each copy with its own stale loan
+        stale = [
+            LoanPayment.objects.select_related("loan_account").get(pk=payment.pk)
+            for payment in payments * 2
+        ]
+        random.Random(7).shuffle(stale)
+
+        self.run_on_threads(process_loan_repayment_accounting, stale)
+
+        for loan in self.loans:
+            self.assertAppliedOnce(loan, Decimal("100") * self.PAYMENTS_PER_LOAN)
+
+    def test_the_queue_processes_loans_in_parallel(self):
+        for loan in self.loans:
+            self.create_payments(loan, ["100"] * self.PAYMENTS_PER_LOAN)
+
+        report = process_loan_repayments(
+            LoanPayment.objects.order_by("payment_date"), workers=self.THREADS
+        )
+
+        self.assertEqual(report["processed"], 3 * self.PAYMENTS_PER_LOAN)
+        for loan in self.loans:
+            self.assertAppliedOnce(loan, Decimal("100") * self.PAYMENTS_PER_LOAN)
@@ -3,6 +3,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db import transaction
 
+from guarantors.services import deferred_guarantor_syncs
 from loanpayments.models import LoanPayment
 from loanpayments.serializers import LoanPaymentSerializer
 from loanpayments.utils import (
@@ -155,7 +156,8 @@ class BulkLoanRepaymentUploadView(generics.CreateAPIView):
         error_count = 0
         errors = []
 
-        with transaction.atomic():
+        # Guarantor profiles are synced once, after the last row
+        with transaction.atomic(), deferred_guarantor_syncs():
             for index, row in enumerate(reader, 1):
                 try:
                     loan_acc = row.get("Loan Account Number") or row.get("loan_account", "").strip()
@@ -244,7 +246,8 @@ class BulkLoanRepaymentCreateView(generics.CreateAPIView):
         error_count = 0
         errors = []
 
-        with transaction.atomic():
+        # Guarantor profiles are synced once, after the last row
+        with transaction.atomic(), deferred_guarantor_syncs():
             for index, payment_data in enumerate(payments_data, 1):
                 try:
                     payment_data["transaction_status"] = "Completed"
@@ -0,0 +1,227 @@
+"""
+Repayment waterfall.
+
+`Waterfall` holds a projection schedule as integer cents (due and paid per
+bucket, per row), parsing each row the first time a payment reaches it, and
+keeps a pointer to the first unpaid row.
+Payments are applied fee → interest → principal from that row (or from a
+targeted installment), touching only the rows they reach, and the touched
+rows are written back to the schedule dicts in the format the rest of the
+code reads (floats, `is_paid`).
+
+Rows carrying tracking fields (`amount_paid` and the per-bucket `*_paid`)
+are read as they are. For legacy schedules without them, what has been paid
+beyond the closed rows (`total_paid` minus their total_due) is placed on the
+first unpaid row, fee first, as the old overflow arithmetic did.
+
+`calculate_waterfall_split` and `calculate_early_payoff_amounts` are the
+entry points used by the repayment services; the backfill command replays
+whole payment histories on one Waterfall.
+"""
+
+import logging
+from decimal import ROUND_HALF_UP, Decimal
+
+from accounts.registry import reference_data
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = ("fee", "interest", "principal")
+
+
+def _cents(value):
+    if isinstance(value, (int, float)):
+        return round(value * 100)
+    return int((Decimal(str(value)) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def _amount(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+class Waterfall:
+    def __init__(self, schedule, total_paid=0):
+        self.schedule = schedule
+        count = len(schedule)
+        # Rows are parsed the first time a payment reaches them
+        self.loaded = [False] * count
+        self.total_due = [0] * count
+        self.due = {bucket: [0] * count for bucket in BUCKETS}
+        self.paid = {bucket: [0] * count for bucket in BUCKETS}
+        self.amount_paid = [0] * count
+        self.is_paid = [bool(row.get("is_paid")) for row in schedule]
+
+        self.first_unpaid = 0
+        self._advance()
+        if self.first_unpaid < count and not any(
+            "amount_paid" in row for row in schedule
+        ):
+            closed = sum(
+                _cents(row.get("total_due", 0))
+                for row, paid in zip(schedule, self.is_paid)
+                if paid
+            )
+            self._place_overflow(_cents(total_paid) - closed)
+
+    def _advance(self):
+        while (
+            self.first_unpaid < len(self.schedule) and self.is_paid[self.first_unpaid]
+        ):
+            self.first_unpaid += 1
+
+    def _load(self, index):
+        if self.loaded[index]:
+            return
+        row = self.schedule[index]
+        self.total_due[index] = _cents(row.get("total_due", 0))
+        for bucket in BUCKETS:
+            self.due[bucket][index] = _cents(row.get(f"{bucket}_due", 0))
+            self.paid[bucket][index] = _cents(row.get(f"{bucket}_paid", 0))
+        self.amount_paid[index] = _cents(row.get("amount_paid", 0))
+        self.loaded[index] = True
+
+    def _place_overflow(self, overflow):
+        index = self.first_unpaid
+        self._load(index)
+        for bucket in BUCKETS:
+            take = max(0, min(overflow, self.due[bucket][index]))
+            self.paid[bucket][index] = take
+            self.amount_paid[index] += take
+            overflow -= take
+
+    def remaining(self, bucket, index):
+        self._load(index)
+        return max(0, self.due[bucket][index] - self.paid[bucket][index])
+
+    def _start_index(self, target_code):
+        if target_code:
+            for index, row in enumerate(self.schedule):
+                if row.get("installment_code") == target_code:
+                    if self.is_paid[index]:
+                        raise ValueError(
+                            f"Installment {target_code} is already fully paid. "
+                            "Choose a different installment or make a regular payment."
+                        )
+                    return index
+            logger.warning(
+                f"target_installment_code '{target_code}' not found in schedule. "
+                "Falling back to first unpaid row."
+            )
+        return self.first_unpaid
+
+    def _write(self, index):
+        row = self.schedule[index]
+        for bucket in BUCKETS:
+            row[f"{bucket}_paid"] = self.paid[bucket][index] / 100
+        row["amount_paid"] = self.amount_paid[index] / 100
+        if self.is_paid[index]:
+            row["is_paid"] = True
+
+    def apply(self, amount, target_code=None):
+        """
+        Apply a payment of `amount`; returns its (principal, interest, fee)
+        split as Decimals. Anything left once every row is covered counts
+        as principal.
+        """
+        remaining = _cents(amount)
+        taken = dict.fromkeys(BUCKETS, 0)
+
+        for index in range(self._start_index(target_code), len(self.schedule)):
+            if self.is_paid[index]:
+                continue
+            self._load(index)
+            for bucket in BUCKETS:
+                take = min(remaining, self.remaining(bucket, index))
+                self.paid[bucket][index] += take
+                self.amount_paid[index] += take
+                taken[bucket] += take
+                remaining -= take
+            if self.amount_paid[index] >= self.total_due[index]:
+                self.is_paid[index] = True
+            self._write(index)
+            if remaining <= 0:
+                break
+
+        taken["principal"] += max(0, remaining)
+        self._advance()
+        return (
+            _amount(taken["principal"]),
+            _amount(taken["interest"]),
+            _amount(taken["fee"]),
+        )
+
+    def settle(self):
+        """Mark every unpaid row paid in full (amount_paid = total_due)."""
+        for index in range(self.first_unpaid, len(self.schedule)):
+            if self.is_paid[index]:
+                continue
+            self._load(index)
+            self.amount_paid[index] = max(
+                self.amount_paid[index], self.total_due[index]
+            )
+            self.is_paid[index] = True
+            self.schedule[index]["is_paid"] = True
+            self.schedule[index]["amount_paid"] = self.amount_paid[index] / 100
+        self.first_unpaid = len(self.schedule)
+
+    def payoff_interest_and_fees(self):
+        """
+        What closing the loan today costs beyond principal on a reducing
+        balance: the current row's remaining interest, and every unpaid fee.
+        """
+        if self.first_unpaid >= len(self.schedule):
+            return Decimal("0"), Decimal("0")
+        interest = self.remaining("interest", self.first_unpaid)
+        fees = sum(
+            self.remaining("fee", index)
+            for index in range(self.first_unpaid, len(self.schedule))
+            if not self.is_paid[index]
+        )
+        return _amount(interest), _amount(fees)
+
+
+def _schedule(loan_acc):
+    return loan_acc.projection_snapshot.get("schedule", [])
+
+
+def calculate_waterfall_split(loan_acc, amount_paid, target_installment_code=None):
+    """
+    Greedy waterfall (fee → interest → principal per row) of `amount_paid`
+    over the loan's schedule, from the first unpaid row or from
+    `target_installment_code`. Rows are updated in place.
+
+    Returns:
+        (p_total, i_total, f_total, Decimal("0"), schedule)
+    """
+    schedule = _schedule(loan_acc)
+    waterfall = Waterfall(schedule, loan_acc.total_amount_paid)
+    principal, interest, fee = waterfall.apply(amount_paid, target_installment_code)
+    return principal, interest, fee, Decimal("0"), schedule
+
+
+def calculate_early_payoff_amounts(loan_acc):
+    """
+    Calculates the exact (principal, interest, fee) required to fully close the loan today.
+
+    Flat Rate:
+      All interest and all fees must be paid — no waiver. Uses the waterfall on
+      outstanding_balance (same as a regular full payment).
+
+    Reducing Balance:
+      - Principal: full remaining principal balance.
+      - Interest: only the current period's remaining interest (future interest is waived).
+      - Fees: ALL unpaid processing fees are mandatory regardless of interest waiver.
+    """
+    product = reference_data.loan_product(loan_acc.product_id)
+
+    if product.interest_method == "Flat":
+        p, i, f, _, _ = calculate_waterfall_split(
+            loan_acc, loan_acc.outstanding_balance
+        )
+        return p, i, f
+
+    remaining_principal = loan_acc.principal - loan_acc.total_principal_paid
+    interest, fees = Waterfall(
+        _schedule(loan_acc), loan_acc.total_amount_paid
+    ).payoff_interest_and_fees()
+    return remaining_principal, interest, fees
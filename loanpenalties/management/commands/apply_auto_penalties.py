@@ -0,0 +1,86 @@
+"""
+Management command: apply_auto_penalties
+
+Charges a penalty on every overdue, unpenalised installment of the active
+loan book in one batch. Run it daily from cron, after midnight; a run is
+idempotent for the day, since each installment is penalised at most once.
+
+Usage
+-----
+    python manage.py apply_auto_penalties --dry-run
+    python manage.py apply_auto_penalties --charged-by MM001
+    python manage.py apply_auto_penalties --date 2026-06-30 --list
+"""
+
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from loanpenalties.services import apply_auto_penalties
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Penalises every overdue installment of the active loan book."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", type=date.fromisoformat, default=None)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the penalties without charging them.",
+        )
+        parser.add_argument(
+            "--charged-by",
+            default=None,
+            help="Member number the penalties are charged by "
+            "(default: the oldest active SACCO admin or superuser).",
+        )
+        parser.add_argument(
+            "--list", action="store_true", help="Print every penalty charged."
+        )
+
+    def _charged_by(self, member_no):
+        admins = User.objects.filter(is_active=True)
+        if member_no:
+            admins = admins.filter(member_no=member_no)
+        else:
+            admins = admins.filter(Q(is_sacco_admin=True) | Q(is_superuser=True))
+        user = admins.order_by("created_at").first()
+        if user is None:
+            raise CommandError(
+                f"No active user {member_no}."
+                if member_no
+                else "No active SACCO admin to charge the penalties; use --charged-by."
+            )
+        return user
+
+    def handle(self, *args, **options):
+        charged_by = self._charged_by(options["charged_by"])
+        try:
+            report = apply_auto_penalties(
+                charged_by, as_of=options["date"], dry_run=options["dry_run"]
+            )
+        except ValidationError as e:
+            raise CommandError(e.message)
+
+        if options["list"]:
+            for charge in report["charges"]:
+                self.stdout.write(
+                    f"{charge['account_number']} {charge['installment_code']} "
+                    f"{charge['amount']}"
+                )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{report['as_of_date']}{' (dry run)' if report['dry_run'] else ''}: "
+                f"{report['penalties']} penalties ({report['total_amount']}) on "
+                f"{report['loans_penalized']} of {report['loans_in_arrears']} loans "
+                f"in arrears; skipped {report['skipped_at_ceiling']} at the ceiling "
+                f"and {report['skipped_zero_amount']} of zero amount "
+                f"in {report['duration']}s"
+            )
+        )
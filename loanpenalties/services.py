@@ -1,19 +1,30 @@
 # loanpenalties/services.py
-from datetime import datetime
+import logging
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
 from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
 from django.utils.timezone import now
 from django.core.exceptions import ValidationError
+from accounts.utils import generate_reference
+from loanaccounts.installments import overdue_installments
+from loanaccounts.models import LoanInstallment
 from .models import LoanPenalty
 from mwandamzedusaccoapi.settings import LOAN_PENALTY_RATE
 
+logger = logging.getLogger(__name__)
+
 
 def apply_auto_targeted_penalty(loan_account, admin_user):
     """
     Identifies the oldest overdue installment and applies a penalty,
     ensuring total penalty instances never exceed the number of installments.
     """
-    schedule = loan_account.projection_snapshot.get("schedule", [])
-    total_installments = len(schedule)
+    total_installments = loan_account.installments.count()
 
     # 1. CEILING CHECK: Can we even add another penalty?
     # We count all penalties (Paid, Pending, etc.) because a penalty
@@ -33,30 +44,161 @@ def apply_auto_targeted_penalty(loan_account, admin_user):
         )
     )
 
-    target_installment = None
     today = now().date()
 
-    for row in schedule:
-        code = row.get("installment_code")
-        if not row.get("is_paid") and code not in penalized_codes:
-            # Re-enable date check for production
-            # due_date = datetime.strptime(row.get("due_date"), "%Y-%m-%d").date()
-            # if today > due_date:
-            target_installment = row
-            break
+    target_installment = (
+        loan_account.installments.filter(is_paid=False)
+        .exclude(installment_code__in=penalized_codes)
+        # Re-enable date check for production
+        # .filter(due_date__lt=today)
+        .order_by("sequence")
+        .first()
+    )
 
     if not target_installment:
         raise ValidationError("No qualifying overdue installments found.")
 
     # 3. EXECUTION
-    total_due = Decimal(str(target_installment.get("total_due", 0)))
+    total_due = target_installment.total_due
     penalty_rate = Decimal(str(LOAN_PENALTY_RATE)) / Decimal("100")
     penalty_amount = round(total_due * penalty_rate, 2)
 
     return LoanPenalty.objects.create(
         loan_account=loan_account,
-        installment_code=target_installment.get("installment_code"),
+        installment_code=target_installment.installment_code,
         amount=penalty_amount,
         status="Pending",
         charged_by=admin_user,
     )
+
+
+# ---------------------------------------------------------
+# Batch run
+# ---------------------------------------------------------
+
+LOAN_PENALTY_GRACE_DAYS = getattr(settings, "LOAN_PENALTY_GRACE_DAYS", 0)
+PENALTY_RUN_LOCK_KEY = "loanpenalties:batch_run:lock"
+PENALTY_RUN_LOCK_TIMEOUT = 30 * 60
+
+
+def apply_auto_penalties(charged_by, as_of=None, dry_run=False):
+    """
+    Penalise every overdue installment of the active loan book once, with
+    the same rules as `apply_auto_targeted_penalty`: installments already
+    carrying a Pending or Paid penalty are skipped, and a loan never holds
+    more non-waived penalties than it has installments.
+
+    Reads are three queries (overdue installments, existing penalties and
+    installment counts, each for the whole book); the penalties are computed
+    in memory and bulk-created in one transaction. With `dry_run` nothing is
+    written. Returns a report of what was (or would be) charged.
+    """
+    start_time = time.perf_counter()
+    as_of = as_of or now().date()
+    due_before = as_of - timedelta(days=LOAN_PENALTY_GRACE_DAYS)
+    penalty_rate = Decimal(str(LOAN_PENALTY_RATE)) / Decimal("100")
+
+    if not dry_run and not cache.add(
+        PENALTY_RUN_LOCK_KEY, 1, timeout=PENALTY_RUN_LOCK_TIMEOUT
+    ):
+        raise ValidationError("A penalty run is already in progress.")
+
+    try:
+        with transaction.atomic():
+            overdue = (
+                overdue_installments(due_before)
+                .order_by("loan_account", "sequence")
+                .values_list(
+                    "loan_account",
+                    "loan_account__account_number",
+                    "installment_code",
+                    "total_due",
+                )
+            )
+
+            # Non-waived penalties are exactly the Pending and Paid ones, so
+            # one query gives both the ceiling count and the codes to skip
+            penalized = defaultdict(set)
+            charged = Counter()
+            existing = (
+                LoanPenalty.objects.filter(loan_account__status="Active")
+                .exclude(status="Waived")
+                .values_list("loan_account", "installment_code")
+            )
+            for loan_id, code in existing.iterator(chunk_size=2000):
+                penalized[loan_id].add(code)
+                charged[loan_id] += 1
+
+            ceilings = dict(
+                LoanInstallment.objects.filter(loan_account__status="Active")
+                .values("loan_account")
+                .annotate(count=Count("id"))
+                .order_by()
+                .values_list("loan_account", "count")
+            )
+
+            penalties = []
+            charges = []
+            loans = set()
+            skipped = Counter()
+            for loan_id, account_number, code, total_due in overdue.iterator(
+                chunk_size=2000
+            ):
+                loans.add(loan_id)
+                if code in penalized[loan_id]:
+                    continue
+                if charged[loan_id] >= ceilings.get(loan_id, 0):
+                    skipped["ceiling"] += 1
+                    continue
+                amount = round(total_due * penalty_rate, 2)
+                if amount <= 0:
+                    skipped["zero_amount"] += 1
+                    continue
+
+                penalized[loan_id].add(code)
+                charged[loan_id] += 1
+                charges.append(
+                    {
+                        "account_number": account_number,
+                        "installment_code": code,
+                        "amount": amount,
+                    }
+                )
+                # bulk_create skips save(), which is where references are set
+                penalties.append(
+                    LoanPenalty(
+                        loan_account_id=loan_id,
+                        installment_code=code,
+                        amount=amount,
+                        status="Pending",
+                        charged_by=charged_by,
+                        reference=generate_reference(),
+                    )
+                )
+
+            if not dry_run:
+                LoanPenalty.objects.bulk_create(penalties, batch_size=1000)
+    finally:
+        if not dry_run:
+            cache.delete(PENALTY_RUN_LOCK_KEY)
+
+    duration = time.perf_counter() - start_time
+    loans_penalized = len({penalty.loan_account_id for penalty in penalties})
+    logger.info(
+        f"Penalty run for {as_of}{' (dry run)' if dry_run else ''}: "
+        f"{len(penalties)} penalties on {loans_penalized} loans in {duration:.3f}s"
+    )
+    return {
+        "as_of_date": as_of,
+        "dry_run": dry_run,
+        "penalty_rate": LOAN_PENALTY_RATE,
+        "grace_days": LOAN_PENALTY_GRACE_DAYS,
+        "loans_in_arrears": len(loans),
+        "loans_penalized": loans_penalized,
+        "penalties": len(penalties),
+        "total_amount": sum((penalty.amount for penalty in penalties), Decimal("0")),
+        "skipped_at_ceiling": skipped["ceiling"],
+        "skipped_zero_amount": skipped["zero_amount"],
+        "duration": round(duration, 3),
+        "charges": charges,
+    }
@@ -1,3 +1,88 @@
+import io
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from loanaccounts.tests import create_loan
+from loanpenalties.models import LoanPenalty
+from loanpenalties.services import apply_auto_penalties
+from loanproducts.models import LoanProduct
+
+User = get_user_model()
+
+
+@mock.patch("loanpenalties.services.LOAN_PENALTY_RATE", 5)
+class AutoPenaltyRunTests(TestCase):
+    def setUp(self):
+        member = User.objects.create_user(
+            email="member@example.com", password="pass", member_no="MM001"
+        )
+        self.admin = User.objects.create_user(
+            email="admin@example.com",
+            password="pass",
+            member_no="MM002",
+            is_sacco_admin=True,
+        )
+        product = LoanProduct.objects.create(
+            name="Development", interest_rate=Decimal("12")
+        )
+        # First installments due 2026-02-15 and 2026-04-15
+        self.late = create_loan(member, product, start=date(2026, 1, 15))
+        self.recent = create_loan(member, product, start=date(2026, 3, 15))
+
+    def test_every_overdue_installment_is_penalised_once(self):
+        # Two of the late loan's installments and one of the recent one's
+        report = apply_auto_penalties(self.admin, as_of=date(2026, 4, 1))
+        self.assertEqual(report["penalties"], 2)
+        report = apply_auto_penalties(self.admin, as_of=date(2026, 5, 1))
+        self.assertEqual(report["penalties"], 2)
+        self.assertEqual(report["loans_penalized"], 2)
+
+        first = self.late.installments.get(sequence=1)
+        penalty = self.late.penalties.get(installment_code=first.installment_code)
+        self.assertEqual(penalty.amount, round(first.total_due * Decimal("0.05"), 2))
+        self.assertIsNotNone(penalty.reference)
+        self.assertEqual(self.late.penalties.count(), 3)
+        self.assertEqual(self.recent.penalties.count(), 1)
+
+        # Nothing new fell due
+        report = apply_auto_penalties(self.admin, as_of=date(2026, 5, 1))
+        self.assertEqual(report["penalties"], 0)
+
+    def test_waived_penalties_free_their_installment(self):
+        apply_auto_penalties(self.admin, as_of=date(2026, 3, 1))
+        self.late.penalties.update(status="Waived")
+        report = apply_auto_penalties(self.admin, as_of=date(2026, 3, 1))
+        self.assertEqual(report["penalties"], 1)
+        self.assertEqual(self.late.penalties.exclude(status="Waived").count(), 1)
+
+    def test_dry_run_reports_without_charging(self):
+        report = apply_auto_penalties(self.admin, as_of=date(2026, 5, 1), dry_run=True)
+        self.assertEqual(report["penalties"], 4)
+        self.assertEqual(
+            report["total_amount"], sum(c["amount"] for c in report["charges"])
+        )
+        self.assertFalse(LoanPenalty.objects.exists())
+
+    def test_command_and_endpoint(self):
+        out = io.StringIO()
+        call_command("apply_auto_penalties", "--date", "2026-04-01", stdout=out)
+        self.assertIn("2 penalties", out.getvalue())
+        self.assertEqual(LoanPenalty.objects.filter(charged_by=self.admin).count(), 2)
+
+        client = APIClient()
+        url = reverse("loanpenalties:loan-penalty-run")
+        client.force_authenticate(User.objects.get(member_no="MM001"))
+        self.assertEqual(client.post(url).status_code, 403)
 
-# Create your tests here.
+        client.force_authenticate(self.admin)
+        response = client.post(url, {"as_of_date": "2026-05-01"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["penalties"], 2)
+        self.assertEqual(LoanPenalty.objects.count(), 2)
@@ -1,11 +1,16 @@
 from django.urls import path
 
-from loanpenalties.views import LoanPenaltyListCreateView, LoanPenaltyRetrieveUpdateView
+from loanpenalties.views import (
+    LoanPenaltyListCreateView,
+    LoanPenaltyRetrieveUpdateView,
+    LoanPenaltyRunView,
+)
 
 app_name = "loanpenalties"
 
 urlpatterns = [
     path("", LoanPenaltyListCreateView.as_view(), name="loan-penalties"),
+    path("run/", LoanPenaltyRunView.as_view(), name="loan-penalty-run"),
     path(
         "<str:reference>/",
         LoanPenaltyRetrieveUpdateView.as_view(),
@@ -1,4 +1,7 @@
+from datetime import date
+
 from rest_framework import generics, status
+from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError as DRFValidationError
@@ -6,7 +9,7 @@ from django.core.exceptions import ValidationError
 
 from loanpenalties.models import LoanPenalty
 from loanpenalties.serializers import LoanPenaltySerializer
-from loanpenalties.services import apply_auto_targeted_penalty
+from loanpenalties.services import apply_auto_penalties, apply_auto_targeted_penalty
 
 
 class LoanPenaltyListCreateView(generics.ListCreateAPIView):
@@ -45,3 +48,40 @@ class LoanPenaltyRetrieveUpdateView(generics.RetrieveUpdateAPIView):
                 {"detail": "Cannot update a loan penalty that has been waived."}
             )
         return super().update(request, *args, **kwargs)
+
+
+class LoanPenaltyRunView(APIView):
+    """
+    POST /api/v1/loanpenalties/run/
+
+    Penalises every overdue installment of the active loan book in one
+    batch, as the apply_auto_penalties command does. Body: dry_run
+    (default true) and as_of_date (ISO date, default today).
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        user = request.user
+        if not (user.is_sacco_admin or user.is_superuser):
+            return Response(
+                {"detail": "Only SACCO admins can run penalties."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        dry_run = request.data.get("dry_run", True)
+        if isinstance(dry_run, str):
+            dry_run = dry_run.lower() not in ("false", "0", "no")
+        try:
+            as_of = request.data.get("as_of_date")
+            as_of = date.fromisoformat(as_of) if as_of else None
+        except (TypeError, ValueError):
+            raise DRFValidationError({"as_of_date": "Use an ISO date, YYYY-MM-DD."})
+
+        try:
+            report = apply_auto_penalties(user, as_of=as_of, dry_run=bool(dry_run))
+        except ValidationError as e:
+            raise DRFValidationError({"detail": e.message})
+        return Response(
+            report, status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED
+        )
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.1 on 2026-10-19 00:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("glaccounts", "0001_initial"),
+        ("loanproducts", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="loanproduct",
+            name="gl_interest_receivable",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="loan_interest_receivables",
+                to="glaccounts.glaccount",
+            ),
+        ),
+    ]
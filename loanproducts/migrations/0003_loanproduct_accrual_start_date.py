@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-19 01:50
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def start_accruals_today(apps, schema_editor):
+    """
+    Products that already post accruals start from today: interest their
+    loans earned before now is recognised when it is repaid.
+    """
+    LoanProduct = apps.get_model("loanproducts", "LoanProduct")
+    LoanProduct.objects.filter(gl_interest_receivable__isnull=False).update(
+        accrual_start_date=timezone.localdate()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("loanproducts", "0002_loanproduct_gl_interest_receivable"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="loanproduct",
+            name="accrual_start_date",
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(start_accruals_today, migrations.RunPython.noop),
+    ]
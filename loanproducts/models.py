@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 
 from accounts.abstracts import TimeStampedModel, UniversalIdModel, ReferenceModel
 from glaccounts.models import GLAccount
@@ -82,6 +83,17 @@ class LoanProduct(UniversalIdModel, TimeStampedModel, ReferenceModel):
         null=True,
         blank=True,
     )
+    # ASSET: Interest accrued daily and not yet received
+    gl_interest_receivable = models.ForeignKey(
+        GLAccount,
+        on_delete=models.PROTECT,
+        related_name="loan_interest_receivables",
+        null=True,
+        blank=True,
+    )
+    # Set when the receivable is enabled: loans only accrue interest from
+    # this date, what they earned before it is recognised on repayment
+    accrual_start_date = models.DateField(null=True, blank=True, editable=False)
     # REVENUE/INCOME: Tracks penalties
     gl_penalty_revenue = models.ForeignKey(
         GLAccount,
@@ -109,5 +121,12 @@ class LoanProduct(UniversalIdModel, TimeStampedModel, ReferenceModel):
         verbose_name_plural = "Loan Products"
         ordering = ["-created_at"]
 
+    def save(self, *args, **kwargs):
+        if not self.gl_interest_receivable_id:
+            self.accrual_start_date = None
+        elif not self.accrual_start_date:
+            self.accrual_start_date = timezone.localdate()
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.name} - {self.interest_rate}% - {self.interest_period} - {self.calculation_schedule}"
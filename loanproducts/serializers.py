@@ -22,6 +22,12 @@ class LoanProductSerializer(serializers.ModelSerializer):
     gl_processing_fee_revenue = serializers.SlugRelatedField(
         slug_field="name", queryset=GLAccount.objects.all()
     )
+    gl_interest_receivable = serializers.SlugRelatedField(
+        slug_field="name",
+        queryset=GLAccount.objects.all(),
+        required=False,
+        allow_null=True,
+    )
 
     class Meta:
         model = LoanProduct
@@ -40,6 +46,7 @@ class LoanProductSerializer(serializers.ModelSerializer):
             "gl_penalty_revenue",
             "gl_interest_revenue",
             "gl_processing_fee_revenue",
+            "gl_interest_receivable",
         )
 
 
@@ -1,11 +1,34 @@
 from django.contrib import admin
 
-from mpesa.models import MpesaBody
+from mpesa.models import MpesaBody, StkRequest
 
 
 @admin.register(MpesaBody)
 class MpesaBodyAdmin(admin.ModelAdmin):
-    list_display = ["reference", "created_at", "updated_at"]
-    list_filter = ["created_at", "updated_at"]
-    search_fields = ["reference"]
+    list_display = [
+        "reference",
+        "callback_type",
+        "checkout_request_id",
+        "processing_status",
+        "attempts",
+        "created_at",
+        "processed_at",
+    ]
+    list_filter = ["processing_status", "callback_type", "created_at", "updated_at"]
+    search_fields = ["reference", "checkout_request_id", "idempotency_key"]
+    ordering = ["-created_at"]
+
+
+@admin.register(StkRequest)
+class StkRequestAdmin(admin.ModelAdmin):
+    list_display = [
+        "checkout_request_id",
+        "callback_type",
+        "content_type",
+        "object_id",
+        "status",
+        "created_at",
+    ]
+    list_filter = ["status", "callback_type", "created_at"]
+    search_fields = ["checkout_request_id", "merchant_request_id"]
     ordering = ["-created_at"]
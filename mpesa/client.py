@@ -0,0 +1,378 @@
+"""
+Safaricom Daraja API client.
+
+One client per process, shared by every view that talks to M-Pesa:
+
+- a pooled `requests.Session`, so STK pushes reuse TCP/TLS connections
+- single-flight token refresh: one thread per process, and one process per
+  cluster (via a lock in the shared cache), fetches a new OAuth token while
+  the others wait for it
+- connect/read timeouts and retries with jittered exponential backoff
+- a circuit breaker that fails fast while Daraja is down
+"""
+
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from django.conf import settings
+from django.core.cache import cache
+
+from mpesa.utils import build_stk_push_payload, build_stk_query_payload
+
+logger = logging.getLogger(__name__)
+
+TOKEN_CACHE_KEY = "mpesa_access_token"
+TOKEN_LOCK_KEY = "mpesa_access_token:lock"
+
+# Refresh this many seconds before Daraja's expiry
+TOKEN_EXPIRY_MARGIN = 60
+
+MPESA_CONNECT_TIMEOUT = getattr(settings, "MPESA_CONNECT_TIMEOUT", 5)
+MPESA_READ_TIMEOUT = getattr(settings, "MPESA_READ_TIMEOUT", 30)
+MPESA_MAX_RETRIES = getattr(settings, "MPESA_MAX_RETRIES", 3)
+MPESA_POOL_SIZE = getattr(settings, "MPESA_POOL_SIZE", 20)
+MPESA_CIRCUIT_FAILURE_THRESHOLD = getattr(
+    settings, "MPESA_CIRCUIT_FAILURE_THRESHOLD", 5
+)
+MPESA_CIRCUIT_RESET_TIMEOUT = getattr(settings, "MPESA_CIRCUIT_RESET_TIMEOUT", 30)
+
+
+# ---------------------------------------------------------
+# Errors
+# ---------------------------------------------------------
+
+
+class MpesaError(Exception):
+    pass
+
+
+class MpesaAuthError(MpesaError, ValueError):
+    """Raised when no access token could be obtained."""
+
+
+class MpesaUnavailable(MpesaError):
+    """Raised without calling Daraja while the circuit breaker is open."""
+
+
+# ---------------------------------------------------------
+# Circuit breaker
+# ---------------------------------------------------------
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls
+    for `reset_timeout` seconds. After that a single trial call is let
+    through: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                raise MpesaUnavailable("M-Pesa is temporarily unavailable")
+            if self._trial_in_flight:
+                raise MpesaUnavailable("M-Pesa is temporarily unavailable")
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                logger.error(f"M-Pesa circuit opened after {self._failures} failures")
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+# ---------------------------------------------------------
+# Client
+# ---------------------------------------------------------
+
+
+def _not_sent(exc):
+    """True when the request certainly never reached the server."""
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class DarajaClient:
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    # STK query answers 500 with this code while the customer has not yet
+    # responded; that is a normal result, not an outage.
+    STK_QUERY_PENDING_ERROR = "500.001.1001"
+    # STK push is not idempotent: only retry when Daraja says it did not
+    # process the request, never after a read timeout.
+    SAFE_POST_RETRY_STATUSES = {429, 503}
+
+    def __init__(
+        self,
+        base_url,
+        consumer_key,
+        consumer_secret,
+        connect_timeout=MPESA_CONNECT_TIMEOUT,
+        read_timeout=MPESA_READ_TIMEOUT,
+        max_retries=MPESA_MAX_RETRIES,
+        backoff_base=0.5,
+        backoff_cap=8.0,
+        pool_size=MPESA_POOL_SIZE,
+        breaker=None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.consumer_key = consumer_key
+        self.consumer_secret = consumer_secret
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker = breaker or CircuitBreaker(
+            MPESA_CIRCUIT_FAILURE_THRESHOLD, MPESA_CIRCUIT_RESET_TIMEOUT
+        )
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._token = None
+        self._token_expires_at = 0.0
+        self._token_lock = threading.Lock()
+
+    # ---------------------------------------------------------
+    # Access token
+    # ---------------------------------------------------------
+
+    def cached_token(self):
+        """The in-process token if it is still valid, else None."""
+        if self._token and time.monotonic() < self._token_expires_at:
+            return self._token
+        return None
+
+    def _remember(self, token, ttl):
+        self._token = token
+        self._token_expires_at = time.monotonic() + ttl
+
+    def get_access_token(self, lock_timeout=15):
+        token = self.cached_token()
+        if token:
+            return token
+
+        with self._token_lock:
+            # Another thread may have refreshed while we waited
+            token = self.cached_token()
+            if token:
+                return token
+
+            deadline = time.monotonic() + lock_timeout
+            while True:
+                cached = cache.get(TOKEN_CACHE_KEY)
+                if isinstance(cached, dict) and cached["expires_at"] > time.time():
+                    self._remember(cached["token"], cached["expires_at"] - time.time())
+                    return cached["token"]
+
+                if cache.add(TOKEN_LOCK_KEY, 1, timeout=lock_timeout):
+                    try:
+                        return self._refresh_token()
+                    finally:
+                        cache.delete(TOKEN_LOCK_KEY)
+
+                # Another worker is refreshing: wait for its token
+                if time.monotonic() >= deadline:
+                    return self._refresh_token()
+                time.sleep(0.05)
+
+    def _refresh_token(self):
+        try:
+            response = self._request(
+                "GET",
+                "/oauth/v1/generate?grant_type=client_credentials",
+                auth=(self.consumer_key, self.consumer_secret),
+                idempotent=True,
+            )
+            response.raise_for_status()
+            auth_data = response.json()
+        except MpesaUnavailable:
+            raise
+        except (requests.RequestException, ValueError) as e:
+            logger.error(f"Failed to obtain M-Pesa access token: {str(e)}")
+            raise MpesaAuthError(f"Failed to obtain access token: {str(e)}")
+
+        token = auth_data.get("access_token")
+        if not token:
+            logger.error(f"No access token in response: {auth_data}")
+            raise MpesaAuthError("No access token returned by M-Pesa API")
+
+        expires_in = int(auth_data.get("expires_in", 3599))
+        ttl = max(expires_in - TOKEN_EXPIRY_MARGIN, 1)
+        cache.set(
+            TOKEN_CACHE_KEY,
+            {"token": token, "expires_at": time.time() + ttl},
+            timeout=ttl,
+        )
+        self._remember(token, ttl)
+        logger.info("Successfully obtained and cached M-Pesa access token")
+        return token
+
+    def invalidate_token(self, token):
+        """Forget `token` after Daraja rejected it (unless already replaced)."""
+        with self._token_lock:
+            if self._token == token:
+                self._token = None
+            cached = cache.get(TOKEN_CACHE_KEY)
+            if isinstance(cached, dict) and cached["token"] == token:
+                cache.delete(TOKEN_CACHE_KEY)
+
+    # ---------------------------------------------------------
+    # Transport
+    # ---------------------------------------------------------
+
+    def _backoff(self, attempt):
+        # Full jitter: spreads retries from concurrent workers apart
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2**attempt))
+
+    def _request(self, method, path, idempotent=False, **kwargs):
+        """
+        Send a request through the circuit breaker, retrying transient
+        failures. Returns the final response (which may be an HTTP error).
+        """
+        self.breaker.before_call()
+        retry_statuses = (
+            self.RETRY_STATUSES if idempotent else self.SAFE_POST_RETRY_STATUSES
+        )
+
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(
+                    method, f"{self.base_url}{path}", timeout=self.timeout, **kwargs
+                )
+            except requests.RequestException as e:
+                # A POST that may have reached Daraja is never resent
+                retryable = idempotent or _not_sent(e)
+                if retryable and attempt < self.max_retries:
+                    logger.warning(f"M-Pesa {method} {path} failed ({e}), retrying")
+                    time.sleep(self._backoff(attempt))
+                    attempt += 1
+                    continue
+                self.breaker.record_failure()
+                raise
+
+            if response.status_code in retry_statuses and attempt < self.max_retries:
+                logger.warning(
+                    f"M-Pesa {method} {path} returned {response.status_code}, retrying"
+                )
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            if self._is_outage(response):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            return response
+
+    def _is_outage(self, response):
+        if response.status_code < 500:
+            return False
+        try:
+            error_code = response.json().get("errorCode")
+        except (ValueError, AttributeError):
+            return True
+        return error_code != self.STK_QUERY_PENDING_ERROR
+
+    def _authorized_post(self, path, payload):
+        token = self.get_access_token()
+        response = self._request(
+            "POST", path, json=payload, headers={"Authorization": f"Bearer {token}"}
+        )
+        if response.status_code == 401:
+            # Token revoked or expired early: refresh once and resend
+            self.invalidate_token(token)
+            token = self.get_access_token()
+            response = self._request(
+                "POST",
+                path,
+                json=payload,
+                headers={"Authorization": f"Bearer {token}"},
+            )
+        try:
+            return response.json()
+        except ValueError:
+            raise MpesaError(
+                f"Unexpected M-Pesa response ({response.status_code}): {response.text}"
+            )
+
+    # ---------------------------------------------------------
+    # API
+    # ---------------------------------------------------------
+
+    def stk_push(
+        self, amount, phone_number, callback_url, account_reference, description
+    ):
+        """Send an M-Pesa Express (STK push) request; returns Daraja's JSON."""
+        payload = build_stk_push_payload(
+            amount=amount,
+            phone_number=phone_number,
+            callback_url=callback_url,
+            account_reference=account_reference,
+            description=description,
+        )
+        return self._authorized_post("/mpesa/stkpush/v1/processrequest", payload)
+
+    def stk_query(self, checkout_request_id):
+        """
+        Ask Daraja for the result of an STK push; returns Daraja's JSON.
+
+        A final result carries `ResultCode` ("0" when paid); a push still
+        awaiting the customer returns `errorCode` STK_QUERY_PENDING_ERROR.
+        """
+        payload = build_stk_query_payload(checkout_request_id)
+        return self._authorized_post("/mpesa/stkpushquery/v1/query", payload)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_daraja_client():
+    """The process-wide client configured from settings."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = DarajaClient(
+                    base_url=settings.MPESA_API_URL,
+                    consumer_key=settings.MPESA_CONSUMER_KEY,
+                    consumer_secret=settings.MPESA_CONSUMER_SECRET,
+                )
+    return _client
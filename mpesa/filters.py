@@ -0,0 +1,29 @@
+import django_filters
+from django.db.models.fields.json import KT
+
+from mpesa.models import MpesaBody
+
+
+class MpesaBodyFilter(django_filters.FilterSet):
+    """
+    Filters for the callback inspection API. Each one maps to an index on
+    MpesaBody, including the expression index on the callback's ResultCode.
+    """
+
+    checkout_request_id = django_filters.CharFilter()
+    result_code = django_filters.CharFilter(method="filter_result_code")
+    created_after = django_filters.IsoDateTimeFilter(
+        field_name="created_at", lookup_expr="gte"
+    )
+    created_before = django_filters.IsoDateTimeFilter(
+        field_name="created_at", lookup_expr="lt"
+    )
+
+    class Meta:
+        model = MpesaBody
+        fields = ["callback_type", "processing_status"]
+
+    def filter_result_code(self, queryset, name, value):
+        return queryset.alias(
+            result_code=KT("body__Body__stkCallback__ResultCode")
+        ).filter(result_code=value)
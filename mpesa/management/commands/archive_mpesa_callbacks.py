@@ -0,0 +1,106 @@
+import gzip
+import json
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from mpesa.models import MpesaBody
+
+# Bodies that still need attention (pending or failed) are never archived
+ARCHIVABLE_STATUSES = ("PROCESSED", "IGNORED")
+
+ARCHIVE_FIELDS = (
+    "id",
+    "reference",
+    "body",
+    "callback_type",
+    "checkout_request_id",
+    "idempotency_key",
+    "processing_status",
+    "processing_error",
+    "attempts",
+    "processed_at",
+    "created_at",
+    "updated_at",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Archives processed M-Pesa callback bodies older than the retention "
+        "period to a gzipped JSON-lines file and deletes them from the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=getattr(settings, "MPESA_CALLBACK_RETENTION_DAYS", 180),
+            help="Keep callbacks received within this many days.",
+        )
+        parser.add_argument("--output-dir", default=".")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the callbacks that would be archived.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        queryset = MpesaBody.objects.filter(
+            created_at__lt=cutoff, processing_status__in=ARCHIVABLE_STATUSES
+        ).order_by("created_at", "pk")
+
+        if options["dry_run"]:
+            self.stdout.write(
+                f"{queryset.count()} callback(s) received before "
+                f"{cutoff:%Y-%m-%d} would be archived"
+            )
+            return
+
+        os.makedirs(options["output_dir"], exist_ok=True)
+        path = os.path.join(
+            options["output_dir"],
+            f"mpesa-callbacks-before-{cutoff:%Y%m%d}-{timezone.now():%Y%m%d%H%M%S}.jsonl.gz",
+        )
+
+        archived = 0
+        cursor = Q()
+        with gzip.open(path, "wt", encoding="utf-8") as archive:
+            while True:
+                rows = list(
+                    queryset.filter(cursor).values(*ARCHIVE_FIELDS)[
+                        : options["batch_size"]
+                    ]
+                )
+                if not rows:
+                    break
+                for row in rows:
+                    archive.write(json.dumps(row, cls=DjangoJSONEncoder) + "\n")
+                # Rows are on disk before they are deleted
+                archive.flush()
+                with transaction.atomic():
+                    MpesaBody.objects.filter(
+                        pk__in=[row["id"] for row in rows]
+                    ).delete()
+
+                archived += len(rows)
+                last = rows[-1]
+                cursor = Q(created_at__gt=last["created_at"]) | Q(
+                    created_at=last["created_at"], pk__gt=last["id"]
+                )
+
+        if not archived:
+            os.remove(path)
+            self.stdout.write("No callbacks to archive")
+            return
+        self.stdout.write(
+            self.style.SUCCESS(f"Archived {archived} callback(s) to {path}")
+        )
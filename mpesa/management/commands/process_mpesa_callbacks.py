@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from mpesa.services import process_pending_callbacks
+
+
+class Command(BaseCommand):
+    help = "Applies stored M-Pesa callbacks that are still pending."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running, draining new callbacks every --interval seconds.",
+        )
+        parser.add_argument("--interval", type=float, default=5)
+        parser.add_argument("--batch-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        while True:
+            totals = process_pending_callbacks(batch_size=options["batch_size"])
+            if any(totals.values()) or not options["loop"]:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Processed: {totals['PROCESSED']}, "
+                        f"ignored: {totals['IGNORED']}, failed: {totals['FAILED']}"
+                    )
+                )
+            if not options["loop"]:
+                return
+            close_old_connections()
+            time.sleep(options["interval"])
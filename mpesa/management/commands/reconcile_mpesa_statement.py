@@ -0,0 +1,64 @@
+import csv
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mpesa.reconciliation import RECONCILIATION_CHUNK_SIZE, reconcile_statement
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconciles an M-Pesa statement CSV against deposits and loan payments "
+        "and writes the matched, unmatched and duplicate lines to CSV files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("statement", help="Path to the M-Pesa statement CSV.")
+        parser.add_argument(
+            "--auto-complete",
+            action="store_true",
+            help="Complete pending transactions matched by account and amount.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=RECONCILIATION_CHUNK_SIZE)
+        parser.add_argument(
+            "--output-dir",
+            default=".",
+            help="Directory for matched.csv, unmatched.csv and duplicates.csv.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["statement"], newline="", encoding="utf-8-sig") as f:
+                reconciler = reconcile_statement(
+                    f,
+                    auto_complete=options["auto_complete"],
+                    chunk_size=options["chunk_size"],
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        os.makedirs(options["output_dir"], exist_ok=True)
+        for name in ("matched", "unmatched", "duplicates"):
+            self._write(
+                os.path.join(options["output_dir"], f"{name}.csv"),
+                getattr(reconciler, name),
+            )
+
+        summary = reconciler.summary()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Matched: {summary['matched']}, unmatched: {summary['unmatched']}, "
+                f"duplicates: {summary['duplicates']}, "
+                f"auto-completed: {summary['auto_completed']}, "
+                f"skipped: {summary['auto_complete_skipped']}"
+            )
+        )
+
+    def _write(self, path, rows):
+        fieldnames = []
+        for row in rows:
+            fieldnames += [key for key in row if key not in fieldnames]
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames or ["line"])
+            writer.writeheader()
+            writer.writerows(rows)
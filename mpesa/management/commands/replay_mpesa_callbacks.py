@@ -0,0 +1,85 @@
+"""
+Management command: replay_mpesa_callbacks
+
+Reprocesses stored MpesaBody rows through the callback pipeline. Processing
+is idempotent: payments that are already completed are left untouched.
+
+Usage
+-----
+    python manage.py replay_mpesa_callbacks                      # FAILED and IGNORED bodies
+    python manage.py replay_mpesa_callbacks --status PROCESSED --since 2026-01-01
+    python manage.py replay_mpesa_callbacks --checkout-request-id ws_CO_123
+    python manage.py replay_mpesa_callbacks --dry-run
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from mpesa.models import MpesaBody
+from mpesa.services import process_callbacks
+
+
+class Command(BaseCommand):
+    help = "Reprocesses stored M-Pesa callback bodies."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--status",
+            nargs="+",
+            default=["FAILED", "IGNORED"],
+            choices=[choice for choice, _ in MpesaBody.PROCESSING_STATUS_CHOICES],
+        )
+        parser.add_argument("--checkout-request-id", nargs="+")
+        parser.add_argument("--reference", nargs="+")
+        parser.add_argument("--since", help="YYYY-MM-DD, inclusive")
+        parser.add_argument("--until", help="YYYY-MM-DD, inclusive")
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def _date(self, value):
+        try:
+            return datetime.strptime(value, "%Y-%m-%d").date()
+        except ValueError:
+            raise CommandError(f"Invalid date: {value}. Use YYYY-MM-DD.")
+
+    def handle(self, *args, **options):
+        bodies = MpesaBody.objects.all()
+        if options["checkout_request_id"] or options["reference"]:
+            if options["checkout_request_id"]:
+                bodies = bodies.filter(
+                    checkout_request_id__in=options["checkout_request_id"]
+                )
+            if options["reference"]:
+                bodies = bodies.filter(reference__in=options["reference"])
+        else:
+            bodies = bodies.filter(processing_status__in=options["status"])
+        if options["since"]:
+            bodies = bodies.filter(created_at__date__gte=self._date(options["since"]))
+        if options["until"]:
+            bodies = bodies.filter(created_at__date__lte=self._date(options["until"]))
+
+        ids = list(bodies.order_by("created_at").values_list("pk", flat=True))
+        self.stdout.write(f"Replaying {len(ids)} M-Pesa callbacks...")
+        if options["dry_run"]:
+            return
+
+        totals = {"PROCESSED": 0, "IGNORED": 0, "FAILED": 0}
+        batch_size = options["batch_size"]
+        for start in range(0, len(ids), batch_size):
+            with transaction.atomic():
+                batch = (
+                    MpesaBody.objects.select_for_update()
+                    .order_by("created_at")
+                    .filter(pk__in=ids[start : start + batch_size])
+                )
+                for status, count in process_callbacks(batch).items():
+                    totals[status] += count
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Processed: {totals['PROCESSED']}, "
+                f"ignored: {totals['IGNORED']}, failed: {totals['FAILED']}"
+            )
+        )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from mpesa.stub import StubDarajaServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs a local Daraja stub (OAuth, STK push and STK query) for "
+        "development. Point MPESA_API_URL at the printed address."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--port", type=int, default=8009)
+        parser.add_argument(
+            "--query-result",
+            default="0",
+            help="STK query ResultCode to return; 'pending' to keep pushes in progress.",
+        )
+
+    def handle(self, *args, **options):
+        server = StubDarajaServer(("127.0.0.1", options["port"]))
+        if options["query_result"] == "pending":
+            server.default_query_result = None
+        else:
+            server.default_query_result = options["query_result"]
+
+        self.stdout.write(self.style.SUCCESS(f"Daraja stub listening on {server.url}"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from mpesa.sweeper import (
+    MPESA_STK_SWEEP_AGE_MINUTES,
+    MPESA_STK_SWEEP_BATCH_SIZE,
+    MPESA_STK_SWEEP_CONCURRENCY,
+    sweep_stale_stk_requests,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Queries Daraja for STK pushes still pending after --older-than minutes "
+        "and completes or fails their deposits / loan payments."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=float,
+            default=MPESA_STK_SWEEP_AGE_MINUTES,
+            help="Only sweep pushes older than this many minutes.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=MPESA_STK_SWEEP_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=MPESA_STK_SWEEP_CONCURRENCY,
+            help="Concurrent STK queries.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running, sweeping every --interval seconds.",
+        )
+        parser.add_argument("--interval", type=float, default=300)
+
+    def handle(self, *args, **options):
+        while True:
+            summary = sweep_stale_stk_requests(
+                older_than_minutes=options["older_than"],
+                batch_size=options["batch_size"],
+                max_workers=options["workers"],
+            )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Checked: {summary['checked']}, completed: {summary['completed']}, "
+                    f"failed: {summary['failed']}, closed: {summary['closed']}, "
+                    f"still pending: {summary['pending']}, "
+                    f"errors: {summary['errors']}, "
+                    f"unreachable: {summary['unreachable']} in {summary['duration']}s"
+                )
+            )
+            if not options["loop"]:
+                return
+            close_old_connections()
+            time.sleep(options["interval"])
@@ -0,0 +1,82 @@
+# Generated by Django 6.0.1 on 2026-10-19 00:18
+
+from django.db import migrations, models
+
+
+def mark_existing_bodies_processed(apps, schema_editor):
+    # Bodies received before the ingestion pipeline were handled inline
+    MpesaBody = apps.get_model("mpesa", "MpesaBody")
+    MpesaBody.objects.update(processing_status="PROCESSED")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mpesa", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mpesabody",
+            name="attempts",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="mpesabody",
+            name="callback_type",
+            field=models.CharField(
+                blank=True,
+                choices=[("DEPOSIT", "DEPOSIT"), ("LOAN_PAYMENT", "LOAN_PAYMENT")],
+                max_length=20,
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="mpesabody",
+            name="checkout_request_id",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name="mpesabody",
+            name="idempotency_key",
+            field=models.CharField(
+                blank=True,
+                help_text="Identifies the callback so Safaricom retries are stored once.",
+                max_length=255,
+                null=True,
+                unique=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="mpesabody",
+            name="processed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="mpesabody",
+            name="processing_error",
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="mpesabody",
+            name="processing_status",
+            field=models.CharField(
+                choices=[
+                    ("PENDING", "PENDING"),
+                    ("PROCESSED", "PROCESSED"),
+                    ("IGNORED", "IGNORED"),
+                    ("FAILED", "FAILED"),
+                ],
+                default="PENDING",
+                max_length=20,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="mpesabody",
+            index=models.Index(
+                fields=["processing_status", "created_at"],
+                name="mpesa_mpesa_process_1a0d98_idx",
+            ),
+        ),
+        migrations.RunPython(mark_existing_bodies_processed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,127 @@
+# Generated by Django 6.0.1 on 2026-10-19 00:20
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+BACKFILL_BATCH_SIZE = 2000
+
+
+def backfill_stk_requests(apps, schema_editor):
+    """Register every existing deposit / loan payment that has a checkout id."""
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    StkRequest = apps.get_model("mpesa", "StkRequest")
+
+    for app_label, model_name, callback_type in (
+        ("savingsdeposits", "savingsdeposit", "DEPOSIT"),
+        ("loanpayments", "loanpayment", "LOAN_PAYMENT"),
+    ):
+        model = apps.get_model(app_label, model_name)
+        content_type, _ = ContentType.objects.get_or_create(
+            app_label=app_label, model=model_name
+        )
+        rows = (
+            model.objects.exclude(checkout_request_id__isnull=True)
+            .exclude(checkout_request_id="")
+            .order_by("created_at")
+            .values_list("pk", "checkout_request_id", "payment_status")
+            .iterator(chunk_size=BACKFILL_BATCH_SIZE)
+        )
+        batch = []
+        for pk, checkout_request_id, payment_status in rows:
+            batch.append(
+                StkRequest(
+                    checkout_request_id=checkout_request_id[:255],
+                    callback_type=callback_type,
+                    content_type=content_type,
+                    object_id=pk,
+                    status=payment_status or "PENDING",
+                )
+            )
+            if len(batch) >= BACKFILL_BATCH_SIZE:
+                StkRequest.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        StkRequest.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("mpesa", "0002_callback_ingestion"),
+        ("savingsdeposits", "0003_savingsdeposit_transaction_date"),
+        ("loanpayments", "0002_loanpayment_transaction_date"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StkRequest",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                        unique=True,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("checkout_request_id", models.CharField(max_length=255, unique=True)),
+                (
+                    "merchant_request_id",
+                    models.CharField(blank=True, max_length=255, null=True),
+                ),
+                (
+                    "callback_type",
+                    models.CharField(
+                        choices=[
+                            ("DEPOSIT", "DEPOSIT"),
+                            ("LOAN_PAYMENT", "LOAN_PAYMENT"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("object_id", models.UUIDField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PENDING", "PENDING"),
+                            ("COMPLETED", "COMPLETED"),
+                            ("CANCELLED", "CANCELLED"),
+                            ("FAILED", "FAILED"),
+                            ("REVERSED", "REVERSED"),
+                        ],
+                        default="PENDING",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "content_type",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        to="contenttypes.contenttype",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "STK Request",
+                "verbose_name_plural": "STK Requests",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["content_type", "object_id"],
+                        name="mpesa_stkre_content_39d888_idx",
+                    ),
+                    models.Index(
+                        fields=["status", "created_at"],
+                        name="mpesa_stkre_status_3cde1d_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_stk_requests, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 6.0.1 on 2026-10-19 00:26
+
+import django.db.models.fields.json
+from django.db import migrations, models
+
+BACKFILL_BATCH_SIZE = 2000
+
+
+def backfill_checkout_request_ids(apps, schema_editor):
+    """Copy CheckoutRequestID out of bodies stored before it had a column."""
+    MpesaBody = apps.get_model("mpesa", "MpesaBody")
+
+    batch = []
+    for mpesa_body in (
+        MpesaBody.objects.filter(checkout_request_id__isnull=True)
+        .only("pk", "body")
+        .iterator(chunk_size=BACKFILL_BATCH_SIZE)
+    ):
+        body = mpesa_body.body if isinstance(mpesa_body.body, dict) else {}
+        checkout_request_id = ((body.get("Body") or {}).get("stkCallback") or {}).get(
+            "CheckoutRequestID"
+        )
+        if checkout_request_id:
+            mpesa_body.checkout_request_id = checkout_request_id[:255]
+            batch.append(mpesa_body)
+        if len(batch) >= BACKFILL_BATCH_SIZE:
+            MpesaBody.objects.bulk_update(batch, ["checkout_request_id"])
+            batch = []
+    if batch:
+        MpesaBody.objects.bulk_update(batch, ["checkout_request_id"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mpesa", "0003_stk_request_registry"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_checkout_request_ids, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="mpesabody",
+            index=models.Index(
+                fields=["created_at"], name="mpesa_mpesa_created_c4af55_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="mpesabody",
+            index=models.Index(
+                fields=["checkout_request_id"], name="mpesa_mpesa_checkou_07f97d_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="mpesabody",
+            index=models.Index(
+                django.db.models.fields.json.KeyTextTransform(
+                    "ResultCode",
+                    django.db.models.fields.json.KeyTextTransform(
+                        "stkCallback",
+                        django.db.models.fields.json.KeyTextTransform("Body", "body"),
+                    ),
+                ),
+                name="mpesa_body_result_code_idx",
+            ),
+        ),
+    ]
@@ -1,15 +1,94 @@
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
 from django.db import models
+from django.db.models.fields.json import KT
 
 from accounts.abstracts import UniversalIdModel, TimeStampedModel, ReferenceModel
 
 
 class MpesaBody(UniversalIdModel, TimeStampedModel, ReferenceModel):
+    CALLBACK_TYPE_CHOICES = (
+        ("DEPOSIT", "DEPOSIT"),
+        ("LOAN_PAYMENT", "LOAN_PAYMENT"),
+    )
+    PROCESSING_STATUS_CHOICES = (
+        ("PENDING", "PENDING"),
+        ("PROCESSED", "PROCESSED"),
+        ("IGNORED", "IGNORED"),
+        ("FAILED", "FAILED"),
+    )
+
     body = models.JSONField()
+    callback_type = models.CharField(
+        max_length=20, choices=CALLBACK_TYPE_CHOICES, blank=True, null=True
+    )
+    checkout_request_id = models.CharField(max_length=255, blank=True, null=True)
+    idempotency_key = models.CharField(
+        max_length=255,
+        unique=True,
+        blank=True,
+        null=True,
+        help_text="Identifies the callback so Safaricom retries are stored once.",
+    )
+    processing_status = models.CharField(
+        max_length=20, choices=PROCESSING_STATUS_CHOICES, default="PENDING"
+    )
+    processing_error = models.TextField(blank=True, null=True)
+    attempts = models.PositiveIntegerField(default=0)
+    processed_at = models.DateTimeField(blank=True, null=True)
 
     class Meta:
         ordering = ["-created_at"]
         verbose_name = "M-Pesa Body"
         verbose_name_plural = "M-Pesa Bodies"
+        indexes = [
+            models.Index(fields=["processing_status", "created_at"]),
+            models.Index(fields=["created_at"]),
+            models.Index(fields=["checkout_request_id"]),
+            # Matches the result_code filter of the callback inspection API
+            models.Index(
+                KT("body__Body__stkCallback__ResultCode"),
+                name="mpesa_body_result_code_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.reference
+
+
+class StkRequest(UniversalIdModel, TimeStampedModel):
+    """
+    Registry of STK pushes: maps a CheckoutRequestID to the deposit or loan
+    payment it was sent for, so callbacks resolve through a unique index
+    instead of scanning the payment tables.
+    """
+
+    STATUS_CHOICES = (
+        ("PENDING", "PENDING"),
+        ("COMPLETED", "COMPLETED"),
+        ("CANCELLED", "CANCELLED"),
+        ("FAILED", "FAILED"),
+        ("REVERSED", "REVERSED"),
+    )
+
+    checkout_request_id = models.CharField(max_length=255, unique=True)
+    merchant_request_id = models.CharField(max_length=255, blank=True, null=True)
+    callback_type = models.CharField(
+        max_length=20, choices=MpesaBody.CALLBACK_TYPE_CHOICES
+    )
+    content_type = models.ForeignKey(ContentType, on_delete=models.PROTECT)
+    object_id = models.UUIDField()
+    payment = GenericForeignKey("content_type", "object_id")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="PENDING")
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = "STK Request"
+        verbose_name_plural = "STK Requests"
+        indexes = [
+            models.Index(fields=["content_type", "object_id"]),
+            models.Index(fields=["status", "created_at"]),
+        ]
+
+    def __str__(self):
+        return self.checkout_request_id
@@ -0,0 +1,356 @@
+"""
+M-Pesa statement reconciliation.
+
+Streams an M-Pesa statement export (CSV) in chunks and matches every
+paid-in line against SavingsDeposit and LoanPayment records:
+
+- by receipt: lines whose receipt is already recorded on a transaction
+  (amount must agree)
+- by account reference and amount: pending STK transactions that never got a
+  callback, which can optionally be completed from the statement
+
+Each chunk costs a fixed number of queries (receipt lookups, pending
+candidates and, with auto-complete, the bulk updates), whatever its size.
+"""
+
+import csv
+import io
+import re
+from collections import defaultdict, deque
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from financials.cache import bump_ledger_version
+from loanpayments.models import LoanPayment
+from mpesa.models import StkRequest
+from mpesa.services import DEPOSIT, LOAN_PAYMENT
+from savingsdeposits.models import SavingsDeposit
+
+RECONCILIATION_CHUNK_SIZE = 1000
+
+# Normalised header -> field, covering the M-Pesa org portal statement and
+# C2B / Daraja style exports.
+HEADER_ALIASES = {
+    "receipt": {
+        "receiptno",
+        "receiptnumber",
+        "receipt",
+        "transid",
+        "mpesareceiptnumber",
+    },
+    "amount": {"paidin", "amount", "transamount"},
+    "completed_at": {"completiontime", "transtime", "transactiondate", "date"},
+    "reference": {
+        "acno",
+        "accountno",
+        "accountnumber",
+        "billrefnumber",
+        "accountreference",
+    },
+    "party": {"otherpartyinfo", "msisdn", "phonenumber"},
+    "status": {"transactionstatus"},
+}
+
+PAYMENT_MODELS = {
+    DEPOSIT: (SavingsDeposit, "savings_account__account_number"),
+    LOAN_PAYMENT: (LoanPayment, "loan_account__account_number"),
+}
+
+COMPLETED_FIELDS = [
+    "transaction_status",
+    "payment_status",
+    "payment_status_description",
+    "confirmation_code",
+    "mpesa_receipt_number",
+    "payment_date",
+    "updated_at",
+]
+
+
+def _normalise_header(header):
+    return re.sub(r"[^a-z0-9]", "", (header or "").lower())
+
+
+def _column_map(fieldnames):
+    columns = {}
+    for header in fieldnames or []:
+        key = _normalise_header(header)
+        for field, aliases in HEADER_ALIASES.items():
+            if key in aliases and field not in columns:
+                columns[field] = header
+    missing = {"receipt", "amount"} - columns.keys()
+    if missing:
+        raise ValueError(
+            f"Statement is missing required column(s): {', '.join(sorted(missing))}"
+        )
+    return columns
+
+
+def _parse_amount(value):
+    value = (value or "").replace(",", "").strip()
+    if not value:
+        return None
+    try:
+        return Decimal(value).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        return None
+
+
+def iter_statement_lines(stream, chunk_size=RECONCILIATION_CHUNK_SIZE):
+    """
+    Yield lists of paid-in statement lines from a text stream, `chunk_size`
+    at a time. Withdrawals and lines that are not completed are skipped.
+    """
+    reader = csv.DictReader(stream)
+    columns = _column_map(reader.fieldnames)
+
+    def value(row, field):
+        column = columns.get(field)
+        return (row.get(column) or "").strip() if column else ""
+
+    chunk = []
+    for line_number, row in enumerate(reader, start=2):
+        status = value(row, "status")
+        if status and status.lower() != "completed":
+            continue
+        amount = _parse_amount(value(row, "amount"))
+        receipt = value(row, "receipt").upper()
+        if not receipt or amount is None or amount <= 0:
+            continue
+
+        chunk.append(
+            {
+                "line": line_number,
+                "receipt": receipt,
+                "amount": amount,
+                "reference": value(row, "reference"),
+                "completed_at": value(row, "completed_at"),
+                "party": value(row, "party"),
+            }
+        )
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class StatementReconciler:
+    """
+    Reconciles one statement. Feed it chunks with `reconcile_chunk`, then
+    read `matched`, `unmatched` and `duplicates`.
+    """
+
+    def __init__(self, auto_complete=False):
+        self.auto_complete = auto_complete
+        self.matched = []
+        self.unmatched = []
+        self.duplicates = []
+        self.completed = 0
+        self.skipped = 0
+        self._seen_receipts = set()
+        self._claimed = set()
+
+    # ---------------------------------------------------------
+    # Lookups (two queries per payment type per chunk)
+    # ---------------------------------------------------------
+
+    def _recorded(self, receipts):
+        """Transactions that already carry one of `receipts`, by receipt."""
+        recorded = defaultdict(list)
+        for callback_type, (model, _) in PAYMENT_MODELS.items():
+            for row in model.objects.filter(mpesa_receipt_number__in=receipts).values(
+                "pk", "reference", "amount", "payment_status", "mpesa_receipt_number"
+            ):
+                row["type"] = callback_type
+                recorded[row["mpesa_receipt_number"].upper()].append(row)
+        return recorded
+
+    def _pending(self, lines):
+        """
+        Pending STK transactions without a receipt, hash-indexed by
+        (account number, amount), oldest first.
+        """
+        references = {line["reference"] for line in lines if line["reference"]}
+        amounts = {line["amount"] for line in lines}
+        pending = defaultdict(deque)
+        if not references:
+            return pending
+
+        for callback_type, (model, account_field) in PAYMENT_MODELS.items():
+            rows = (
+                model.objects.filter(
+                    payment_status="PENDING",
+                    mpesa_receipt_number__isnull=True,
+                    amount__in=amounts,
+                    **{f"{account_field}__in": references},
+                )
+                .order_by("created_at")
+                .values("pk", "reference", "amount", "payment_status", account_field)
+            )
+            for row in rows:
+                if row["pk"] in self._claimed:
+                    continue
+                row["type"] = callback_type
+                pending[(row[account_field], row["amount"])].append(row)
+        return pending
+
+    # ---------------------------------------------------------
+    # Matching
+    # ---------------------------------------------------------
+
+    def _entry(self, line, transaction_row=None, **extra):
+        entry = {
+            "line": line["line"],
+            "receipt": line["receipt"],
+            "amount": str(line["amount"]),
+            "reference": line["reference"],
+            "completed_at": line["completed_at"],
+            "party": line["party"],
+        }
+        if transaction_row:
+            entry.update(
+                {
+                    "type": transaction_row["type"],
+                    "transaction": transaction_row["reference"],
+                    "transaction_amount": str(transaction_row["amount"]),
+                    "payment_status": transaction_row["payment_status"],
+                }
+            )
+        entry.update(extra)
+        return entry
+
+    def reconcile_chunk(self, lines):
+        # Receipts repeated in the statement are reported once as duplicates
+        unique = {}
+        for line in lines:
+            key = line["receipt"]
+            if key in self._seen_receipts or key in unique:
+                self.duplicates.append(
+                    self._entry(line, reason="Repeated in statement")
+                )
+            else:
+                unique[key] = line
+        self._seen_receipts.update(unique)
+
+        recorded = self._recorded(list(unique))
+        remaining = []
+        for receipt, line in unique.items():
+            rows = recorded.get(receipt)
+            if not rows:
+                remaining.append(line)
+            elif len(rows) > 1:
+                for row in rows:
+                    self.duplicates.append(
+                        self._entry(
+                            line,
+                            row,
+                            reason=f"Receipt recorded on {len(rows)} transactions",
+                        )
+                    )
+            elif rows[0]["amount"] != line["amount"]:
+                self.unmatched.append(
+                    self._entry(line, rows[0], reason="Amount mismatch")
+                )
+            else:
+                self.matched.append(self._entry(line, rows[0], match="receipt"))
+
+        pending = self._pending(remaining)
+        to_complete = defaultdict(list)
+        for line in remaining:
+            candidates = pending.get((line["reference"], line["amount"]))
+            if not candidates:
+                self.unmatched.append(
+                    self._entry(line, reason="No matching transaction")
+                )
+                continue
+            row = candidates.popleft()
+            self._claimed.add(row["pk"])
+            entry = self._entry(
+                line,
+                row,
+                match="reference_amount",
+                action="completed" if self.auto_complete else "pending",
+            )
+            self.matched.append(entry)
+            to_complete[row["type"]].append((row["pk"], line, entry))
+
+        if self.auto_complete and to_complete:
+            self._complete(to_complete)
+
+    def _complete(self, to_complete):
+        """
+        Complete the matched pending transactions. They are re-selected
+        under lock: one a callback or sweep resolved since `_pending` read
+        it is left alone and counted as skipped.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            completed_pks = []
+            for callback_type, items in to_complete.items():
+                model = PAYMENT_MODELS[callback_type][0]
+                still_pending = set(
+                    model.objects.select_for_update()
+                    .filter(
+                        pk__in=[pk for pk, _, _ in items],
+                        payment_status="PENDING",
+                        mpesa_receipt_number__isnull=True,
+                    )
+                    .values_list("pk", flat=True)
+                )
+                objs = []
+                for pk, line, entry in items:
+                    if pk not in still_pending:
+                        entry["action"] = "skipped"
+                        self.skipped += 1
+                        continue
+                    obj = model(pk=pk)
+                    obj.transaction_status = "Completed"
+                    obj.payment_status = "COMPLETED"
+                    obj.payment_status_description = "Completed from M-Pesa statement"
+                    obj.confirmation_code = line["receipt"]
+                    obj.mpesa_receipt_number = line["receipt"]
+                    obj.payment_date = now
+                    obj.updated_at = now
+                    objs.append(obj)
+                model.objects.bulk_update(objs, COMPLETED_FIELDS)
+                completed_pks += [obj.pk for obj in objs]
+
+            if completed_pks:
+                StkRequest.objects.filter(object_id__in=completed_pks).update(
+                    status="COMPLETED", updated_at=now
+                )
+                # bulk_update sends no post_save: invalidate cached reports here
+                bump_ledger_version()
+        self.completed += len(completed_pks)
+
+    # ---------------------------------------------------------
+    # Result
+    # ---------------------------------------------------------
+
+    def summary(self):
+        return {
+            "matched": len(self.matched),
+            "unmatched": len(self.unmatched),
+            "duplicates": len(self.duplicates),
+            "auto_completed": self.completed,
+            "auto_complete_skipped": self.skipped,
+        }
+
+
+def reconcile_statement(
+    stream, auto_complete=False, chunk_size=RECONCILIATION_CHUNK_SIZE
+):
+    """
+    Reconcile a statement read from `stream` (text, or binary decoded as
+    UTF-8). Returns the finished StatementReconciler.
+    """
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+    reconciler = StatementReconciler(auto_complete=auto_complete)
+    for lines in iter_statement_lines(stream, chunk_size=chunk_size):
+        reconciler.reconcile_chunk(lines)
+    return reconciler
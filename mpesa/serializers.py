@@ -11,6 +11,12 @@ class MpesaBodySerializer(serializers.ModelSerializer):
         fields = (
             "body",
             "reference",
+            "callback_type",
+            "checkout_request_id",
+            "processing_status",
+            "processing_error",
+            "attempts",
+            "processed_at",
             "created_at",
             "updated_at",
         )
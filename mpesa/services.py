@@ -0,0 +1,317 @@
+"""
+M-Pesa STK callback ingestion.
+
+Callback views only store the raw body (`ingest_callback`) and acknowledge
+Safaricom straight away. The stored bodies are then applied to their
+deposits / loan payments in batches by `process_pending_callbacks`, run by
+the in-process worker (mpesa/worker.py) or the process_mpesa_callbacks
+command. Processing is idempotent, so bodies can be replayed safely.
+"""
+
+import hashlib
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from mpesa.models import MpesaBody, StkRequest
+from savingsdeposits.models import SavingsDeposit
+from loanpayments.models import LoanPayment
+from loanpayments.utils import send_loan_payment_pending_update_email
+
+logger = logging.getLogger(__name__)
+
+CALLBACK_BATCH_SIZE = 100
+
+DEPOSIT = "DEPOSIT"
+LOAN_PAYMENT = "LOAN_PAYMENT"
+
+
+# ---------------------------------------------------------
+# Ingestion
+# ---------------------------------------------------------
+
+
+def get_stk_callback(body):
+    if not isinstance(body, dict):
+        return {}
+    return (body.get("Body") or {}).get("stkCallback") or {}
+
+
+def get_idempotency_key(callback_type, body):
+    """
+    Safaricom sends one final callback per CheckoutRequestID and retries it
+    verbatim when we are slow, so (type, checkout id) identifies it. Bodies
+    without a checkout id fall back to a hash of their content.
+    """
+    checkout_request_id = get_stk_callback(body).get("CheckoutRequestID")
+    if checkout_request_id:
+        return f"{callback_type}:{checkout_request_id}"
+    digest = hashlib.sha256(
+        json.dumps(body, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return f"{callback_type}:sha256:{digest}"
+
+
+def ingest_callback(callback_type, body):
+    """
+    Store a raw callback body once. Returns (mpesa_body, created); created is
+    False for a retry of a callback that was already received.
+    """
+    idempotency_key = get_idempotency_key(callback_type, body)
+    checkout_request_id = get_stk_callback(body).get("CheckoutRequestID")
+
+    existing = MpesaBody.objects.filter(idempotency_key=idempotency_key).first()
+    if existing:
+        return existing, False
+
+    try:
+        with transaction.atomic():
+            mpesa_body = MpesaBody.objects.create(
+                body=body,
+                callback_type=callback_type,
+                checkout_request_id=checkout_request_id,
+                idempotency_key=idempotency_key,
+                processing_status="PENDING" if checkout_request_id else "IGNORED",
+                processing_error=(
+                    None if checkout_request_id else "Missing CheckoutRequestID"
+                ),
+            )
+    except IntegrityError:
+        # The same callback arrived concurrently
+        return MpesaBody.objects.get(idempotency_key=idempotency_key), False
+
+    return mpesa_body, True
+
+
+# ---------------------------------------------------------
+# STK request registry
+# ---------------------------------------------------------
+
+
+def register_stk_request(
+    payment, callback_type, checkout_request_id, merchant_request_id=None
+):
+    """Record which deposit / loan payment an STK push was sent for."""
+    stk_request, _ = StkRequest.objects.update_or_create(
+        checkout_request_id=checkout_request_id,
+        defaults={
+            "merchant_request_id": merchant_request_id,
+            "callback_type": callback_type,
+            "content_type": ContentType.objects.get_for_model(payment),
+            "object_id": payment.pk,
+            "status": payment.payment_status,
+        },
+    )
+    return stk_request
+
+
+aregister_stk_request = sync_to_async(register_stk_request)
+
+
+# ---------------------------------------------------------
+# Processing
+# ---------------------------------------------------------
+
+
+def _metadata(stk_callback, name):
+    items = (stk_callback.get("CallbackMetadata") or {}).get("Item", [])
+    return next((item.get("Value") for item in items if item.get("Name") == name), None)
+
+
+def _apply_callback(payment, stk_callback):
+    """
+    Apply an STK result to a SavingsDeposit or LoanPayment.
+    Returns True if the payment was completed by this callback.
+    """
+    if stk_callback.get("ResultCode") != 0:
+        payment.transaction_status = "Failed"
+        payment.payment_status = "FAILED"
+        payment.payment_status_description = stk_callback.get(
+            "ResultDesc", "Payment failed"
+        )
+        payment.save()
+        return False
+
+    confirmation_code = _metadata(stk_callback, "MpesaReceiptNumber")
+    payment_account = _metadata(stk_callback, "PhoneNumber")
+
+    payment.transaction_status = "Completed"
+    payment.payment_status = "COMPLETED"
+    payment.payment_status_description = "Payment completed"
+    payment.confirmation_code = confirmation_code
+    payment.payment_account = payment_account
+    payment.mpesa_receipt_number = confirmation_code
+    payment.mpesa_phone_number = payment_account
+    payment.payment_date = timezone.now()
+    payment.save()
+    return True
+
+
+def _payment_queryset(callback_type):
+    if callback_type == LOAN_PAYMENT:
+        return LoanPayment.objects.select_related("loan_account__member")
+    return SavingsDeposit.objects.all()
+
+
+def _load_payments(bodies):
+    """
+    Resolve the deposits and loan payments referenced by `bodies`: one
+    indexed query on the STK registry, then a primary key lookup per payment
+    type. Checkout ids pushed before the registry existed fall back to the
+    payment tables.
+    """
+    ids = {DEPOSIT: set(), LOAN_PAYMENT: set()}
+    for mpesa_body in bodies:
+        checkout_request_id = mpesa_body.checkout_request_id or get_stk_callback(
+            mpesa_body.body
+        ).get("CheckoutRequestID")
+        if not checkout_request_id:
+            continue
+        # Bodies stored before ingestion did not record their type
+        for callback_type in (
+            [mpesa_body.callback_type] if mpesa_body.callback_type else ids
+        ):
+            ids[callback_type].add(checkout_request_id)
+
+    registry = {
+        stk_request.checkout_request_id: stk_request
+        for stk_request in StkRequest.objects.filter(
+            checkout_request_id__in=ids[DEPOSIT] | ids[LOAN_PAYMENT]
+        )
+    }
+
+    payments = {DEPOSIT: {}, LOAN_PAYMENT: {}}
+    for callback_type, checkout_ids in ids.items():
+        entries = [
+            registry[checkout_request_id]
+            for checkout_request_id in checkout_ids
+            if checkout_request_id in registry
+            and registry[checkout_request_id].callback_type == callback_type
+        ]
+        if entries:
+            by_pk = _payment_queryset(callback_type).in_bulk(
+                [entry.object_id for entry in entries]
+            )
+            for entry in entries:
+                if entry.object_id in by_pk:
+                    payments[callback_type][entry.checkout_request_id] = by_pk[
+                        entry.object_id
+                    ]
+
+        unregistered = checkout_ids - registry.keys()
+        if unregistered:
+            for payment in _payment_queryset(callback_type).filter(
+                checkout_request_id__in=unregistered
+            ):
+                payments[callback_type][payment.checkout_request_id] = payment
+
+    return payments, registry
+
+
+def _process_body(mpesa_body, payments, completed_loan_payments):
+    stk_callback = get_stk_callback(mpesa_body.body)
+    checkout_request_id = stk_callback.get("CheckoutRequestID")
+    if not checkout_request_id:
+        return "IGNORED", "Missing CheckoutRequestID", None
+
+    callback_types = (
+        [mpesa_body.callback_type] if mpesa_body.callback_type else payments
+    )
+    payment = next(
+        (
+            payments[callback_type][checkout_request_id]
+            for callback_type in callback_types
+            if checkout_request_id in payments[callback_type]
+        ),
+        None,
+    )
+    if payment is None:
+        label = (
+            "Loan payment" if mpesa_body.callback_type == LOAN_PAYMENT else "Deposit"
+        )
+        return "IGNORED", f"{label} not found", None
+
+    # prevent duplicate processing
+    if payment.payment_status == "COMPLETED":
+        return "PROCESSED", "Already processed", payment
+
+    with transaction.atomic():
+        completed = _apply_callback(payment, stk_callback)
+
+    if completed and isinstance(payment, LoanPayment):
+        completed_loan_payments.append(payment)
+    return "PROCESSED", None, payment
+
+
+def process_callbacks(bodies):
+    """
+    Apply a batch of stored callbacks. Each body is processed on its own, so
+    one bad callback does not hold up the rest. Returns a status count.
+    """
+    bodies = list(bodies)
+    payments, registry = _load_payments(bodies)
+    completed_loan_payments = []
+    stk_requests = []
+    summary = {"PROCESSED": 0, "IGNORED": 0, "FAILED": 0}
+
+    for mpesa_body in bodies:
+        try:
+            status, error, payment = _process_body(
+                mpesa_body, payments, completed_loan_payments
+            )
+        except Exception as e:
+            logger.error(f"Failed to process M-Pesa callback {mpesa_body.pk}: {e}")
+            status, error, payment = "FAILED", str(e), None
+
+        stk_request = registry.get(mpesa_body.checkout_request_id)
+        if payment is not None and stk_request is not None:
+            stk_request.status = payment.payment_status
+            stk_requests.append(stk_request)
+
+        mpesa_body.processing_status = status
+        mpesa_body.processing_error = error
+        mpesa_body.attempts += 1
+        mpesa_body.processed_at = timezone.now()
+        summary[status] += 1
+
+    MpesaBody.objects.bulk_update(
+        bodies,
+        ["processing_status", "processing_error", "attempts", "processed_at"],
+    )
+    StkRequest.objects.bulk_update(stk_requests, ["status", "updated_at"])
+
+    # send email to member, once the batch is committed
+    for loan_payment in completed_loan_payments:
+        transaction.on_commit(
+            lambda loan_payment=loan_payment: send_loan_payment_pending_update_email(
+                loan_payment.loan_account.member, loan_payment
+            )
+        )
+
+    return summary
+
+
+def process_pending_callbacks(batch_size=CALLBACK_BATCH_SIZE):
+    """
+    Drain PENDING callbacks in batches. Rows are claimed with
+    SKIP LOCKED so several workers can drain concurrently.
+    """
+    totals = {"PROCESSED": 0, "IGNORED": 0, "FAILED": 0}
+    while True:
+        with transaction.atomic():
+            bodies = list(
+                MpesaBody.objects.select_for_update(skip_locked=True)
+                .filter(processing_status="PENDING")
+                .order_by("created_at")[:batch_size]
+            )
+            if not bodies:
+                return totals
+            summary = process_callbacks(bodies)
+
+        for status, count in summary.items():
+            totals[status] += count
+        logger.info(f"Processed M-Pesa callbacks: {summary}")
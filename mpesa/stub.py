@@ -0,0 +1,173 @@
+"""
+Local stand-in for the Daraja API.
+
+Serves the OAuth, STK push and STK query endpoints well enough to exercise
+DarajaClient and the stale STK sweeper without Safaricom's sandbox. Used by
+the mpesa tests and by the run_daraja_stub command for local development
+(point MPESA_API_URL at it).
+"""
+
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STK_PUSH_PATH = "/mpesa/stkpush/v1/processrequest"
+STK_QUERY_PATH = "/mpesa/stkpushquery/v1/query"
+
+# STK query result codes Daraja returns for finished pushes
+RESULT_DESCRIPTIONS = {
+    "0": "The service request is processed successfully.",
+    "1": "The balance is insufficient for the transaction.",
+    "1032": "Request cancelled by user",
+    "1037": "DS timeout user cannot be reached",
+    "2001": "The initiator information is invalid.",
+}
+
+
+class StubDarajaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status_code, body):
+        data = json.dumps(body).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.token_calls += 1
+            server.token_count += 1
+            token = f"token-{server.token_count}"
+        if server.token_delay:
+            time.sleep(server.token_delay)
+        self._send(200, {"access_token": token, "expires_in": "3599"})
+
+    def do_POST(self):
+        server = self.server
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+        if self.headers["Authorization"] in server.revoked:
+            self._send(401, {"errorMessage": "Invalid Access Token"})
+        elif self.path == STK_QUERY_PATH:
+            self._stk_query(payload)
+        else:
+            self._stk_push(payload)
+
+    def _stk_push(self, payload):
+        server = self.server
+        with server.lock:
+            server.stk_calls += 1
+            server.client_ports.add(self.client_address[1])
+            status_code = server.stk_statuses.pop(0) if server.stk_statuses else 200
+
+        if status_code != 200:
+            self._send(status_code, {"errorMessage": "stub error"})
+            return
+        self._send(
+            200,
+            {
+                "MerchantRequestID": "m-1",
+                "CheckoutRequestID": server.next_checkout_request_id(),
+                "ResponseCode": "0",
+                "ResponseDescription": "Success. Request accepted for processing",
+                "CustomerMessage": "Success. Request accepted for processing",
+            },
+        )
+
+    def _stk_query(self, payload):
+        server = self.server
+        checkout_request_id = payload.get("CheckoutRequestID")
+        with server.lock:
+            server.query_calls += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            if server.query_delay:
+                time.sleep(server.query_delay)
+            result_code = server.query_results.get(
+                checkout_request_id, server.default_query_result
+            )
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+        if result_code is None:
+            self._send(
+                500,
+                {
+                    "requestId": uuid.uuid4().hex,
+                    "errorCode": "500.001.1001",
+                    "errorMessage": "The transaction is being processed",
+                },
+            )
+            return
+        self._send(
+            200,
+            {
+                "ResponseCode": "0",
+                "ResponseDescription": "The service request has been accepted successsfully",
+                "MerchantRequestID": "m-1",
+                "CheckoutRequestID": checkout_request_id,
+                "ResultCode": result_code,
+                "ResultDesc": RESULT_DESCRIPTIONS.get(result_code, "Failed"),
+            },
+        )
+
+
+class StubDarajaServer(ThreadingHTTPServer):
+    """
+    Threaded stub server. Behaviour is set through attributes:
+
+    - `stk_statuses`: HTTP statuses returned by the next STK pushes
+    - `revoked`: Authorization headers answered with 401
+    - `query_results`: STK query result code per CheckoutRequestID; None
+      means the push is still awaiting the customer
+    - `default_query_result`: result code for CheckoutRequestIDs not listed
+    - `token_delay` / `query_delay`: seconds to hold each response
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), token_delay=0, query_delay=0):
+        super().__init__(address, StubDarajaHandler)
+        self.lock = threading.Lock()
+        self.token_delay = token_delay
+        self.query_delay = query_delay
+        self.token_calls = 0
+        self.token_count = 0
+        self.stk_calls = 0
+        self.stk_statuses = []
+        self.client_ports = set()
+        self.revoked = set()
+        self.query_calls = 0
+        self.query_results = {}
+        self.default_query_result = "0"
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._checkout_count = 0
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def next_checkout_request_id(self):
+        with self.lock:
+            self._checkout_count += 1
+            return f"ws_CO_{self._checkout_count}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,317 @@
+"""
+Stale STK push sweeper.
+
+A deposit or loan payment stays PENDING when its callback never arrives.
+`sweep_stale_stk_requests` picks registered STK pushes still pending after
+MPESA_STK_SWEEP_AGE_MINUTES, asks Daraja for their result (STK query, a few
+at a time on a thread pool) and completes or fails them in bulk. Run it
+with the sweep_stale_stk_requests command.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from financials.cache import bump_ledger_version
+from loanpayments.models import LoanPayment
+from loanpayments.utils import send_loan_payment_pending_update_email
+from mpesa.client import MpesaError, get_daraja_client
+from mpesa.models import StkRequest
+from mpesa.services import DEPOSIT, LOAN_PAYMENT
+from savingsdeposits.models import SavingsDeposit
+
+logger = logging.getLogger(__name__)
+
+SWEEP_STATS_PREFIX = "mpesa:sweep_stats"
+
+# Pushes younger than this may still get their callback
+MPESA_STK_SWEEP_AGE_MINUTES = getattr(settings, "MPESA_STK_SWEEP_AGE_MINUTES", 10)
+# Pushes Daraja still reports as in progress (or answers with an error for)
+# after this are failed. Pushes it cannot be reached for stay pending.
+MPESA_STK_SWEEP_EXPIRY_HOURS = getattr(settings, "MPESA_STK_SWEEP_EXPIRY_HOURS", 24)
+# Concurrent STK queries; Daraja throttles bursts per consumer key
+MPESA_STK_SWEEP_CONCURRENCY = getattr(settings, "MPESA_STK_SWEEP_CONCURRENCY", 5)
+MPESA_STK_SWEEP_BATCH_SIZE = getattr(settings, "MPESA_STK_SWEEP_BATCH_SIZE", 100)
+
+PAYMENT_MODELS = {DEPOSIT: SavingsDeposit, LOAN_PAYMENT: LoanPayment}
+
+RESULT_FIELDS = [
+    "transaction_status",
+    "payment_status",
+    "payment_status_description",
+    "updated_at",
+]
+
+SWEEP_COUNTERS = (
+    "runs",
+    "checked",
+    "completed",
+    "failed",
+    "closed",
+    "pending",
+    "errors",
+    "unreachable",
+)
+
+
+# ---------------------------------------------------------
+# Daraja
+# ---------------------------------------------------------
+
+
+def _query(client, checkout_request_id):
+    """
+    Query one push. Returns (outcome, description, latency): outcome is
+    COMPLETED, FAILED, PENDING (no result yet), ERROR (Daraja answered
+    with an error) or UNREACHABLE (no answer: transport error, open
+    circuit, ...).
+    """
+    start_time = time.perf_counter()
+    try:
+        response = client.stk_query(checkout_request_id)
+    except (MpesaError, requests.RequestException) as e:
+        return "UNREACHABLE", str(e), time.perf_counter() - start_time
+    latency = time.perf_counter() - start_time
+
+    result_code = response.get("ResultCode")
+    if result_code is None:
+        if response.get("errorCode") == client.STK_QUERY_PENDING_ERROR:
+            return "PENDING", response.get("errorMessage"), latency
+        return "ERROR", response.get("errorMessage") or str(response), latency
+    if str(result_code) == "0":
+        return "COMPLETED", response.get("ResultDesc"), latency
+    return "FAILED", response.get("ResultDesc") or "Payment failed", latency
+
+
+# ---------------------------------------------------------
+# Applying results
+# ---------------------------------------------------------
+
+
+def _resolve(stk_request, outcome, description, expire_before):
+    """
+    The outcome to apply for one query result. Pushes past the expiry that
+    Daraja still reports as in progress, or keeps answering with an error
+    for (e.g. an unknown CheckoutRequestID), are failed. Pushes Daraja
+    could not be asked about stay pending whatever their age.
+    """
+    if outcome in ("PENDING", "ERROR") and stk_request.created_at < expire_before:
+        return "FAILED", "No M-Pesa result before expiry"
+    return outcome, description
+
+
+def _apply_results(stk_requests, outcomes):
+    """
+    Complete or fail the payments behind `stk_requests` in bulk: one locking
+    query and one bulk update per payment type, plus one for the registry.
+    `outcomes` are the resolved (outcome, description) pairs.
+
+    Payments that left PENDING meanwhile (a late callback, or any other
+    path) are left alone; their registry rows take the payment's current
+    status, and are CANCELLED if the payment is gone.
+    Returns counts of COMPLETED, FAILED and closed registry rows.
+    """
+    now = timezone.now()
+    to_apply = {
+        stk_request.object_id: (stk_request, outcome, description)
+        for stk_request, (outcome, description) in zip(stk_requests, outcomes)
+        if outcome in ("COMPLETED", "FAILED")
+    }
+    counts = {"COMPLETED": 0, "FAILED": 0, "closed": 0}
+    if not to_apply:
+        return counts
+
+    completed_loan_payments = []
+    updated_requests = []
+
+    with transaction.atomic():
+        for callback_type, model in PAYMENT_MODELS.items():
+            ids = [
+                object_id
+                for object_id, (stk_request, _, _) in to_apply.items()
+                if stk_request.callback_type == callback_type
+            ]
+            if not ids:
+                continue
+            payments = model.objects.select_for_update().filter(
+                pk__in=ids, payment_status="PENDING"
+            )
+            if model is LoanPayment:
+                payments = payments.select_related("loan_account__member")
+
+            payments = list(payments)
+            for payment in payments:
+                stk_request, outcome, description = to_apply[payment.pk]
+                payment.payment_status = outcome
+                payment.transaction_status = outcome.capitalize()
+                payment.payment_status_description = (description or "")[:100]
+                payment.updated_at = now
+                stk_request.status = outcome
+                stk_request.updated_at = now
+                updated_requests.append(stk_request)
+                counts[outcome] += 1
+                if outcome == "COMPLETED" and model is LoanPayment:
+                    completed_loan_payments.append(payment)
+            model.objects.bulk_update(payments, RESULT_FIELDS)
+
+            missed = set(ids) - {payment.pk for payment in payments}
+            if missed:
+                current = dict(
+                    model.objects.filter(pk__in=missed).values_list(
+                        "pk", "payment_status"
+                    )
+                )
+                for object_id in missed:
+                    stk_request = to_apply[object_id][0]
+                    stk_request.status = current.get(object_id, "CANCELLED")
+                    stk_request.updated_at = now
+                    updated_requests.append(stk_request)
+                    counts["closed"] += 1
+
+        StkRequest.objects.bulk_update(updated_requests, ["status", "updated_at"])
+        if counts["COMPLETED"]:
+            # bulk_update sends no post_save: invalidate cached reports here
+            bump_ledger_version()
+
+    for loan_payment in completed_loan_payments:
+        transaction.on_commit(
+            lambda loan_payment=loan_payment: send_loan_payment_pending_update_email(
+                loan_payment.loan_account.member, loan_payment
+            )
+        )
+    return counts
+
+
+# ---------------------------------------------------------
+# Sweep
+# ---------------------------------------------------------
+
+
+def _stale_batches(cutoff, batch_size):
+    """Pending registry rows created before `cutoff`, oldest first."""
+    queryset = StkRequest.objects.filter(
+        status="PENDING", created_at__lt=cutoff
+    ).order_by("created_at", "pk")
+    cursor = Q()
+    while True:
+        batch = list(queryset.filter(cursor)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+        cursor = Q(created_at__gt=last.created_at) | Q(
+            created_at=last.created_at, pk__gt=last.pk
+        )
+
+
+def sweep_stale_stk_requests(
+    older_than_minutes=MPESA_STK_SWEEP_AGE_MINUTES,
+    batch_size=MPESA_STK_SWEEP_BATCH_SIZE,
+    max_workers=MPESA_STK_SWEEP_CONCURRENCY,
+    client=None,
+):
+    """
+    Query every stale pending STK push once and apply the results.
+    Returns the run's counts and latencies (also recorded for
+    `get_sweep_stats`).
+    """
+    client = client or get_daraja_client()
+    now = timezone.now()
+    cutoff = now - timedelta(minutes=older_than_minutes)
+    expire_before = now - timedelta(hours=MPESA_STK_SWEEP_EXPIRY_HOURS)
+
+    start_time = time.perf_counter()
+    summary = {name: 0 for name in SWEEP_COUNTERS if name != "runs"}
+    latencies = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for stk_requests in _stale_batches(cutoff, batch_size):
+            # Only the HTTP calls run on the pool; the ORM stays on this thread
+            results = list(
+                executor.map(
+                    lambda stk_request: _query(client, stk_request.checkout_request_id),
+                    stk_requests,
+                )
+            )
+            outcomes = [
+                _resolve(stk_request, outcome, description, expire_before)
+                for stk_request, (outcome, description, _) in zip(stk_requests, results)
+            ]
+            counts = _apply_results(stk_requests, outcomes)
+
+            summary["checked"] += len(stk_requests)
+            summary["completed"] += counts["COMPLETED"]
+            summary["failed"] += counts["FAILED"]
+            summary["closed"] += counts["closed"]
+            summary["errors"] += sum(1 for outcome, _ in outcomes if outcome == "ERROR")
+            summary["unreachable"] += sum(
+                1 for outcome, _ in outcomes if outcome == "UNREACHABLE"
+            )
+            latencies += [latency for _, _, latency in results]
+
+    summary["pending"] = summary["checked"] - (
+        summary["completed"]
+        + summary["failed"]
+        + summary["closed"]
+        + summary["errors"]
+        + summary["unreachable"]
+    )
+    summary["duration"] = round(time.perf_counter() - start_time, 3)
+    summary["query_latency_avg"] = (
+        round(sum(latencies) / len(latencies), 3) if latencies else None
+    )
+    summary["query_latency_max"] = round(max(latencies), 3) if latencies else None
+
+    _record_sweep(summary)
+    logger.info(f"Swept stale M-Pesa STK requests: {summary}")
+    return summary
+
+
+# ---------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------
+
+
+def _incr(name, amount):
+    key = f"{SWEEP_STATS_PREFIX}:{name}"
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        pass
+
+
+def _record_sweep(summary):
+    _incr("runs", 1)
+    for name in SWEEP_COUNTERS[1:]:
+        _incr(name, summary[name])
+    # Durations are kept in milliseconds so they can be incremented
+    _incr("duration_ms", int(summary["duration"] * 1000))
+    cache.set(
+        f"{SWEEP_STATS_PREFIX}:last",
+        {**summary, "finished_at": timezone.now().isoformat()},
+        timeout=None,
+    )
+
+
+def get_sweep_stats():
+    """Counters and sweep latency across runs, plus the last run."""
+    totals = {
+        name: cache.get(f"{SWEEP_STATS_PREFIX}:{name}", 0) for name in SWEEP_COUNTERS
+    }
+    duration_ms = cache.get(f"{SWEEP_STATS_PREFIX}:duration_ms", 0)
+    return {
+        "totals": totals,
+        "average_duration": (
+            round(duration_ms / 1000 / totals["runs"], 3) if totals["runs"] else None
+        ),
+        "last_run": cache.get(f"{SWEEP_STATS_PREFIX}:last"),
+    }
@@ -1,3 +1,605 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+import httpx
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from rest_framework.test import APIClient
+from django.urls import reverse
+from django.utils import timezone
+
+from mpesa.client import CircuitBreaker, DarajaClient, MpesaUnavailable
+from mpesa.models import MpesaBody, StkRequest
+from mpesa.reconciliation import StatementReconciler, reconcile_statement
+from mpesa.stub import StubDarajaServer
+from mpesa.utils import astk_push
+from mpesa.views import _stk_push_response
+from mpesa.sweeper import (
+    _apply_results,
+    _resolve,
+    get_sweep_stats,
+    sweep_stale_stk_requests,
+)
+from mpesa.services import (
+    _load_payments,
+    ingest_callback,
+    process_callbacks,
+    process_pending_callbacks,
+    register_stk_request,
+)
+from savings.models import SavingsAccount
+from savingsdeposits.models import SavingsDeposit
+from savingtypes.models import SavingType
+
+User = get_user_model()
+
+
+class AsyncStkPushViewTests(TestCase):
+    def setUp(self):
+        self.client = Client(enforce_csrf_checks=True)
+
+    def test_missing_reference_is_rejected(self):
+        response = self.client.post(
+            reverse("mpesa:async_payment"),
+            {"phone_number": "254700000000"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "No deposit reference provided"})
+
+    def test_unknown_deposit_returns_404(self):
+        response = self.client.post(
+            reverse("mpesa:async_payment"),
+            {"deposit_reference": "missing", "phone_number": "254700000000"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_unknown_loan_payment_returns_404(self):
+        response = self.client.post(
+            reverse("mpesa:async_loan_payment"),
+            {"loan_payment_reference": "missing", "phone_number": "254700000000"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class AsyncStkPushTests(TestCase):
+    """astk_push against a mocked Daraja, sharing the sync client's breaker."""
+
+    def setUp(self):
+        self.requests = []
+        self.responses = []
+        self.daraja = DarajaClient(
+            base_url="http://daraja.test",
+            consumer_key="key",
+            consumer_secret="secret",
+            breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0),
+        )
+        self.tokens = mock.AsyncMock(side_effect=["token-1", "token-2"])
+        for patcher in (
+            mock.patch("mpesa.client.get_daraja_client", return_value=self.daraja),
+            mock.patch("mpesa.utils.aget_access_token", self.tokens),
+            mock.patch("mpesa.utils.get_http_client", self.http_client),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def http_client(self):
+        async def handler(request):
+            self.requests.append(request)
+            response = self.responses.pop(0)
+            if isinstance(response, float):
+                await asyncio.sleep(response)
+            return response
+
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def test_a_rejected_token_is_refreshed_once(self):
+        self.responses = [
+            httpx.Response(401, json={"errorMessage": "Invalid Access Token"}),
+            httpx.Response(200, json={"ResponseCode": "0"}),
+        ]
+
+        self.assertEqual(await astk_push({}), {"ResponseCode": "0"})
+        self.assertEqual(
+            [request.headers["Authorization"] for request in self.requests],
+            ["Bearer token-1", "Bearer token-2"],
+        )
+
+    async def test_non_json_errors_answer_like_the_sync_view(self):
+        self.responses = [httpx.Response(502, text="<html>Bad Gateway</html>")]
+
+        response = await _stk_push_response({}, mock.AsyncMock())
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(
+            json.loads(response.content), {"error": "STK Push request failed"}
+        )
+
+    async def test_cancelled_trial_calls_release_the_breaker(self):
+        self.daraja.breaker.record_failure()
+        self.assertEqual(self.daraja.breaker.state, "half-open")
+        self.responses = [10.0]
+
+        push = asyncio.ensure_future(astk_push({}))
+        while not self.requests:
+            await asyncio.sleep(0)
+        push.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await push
+
+        # The next call is let through as a new trial
+        self.daraja.breaker.before_call()
+
+
+# Worker threads share the token through the cache; keep it off the
+# test database so they do not contend for its locks.
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class DarajaClientTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Slow enough for concurrent callers to pile up behind the refresh
+        self.server = StubDarajaServer(token_delay=0.2).start()
+        self.client = DarajaClient(
+            base_url=self.server.url,
+            consumer_key="key",
+            consumer_secret="secret",
+            backoff_base=0.01,
+            breaker=CircuitBreaker(failure_threshold=3, reset_timeout=60),
+        )
+
+    def tearDown(self):
+        self.client.session.close()
+        self.server.stop()
+
+    def push(self):
+        return self.client.stk_push(
+            amount=100,
+            phone_number="254700000000",
+            callback_url="http://localhost/cb",
+            account_reference="SA001",
+            description="Deposit SA001",
+        )
+
+    def test_concurrent_pushes_share_one_token_refresh(self):
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            results = list(executor.map(lambda _: self.push(), range(10)))
+
+        self.assertTrue(all(r["ResponseCode"] == "0" for r in results))
+        self.assertEqual(self.server.token_calls, 1)
+        self.assertEqual(self.server.stk_calls, 10)
+
+    def test_sequential_pushes_reuse_the_connection(self):
+        for _ in range(5):
+            self.push()
+        self.assertEqual(len(self.server.client_ports), 1)
+
+    def test_unavailable_responses_are_retried(self):
+        self.server.stk_statuses = [503, 503]
+        self.assertEqual(self.push()["ResponseCode"], "0")
+        self.assertEqual(self.server.stk_calls, 3)
+
+    def test_server_errors_on_stk_push_are_not_resent(self):
+        self.server.stk_statuses = [500]
+        self.assertEqual(self.push()["errorMessage"], "stub error")
+        self.assertEqual(self.server.stk_calls, 1)
+
+    def test_rejected_token_is_refreshed_once(self):
+        self.push()
+        self.server.revoked.add("Bearer token-1")
+
+        self.assertEqual(self.push()["ResponseCode"], "0")
+        self.assertEqual(self.server.token_calls, 2)
+
+    def test_circuit_opens_after_repeated_failures(self):
+        self.push()
+        self.server.stk_statuses = [500] * 3
+        for _ in range(3):
+            self.push()
+
+        with self.assertRaises(MpesaUnavailable):
+            self.push()
+        self.assertEqual(self.server.stk_calls, 4)
+        self.assertEqual(self.client.breaker.state, "open")
+
+
+def stk_callback_body(checkout_request_id, result_code=0):
+    callback = {
+        "MerchantRequestID": "m-1",
+        "CheckoutRequestID": checkout_request_id,
+        "ResultCode": result_code,
+        "ResultDesc": "The service request is processed successfully.",
+    }
+    if result_code == 0:
+        callback["CallbackMetadata"] = {
+            "Item": [
+                {"Name": "Amount", "Value": 100},
+                {"Name": "MpesaReceiptNumber", "Value": "QWE123RTY"},
+                {"Name": "PhoneNumber", "Value": 254700000000},
+            ]
+        }
+    return {"Body": {"stkCallback": callback}}
+
+
+@override_settings(MPESA_CALLBACK_WORKER=False)
+class CallbackIngestionTests(TestCase):
+    def setUp(self):
+        member = User.objects.create_user(
+            email="member@example.com", password="pass", member_no="MM001"
+        )
+        saving_type = SavingType.objects.create(name="Member Savings")
+        account = SavingsAccount.objects.create(member=member, account_type=saving_type)
+        self.deposit = SavingsDeposit.objects.create(
+            savings_account=account, amount=100, checkout_request_id="ws_CO_1"
+        )
+
+    def post_callback(self, body):
+        return self.client.post(
+            reverse("mpesa:callback"), body, content_type="application/json"
+        )
+
+    def test_callback_is_stored_once_and_acknowledged(self):
+        for _ in range(2):
+            response = self.post_callback(stk_callback_body("ws_CO_1"))
+            self.assertEqual(response.json()["ResultCode"], 0)
+
+        self.assertEqual(MpesaBody.objects.count(), 1)
+        self.deposit.refresh_from_db()
+        self.assertEqual(self.deposit.payment_status, "PENDING")
+
+    def test_pending_callbacks_complete_their_deposits(self):
+        self.post_callback(stk_callback_body("ws_CO_1"))
+        self.post_callback(stk_callback_body("ws_CO_unknown"))
+
+        totals = process_pending_callbacks()
+
+        self.assertEqual(totals, {"PROCESSED": 1, "IGNORED": 1, "FAILED": 0})
+        self.deposit.refresh_from_db()
+        self.assertEqual(self.deposit.payment_status, "COMPLETED")
+        self.assertEqual(self.deposit.mpesa_receipt_number, "QWE123RTY")
+
+    def test_replay_is_idempotent(self):
+        self.post_callback(stk_callback_body("ws_CO_1"))
+        process_pending_callbacks()
+        body = MpesaBody.objects.get()
+
+        self.assertEqual(
+            process_callbacks([body]), {"PROCESSED": 1, "IGNORED": 0, "FAILED": 0}
+        )
+        body.refresh_from_db()
+        self.assertEqual(body.processing_error, "Already processed")
+        self.assertEqual(body.attempts, 2)
+
+    def test_callbacks_resolve_through_the_stk_registry(self):
+        stk_request = register_stk_request(self.deposit, "DEPOSIT", "ws_CO_1")
+        self.post_callback(stk_callback_body("ws_CO_1"))
+        bodies = list(MpesaBody.objects.all())
+
+        # registry + payments by primary key, nothing else
+        with self.assertNumQueries(2):
+            payments, registry = _load_payments(bodies)
+        self.assertEqual(payments["DEPOSIT"]["ws_CO_1"].pk, self.deposit.pk)
+
+        process_callbacks(bodies)
+        stk_request.refresh_from_db()
+        self.assertEqual(stk_request.status, "COMPLETED")
+
+
+class StatementReconciliationTests(TestCase):
+    def setUp(self):
+        member = User.objects.create_user(
+            email="member@example.com", password="pass", member_no="MM001"
+        )
+        saving_type = SavingType.objects.create(name="Member Savings")
+        self.account = SavingsAccount.objects.create(
+            member=member, account_type=saving_type
+        )
+        self.recorded = SavingsDeposit.objects.create(
+            savings_account=self.account,
+            amount=100,
+            payment_status="COMPLETED",
+            mpesa_receipt_number="RCP001",
+        )
+        self.pending = SavingsDeposit.objects.create(
+            savings_account=self.account, amount=250, checkout_request_id="ws_CO_2"
+        )
+        register_stk_request(self.pending, "DEPOSIT", "ws_CO_2")
+
+    def statement(self, *rows):
+        lines = ["Receipt No.,Completion Time,Paid In,Withdrawn,A/C No."]
+        lines += [",".join(row) for row in rows]
+        return io.StringIO("\n".join(lines) + "\n")
+
+    def test_lines_are_matched_in_constant_queries(self):
+        account_number = self.account.account_number
+        statement = self.statement(
+            ("RCP001", "2026-01-05 10:00:00", "100.00", "", account_number),
+            ("RCP002", "2026-01-05 11:00:00", '"1,250.00"', "", account_number),
+            ("RCP002", "2026-01-05 11:00:00", '"1,250.00"', "", account_number),
+            ("RCP003", "2026-01-05 12:00:00", "", "50.00", account_number),
+            ("RCP004", "2026-01-05 13:00:00", "250.00", "", account_number),
+        )
+
+        # receipts and pending candidates, for deposits and loan payments
+        with self.assertNumQueries(4):
+            reconciler = reconcile_statement(statement)
+
+        self.assertEqual(
+            reconciler.summary(),
+            {
+                "matched": 2,
+                "unmatched": 1,
+                "duplicates": 1,
+                "auto_completed": 0,
+                "auto_complete_skipped": 0,
+            },
+        )
+        self.assertEqual(reconciler.matched[0]["transaction"], self.recorded.reference)
+        self.assertEqual(reconciler.matched[1]["transaction"], self.pending.reference)
+        self.assertEqual(reconciler.unmatched[0]["receipt"], "RCP002")
+
+    def test_auto_complete_completes_pending_deposits(self):
+        statement = self.statement(
+            ("RCP004", "2026-01-05 13:00:00", "250.00", "", self.account.account_number)
+        )
+
+        reconciler = reconcile_statement(statement, auto_complete=True)
+
+        self.assertEqual(reconciler.completed, 1)
+        self.pending.refresh_from_db()
+        self.assertEqual(self.pending.payment_status, "COMPLETED")
+        self.assertEqual(self.pending.mpesa_receipt_number, "RCP004")
+        self.assertEqual(
+            StkRequest.objects.get(checkout_request_id="ws_CO_2").status, "COMPLETED"
+        )
+
+    def test_auto_complete_skips_transactions_resolved_meanwhile(self):
+        reconciler = StatementReconcilerRacingACallback(auto_complete=True)
+        reconciler.reconcile_chunk(
+            [
+                {
+                    "line": 2,
+                    "receipt": "RCP004",
+                    "amount": self.pending.amount,
+                    "reference": self.account.account_number,
+                    "completed_at": "2026-01-05 13:00:00",
+                    "party": "",
+                }
+            ]
+        )
+
+        self.assertEqual((reconciler.completed, reconciler.skipped), (0, 1))
+        self.assertEqual(reconciler.matched[0]["action"], "skipped")
+        self.pending.refresh_from_db()
+        self.assertEqual(self.pending.payment_status, "FAILED")
+        self.assertIsNone(self.pending.mpesa_receipt_number)
+        self.assertEqual(
+            StkRequest.objects.get(checkout_request_id="ws_CO_2").status, "PENDING"
+        )
+
+
+class StatementReconcilerRacingACallback(StatementReconciler):
+    """Fails the matched deposits between matching and completing them."""
+
+    def _complete(self, to_complete):
+        for items in to_complete.values():
+            SavingsDeposit.objects.filter(pk__in=[pk for pk, _, _ in items]).update(
+                payment_status="FAILED"
+            )
+        super()._complete(to_complete)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class StaleStkSweepTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.server = StubDarajaServer(query_delay=0.05).start()
+        self.client = DarajaClient(
+            base_url=self.server.url, consumer_key="key", consumer_secret="secret"
+        )
+
+        member = User.objects.create_user(
+            email="member@example.com", password="pass", member_no="MM001"
+        )
+        saving_type = SavingType.objects.create(name="Member Savings")
+        account = SavingsAccount.objects.create(member=member, account_type=saving_type)
+
+        self.deposits = {}
+        for checkout_request_id in ("ws_CO_1", "ws_CO_2", "ws_CO_3", "ws_CO_4"):
+            deposit = SavingsDeposit.objects.create(
+                savings_account=account,
+                amount=100,
+                checkout_request_id=checkout_request_id,
+            )
+            register_stk_request(deposit, "DEPOSIT", checkout_request_id)
+            self.deposits[checkout_request_id] = deposit
+        StkRequest.objects.update(created_at=timezone.now() - timedelta(minutes=30))
+
+        self.server.query_results = {"ws_CO_2": "1032", "ws_CO_3": None}
+
+    def tearDown(self):
+        self.client.session.close()
+        self.server.stop()
+
+    def status(self, checkout_request_id):
+        self.deposits[checkout_request_id].refresh_from_db()
+        return self.deposits[checkout_request_id].payment_status
+
+    def test_stale_pushes_are_finalised_from_their_query_result(self):
+        summary = sweep_stale_stk_requests(
+            older_than_minutes=10, max_workers=2, client=self.client
+        )
+
+        self.assertEqual(
+            {k: summary[k] for k in ("checked", "completed", "failed", "pending")},
+            {"checked": 4, "completed": 2, "failed": 1, "pending": 1},
+        )
+        self.assertEqual(self.status("ws_CO_1"), "COMPLETED")
+        self.assertEqual(self.status("ws_CO_2"), "FAILED")
+        self.assertEqual(self.status("ws_CO_3"), "PENDING")
+        self.assertEqual(self.server.max_in_flight, 2)
+        # "still processing" answers do not trip the circuit breaker
+        self.assertEqual(self.client.breaker.state, "closed")
+        self.assertEqual(get_sweep_stats()["totals"]["completed"], 2)
+
+    def test_recent_and_resolved_pushes_are_not_queried(self):
+        StkRequest.objects.filter(checkout_request_id="ws_CO_1").update(
+            created_at=timezone.now()
+        )
+        StkRequest.objects.filter(checkout_request_id="ws_CO_2").update(
+            status="COMPLETED"
+        )
+
+        summary = sweep_stale_stk_requests(older_than_minutes=10, client=self.client)
+
+        self.assertEqual(summary["checked"], 2)
+        self.assertEqual(self.server.query_calls, 2)
+
+    def test_registry_follows_payments_resolved_elsewhere(self):
+        # Failed outside the callback / reconciliation paths, and deleted
+        SavingsDeposit.objects.filter(checkout_request_id="ws_CO_1").update(
+            payment_status="FAILED"
+        )
+        self.deposits["ws_CO_4"].delete()
+
+        summary = sweep_stale_stk_requests(older_than_minutes=10, client=self.client)
+
+        self.assertEqual(
+            {k: summary[k] for k in ("completed", "failed", "closed", "pending")},
+            {"completed": 0, "failed": 1, "closed": 2, "pending": 1},
+        )
+        statuses = dict(StkRequest.objects.values_list("checkout_request_id", "status"))
+        self.assertEqual(statuses["ws_CO_1"], "FAILED")
+        self.assertEqual(statuses["ws_CO_4"], "CANCELLED")
+        # Closed rows are not queried again
+        self.server.query_calls = 0
+        sweep_stale_stk_requests(older_than_minutes=10, client=self.client)
+        self.assertEqual(self.server.query_calls, 1)
+
+    def test_query_errors_past_the_expiry_fail_the_push(self):
+        stk_requests = list(
+            StkRequest.objects.filter(
+                checkout_request_id__in=["ws_CO_1", "ws_CO_2"]
+            ).order_by("checkout_request_id")
+        )
+        StkRequest.objects.filter(checkout_request_id="ws_CO_1").update(
+            created_at=timezone.now() - timedelta(days=2)
+        )
+        stk_requests[0].refresh_from_db()
+        expire_before = timezone.now() - timedelta(hours=24)
+
+        outcomes = [
+            _resolve(stk_request, "ERROR", "Invalid CheckoutRequestID", expire_before)
+            for stk_request in stk_requests
+        ]
+        self.assertEqual(
+            outcomes,
+            [
+                ("FAILED", "No M-Pesa result before expiry"),
+                ("ERROR", "Invalid CheckoutRequestID"),
+            ],
+        )
+        self.assertEqual(_apply_results(stk_requests, outcomes)["FAILED"], 1)
+        self.assertEqual(self.status("ws_CO_1"), "FAILED")
+        self.assertEqual(self.status("ws_CO_2"), "PENDING")
+
+    def test_pushes_stay_pending_while_daraja_is_unreachable(self):
+        StkRequest.objects.update(created_at=timezone.now() - timedelta(days=2))
+        for _ in range(self.client.breaker.failure_threshold):
+            self.client.breaker.record_failure()
+        self.assertEqual(self.client.breaker.state, "open")
+
+        summary = sweep_stale_stk_requests(older_than_minutes=10, client=self.client)
+
+        self.assertEqual(
+            {k: summary[k] for k in ("checked", "failed", "unreachable", "pending")},
+            {"checked": 4, "failed": 0, "unreachable": 4, "pending": 0},
+        )
+        self.assertEqual(self.server.query_calls, 0)
+        self.assertEqual(
+            {self.status(checkout_id) for checkout_id in self.deposits}, {"PENDING"}
+        )
+
+
+@override_settings(MPESA_CALLBACK_WORKER=False)
+class CallbackInspectionTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            email="admin@example.com",
+            password="pass",
+            member_no="MM002",
+            is_sacco_admin=True,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+        for i in range(5):
+            ingest_callback("DEPOSIT", stk_callback_body(f"ws_CO_{i}"))
+        ingest_callback("LOAN_PAYMENT", stk_callback_body("ws_CO_9", result_code=1032))
+
+    def test_callbacks_are_cursor_paginated_and_filtered(self):
+        url = reverse("mpesa:callbacks")
+        page = self.client.get(url, {"page_size": 4}).json()
+        self.assertEqual(len(page["results"]), 4)
+        self.assertEqual(len(self.client.get(page["next"]).json()["results"]), 2)
+
+        results = self.client.get(url, {"result_code": "1032"}).json()["results"]
+        self.assertEqual([r["checkout_request_id"] for r in results], ["ws_CO_9"])
+
+        results = self.client.get(url, {"checkout_request_id": "ws_CO_3"}).json()
+        self.assertEqual(len(results["results"]), 1)
+
+        # the callback URL's GET lists only its own callback type
+        results = self.client.get(reverse("mpesa:loan_callback")).json()["results"]
+        self.assertEqual(len(results), 1)
+
+    def test_non_admins_see_nothing(self):
+        member = User.objects.create_user(
+            email="member@example.com", password="pass", member_no="MM001"
+        )
+        self.client.force_authenticate(member)
+        response = self.client.get(reverse("mpesa:callbacks"))
+        self.assertEqual(response.json()["results"], [])
+
+    def test_old_processed_callbacks_are_archived(self):
+        MpesaBody.objects.filter(checkout_request_id__in=["ws_CO_0", "ws_CO_1"]).update(
+            processing_status="PROCESSED",
+            created_at=timezone.now() - timedelta(days=365),
+        )
+        MpesaBody.objects.filter(checkout_request_id="ws_CO_2").update(
+            created_at=timezone.now() - timedelta(days=365)
+        )
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            call_command(
+                "archive_mpesa_callbacks",
+                days=180,
+                output_dir=output_dir,
+                batch_size=1,
+                stdout=io.StringIO(),
+            )
+            (name,) = os.listdir(output_dir)
+            with gzip.open(os.path.join(output_dir, name), "rt") as archive:
+                archived = [json.loads(line) for line in archive]
+
+        self.assertEqual(
+            sorted(row["checkout_request_id"] for row in archived),
+            ["ws_CO_0", "ws_CO_1"],
+        )
+        # pending callbacks are kept whatever their age
+        self.assertEqual(MpesaBody.objects.count(), 4)
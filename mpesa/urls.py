@@ -4,6 +4,11 @@ from mpesa.views import (
     MpesaCallbackView,
     LoanPaymentMpesaCreateView,
     LoanMpesaCallbackView,
+    AsyncMpesaPaymentCreateView,
+    AsyncLoanPaymentMpesaCreateView,
+    MpesaStatementReconciliationView,
+    StkSweepStatsView,
+    MpesaBodyListView,
 )
 
 app_name = "mpesa"
@@ -13,4 +18,18 @@ urlpatterns = [
     path("callback/", MpesaCallbackView.as_view(), name="callback"),
     path("pay/loan/member/", LoanPaymentMpesaCreateView.as_view(), name="loan_payment"),
     path("callback/loan/", LoanMpesaCallbackView.as_view(), name="loan_callback"),
+    path("callbacks/", MpesaBodyListView.as_view(), name="callbacks"),
+    # async variants (served without blocking a worker under ASGI)
+    path("async/pay/", AsyncMpesaPaymentCreateView.as_view(), name="async_payment"),
+    path(
+        "async/pay/loan/member/",
+        AsyncLoanPaymentMpesaCreateView.as_view(),
+        name="async_loan_payment",
+    ),
+    path(
+        "reconcile/",
+        MpesaStatementReconciliationView.as_view(),
+        name="reconcile_statement",
+    ),
+    path("sweeper/stats/", StkSweepStatsView.as_view(), name="sweep_stats"),
 ]
@@ -1,38 +1,133 @@
-import requests
-from django.core.cache import cache
+import base64
+from asgiref.sync import sync_to_async
+from datetime import datetime
+from django.conf import settings
 
 import logging
 
+from accounts.async_utils import get_http_client
+
 logger = logging.getLogger(__name__)
 
 
-def get_access_token(access_token_url, consumer_key, consumer_secret):
-    # Check cache first
-    cache_key = "mpesa_access_token"
-    access_token = cache.get(cache_key)
-    if access_token:
-        logger.info("Using cached M-Pesa access token")
-        return access_token
+def get_access_token(access_token_url=None, consumer_key=None, consumer_secret=None):
+    """
+    Return a valid Daraja access token.
+
+    Kept for existing callers; the token is managed by the shared
+    DarajaClient (see mpesa/client.py), which refreshes it single-flight.
+    The arguments are ignored and come from settings.
+    """
+    from mpesa.client import get_daraja_client
+
+    return get_daraja_client().get_access_token()
+
+
+async def aget_access_token():
+    """Async variant of get_access_token, sharing the same token."""
+    from mpesa.client import get_daraja_client
+
+    client = get_daraja_client()
+    # Only a refresh (at most once an hour) needs a thread
+    return client.cached_token() or await sync_to_async(client.get_access_token)()
+
+
+def mpesa_credentials_configured():
+    return all(
+        [
+            settings.MPESA_CONSUMER_KEY,
+            settings.MPESA_CONSUMER_SECRET,
+            settings.MPESA_SHORTCODE,
+            settings.MPESA_PASSKEY,
+        ]
+    )
+
+
+def _stk_password():
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    password = base64.b64encode(
+        f"{settings.MPESA_SHORTCODE}{settings.MPESA_PASSKEY}{timestamp}".encode()
+    ).decode()
+    return password, timestamp
+
+
+def build_stk_push_payload(
+    amount, phone_number, callback_url, account_reference, description
+):
+    password, timestamp = _stk_password()
 
+    return {
+        "BusinessShortCode": settings.MPESA_SHORTCODE,
+        "Password": password,
+        "Timestamp": timestamp,
+        "TransactionType": "CustomerPayBillOnline",
+        "Amount": int(amount),
+        "PartyA": phone_number,
+        "PartyB": settings.MPESA_SHORTCODE,
+        "PhoneNumber": phone_number,
+        "CallBackURL": callback_url,
+        "AccountReference": account_reference,
+        "TransactionDesc": description,
+    }
+
+
+def build_stk_query_payload(checkout_request_id):
+    password, timestamp = _stk_password()
+
+    return {
+        "BusinessShortCode": settings.MPESA_SHORTCODE,
+        "Password": password,
+        "Timestamp": timestamp,
+        "CheckoutRequestID": checkout_request_id,
+    }
+
+
+async def _apost(client, url, payload, access_token):
+    """POST through the shared circuit breaker."""
+    client.breaker.before_call()
     try:
-        response = requests.get(
-            access_token_url, auth=(consumer_key, consumer_secret), timeout=10
+        response = await get_http_client().post(
+            url,
+            json=payload,
+            headers={
+                "Authorization": f"Bearer {access_token}",
+                "Content-Type": "application/json",
+            },
         )
-        response.raise_for_status()
-        auth_data = response.json()
-        access_token = auth_data.get("access_token")
-
-        if not access_token:
-            logger.error(f"No access token in response: {auth_data}")
-            raise ValueError("No access token returned by M-Pesa API")
-
-        # Cache token for 50 minutes (less than 1 hour to avoid expiry)
-        cache.set(cache_key, access_token, timeout=50 * 60)
-        logger.info("Successfully obtained and cached M-Pesa access token")
-        return access_token
-
-    except requests.RequestException as e:
-        logger.error(
-            f"Failed to obtain M-Pesa access token: {str(e)}, Response: {response.text if 'response' in locals() else 'No response'}"
+    except BaseException:
+        # Cancellation included, or a half-open trial would stay in flight
+        client.breaker.record_failure()
+        raise
+
+    if response.status_code >= 500:
+        client.breaker.record_failure()
+    else:
+        client.breaker.record_success()
+    return response
+
+
+async def astk_push(payload):
+    """
+    Send an STK push request and return the decoded Daraja response.
+
+    Shares the token and circuit breaker of the sync DarajaClient, and like
+    it resends once with a fresh token when Daraja rejects the current one.
+    """
+    from mpesa.client import MpesaError, get_daraja_client
+
+    client = get_daraja_client()
+    url = f"{client.base_url}/mpesa/stkpush/v1/processrequest"
+    access_token = await aget_access_token()
+    response = await _apost(client, url, payload, access_token)
+    if response.status_code == 401:
+        # Token revoked or expired early: refresh once and resend
+        await sync_to_async(client.invalidate_token)(access_token)
+        access_token = await aget_access_token()
+        response = await _apost(client, url, payload, access_token)
+
+    try:
+        return response.json()
+    except ValueError:
+        raise MpesaError(
+            f"Unexpected M-Pesa response ({response.status_code}): {response.text}"
         )
-        raise ValueError(f"Failed to obtain access token: {str(e)}")
@@ -1,16 +1,41 @@
 import logging
 import requests
-import base64
 import threading
-from datetime import datetime
+import httpx
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
 from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework import generics, status
+from rest_framework.pagination import CursorPagination
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.conf import settings
-
-from mpesa.utils import get_access_token
+from django.db import transaction
+
+from accounts.async_utils import AsyncAPIView
+from accounts.permissions import IsSystemAdminOrReadOnly
+from mpesa.client import (
+    MpesaAuthError,
+    MpesaError,
+    MpesaUnavailable,
+    get_daraja_client,
+)
+from mpesa.services import (
+    DEPOSIT,
+    LOAN_PAYMENT,
+    ingest_callback,
+    register_stk_request,
+)
+from mpesa.worker import callback_worker
+from mpesa.filters import MpesaBodyFilter
+from mpesa.reconciliation import reconcile_statement
+from mpesa.sweeper import get_sweep_stats
+from mpesa.utils import (
+    astk_push,
+    build_stk_push_payload,
+    mpesa_credentials_configured,
+)
 from mpesa.models import MpesaBody
 from mpesa.serializers import MpesaBodySerializer
 from savingsdeposits.models import SavingsDeposit
@@ -20,7 +45,6 @@ from savings.models import SavingsAccount
 # loans
 from loanpayments.models import LoanPayment
 from loanaccounts.models import LoanAccount
-from loanpayments.utils import send_loan_payment_pending_update_email
 
 logger = logging.getLogger(__name__)
 
@@ -65,107 +89,77 @@ class MpesaPaymentCreateView(APIView):
                 )
 
             # validate M-Pesa Credentials
-            if not all(
-                [
-                    settings.MPESA_CONSUMER_KEY,
-                    settings.MPESA_CONSUMER_SECRET,
-                    settings.MPESA_SHORTCODE,
-                    settings.MPESA_PASSKEY,
-                ]
-            ):
+            if not mpesa_credentials_configured():
                 logger.error("M-Pesa credentials not configured")
                 return Response(
                     {"error": "M-Pesa credentials not configured"},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 )
 
-            # Get access token
+            account_number = deposit.savings_account.account_number
             try:
-                access_token = get_access_token(
-                    access_token_url=f"{settings.MPESA_API_URL}/oauth/v1/generate?grant_type=client_credentials",
-                    consumer_key=settings.MPESA_CONSUMER_KEY,
-                    consumer_secret=settings.MPESA_CONSUMER_SECRET,
+                response_data = get_daraja_client().stk_push(
+                    amount=deposit.amount,
+                    phone_number=phone_number,
+                    callback_url=settings.MPESA_CALLBACK_URL,
+                    account_reference=f"{account_number}",
+                    description=f"Mwanda Mzedu SACCO Deposit {account_number}",
                 )
-            except ValueError as e:
+            except MpesaAuthError as e:
                 logger.error(f"M-Pesa authentication failed: {str(e)}")
                 return Response(
                     {"error": f"Authentication failed: {str(e)}"},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 )
+            except MpesaUnavailable as e:
+                logger.error(f"M-Pesa STK Push skipped: {str(e)}")
+                return Response(
+                    {"error": str(e)},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                )
+            except (MpesaError, requests.RequestException) as e:
+                logger.error(f"M-Pesa STK Push request failed: {str(e)}")
+                return Response(
+                    {"error": "STK Push request failed"},
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                )
 
-            # Prepare STK Push Payload
-
-            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-            password = base64.b64encode(
-                f"{settings.MPESA_SHORTCODE}{settings.MPESA_PASSKEY}{timestamp}".encode()
-            ).decode()
-
-            payload = {
-                "BusinessShortCode": settings.MPESA_SHORTCODE,
-                "Password": password,
-                "Timestamp": timestamp,
-                "TransactionType": "CustomerPayBillOnline",
-                "Amount": int(deposit.amount),
-                "PartyA": phone_number,
-                "PartyB": settings.MPESA_SHORTCODE,
-                "PhoneNumber": phone_number,
-                "CallBackURL": settings.MPESA_CALLBACK_URL,
-                "AccountReference": f"{deposit.savings_account.account_number}",
-                "TransactionDesc": f"Mwanda Mzedu SACCO Deposit {deposit.savings_account.account_number}",
-            }
-
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json",
-            }
+            logger.info(f"M-Pesa STK Push response: {response_data}")
 
-            try:
-                response = requests.post(
-                    f"{settings.MPESA_API_URL}/mpesa/stkpush/v1/processrequest",
-                    json=payload,
-                    headers=headers,
-                )
-                response_data = response.json()
-                logger.info(f"M-Pesa STK Push response: {response_data}")
-
-                if response_data.get("ResponseCode") == "0":
-                    deposit.checkout_request_id = response_data.get("CheckoutRequestID")
-                    deposit.callback_url = settings.MPESA_CALLBACK_URL
-                    # deposit.payment_method = "Mpesa STK Push" # until we find a way to link the payment method to the payment account
-                    deposit.mpesa_phone_number = phone_number
+            if response_data.get("ResponseCode") == "0":
+                deposit.checkout_request_id = response_data.get("CheckoutRequestID")
+                deposit.callback_url = settings.MPESA_CALLBACK_URL
+                # deposit.payment_method = "Mpesa STK Push" # until we find a way to link the payment method to the payment account
+                deposit.mpesa_phone_number = phone_number
+                with transaction.atomic():
                     deposit.save()
-
-                    return Response(
-                        {
-                            "merchant_request_id": response_data.get(
-                                "MerchantRequestID"
-                            ),
-                            "checkout_request_id": response_data.get(
-                                "CheckoutRequestID"
-                            ),
-                            "response_description": response_data.get(
-                                "ResponseDescription"
-                            ),
-                            "customer_message": response_data.get("CustomerMessage"),
-                        },
-                        status=status.HTTP_200_OK,
-                    )
-                else:
-                    logger.error(f"M-Pesa STK Push failed: {response_data}")
-                    return Response(
-                        {
-                            "error": response_data.get(
-                                "errorMessage", "STK Push request failed"
-                            )
-                        },
-                        status=status.HTTP_400_BAD_REQUEST,
+                    register_stk_request(
+                        deposit,
+                        DEPOSIT,
+                        response_data.get("CheckoutRequestID"),
+                        response_data.get("MerchantRequestID"),
                     )
 
-            except requests.RequestException as e:
-                logger.error(f"M-Pesa STK Push request failed: {str(e)}")
                 return Response(
-                    {"error": "STK Push request failed"},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    {
+                        "merchant_request_id": response_data.get("MerchantRequestID"),
+                        "checkout_request_id": response_data.get("CheckoutRequestID"),
+                        "response_description": response_data.get(
+                            "ResponseDescription"
+                        ),
+                        "customer_message": response_data.get("CustomerMessage"),
+                    },
+                    status=status.HTTP_200_OK,
+                )
+            else:
+                logger.error(f"M-Pesa STK Push failed: {response_data}")
+                return Response(
+                    {
+                        "error": response_data.get(
+                            "errorMessage", "STK Push request failed"
+                        )
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
                 )
 
         except SavingsDeposit.DoesNotExist:
@@ -193,99 +187,62 @@ class MpesaCallbackView(APIView):
             logger.error("Invalid or empty callback data")
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        # Save raw callback for debugging
-        MpesaBody.objects.create(body=body)
+        # Store the raw callback and acknowledge at once; it is applied by the
+        # callback worker (see mpesa/services.py)
+        mpesa_body, created = ingest_callback(DEPOSIT, body)
 
-        stk_callback = body.get("Body", {}).get("stkCallback", {})
-        checkout_request_id = stk_callback.get("CheckoutRequestID")
-
-        if not checkout_request_id:
+        if not mpesa_body.checkout_request_id:
             logger.error("Missing CheckoutRequestID in callback")
             return Response(
                 {"ResultCode": 1, "ResultDesc": "Invalid callback data"},
                 status=status.HTTP_200_OK,
             )
 
-        try:
-            deposit = SavingsDeposit.objects.get(
-                checkout_request_id=checkout_request_id
-            )
-        except SavingsDeposit.DoesNotExist:
-            logger.error("Deposit not found")
-            return Response(
-                {"ResultCode": 0, "ResultDesc": "Deposit not found"},
-                status=status.HTTP_200_OK,
-            )
+        if created:
+            transaction.on_commit(callback_worker.wake)
+        else:
+            logger.info(f"Duplicate callback {mpesa_body.idempotency_key} ignored")
 
-        # prevent duplicate processing
-        if deposit.payment_status == "COMPLETED":
-            logger.info("Deposit already processed")
-            return Response(
-                {"ResultCode": 0, "ResultDesc": "Deposit already processed"},
-                status=status.HTTP_200_OK,
-            )
+        return Response(
+            {"ResultCode": 0, "ResultDesc": "Accepted"},
+            status=status.HTTP_200_OK,
+        )
 
-        result_code = stk_callback.get("ResultCode")
+    def get(self, request, *args, **kwargs):
+        """Saved deposit callbacks (for debugging), see MpesaBodyListView"""
+        return MpesaBodyListView.as_view(callback_type=DEPOSIT)(request._request)
 
-        if result_code != 0:
-            deposit.transaction_status = "Failed"
-            deposit.payment_status = "FAILED"
-            deposit.payment_status_description = stk_callback.get(
-                "ResultDesc", "Payment failed"
-            )
-            deposit.save()
 
-            logger.error("Deposit failed")
-            return Response(
-                {"ResultCode": 0, "ResultDesc": "Deposit failed"},
-                status=status.HTTP_200_OK,
-            )
+class MpesaBodyCursorPagination(CursorPagination):
+    ordering = "-created_at"
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
 
-        metadata_items = stk_callback.get("CallbackMetadata", {}).get("Item", [])
 
-        confirmation_code = next(
-            (
-                item.get("Value")
-                for item in metadata_items
-                if item.get("Name") == "MpesaReceiptNumber"
-            ),
-            None,
-        )
-        payment_account = next(
-            (
-                item.get("Value")
-                for item in metadata_items
-                if item.get("Name") == "PhoneNumber"
-            ),
-            None,
-        )
+class MpesaBodyListView(generics.ListAPIView):
+    """
+    GET /api/v1/mpesa/callbacks/
 
-        deposit.transaction_status = "Completed"
-        deposit.payment_status = "COMPLETED"
-        deposit.payment_status_description = "Payment completed"
-        deposit.confirmation_code = confirmation_code
-        deposit.payment_account = payment_account
-        deposit.mpesa_receipt_number = confirmation_code
-        deposit.mpesa_phone_number = payment_account
-        deposit.payment_date = datetime.now()
-        deposit.save()
-
-        # Update savings account balance: to be done by admin
-        # deposit.savings_account.balance += deposit.amount
-        # deposit.savings_account.save()
-        # deposit.save()
-
-        logger.info("Deposit processed successfully")
-        return Response(
-            {"ResultCode": 0, "ResultDesc": "Deposit processed successfully"},
-            status=status.HTTP_200_OK,
-        )
+    Stored M-Pesa callbacks, newest first, cursor paginated. Filters:
+    checkout_request_id, result_code, callback_type, processing_status,
+    created_after and created_before (ISO 8601).
+    """
 
-    def get(self, request, *args, **kwargs):
-        """Endpoint to view all saved callback bodies (for debugging)"""
-        bodies = MpesaBody.objects.all().order_by("-id")
-        serializer = MpesaBodySerializer(bodies, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+    serializer_class = MpesaBodySerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = MpesaBodyCursorPagination
+    filterset_class = MpesaBodyFilter
+    callback_type = None
+
+    def get_queryset(self):
+        user = self.request.user
+        if not (user.is_sacco_admin or user.is_superuser):
+            return MpesaBody.objects.none()
+        queryset = MpesaBody.objects.all()
+        if self.callback_type:
+            queryset = queryset.filter(callback_type=self.callback_type)
+        return queryset
 
 
 class LoanPaymentMpesaCreateView(APIView):
@@ -326,111 +283,81 @@ class LoanPaymentMpesaCreateView(APIView):
                 )
 
             # validate M-Pesa Credentials
-            if not all(
-                [
-                    settings.MPESA_CONSUMER_KEY,
-                    settings.MPESA_CONSUMER_SECRET,
-                    settings.MPESA_SHORTCODE,
-                    settings.MPESA_PASSKEY,
-                ]
-            ):
+            if not mpesa_credentials_configured():
                 logger.error("M-Pesa credentials not configured")
                 return Response(
                     {"error": "M-Pesa credentials not configured"},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 )
 
-            # Get access token
+            loan_account = loan_payment.loan_account
             try:
-                access_token = get_access_token(
-                    access_token_url=f"{settings.MPESA_API_URL}/oauth/v1/generate?grant_type=client_credentials",
-                    consumer_key=settings.MPESA_CONSUMER_KEY,
-                    consumer_secret=settings.MPESA_CONSUMER_SECRET,
+                response_data = get_daraja_client().stk_push(
+                    amount=loan_payment.amount,
+                    phone_number=phone_number,
+                    callback_url=settings.MPESA_LOAN_CALLBACK_URL,
+                    account_reference=f"{loan_account.account_number}",
+                    description=f"Mwanda Mzedu SACCO Loan Payment {loan_account.account_number} for {loan_account.member}",
                 )
-            except ValueError as e:
+            except MpesaAuthError as e:
                 logger.error(f"M-Pesa authentication failed: {str(e)}")
                 return Response(
                     {"error": f"Authentication failed: {str(e)}"},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 )
+            except MpesaUnavailable as e:
+                logger.error(f"M-Pesa STK Push skipped: {str(e)}")
+                return Response(
+                    {"error": str(e)},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                )
+            except (MpesaError, requests.RequestException) as e:
+                logger.error(f"M-Pesa STK Push request failed: {str(e)}")
+                return Response(
+                    {"error": "STK Push request failed"},
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                )
 
-            # Prepare STK Push Payload
-
-            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-            password = base64.b64encode(
-                f"{settings.MPESA_SHORTCODE}{settings.MPESA_PASSKEY}{timestamp}".encode()
-            ).decode()
-
-            payload = {
-                "BusinessShortCode": settings.MPESA_SHORTCODE,
-                "Password": password,
-                "Timestamp": timestamp,
-                "TransactionType": "CustomerPayBillOnline",
-                "Amount": int(loan_payment.amount),
-                "PartyA": phone_number,
-                "PartyB": settings.MPESA_SHORTCODE,
-                "PhoneNumber": phone_number,
-                "CallBackURL": settings.MPESA_LOAN_CALLBACK_URL,
-                "AccountReference": f"{loan_payment.loan_account.account_number}",
-                "TransactionDesc": f"Mwanda Mzedu SACCO Loan Payment {loan_payment.loan_account.account_number} for {loan_payment.loan_account.member}",
-            }
-
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json",
-            }
+            logger.info(f"M-Pesa STK Push response: {response_data}")
 
-            try:
-                response = requests.post(
-                    f"{settings.MPESA_API_URL}/mpesa/stkpush/v1/processrequest",
-                    json=payload,
-                    headers=headers,
+            if response_data.get("ResponseCode") == "0":
+                # SUCCESS
+                loan_payment.checkout_request_id = response_data.get(
+                    "CheckoutRequestID"
                 )
-                response_data = response.json()
-                logger.info(f"M-Pesa STK Push response: {response_data}")
-
-                if response_data.get("ResponseCode") == "0":
-                    # SUCCESS
-                    loan_payment.checkout_request_id = response_data.get(
-                        "CheckoutRequestID"
-                    )
-                    loan_payment.callback_url = settings.MPESA_LOAN_CALLBACK_URL
-                    loan_payment.repayment_type = "Mpesa STK Push"
-                    loan_payment.mpesa_phone_number = phone_number
+                loan_payment.callback_url = settings.MPESA_LOAN_CALLBACK_URL
+                loan_payment.repayment_type = "Mpesa STK Push"
+                loan_payment.mpesa_phone_number = phone_number
+                with transaction.atomic():
                     loan_payment.save()
-
-                    return Response(
-                        {
-                            "merchant_request_id": response_data.get(
-                                "MerchantRequestID"
-                            ),
-                            "checkout_request_id": response_data.get(
-                                "CheckoutRequestID"
-                            ),
-                            "response_description": response_data.get(
-                                "ResponseDescription"
-                            ),
-                            "customer_message": response_data.get("CustomerMessage"),
-                        },
-                        status=status.HTTP_200_OK,
-                    )
-                else:
-                    # FAILURE
-                    logger.error(f"M-Pesa STK Push failed: {response_data}")
-                    return Response(
-                        {
-                            "error": response_data.get(
-                                "errorMessage", "STK Push request failed"
-                            )
-                        },
-                        status=status.HTTP_400_BAD_REQUEST,
+                    register_stk_request(
+                        loan_payment,
+                        LOAN_PAYMENT,
+                        response_data.get("CheckoutRequestID"),
+                        response_data.get("MerchantRequestID"),
                     )
 
-            except requests.RequestException as e:
-                logger.error(f"M-Pesa STK Push request failed: {str(e)}")
                 return Response(
-                    {"error": "STK Push request failed"},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    {
+                        "merchant_request_id": response_data.get("MerchantRequestID"),
+                        "checkout_request_id": response_data.get("CheckoutRequestID"),
+                        "response_description": response_data.get(
+                            "ResponseDescription"
+                        ),
+                        "customer_message": response_data.get("CustomerMessage"),
+                    },
+                    status=status.HTTP_200_OK,
+                )
+            else:
+                # FAILURE
+                logger.error(f"M-Pesa STK Push failed: {response_data}")
+                return Response(
+                    {
+                        "error": response_data.get(
+                            "errorMessage", "STK Push request failed"
+                        )
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
                 )
 
         except LoanPayment.DoesNotExist:
@@ -458,96 +385,282 @@ class LoanMpesaCallbackView(APIView):
             logger.error("Invalid or empty callback data")
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        # Save raw callback for debugging
-        MpesaBody.objects.create(body=body)
+        # Store the raw callback and acknowledge at once; it is applied by the
+        # callback worker (see mpesa/services.py)
+        mpesa_body, created = ingest_callback(LOAN_PAYMENT, body)
 
-        stk_callback = body.get("Body", {}).get("stkCallback", {})
-        checkout_request_id = stk_callback.get("CheckoutRequestID")
-
-        if not checkout_request_id:
+        if not mpesa_body.checkout_request_id:
             logger.error("Missing CheckoutRequestID in callback")
             return Response(
                 {"ResultCode": 1, "ResultDesc": "Invalid callback data"},
                 status=status.HTTP_200_OK,
             )
 
+        if created:
+            transaction.on_commit(callback_worker.wake)
+        else:
+            logger.info(f"Duplicate callback {mpesa_body.idempotency_key} ignored")
+
+        return Response(
+            {"ResultCode": 0, "ResultDesc": "Accepted"},
+            status=status.HTTP_200_OK,
+        )
+
+    def get(self, request, *args, **kwargs):
+        """Saved loan payment callbacks (for debugging), see MpesaBodyListView"""
+        return MpesaBodyListView.as_view(callback_type=LOAN_PAYMENT)(request._request)
+
+
+"""
+Async STK push
+
+Same contract as the views above, served without holding a worker thread
+while Daraja responds. Mounted alongside the sync routes; under ASGI many
+pushes can be in flight per worker.
+"""
+
+
+async def _stk_push_response(payload, on_success):
+    try:
+        response_data = await astk_push(payload)
+    except MpesaAuthError as e:
+        logger.error(f"M-Pesa authentication failed: {str(e)}")
+        return JsonResponse(
+            {"error": f"Authentication failed: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+    except MpesaUnavailable as e:
+        logger.error(f"M-Pesa STK Push skipped: {str(e)}")
+        return JsonResponse(
+            {"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    except (MpesaError, httpx.HTTPError) as e:
+        logger.error(f"M-Pesa STK Push request failed: {str(e)}")
+        return JsonResponse(
+            {"error": "STK Push request failed"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+    logger.info(f"M-Pesa STK Push response: {response_data}")
+
+    if response_data.get("ResponseCode") != "0":
+        logger.error(f"M-Pesa STK Push failed: {response_data}")
+        return JsonResponse(
+            {"error": response_data.get("errorMessage", "STK Push request failed")},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    await on_success(
+        response_data.get("CheckoutRequestID"), response_data.get("MerchantRequestID")
+    )
+
+    return JsonResponse(
+        {
+            "merchant_request_id": response_data.get("MerchantRequestID"),
+            "checkout_request_id": response_data.get("CheckoutRequestID"),
+            "response_description": response_data.get("ResponseDescription"),
+            "customer_message": response_data.get("CustomerMessage"),
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+class AsyncMpesaPaymentCreateView(AsyncAPIView):
+    async def post(self, request, *args, **kwargs):
+        deposit_reference = request.data.get("deposit_reference")
+        phone_number = request.data.get("phone_number")
+
+        if not deposit_reference:
+            logger.error("No deposit reference provided")
+            return JsonResponse(
+                {"error": "No deposit reference provided"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if not phone_number:
+            logger.error("No phone number provided")
+            return JsonResponse(
+                {"error": "No phone number provided"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
         try:
-            loan_payment = LoanPayment.objects.get(
-                checkout_request_id=checkout_request_id
+            deposit = await SavingsDeposit.objects.select_related(
+                "savings_account"
+            ).aget(reference=deposit_reference)
+        except SavingsDeposit.DoesNotExist:
+            logger.error("Deposit not found")
+            return JsonResponse(
+                {"error": "Deposit not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        if deposit.payment_status == "COMPLETED":
+            logger.error("Deposit already completed")
+            return JsonResponse(
+                {"error": "Deposit already completed"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if deposit.transaction_status != "Pending":
+            logger.error("Deposit is not pending")
+            return JsonResponse(
+                {"error": "Deposit is not pending"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if not mpesa_credentials_configured():
+            logger.error("M-Pesa credentials not configured")
+            return JsonResponse(
+                {"error": "M-Pesa credentials not configured"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        account_number = deposit.savings_account.account_number
+        payload = build_stk_push_payload(
+            amount=deposit.amount,
+            phone_number=phone_number,
+            callback_url=settings.MPESA_CALLBACK_URL,
+            account_reference=f"{account_number}",
+            description=f"Mwanda Mzedu SACCO Deposit {account_number}",
+        )
+
+        @sync_to_async
+        def on_success(checkout_request_id, merchant_request_id):
+            deposit.checkout_request_id = checkout_request_id
+            deposit.callback_url = settings.MPESA_CALLBACK_URL
+            deposit.mpesa_phone_number = phone_number
+            with transaction.atomic():
+                deposit.save()
+                register_stk_request(
+                    deposit, DEPOSIT, checkout_request_id, merchant_request_id
+                )
+
+        return await _stk_push_response(payload, on_success)
+
+
+class AsyncLoanPaymentMpesaCreateView(AsyncAPIView):
+    async def post(self, request, *args, **kwargs):
+        loan_payment_reference = request.data.get("loan_payment_reference")
+        phone_number = request.data.get("phone_number")
+
+        if not loan_payment_reference:
+            logger.error("No loan payment reference provided")
+            return JsonResponse(
+                {"error": "No loan payment reference provided"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
+
+        if not phone_number:
+            logger.error("No phone number provided")
+            return JsonResponse(
+                {"error": "No phone number provided"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            loan_payment = await LoanPayment.objects.select_related(
+                "loan_account__member"
+            ).aget(reference=loan_payment_reference)
         except LoanPayment.DoesNotExist:
             logger.error("Loan payment not found")
-            return Response(
-                {"ResultCode": 0, "ResultDesc": "Loan payment not found"},
-                status=status.HTTP_200_OK,
+            return JsonResponse(
+                {"error": "Loan payment not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
-        # prevent duplicate processing
         if loan_payment.payment_status == "COMPLETED":
-            logger.info("Loan payment already processed")
-            return Response(
-                {"ResultCode": 0, "ResultDesc": "Loan payment already processed"},
-                status=status.HTTP_200_OK,
+            logger.error("Loan payment already completed")
+            return JsonResponse(
+                {"error": "Loan payment already completed"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
-        result_code = stk_callback.get("ResultCode")
-
-        if result_code != 0:
-            loan_payment.transaction_status = "Failed"
-            loan_payment.payment_status = "FAILED"
-            loan_payment.payment_status_description = stk_callback.get(
-                "ResultDesc", "Payment failed"
+        if loan_payment.transaction_status != "Pending":
+            logger.error("Loan payment is not pending")
+            return JsonResponse(
+                {"error": "Loan payment is not pending"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            loan_payment.save()
 
-            logger.error("Loan payment failed")
-            return Response(
-                {"ResultCode": 0, "ResultDesc": "Loan payment failed"},
-                status=status.HTTP_200_OK,
+        if not mpesa_credentials_configured():
+            logger.error("M-Pesa credentials not configured")
+            return JsonResponse(
+                {"error": "M-Pesa credentials not configured"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
-        metadata_items = stk_callback.get("CallbackMetadata", {}).get("Item", [])
-
-        confirmation_code = next(
-            (
-                item.get("Value")
-                for item in metadata_items
-                if item.get("Name") == "MpesaReceiptNumber"
-            ),
-            None,
-        )
-        payment_account = next(
-            (
-                item.get("Value")
-                for item in metadata_items
-                if item.get("Name") == "PhoneNumber"
-            ),
-            None,
+        loan_account = loan_payment.loan_account
+        payload = build_stk_push_payload(
+            amount=loan_payment.amount,
+            phone_number=phone_number,
+            callback_url=settings.MPESA_LOAN_CALLBACK_URL,
+            account_reference=f"{loan_account.account_number}",
+            description=f"Mwanda Mzedu SACCO Loan Payment {loan_account.account_number} for {loan_account.member}",
         )
 
-        loan_payment.transaction_status = "Completed"
-        loan_payment.payment_status = "COMPLETED"
-        loan_payment.payment_status_description = "Payment completed"
-        loan_payment.confirmation_code = confirmation_code
-        loan_payment.payment_account = payment_account
-        loan_payment.mpesa_receipt_number = confirmation_code
-        loan_payment.mpesa_phone_number = payment_account
-        loan_payment.payment_date = datetime.now()
-        loan_payment.save()
-
-        # send email to member
-        send_loan_payment_pending_update_email(
-            loan_payment.loan_account.member, loan_payment
+        @sync_to_async
+        def on_success(checkout_request_id, merchant_request_id):
+            loan_payment.checkout_request_id = checkout_request_id
+            loan_payment.callback_url = settings.MPESA_LOAN_CALLBACK_URL
+            loan_payment.repayment_type = "Mpesa STK Push"
+            loan_payment.mpesa_phone_number = phone_number
+            with transaction.atomic():
+                loan_payment.save()
+                register_stk_request(
+                    loan_payment, LOAN_PAYMENT, checkout_request_id, merchant_request_id
+                )
+
+        return await _stk_push_response(payload, on_success)
+
+
+class MpesaStatementReconciliationView(APIView):
+    """
+    Upload an M-Pesa statement (CSV) and get back the matched, unmatched and
+    duplicate lines. With auto_complete=true, pending transactions matched by
+    account number and amount are completed from the statement.
+    """
+
+    permission_classes = [IsSystemAdminOrReadOnly]
+
+    def post(self, request, *args, **kwargs):
+        file = request.FILES.get("file")
+        if not file:
+            return Response(
+                {"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        auto_complete = str(request.data.get("auto_complete", "")).lower() in (
+            "1",
+            "true",
+            "yes",
         )
+        try:
+            reconciler = reconcile_statement(file, auto_complete=auto_complete)
+        except (ValueError, UnicodeDecodeError) as e:
+            logger.error(f"M-Pesa statement rejected: {str(e)}")
+            return Response(
+                {"error": f"Invalid statement: {str(e)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        logger.info("Loan payment processed successfully")
         return Response(
-            {"ResultCode": 0, "ResultDesc": "Loan payment processed successfully"},
+            {
+                "summary": reconciler.summary(),
+                "matched": reconciler.matched,
+                "unmatched": reconciler.unmatched,
+                "duplicates": reconciler.duplicates,
+            },
             status=status.HTTP_200_OK,
         )
 
-    def get(self, request, *args, **kwargs):
-        """Endpoint to view all saved callback bodies (for debugging)"""
-        bodies = LoanPayment.objects.all().order_by("-id")
-        serializer = LoanPaymentSerializer(bodies, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+
+class StkSweepStatsView(APIView):
+    """
+    GET /api/v1/mpesa/sweeper/stats/
+
+    Counters and latency of the stale STK push sweeper.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(get_sweep_stats())
@@ -0,0 +1,58 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+# Seconds between sweeps for callbacks left behind (e.g. by a restart)
+CALLBACK_WORKER_POLL_INTERVAL = getattr(
+    settings, "MPESA_CALLBACK_WORKER_POLL_INTERVAL", 30
+)
+
+
+class CallbackWorker:
+    """
+    Background thread that applies stored M-Pesa callbacks.
+
+    Callback views call `wake()` after storing a body; the thread then drains
+    every pending callback in batches. It also wakes up periodically so
+    nothing stays pending if a wake-up was missed.
+    """
+
+    def __init__(self, poll_interval=CALLBACK_WORKER_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="mpesa-callback-worker", daemon=True
+                )
+                self._thread.start()
+
+    def wake(self):
+        if not getattr(settings, "MPESA_CALLBACK_WORKER", True):
+            return
+        self._ensure_started()
+        self._event.set()
+
+    def _run(self):
+        from mpesa.services import process_pending_callbacks
+
+        while True:
+            self._event.wait(timeout=self.poll_interval)
+            self._event.clear()
+            try:
+                process_pending_callbacks()
+            except Exception as e:
+                logger.error(f"M-Pesa callback worker failed: {str(e)}")
+            finally:
+                close_old_connections()
+
+
+callback_worker = CallbackWorker()
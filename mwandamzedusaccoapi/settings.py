@@ -135,10 +135,77 @@ WSGI_APPLICATION = "mwandamzedusaccoapi.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-db_config = dj_database_url.config(default=config("DATABASE_URL"))
+# https://docs.djangoproject.com/en/6.0/ref/databases/#connection-management
+# DB_POOL enables psycopg's native connection pool (PostgreSQL only, needs
+# psycopg[pool]). Pooling and persistent connections are mutually exclusive,
+# so DB_CONN_MAX_AGE only applies when the pool is disabled.
+# Under ASGI (SERVER_MODE=asgi, see gunicorn.conf.py) connections are not
+# reused across requests, so persistent connections are off by default there
+# and the pool should be used instead.
+
+SERVER_MODE = config("SERVER_MODE", default="wsgi")
+DB_POOL = config("DB_POOL", default=False, cast=bool)
+DB_CONN_MAX_AGE = config(
+    "DB_CONN_MAX_AGE", default=0 if SERVER_MODE == "asgi" else 600, cast=int
+)
+DB_CONN_HEALTH_CHECKS = config("DB_CONN_HEALTH_CHECKS", default=True, cast=bool)
+
+db_config = dj_database_url.config(
+    default=config("DATABASE_URL"),
+    conn_max_age=0 if DB_POOL else DB_CONN_MAX_AGE,
+    conn_health_checks=DB_CONN_HEALTH_CHECKS,
+)
+
+if DB_POOL and db_config["ENGINE"] == "django.db.backends.postgresql":
+    db_config.setdefault("OPTIONS", {})["pool"] = {
+        "min_size": config("DB_POOL_MIN_SIZE", default=2, cast=int),
+        "max_size": config("DB_POOL_MAX_SIZE", default=10, cast=int),
+        "timeout": config("DB_POOL_TIMEOUT", default=10, cast=int),
+    }
+
 DATABASES = {"default": db_config}
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Shared between workers so the M-Pesa token, cached reports and reference
+# data lookups are not duplicated per process.
+# CACHE_BACKEND: "database" (default), "file", "redis" (needs REDIS_URL) or "locmem"
+
+CACHE_BACKEND = config("CACHE_BACKEND", default="database")
+
+if CACHE_BACKEND == "redis":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": config("REDIS_URL"),
+        }
+    }
+elif CACHE_BACKEND == "file":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": config("CACHE_LOCATION", default=str(BASE_DIR / ".cache")),
+        }
+    }
+elif CACHE_BACKEND == "locmem":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "django_cache",
+        }
+    }
+
+LOOKUP_CACHE_TIMEOUT = config("LOOKUP_CACHE_TIMEOUT", default=60 * 60, cast=int)
+REPORT_CACHE_TIMEOUT = config("REPORT_CACHE_TIMEOUT", default=15 * 60, cast=int)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -45,8 +45,6 @@ class PaymentAccount(ReferenceModel, TimeStampedModel, UniversalIdModel):
 
 
 def get_default_payment_method():
-    acc = PaymentAccount.objects.filter(is_active=True).first()
-    if not acc:
-        acc = PaymentAccount.objects.first()
-    return acc
+    from accounts.registry import reference_data
 
+    return reference_data.default_payment_method()
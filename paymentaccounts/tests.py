@@ -1,3 +1,58 @@
+from django.core.cache import cache
+from django.db import transaction
 from django.test import TestCase
 
-# Create your tests here.
+from accounts.cache import get_saving_type_names
+from accounts.registry import reference_data
+from glaccounts.models import GLAccount
+from paymentaccounts.models import PaymentAccount, get_default_payment_method
+from savingtypes.models import SavingType
+
+
+class ReferenceRegistryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reference_data.clear()
+        # Committed: the registry's shared snapshot may hold these
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bank_gl = GLAccount.objects.create(
+                name="Cash at Bank", code="11000", category="ASSET"
+            )
+            self.mpesa = PaymentAccount.objects.create(
+                name="M-Pesa", gl_account=self.bank_gl
+            )
+
+    def test_reference_data_is_served_without_queries(self):
+        reference_data.payment_account(self.mpesa.pk)
+
+        with self.assertNumQueries(0):
+            account = reference_data.payment_account(self.mpesa.pk)
+            self.assertEqual(account.gl_account.code, "11000")
+            self.assertEqual(get_default_payment_method(), self.mpesa)
+
+    def test_saving_reference_data_reloads_the_registry(self):
+        self.assertEqual(get_default_payment_method(), self.mpesa)
+
+        self.mpesa.is_active = False
+        self.mpesa.save()
+        bank = PaymentAccount.objects.create(name="Bank", gl_account=self.bank_gl)
+
+        self.assertEqual(get_default_payment_method(), bank)
+
+    def test_rolled_back_changes_are_never_served(self):
+        self.assertEqual(get_default_payment_method(), self.mpesa)
+        self.assertEqual(get_saving_type_names(), [])
+
+        with transaction.atomic():
+            self.mpesa.is_active = False
+            self.mpesa.save()
+            bank = PaymentAccount.objects.create(name="Bank", gl_account=self.bank_gl)
+            SavingType.objects.create(name="Holiday Savings")
+            # The transaction sees its own changes
+            self.assertEqual(get_default_payment_method(), bank)
+            self.assertEqual(get_saving_type_names(), ["Holiday Savings"])
+            transaction.set_rollback(True)
+
+        self.mpesa.refresh_from_db()
+        self.assertEqual(get_default_payment_method(), self.mpesa)
+        self.assertEqual(get_saving_type_names(), [])
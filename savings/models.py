@@ -30,6 +30,14 @@ class SavingsAccount(UniversalIdModel, TimeStampedModel, ReferenceModel):
     def __str__(self):
         return f"{self.account_number} - {self.member.member_no} - {self.member.first_name} - {self.account_type.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The balance as loaded, so the post_save signal can move the
+        # member's guarantee capacity by the change
+        instance._loaded_balance = instance.__dict__.get("balance")
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.identity:
             self.identity = slugify(f"{self.member.member_no}-{self.account_number}")
@@ -1,21 +1,31 @@
+from decimal import Decimal
+
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from decimal import Decimal
-from django.db import models
 
-from savings.models import SavingsAccount
+from accounts.registry import reference_data
 from guarantors.models import GuarantorProfile
+from guarantors.services import adjust_max_guarantee_amount
+from savings.models import SavingsAccount
 
 
 @receiver(post_save, sender=SavingsAccount)
-def update_guarantor_max_amount(sender, instance, **kwargs):
-    try:
-        profile = instance.member.guarantor_profile
-        if profile.is_eligible:
-            total = SavingsAccount.objects.filter(
-                member=instance.member, account_type__can_guarantee=True
-            ).aggregate(total=models.Sum("balance"))["total"] or Decimal("0")
-            profile.max_guarantee_amount = total
+def update_guarantor_max_amount(sender, instance, created, raw=False, **kwargs):
+    update_fields = kwargs.get("update_fields")
+    if raw or (update_fields is not None and "balance" not in update_fields):
+        return
+
+    account_type = reference_data.saving_type(instance.account_type_id)
+    if account_type is None or not account_type.can_guarantee:
+        return
+
+    balance = Decimal(str(instance.balance))
+    previous = Decimal("0") if created else getattr(instance, "_loaded_balance", None)
+    if previous is None:
+        # Loaded without its balance: recompute the member's capacity instead
+        for profile in GuarantorProfile.objects.filter(member_id=instance.member_id):
+            profile.recalculate_max_guarantee_amount()
             profile.save(update_fields=["max_guarantee_amount"])
-    except GuarantorProfile.DoesNotExist:
-        pass
+    else:
+        adjust_max_guarantee_amount(instance.member_id, balance - previous)
+    instance._loaded_balance = balance
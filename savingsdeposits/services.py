@@ -3,6 +3,7 @@ from django.db import transaction
 from django.utils.timezone import now
 from savingsdeposits.models import SavingsDeposit
 from financials.services import post_to_ledger
+from accounts.registry import reference_data
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +24,11 @@ def process_savings_deposit_accounting(deposit):
         logger.info(f"Deposit {deposit.reference} has already been processed.")
         return True
 
+    # Reference data (types, payment accounts, GL accounts) comes from the
+    # in-process registry rather than per-deposit queries
+    payment_method = reference_data.payment_account(deposit.payment_method_id)
+    account_type = reference_data.saving_type(deposit.savings_account.account_type_id)
+
     try:
         with transaction.atomic():
             # 3. Update Operational Balance
@@ -36,17 +42,17 @@ def process_savings_deposit_accounting(deposit):
 
             # 4. Post to General Ledger
             if not deposit.posted_to_gl:
-                if not deposit.payment_method or not deposit.payment_method.gl_account:
+                if not payment_method or not payment_method.gl_account:
                     raise ValueError(
-                        f"No GL Account linked to Payment Method: {deposit.payment_method}"
+                        f"No GL Account linked to Payment Method: {payment_method}"
                     )
 
-                bank_gl = deposit.payment_method.gl_account
-                savings_gl = deposit.savings_account.account_type.gl_account
+                bank_gl = payment_method.gl_account
+                savings_gl = account_type.gl_account
 
                 if not savings_gl:
                     raise ValueError(
-                        f"No GL Account linked to Saving Type: {deposit.savings_account.account_type}"
+                        f"No GL Account linked to Saving Type: {account_type}"
                     )
 
                 description = f"Savings Deposit: {deposit.savings_account.account_number} for member: {deposit.savings_account.member.member_no}"
@@ -78,19 +84,19 @@ def process_savings_deposit_accounting(deposit):
                 update_fields=["balance_updated", "posted_to_gl", "accounting_error"]
             )
 
-            # 6. Affect Guarantor Profile if applicable
-            if deposit.savings_account.account_type.can_guarantee:
+            # 6. Affect Guarantor Profile if applicable. Saving the account
+            # moved an existing profile's max_guarantee_amount by the deposit
+            # (savings.signals); a new profile starts from the savings total.
+            if account_type.can_guarantee:
                 try:
                     from guarantors.models import GuarantorProfile
-                    from guarantors.services import sync_guarantor_profile
 
-                    profile, _ = GuarantorProfile.objects.get_or_create(
+                    GuarantorProfile.objects.get_or_create(
                         member=deposit.savings_account.member
                     )
-                    sync_guarantor_profile(profile)
                 except Exception as e:
                     logger.error(
-                        f"Failed to sync guarantor profile for deposit {deposit.reference}: {e}"
+                        f"Failed to create guarantor profile for deposit {deposit.reference}: {e}"
                     )
 
             return True
@@ -26,7 +26,7 @@ from savingsdeposits.utils import send_deposit_made_email
 from datetime import datetime, date
 from django.db import transaction, models
 from transactions.models import BulkTransactionLog
-from savingtypes.models import SavingType
+from accounts.cache import get_saving_type_names
 from mpesa.models import MpesaBody
 from savings.models import SavingsAccount
 from paymentaccounts.models import get_default_payment_method
@@ -216,7 +216,7 @@ class BulkSavingsDepositUploadView(generics.CreateAPIView):
                 {"error": f"Invalid CSV: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        savings_types = list(SavingType.objects.all().values_list("name", flat=True))
+        savings_types = get_saving_type_names()
         admin = request.user
         prefix = f"SAVINGS-BULK-{date.today().strftime('%Y%m%d')}"
 
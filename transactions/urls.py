@@ -4,6 +4,7 @@ from transactions.views import (
     AccountListView,
     AccountDetailView,
     AccountListDownloadView,
+    AsyncAccountListDownloadView,
     CombinedBulkUploadView,
     MemberYearlySummaryView,
     MemberYearlySummaryPDFView,
@@ -42,6 +43,11 @@ urlpatterns = [
         AccountListDownloadView.as_view(),
         name="account-list-download",
     ),
+    path(
+        "list/download/async/",
+        AsyncAccountListDownloadView.as_view(),
+        name="async-account-list-download",
+    ),
     path(
         "bulk/upload/",
         CombinedBulkUploadView.as_view(),
@@ -23,12 +23,12 @@ from django.utils import timezone
 
 from transactions.serializers import AccountSerializer, BulkUploadSerializer
 from savings.models import SavingsAccount
-from savingtypes.models import SavingType
 from loanaccounts.models import LoanAccount
-from feetypes.models import FeeType
 from loanproducts.models import LoanProduct
 from transactions.models import DownloadLog, BulkTransactionLog
 from paymentaccounts.models import get_default_payment_method
+from accounts.cache import get_saving_type_names, get_fee_type_names
+from accounts.async_utils import AsyncAPIView, aupload_to_cloudinary, run_sync
 
 from savingsdeposits.models import SavingsDeposit
 from savingsdeposits.serializers import SavingsDepositSerializer
@@ -44,6 +44,7 @@ from transactions.reports import (
     get_cash_book,
 )
 
+from financials.cache import cached_report
 from feeaccounts.models import FeeAccount
 from feepayments.models import FeePayment
 from feepayments.serializers import FeePaymentSerializer
@@ -95,6 +96,45 @@ class AccountDetailView(generics.RetrieveAPIView):
         )
 
 
+def build_bulk_upload_template(data, saving_types, fee_types):
+    """Account list with empty bulk upload columns, as a CSV buffer."""
+    buffer = io.StringIO()
+
+    # ====== FULL ACCOUNT LIST + BULK UPLOAD COLUMNS ======
+    headers = ["Member Name", "Member Number"]
+
+    # Savings: Deposit only
+    for st in saving_types:
+        headers += [f"{st} Deposit"]
+
+    # Fees: Payment only
+    for ft in fee_types:
+        headers += [f"{ft} Payment"]
+
+    # write headers
+    writer = csv.DictWriter(buffer, fieldnames=headers, lineterminator="\n")
+    writer.writeheader()
+
+    # write data
+    for user in data:
+        row = {
+            "Member Name": user["member_name"],
+            "Member Number": user["member_no"],
+        }
+
+        # initialize all to empty
+        for st in saving_types:
+            row[f"{st} Deposit"] = ""
+
+        for ft in fee_types:
+            row[f"{ft} Payment"] = ""
+
+        # write row
+        writer.writerow(row)
+
+    return buffer
+
+
 class AccountListDownloadView(generics.ListAPIView):
     serializer_class = AccountSerializer
     permission_classes = [
@@ -113,46 +153,12 @@ class AccountListDownloadView(generics.ListAPIView):
 
     def get(self, request, *args, **kwargs):
         # load types
-        saving_types = list(SavingType.objects.values_list("name", flat=True))
-        fee_types = list(FeeType.objects.values_list("name", flat=True))
+        saving_types = get_saving_type_names()
+        fee_types = get_fee_type_names()
 
         queryset = self.get_queryset()
         serializer = self.get_serializer(queryset, many=True)
-        data = serializer.data
-
-        buffer = io.StringIO()
-
-        # ====== FULL ACCOUNT LIST + BULK UPLOAD COLUMNS ======
-        headers = ["Member Name", "Member Number"]
-
-        # Savings: Deposit only
-        for st in saving_types:
-            headers += [f"{st} Deposit"]
-
-        # Fees: Payment only
-        for ft in fee_types:
-            headers += [f"{ft} Payment"]
-
-        # write headers
-        writer = csv.DictWriter(buffer, fieldnames=headers, lineterminator="\n")
-        writer.writeheader()
-
-        # write data
-        for user in data:
-            row = {
-                "Member Name": user["member_name"],
-                "Member Number": user["member_no"],
-            }
-
-            # initialize all to empty
-            for st in saving_types:
-                row[f"{st} Deposit"] = ""
-
-            for ft in fee_types:
-                row[f"{ft} Payment"] = ""
-
-            # write row
-            writer.writerow(row)
+        buffer = build_bulk_upload_template(serializer.data, saving_types, fee_types)
 
         file_name = f"bulk-upload-template-{date.today().strftime('%Y-%m-%d')}.csv"
         cloudinary_path = f"sproutsacco/bulk-upload-templates/{file_name}"
@@ -177,6 +183,48 @@ class AccountListDownloadView(generics.ListAPIView):
         return response
 
 
+class AsyncAccountListDownloadView(AsyncAPIView):
+    """
+    Async variant of AccountListDownloadView: the Cloudinary upload of the
+    template does not hold a worker thread.
+    """
+
+    authentication_required = True
+
+    async def get(self, request, *args, **kwargs):
+        def load():
+            queryset = (
+                User.objects.all()
+                .filter(is_member=True)
+                .prefetch_related("savings", "fee_accounts")
+            )
+            return (
+                AccountSerializer(queryset, many=True).data,
+                get_saving_type_names(),
+                get_fee_type_names(),
+            )
+
+        data, saving_types, fee_types = await run_sync(load)
+        content = build_bulk_upload_template(data, saving_types, fee_types).getvalue()
+
+        file_name = f"bulk-upload-template-{date.today().strftime('%Y-%m-%d')}.csv"
+        cloudinary_path = f"sproutsacco/bulk-upload-templates/{file_name}"
+
+        upload_result = await aupload_to_cloudinary(
+            content, resource_type="raw", public_id=cloudinary_path, format="csv"
+        )
+
+        await DownloadLog.objects.acreate(
+            admin=request.user,
+            file_name=file_name,
+            cloudinary_url=upload_result["secure_url"],
+        )
+
+        response = HttpResponse(content, content_type="text/csv")
+        response["Content-Disposition"] = f'attachment; filename="{file_name}"'
+        return response
+
+
 class CombinedBulkUploadView(generics.CreateAPIView):
     """
     Bulk upload accounts: Savings Deposits and Fee Payments
@@ -206,8 +254,8 @@ class CombinedBulkUploadView(generics.CreateAPIView):
 
         # Get types
         try:
-            saving_types = list(SavingType.objects.all().values_list("name", flat=True))
-            fee_types = list(FeeType.objects.all().values_list("name", flat=True))
+            saving_types = get_saving_type_names()
+            fee_types = get_fee_type_names()
         except Exception as e:
             logger.error(f"Failed to fetch types: {str(e)}")
             return Response(
@@ -1010,13 +1058,17 @@ class FinancialReportsView(APIView):
         if report_type:
             start_time = timezone.now()
             if report_type == "debtors":
-                data = get_debtors_report()
+                data = cached_report("debtors", {}, get_debtors_report)
                 logger.info(
                     f"Generated debtors report in {timezone.now() - start_time}"
                 )
 
             elif report_type == "balance-sheet":
-                data = get_balance_sheet(as_of_date=as_of_date)
+                data = cached_report(
+                    "summary_balance_sheet",
+                    {"as_of_date": as_of_date},
+                    lambda: get_balance_sheet(as_of_date=as_of_date),
+                )
                 logger.info(f"Generated balance sheet in {timezone.now() - start_time}")
 
             elif report_type == "pnl":
@@ -1025,11 +1077,19 @@ class FinancialReportsView(APIView):
                     today = timezone.now().date()
                     start_date = today.replace(day=1)
 
-                data = get_pnl(start_date=start_date, end_date=end_date)
+                data = cached_report(
+                    "summary_pnl",
+                    {"start_date": start_date, "end_date": end_date},
+                    lambda: get_pnl(start_date=start_date, end_date=end_date),
+                )
                 logger.info(f"Generated P&L in {timezone.now() - start_time}")
 
             elif report_type == "cash-book":
-                data = get_cash_book(start_date=start_date, end_date=end_date)
+                data = cached_report(
+                    "cash_book",
+                    {"start_date": start_date, "end_date": end_date},
+                    lambda: get_cash_book(start_date=start_date, end_date=end_date),
+                )
                 logger.info(f"Generated cash book in {timezone.now() - start_time}")
 
             else:
@@ -1043,11 +1103,24 @@ class FinancialReportsView(APIView):
                 today = timezone.now().date()
                 start_date = today.replace(day=1)
 
+            period = {"start_date": start_date, "end_date": end_date}
             data = {
-                "debtors": get_debtors_report(),
-                "balance_sheet": get_balance_sheet(as_of_date=as_of_date),
-                "pnl": get_pnl(start_date=start_date, end_date=end_date),
-                "cash_book": get_cash_book(start_date=start_date, end_date=end_date),
+                "debtors": cached_report("debtors", {}, get_debtors_report),
+                "balance_sheet": cached_report(
+                    "summary_balance_sheet",
+                    {"as_of_date": as_of_date},
+                    lambda: get_balance_sheet(as_of_date=as_of_date),
+                ),
+                "pnl": cached_report(
+                    "summary_pnl",
+                    period,
+                    lambda: get_pnl(start_date=start_date, end_date=end_date),
+                ),
+                "cash_book": cached_report(
+                    "cash_book",
+                    period,
+                    lambda: get_cash_book(start_date=start_date, end_date=end_date),
+                ),
             }
             logger.info(
                 f"Generated all financial reports in {timezone.now() - total_start_time}"